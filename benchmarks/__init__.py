@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""Performance benchmarks of Curly.
+
+Each module is a standalone script, run it from the repository root,
+like ``python -m benchmarks.compile_corpus``.
+"""
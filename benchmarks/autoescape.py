@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of autoescaping against escaping the whole context.
+
+Context has rows with a few printed fields and a large field which is
+never printed (like a raw document body). Up front escaping walks and
+copies every value of the context before rendering, autoescaping
+escapes only printed values.
+
+Usage: python -m benchmarks.autoescape [--repeat N] [--rows N]
+    [--payload N]
+"""
+
+
+import argparse
+import html
+
+import curly
+from curly import bench
+
+
+TEMPLATE = """\
+<table>{% loop rows %}
+<tr><td>{{ item.name }}</td><td>{{ item.email }}</td>\
+<td>{{ item.status }}</td></tr>{% /loop %}
+</table>
+"""
+
+
+def make_context(rows, payload):
+    return {
+        "rows": [
+            {"name": "<user{0}>".format(index),
+             "email": "user{0}@example.com".format(index),
+             "status": ("active", "<blocked>")[index % 2],
+             "payload": "<p>" + "x" * payload + "</p>"}
+            for index in range(rows)]}
+
+
+def escape_context(value):
+    if isinstance(value, dict):
+        return {key: escape_context(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [escape_context(item) for item in value]
+    if isinstance(value, str):
+        return html.escape(value)
+
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--payload", type=int, default=10000)
+    options = parser.parse_args()
+
+    context = make_context(options.rows, options.payload)
+    plain = curly.Template(TEMPLATE)
+    autoescaped = curly.Template(TEMPLATE, autoescape=True)
+    cases = (
+        ("no escaping", lambda: plain.render(context)),
+        ("up front", lambda: plain.render(escape_context(context))),
+        ("autoescape", lambda: autoescaped.render(context)))
+
+    results = bench.measure_cases(cases, repeat=options.repeat)
+    print(bench.format_cases(results, unit="us", speedup=False))
+
+
+if __name__ == "__main__":
+    main()
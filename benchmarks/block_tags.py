@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of block tag dispatch in the parser.
+
+Parses a tag-heavy template (every other token is a block tag) with
+builtin tags only, with a hundred of additional tags in the registry
+and with a custom tag instead of ``if``. Tokens are lexed and trimmed
+beforehand, so only the stack machine of the parser is measured.
+
+Usage: python -m benchmarks.block_tags [--repeat N] [--sections N]
+"""
+
+
+import argparse
+import collections
+import functools
+
+from curly import bench
+from curly import lexer
+from curly import parser
+
+
+SECTION = (
+    "{% if a %}<b>{{ a }}</b>{% elif b %}<i>{{ b }}</i>{% else %}-{% /if %}"
+    "{% loop items %}{% if item %}<li>{{ item }}</li>{% /if %}{% /loop %}")
+
+
+class CustomNode(parser.BlockTagNode):
+    """Node of the custom tag, renders its body as is."""
+
+
+def make_tokens(text):
+    return list(parser.trim_tokens(lexer.tokenize(text)))
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--repeat", type=int, default=10)
+    argparser.add_argument("--sections", type=int, default=5000)
+    options = argparser.parse_args()
+
+    text = SECTION * options.sections
+    tokens = make_tokens(text)
+    custom_tokens = make_tokens(
+        text.replace("{% if item %}", "{% custom item %}").replace(
+            "{% /if %}{% /loop %}", "{% /custom %}{% /loop %}"))
+
+    def register_extra():
+        for index in range(100):
+            parser.register_block_tag(
+                "extra{0}".format(index), CustomNode)
+
+    cases = (
+        ("builtin", tokens, None),
+        ("registry100", tokens, register_extra),
+        ("custom", custom_tokens,
+         lambda: parser.register_block_tag("custom", CustomNode)))
+
+    print("tokens={0}".format(len(tokens)))
+    results = collections.OrderedDict()
+    for name, case_tokens, setup in cases:
+        if setup is not None:
+            setup()
+        results[name] = bench.measure(
+            functools.partial(parser.parse_tokens, case_tokens),
+            repeat=options.repeat, warmup=1)
+    print(bench.format_cases(results))
+
+
+if __name__ == "__main__":
+    main()
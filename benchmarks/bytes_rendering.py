@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of rendering into bytes against encoding rendered text.
+
+Template is a literal-heavy page: large blocks of markup with a few
+printed values and conditions between them, like pages which are sent
+to the socket in UTF-8. :py:meth:`curly.Template.render_bytes` encodes
+only printed values and joins encoded chunks, ``render().encode()``
+builds the whole text and encodes it once again.
+
+Usage: python -m benchmarks.bytes_rendering [--repeat N] [--sections N]
+    [--literal N]
+"""
+
+
+import argparse
+
+import curly
+from curly import bench
+
+
+SECTION = (
+    "<section class=\"card\">\n{0}"
+    "  <h2>{{ post.title }}</h2>\n"
+    "  {% if post.visible %}<p>{{ post.body }}</p>"
+    "{% else %}<p>Скрыто</p>{% /if %}\n"
+    "  <footer>{{ post.author }} — {{ post.date }}</footer>\n"
+    "</section>\n")
+
+LITERAL = (
+    "  <p class=\"lead\">Lorem ipsum dolor sit amet, consectetur "
+    "adipiscing elit, sed do eiusmod tempor — «текст» ü€.</p>\n")
+
+CONTEXT = {
+    "post": {
+        "title": "Заголовок",
+        "body": "Body of the post",
+        "visible": True,
+        "author": "Sergey",
+        "date": "2017-01-01"}}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--sections", type=int, default=200)
+    parser.add_argument("--literal", type=int, default=10,
+                        help="The number of literal lines in section.")
+    options = parser.parse_args()
+
+    template = curly.Template(
+        SECTION.replace("{0}", LITERAL * options.literal) *
+        options.sections)
+    rendered = template.render_bytes(CONTEXT)
+    assert rendered == template.render(CONTEXT).encode("utf-8")
+    print("output={0:.2f}MB".format(len(rendered) / 2 ** 20))
+
+    cases = (
+        ("encode", lambda: template.render(CONTEXT).encode("utf-8")),
+        ("bytes", lambda: template.render_bytes(CONTEXT)))
+
+    results = bench.measure_cases(cases, repeat=options.repeat)
+    print(bench.format_cases(results, extra=(
+        ("throughput", lambda stats: "{0:8.1f}MB/s".format(
+            len(rendered) / stats["median"] / 2 ** 20)),
+        ("memory", lambda stats: "{0:8.2f}MB".format(
+            stats["allocated_peak"] / 2 ** 20)))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compare two runs of :py:mod:`benchmarks.suite`.
+
+Prints a table with median timings of every scenario and phase and
+flags regressions: phases which became slower than the threshold.
+Exits with status 1 if there are any regressions.
+
+Usage: python -m benchmarks.compare BASE.json NEW.json [-t 0.1]
+"""
+
+
+import argparse
+import json
+import sys
+
+
+def compare(base, new, threshold, metric="median"):
+    """Compare two results of the suite.
+
+    :return: List of ``(scenario, phase, base, new, ratio, regressed)``.
+    """
+    rows = []
+
+    for scenario, result in new["results"].items():
+        base_result = base["results"].get(scenario)
+        if base_result is None:
+            continue
+        for phase, stats in result["phases"].items():
+            base_stats = base_result["phases"].get(phase)
+            if base_stats is None:
+                continue
+            ratio = stats[metric] / base_stats[metric]
+            rows.append((scenario, phase, base_stats[metric], stats[metric],
+                         ratio, ratio > 1 + threshold))
+
+    return rows
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    argparser.add_argument("base", help="JSON with base results.")
+    argparser.add_argument("new", help="JSON with new results.")
+    argparser.add_argument(
+        "-t", "--threshold", type=float, default=0.1,
+        help="Relative slowdown which is considered as regression.")
+    argparser.add_argument(
+        "-m", "--metric", default="median", choices=("min", "median", "p99"),
+        help="Metric to compare.")
+    options = argparser.parse_args()
+
+    with open(options.base) as base_fp, open(options.new) as new_fp:
+        rows = compare(json.load(base_fp), json.load(new_fp),
+                       options.threshold, options.metric)
+
+    print("{0:<16} {1:<12} {2:>12} {3:>12} {4:>8}".format(
+        "scenario", "phase", "base, us", "new, us", "change"))
+    for scenario, phase, base, new, ratio, regressed in rows:
+        print("{0:<16} {1:<12} {2:>12.1f} {3:>12.1f} {4:>+7.1f}%{5}".format(
+            scenario, phase, base * 1e6, new * 1e6, (ratio - 1) * 100,
+            "  REGRESSION" if regressed else ""))
+
+    if any(row[-1] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of parallel precompilation of a template directory.
+
+Generates a corpus of templates in temporary directory and compiles it
+with :py:func:`curly.batch.compile_files` using different number of
+worker processes. Speedup is reported against single process.
+
+Usage: python -m benchmarks.compile_corpus [--files N] [--size N]
+"""
+
+
+import argparse
+import os
+import tempfile
+import time
+
+from curly import batch
+from curly import cache
+
+
+TEMPLATE_CHUNK = """\
+<div class="user">Hello {{ user.name }}!
+{% if user.admin %}<a href="/admin">Admin</a>{% elif user.staff %}Staff\
+{% else %}Guest{% /if %}
+<ul>{% loop user.items %}<li>{{ item.key }}: {{ item.value }}</li>\
+{% /loop %}</ul></div>
+"""
+
+
+def make_corpus(directory, files, size):
+    for index in range(files):
+        subdir = os.path.join(directory, "{0:03d}".format(index % 100))
+        os.makedirs(subdir, exist_ok=True)
+        path = os.path.join(subdir, "template{0}.html".format(index))
+        with open(path, "w") as template_fp:
+            template_fp.write(TEMPLATE_CHUNK * size)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=20)
+    options = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    jobs_list = sorted({1, 2, 4, 8, 16, cpus} & set(range(1, cpus + 1)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        make_corpus(os.path.join(directory, "src"), options.files,
+                    options.size)
+        paths = batch.find_templates(os.path.join(directory, "src"))
+
+        baseline = None
+        for jobs in jobs_list:
+            template_cache = cache.FileCache(
+                os.path.join(directory, "cache{0}".format(jobs)))
+            started_at = time.perf_counter()
+            errors = sum(
+                1 for result in batch.compile_files(
+                    paths, jobs=jobs, cache=template_cache)
+                if result.error)
+            elapsed = time.perf_counter() - started_at
+            baseline = baseline or elapsed
+
+            print("jobs={0:<3d} {1:8.3f}s {2:9.1f} files/s "
+                  "speedup={3:5.2f} errors={4}".format(
+                      jobs, elapsed, len(paths) / elapsed,
+                      baseline / elapsed, errors))
+
+
+if __name__ == "__main__":
+    main()
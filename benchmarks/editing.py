@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of incremental recompilation of edited templates.
+
+Makes single-character edits in a large template (typing into literal
+text, into expressions of prints and into the body of the loop) and
+recompiles it with :py:meth:`curly.template.Template.edit` and from
+scratch.
+
+Usage: python -m benchmarks.editing [--repeat N] [--kilobytes N]
+"""
+
+
+import argparse
+import collections
+import random
+
+import curly
+from curly import bench
+
+
+SECTION = (
+    "{% if show %}<div class=\"post\">\n"
+    "  <h2>{{ post.title }}</h2>\n"
+    "  <p>Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do "
+    "eiusmod tempor incididunt ut labore et dolore magna aliqua.</p>\n"
+    "  {% if post.visible %}<p>{{ post.body }}</p>"
+    "{% else %}<p>hidden</p>{% /if %}\n"
+    "  <ul>{% loop post.tags %}<li>{{ item }}</li>{% /loop %}</ul>\n"
+    "  <p>Ut enim ad minim veniam, quis nostrud exercitation ullamco "
+    "laboris nisi ut aliquip ex ea commodo consequat.</p>\n"
+    "</div>{% /if %}\n")
+
+
+def make_edits(text, marker, count):
+    """Offsets after the marker in random sections of the text."""
+    offsets = []
+    position = text.find(marker)
+    while position >= 0:
+        offsets.append(position + len(marker))
+        position = text.find(marker, position + 1)
+
+    return random.sample(offsets, min(count, len(offsets)))
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--repeat", type=int, default=50)
+    argparser.add_argument("--kilobytes", type=int, default=64)
+    options = argparser.parse_args()
+
+    random.seed(0)
+    text = SECTION * (options.kilobytes * 1024 // len(SECTION))
+    template = curly.Template(text, editable=True)
+    edits = {
+        "literal": iter(make_edits(text, "Lorem", options.repeat * 2)),
+        "print": iter(make_edits(text, "{{ post.ti", options.repeat * 2)),
+        "loop": iter(make_edits(text, "<li", options.repeat * 2))}
+
+    def edit(kind):
+        # Typing a character and deleting it back keeps text the same.
+        offset = next(edits[kind])
+        template.edit(offset, offset, "x")
+        template.edit(offset, offset + 1, "")
+
+    cases = [
+        ("full", lambda: curly.Template(text + "x"), 3)]
+    cases.extend(
+        (kind, lambda kind=kind: edit(kind), options.repeat)
+        for kind in sorted(edits))
+
+    print("template={0:.1f}KB".format(len(text) / 1024))
+    results = collections.OrderedDict()
+    for name, func, repeat in cases:
+        stats = bench.measure(func, repeat=repeat, warmup=0)
+        if name != "full":
+            # Every measured run makes 2 edits.
+            stats = {key: value / 2 for key, value in stats.items()}
+        results[name] = stats
+    print(bench.format_cases(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Parametric generator of synthetic templates and contexts.
+
+Template is a sequence of *blocks*. Each block is either a literal
+text or a tag; tags are prints, conditions and loops which could nest
+each other up to the given depth. Every variable used by the template
+is present in the generated context, so template always renders.
+
+.. code-block:: pycon
+
+  >>> from benchmarks.generator import Parameters, generate
+  >>> text, context = generate(Parameters(size=10000, nesting=3))
+"""
+
+
+import collections
+import random
+
+
+Parameters = collections.namedtuple("Parameters", [
+    "size",          # approximate size of the template in characters
+    "tag_density",   # probability that block is a tag, not a literal
+    "nesting",       # maximal depth of nested if/loop blocks
+    "fanout",        # the number of items in each loop
+    "path_depth",    # the number of segments in dotted variable paths
+    "objects",       # use objects with attributes instead of dicts
+    "seed"           # random seed, generation is deterministic
+])
+Parameters.__new__.__defaults__ = (10000, 0.3, 2, 5, 2, False, 0)
+
+
+LITERAL_WORDS = (
+    "lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing",
+    "elit", "sed", "do", "eiusmod", "tempor", "incididunt", "ut", "labore")
+
+
+class Object:
+    """Plain object to test attribute lookups."""
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+    def __repr__(self):
+        return "Object({0!r})".format(self.__dict__)
+
+
+class Generator:
+    """Stateful generator for :py:func:`generate`."""
+
+    def __init__(self, parameters):
+        self.parameters = parameters
+        self.random = random.Random(parameters.seed)
+        self.variables = 0
+        self.context = {}
+
+    def generate(self):
+        chunks = []
+        size = 0
+
+        while size < self.parameters.size:
+            chunk = self.block(self.parameters.nesting, in_loop=False)
+            chunks.append(chunk)
+            size += len(chunk)
+
+        return "".join(chunks), self.context
+
+    def block(self, depth, in_loop):
+        if self.random.random() >= self.parameters.tag_density:
+            return self.literal()
+
+        kinds = ["print"]
+        if depth > 0:
+            kinds.extend(("if", "loop"))
+        kind = self.random.choice(kinds)
+
+        if kind == "print":
+            return "{{ " + self.path(in_loop) + " }}"
+        if kind == "if":
+            return "{{% if {0} %}}{1}{{% else %}}{2}{{% /if %}}".format(
+                self.flag(), self.body(depth - 1, in_loop),
+                self.body(depth - 1, in_loop))
+
+        return "{{% loop {0} %}}{1}{{% /loop %}}".format(
+            self.rows(), self.body(depth - 1, True))
+
+    def body(self, depth, in_loop):
+        return "".join(
+            self.block(depth, in_loop)
+            for _ in range(self.random.randint(1, 4)))
+
+    def literal(self):
+        words = self.random.sample(LITERAL_WORDS, self.random.randint(1, 8))
+        return " ".join(words) + "\n"
+
+    def name(self):
+        self.variables += 1
+        return "var{0}".format(self.variables)
+
+    def path(self, in_loop):
+        if in_loop and self.random.random() < 0.5:
+            return "item." + ".".join(["field"] * self.parameters.path_depth)
+
+        names = [self.name() for _ in range(self.parameters.path_depth)]
+        self.context[names[0]] = self.nested(names[1:], "value")
+
+        return ".".join(names)
+
+    def flag(self):
+        name = self.name()
+        self.context[name] = self.random.random() < 0.5
+
+        return name
+
+    def rows(self):
+        name = self.name()
+        row = self.nested(["field"] * self.parameters.path_depth, "cell")
+        self.context[name] = [row] * self.parameters.fanout
+
+        return name
+
+    def nested(self, names, value):
+        for name in reversed(names):
+            if self.parameters.objects:
+                value = Object(**{name: value})
+            else:
+                value = {name: value}
+
+        return value
+
+
+def generate(parameters=Parameters()):
+    """Generate template and context.
+
+    :param parameters: Generation parameters.
+    :type parameters: :py:data:`Parameters`
+    :return: Template text and context for it.
+    :rtype: tuple[str, dict]
+    """
+    return Generator(parameters).generate()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of incremental rendering against full rendering.
+
+Renders a dashboard-like template where only a few hosts change between
+updates, with :py:meth:`curly.template.Template.render` and with
+:py:class:`curly.incremental.IncrementalRenderer`.
+
+Usage: python -m benchmarks.incremental [--repeat N] [--hosts N]
+"""
+
+
+import argparse
+import functools
+import itertools
+
+import curly
+from curly import bench
+from curly.incremental import IncrementalRenderer
+
+
+TEMPLATE = (
+    "<h1>{{ title }}</h1><p>Updated at {{ updated_at }}</p><table>"
+    "{% loop hosts %}<tr><td>{{ item.name }}</td>"
+    "<td>{% if item.alive %}up{% else %}down{% /if %}</td>"
+    "<td>{{ item.load }}</td></tr>{% /loop %}</table>")
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--repeat", type=int, default=20)
+    argparser.add_argument("--hosts", type=int, default=5000)
+    argparser.add_argument("--changes", type=int, default=10)
+    options = argparser.parse_args()
+
+    context = {
+        "title": "Dashboard",
+        "updated_at": 0,
+        "hosts": [{"name": "host{0}".format(index), "alive": True,
+                   "load": index % 100}
+                  for index in range(options.hosts)]}
+    ticks = itertools.count()
+
+    def tick():
+        step = next(ticks)
+        context["updated_at"] = step
+        for index in range(options.changes):
+            host = context["hosts"][(step * options.changes + index) %
+                                    options.hosts]
+            host["load"] += 1
+
+    template = curly.Template(TEMPLATE)
+    renderer = IncrementalRenderer(template)
+    renderer.update(context)
+
+    cases = (
+        ("full", functools.partial(template.render, context)),
+        ("incremental", functools.partial(renderer.update, context)))
+
+    results = bench.measure_cases(
+        ((name, lambda render=render: (tick(), render()))
+         for name, render in cases),
+        repeat=options.repeat, warmup=1)
+    print(bench.format_cases(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of memory used by a corpus of near-duplicate templates.
+
+Every tenant template is a copy of one of a few base layouts with a
+couple of tenant-specific changes (a title and a footer). Corpus is
+compiled with and without interning (see :py:mod:`curly.interning`)
+and memory allocated by compiled templates is measured with
+:py:mod:`tracemalloc`.
+
+Usage: python -m benchmarks.interning [--tenants N] [--layouts N]
+"""
+
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+import curly
+
+
+SECTION = (
+    "{% if show_{0} %}<div class=\"block-{0}\">\n"
+    "  <h2>{{ post.title | upper }}</h2>\n"
+    "  <p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>\n"
+    "  {% if post.visible %}<p>{{ post.body }}</p>"
+    "{% else %}<p>hidden</p>{% /if %}\n"
+    "  <ul>{% loop post.tags %}<li>{{ item }}</li>{% /loop %}</ul>\n"
+    "</div>{% /if %}\n")
+
+
+def make_corpus(tenants, layouts, sections):
+    bases = [
+        "".join(SECTION.replace("{0}", str(layout * 100 + index))
+                for index in range(sections))
+        for layout in range(layouts)]
+
+    return [
+        "<title>Tenant {0}</title>\n{1}<footer>{{{{ tenant_{0} }}}}"
+        "</footer>".format(tenant, bases[tenant % layouts])
+        for tenant in range(tenants)]
+
+
+def measure(corpus, intern):
+    gc.collect()
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    compiled = [curly.Template(text, intern=intern) for text in corpus]
+    elapsed = time.perf_counter() - started_at
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return compiled, used, elapsed
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--tenants", type=int, default=1000)
+    argparser.add_argument("--layouts", type=int, default=5)
+    argparser.add_argument("--sections", type=int, default=20)
+    options = argparser.parse_args()
+
+    corpus = make_corpus(options.tenants, options.layouts, options.sections)
+    print("templates={0} source={1:.2f}MB".format(
+        len(corpus), sum(map(len, corpus)) / 2 ** 20))
+
+    baseline = None
+    for name, intern in (("plain", False), ("interned", True)):
+        compiled, used, elapsed = measure(corpus, intern)
+        baseline = baseline or used
+        print("{0:<12} memory={1:8.2f}MB compile={2:8.2f}s "
+              "saved={3:5.1%}".format(
+                  name, used / 2 ** 20, elapsed, 1 - used / baseline))
+        del compiled
+
+
+if __name__ == "__main__":
+    main()
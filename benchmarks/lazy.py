@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of lazy parsing of block bodies.
+
+Template is a page with a few sections which are rendered and a lot
+of large branches which are not (admin sections, error pages).
+Compilation with and without ``lazy`` (see :py:mod:`curly.lazy`) is
+compared by time to the first rendering (compilation and rendering)
+and by memory allocated by the compiled template, measured with
+:py:mod:`tracemalloc`.
+
+Usage: python -m benchmarks.lazy [--repeat N] [--sections N] [--admin-rows N]
+"""
+
+
+import argparse
+import functools
+import gc
+import tracemalloc
+
+import curly
+from curly import bench
+
+
+SECTION = (
+    "<div class=\"post\">\n"
+    "  <h2>{{ post.title | upper }}</h2>\n"
+    "  {% if admin %}<form>\n{0}  </form>"
+    "{% elif error %}<p>{{ error.message }}</p>"
+    "{% else %}<p>{{ post.body }}</p>{% /if %}\n"
+    "</div>\n")
+
+ADMIN_ROW = (
+    "    {% loop post.fields %}<label>{{ item.key }}</label>"
+    "<input value=\"{{ item.value }}\">{% /loop %}\n"
+    "    <p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>\n"
+    "    {% if post.draft %}<p>{{ post.body }}</p>"
+    "{% else %}<p>published</p>{% /if %}\n")
+
+CONTEXT = {
+    "admin": False,
+    "error": None,
+    "post": {"title": "title", "body": "body"}}
+
+
+def render(text, lazy):
+    return curly.Template(text, lazy=lazy).render(CONTEXT)
+
+
+def measure_memory(text, lazy):
+    gc.collect()
+    tracemalloc.start()
+    template = curly.Template(text, lazy=lazy)
+    template.render(CONTEXT)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return template, used
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--repeat", type=int, default=10)
+    argparser.add_argument("--sections", type=int, default=2000)
+    argparser.add_argument("--admin-rows", type=int, default=5)
+    options = argparser.parse_args()
+
+    text = SECTION.replace(
+        "{0}", ADMIN_ROW * options.admin_rows) * options.sections
+    rendered = curly.Template(text).render(CONTEXT)
+
+    cases = (("eager", False), ("lazy", True))
+    for _, lazy in cases:
+        assert curly.Template(text, lazy=lazy).render(CONTEXT) == rendered
+
+    results = bench.measure_cases(
+        ((name, functools.partial(render, text, lazy))
+         for name, lazy in cases),
+        repeat=options.repeat, warmup=1)
+    for name, lazy in cases:
+        results[name]["memory"] = measure_memory(text, lazy)[1]
+    print(bench.format_cases(results, extra=(
+        ("memory", lambda stats: "{0:8.2f}MB".format(
+            stats["memory"] / 2 ** 20)),)))
+
+
+if __name__ == "__main__":
+    main()
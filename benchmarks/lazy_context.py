@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of lazy context values against building the whole context.
+
+Page has a lot of widgets, every one needs an expensive value (a query
+to the database, emulated with a sleep). Only a few widgets are shown:
+others are in ``if`` branches which are not taken. Context is built up
+front, made of providers (see :py:mod:`curly.context`) or made of
+providers which are prefetched in the thread pool.
+
+Usage: python -m benchmarks.lazy_context [--repeat N] [--widgets N]
+    [--shown N] [--latency MS]
+"""
+
+
+import argparse
+import concurrent.futures
+import time
+
+import curly
+from curly import bench
+from curly.context import LazyContext
+
+
+WIDGET = (
+    "{% if show.widget_{0} %}<div class=\"widget\">"
+    "<h3>{{ widget_{0}.title }}</h3>"
+    "{% loop widget_{0}.rows %}<p>{{ item }}</p>{% /loop %}</div>"
+    "{% /if %}\n")
+
+
+def make_provider(index, latency):
+    def provide():
+        time.sleep(latency)
+        return {"title": "Widget {0}".format(index),
+                "rows": ["row {0}".format(row) for row in range(10)]}
+
+    return provide
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--widgets", type=int, default=50)
+    parser.add_argument("--shown", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=2.0,
+                        help="Latency of the provider in milliseconds.")
+    options = parser.parse_args()
+
+    # Shown widgets are printed at the top level, so they are prefetched.
+    template = curly.Template(
+        "".join("{{{{ widget_{0}.title }}}}\n".format(index)
+                for index in range(options.shown)) +
+        "".join(WIDGET.replace("{0}", str(index))
+                for index in range(options.widgets)))
+    show = {"widget_{0}".format(index): index < options.shown
+            for index in range(options.widgets)}
+    providers = {
+        "widget_{0}".format(index): make_provider(
+            index, options.latency / 1e3)
+        for index in range(options.widgets)}
+
+    def eager():
+        context = {key: provide() for key, provide in providers.items()}
+        context["show"] = show
+        return template.render(context)
+
+    def lazy():
+        return template.render(LazyContext(providers, show=show))
+
+    executor = concurrent.futures.ThreadPoolExecutor(options.shown or 1)
+
+    def prefetched():
+        context = LazyContext(providers, show=show)
+        return template.render(template.prefetch(context, executor))
+
+    assert eager() == lazy() == prefetched()
+
+    results = bench.measure_cases(
+        (("eager", eager), ("lazy", lazy), ("prefetch", prefetched)),
+        repeat=options.repeat, warmup=2)
+    print(bench.format_cases(results))
+
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of failed lookups against a large context.
+
+Every dotted lookup of the template walks the context and creates
+exceptions on misses, so the cost of exception construction is
+multiplied by the number of lookups. Renders the template where all
+lookups succeed and measures resolution of dotted paths which miss on
+the last segment.
+
+Usage: python -m benchmarks.lookup_errors [--repeat N] [--keys N]
+    [--lookups N]
+"""
+
+
+import argparse
+
+import curly
+from curly import bench
+from curly import exceptions
+from curly import utils
+
+
+def make_context(keys):
+    return {
+        "key{0}".format(index): {
+            "name": "name{0}".format(index),
+            "payload": "x" * 100}
+        for index in range(keys)}
+
+
+def resolve_missing(paths, context):
+    for path in paths:
+        try:
+            utils.resolve_variable(path, context)
+        except exceptions.CurlyEvaluateError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keys", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    options = parser.parse_args()
+
+    context = make_context(options.keys)
+    names = ["key{0}".format(index % options.keys)
+             for index in range(options.lookups)]
+    template = curly.Template(
+        "".join("{{ " + name + ".name }}" for name in names))
+    missing = [name + ".missing" for name in names]
+    exc = exceptions.CurlyEvaluateNoKeyError(context, "missing")
+
+    cases = (
+        ("render", lambda: template.render(context)),
+        ("missing lookups", lambda: resolve_missing(missing, context)),
+        ("str(exception)", lambda: str(exc)))
+
+    results = bench.measure_cases(cases, repeat=options.repeat, warmup=1)
+    print(bench.format_cases(results, unit="us", speedup=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of memory-mapped template sources.
+
+Writes a large mostly static template into temporary file and compiles
+it in a fresh process: after reading the whole file and with
+:py:meth:`curly.Template.from_file`. Reports resident memory of the
+process after compilation and throughput of rendering into binary
+sink with :py:meth:`curly.Template.render_to`. Private memory does not
+include pages of the mapped file (they are shared page cache).
+
+Usage: python -m benchmarks.mmap_sources [--megabytes N] [--repeat N]
+"""
+
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import curly
+
+
+BLOCK = "".join(
+    "<p class=\"static\">Paragraph {0} of the static page.</p>\n".format(
+        index)
+    for index in range(20000))
+
+TAGS = "<h1>{{ title }}</h1>{% if user %}<b>{{ user }}</b>{% /if %}\n"
+
+CONTEXT = {"title": "Benchmark", "user": "someone"}
+
+
+class NullSink:
+    """Binary sink which discards written data."""
+
+    def write(self, data):
+        return len(data)
+
+
+def get_memory():
+    """Resident and private (not file-backed) memory in bytes."""
+    with open("/proc/self/statm") as statm_fp:
+        _, resident, shared = statm_fp.read().split()[:3]
+    page_size = os.sysconf("SC_PAGE_SIZE")
+
+    return (int(resident) * page_size,
+            (int(resident) - int(shared)) * page_size)
+
+
+def load(path, mode):
+    if mode == "mmap":
+        return curly.Template.from_file(path)
+
+    with open(path, "rb") as template_fp:
+        return curly.Template(template_fp.read())
+
+
+def child(path, mode, repeat):
+    base_rss, base_private = get_memory()
+    template = load(path, mode)
+    rss, private = get_memory()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    sink = NullSink()
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        written = template.render_to(sink, CONTEXT)
+    elapsed = time.perf_counter() - started_at
+
+    megabyte = 1024 * 1024
+    print("{0:<6} rss={1:6.1f}MB private={2:6.1f}MB peak={3:6.1f}MB "
+          "render={4:8.1f}MB/s".format(
+              mode, (rss - base_rss) / megabyte,
+              (private - base_private) / megabyte,
+              (peak - base_rss) / megabyte,
+              written * repeat / elapsed / megabyte))
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--megabytes", type=int, default=100)
+    argparser.add_argument("--repeat", type=int, default=5)
+    argparser.add_argument("--child", nargs=2, metavar=("PATH", "MODE"),
+                           help=argparse.SUPPRESS)
+    options = argparser.parse_args()
+
+    if options.child:
+        child(options.child[0], options.child[1], options.repeat)
+        return
+
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8") as template_fp:
+        blocks = options.megabytes * 1024 * 1024 // len(BLOCK)
+        for _ in range(blocks):
+            template_fp.write(BLOCK)
+            template_fp.write(TAGS)
+        template_fp.flush()
+        print("file={0:.1f}MB".format(
+            os.path.getsize(template_fp.name) / 1024 / 1024))
+
+        for mode in ("whole", "mmap"):
+            subprocess.check_call([
+                sys.executable, "-m", "benchmarks.mmap_sources",
+                "--repeat", str(options.repeat),
+                "--child", template_fp.name, mode])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of the overhead of render observers.
+
+Renders the same template without observer, with no-op
+:py:class:`curly.metrics.Observer` and with
+:py:class:`curly.metrics.MetricsSink`.
+
+Usage: python -m benchmarks.observer_overhead [--repeat N] [--rows N]
+"""
+
+
+import argparse
+import functools
+
+import curly
+from curly import bench
+from curly import metrics
+
+
+TEMPLATE = """\
+<h1>{{ title }}</h1>
+<table>{% loop rows %}
+<tr><td>{{ item.id }}</td><td>{{ item.name }}</td>\
+<td>{% if item.admin %}admin{% else %}user{% /if %}</td></tr>\
+{% /loop %}
+</table>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=100)
+    options = parser.parse_args()
+
+    context = {
+        "title": "Users",
+        "rows": [
+            {"id": index, "name": "user{0}".format(index),
+             "admin": index % 10 == 0}
+            for index in range(options.rows)]}
+    observers = (
+        ("no observer", None),
+        ("Observer", metrics.Observer()),
+        ("MetricsSink", metrics.MetricsSink()))
+
+    results = bench.measure_cases(
+        ((name, functools.partial(
+            curly.Template(TEMPLATE, observer=observer).render, context))
+         for name, observer in observers),
+        repeat=options.repeat)
+    baseline = results["no observer"]["median"]
+    print(bench.format_cases(
+        results, unit="us", speedup=False, extra=(
+            ("overhead", lambda stats: "{0:+6.1f}%".format(
+                (stats["median"] / baseline - 1) * 100)),)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of batch rendering against a JSONL stream of contexts.
+
+Renders one template against generated JSONL lines with
+:py:func:`curly.batch.render_contexts` using different number of worker
+processes and reports throughput in renders per second.
+
+Usage: python -m benchmarks.render_stream [--contexts N]
+"""
+
+
+import argparse
+import json
+import os
+import time
+
+import curly
+from curly import batch
+
+
+TEMPLATE = """\
+<tr><td>{{ id }}</td><td>{{ user.name }}</td>\
+<td>{% if user.admin %}admin{% else %}user{% /if %}</td>\
+<td>{% loop tags %}{{ item }} {% /loop %}</td></tr>
+"""
+
+
+def make_contexts(count):
+    for index in range(count):
+        yield json.dumps({
+            "id": index,
+            "user": {"name": "user{0}".format(index), "admin": index % 7 == 0},
+            "tags": ["tag{0}".format(tag) for tag in range(index % 5)]})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contexts", type=int, default=100000)
+    options = parser.parse_args()
+
+    template = curly.Template(TEMPLATE)
+    cpus = os.cpu_count() or 1
+    jobs_list = sorted({1, 2, 4, 8, 16, cpus} & set(range(1, cpus + 1)))
+
+    for jobs in jobs_list:
+        started_at = time.perf_counter()
+        rendered = batch.render_contexts(
+            template, make_contexts(options.contexts), jobs=jobs,
+            decode=json.loads)
+        size = sum(len(text) for text in rendered)
+        elapsed = time.perf_counter() - started_at
+
+        print("jobs={0:<3d} {1:8.3f}s {2:10.1f} renders/s {3} chars".format(
+            jobs, elapsed, options.contexts / elapsed, size))
+
+
+if __name__ == "__main__":
+    main()
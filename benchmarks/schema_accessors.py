@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of schema accessors against schemaless rendering.
+
+Renders a template with nested variables and ``if`` blocks inside the
+loop (so the body is not vectorized) without schema and with schema,
+when every variable is looked up by generated accessor.
+
+Usage: python -m benchmarks.schema_accessors [--repeat N] [--rows N]
+"""
+
+
+import argparse
+import functools
+
+import curly
+from curly import bench
+
+
+TEMPLATE = (
+    "{{ page.title }} by {{ page.author.name }}\n"
+    "{% loop rows %}{% if item.visible %}{{ item.user.name }} "
+    "{{ item.user.roles.0 }} {{ item.score }}\n{% /if %}{% /loop %}")
+
+SCHEMA = {
+    "page": {"title": str, "author": {"name": str}},
+    "rows": [{
+        "visible": bool,
+        "score": int,
+        "user": {"name": str, "roles": [str]}}]}
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--repeat", type=int, default=10)
+    argparser.add_argument("--rows", type=int, default=20000)
+    options = argparser.parse_args()
+
+    context = {
+        "page": {"title": "Report", "author": {"name": "Sergey"}},
+        "rows": [
+            {"visible": bool(index % 3),
+             "score": index,
+             "user": {"name": "user{0}".format(index),
+                      "roles": ["admin", "view"]}}
+            for index in range(options.rows)]}
+
+    cases = (
+        ("schemaless", curly.Template(TEMPLATE)),
+        ("schema", curly.Template(TEMPLATE, schema=SCHEMA)))
+
+    results = bench.measure_cases(
+        ((name, functools.partial(template.render, context))
+         for name, template in cases),
+        repeat=options.repeat, warmup=1)
+    print(bench.format_cases(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of loading of compiled templates.
+
+Compares compilation of the source from scratch, :py:mod:`pickle` of
+the compiled template and the binary format of
+:py:mod:`curly.serialize` (:py:meth:`curly.template.Template.dumps`
+and :py:meth:`curly.template.Template.loads`). Sizes of the payloads
+are printed too.
+
+Usage: python -m benchmarks.serialization [--repeat N] [--sections N]
+"""
+
+
+import argparse
+import functools
+import pickle
+
+import curly
+from curly import bench
+
+
+SECTION = (
+    "{% if show %}<div class=\"post\">\n"
+    "  <h2>{{ post.title | upper }}</h2>\n"
+    "  <p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>\n"
+    "  {% if post.visible %}<p>{{ post.body }}</p>"
+    "{% elif post.draft %}<p>draft</p>{% else %}<p>hidden</p>{% /if %}\n"
+    "  <ul>{% loop post.tags %}<li>{{ item }}</li>{% /loop %}</ul>\n"
+    "</div>{% /if %}\n")
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--repeat", type=int, default=10)
+    argparser.add_argument("--sections", type=int, default=2000)
+    options = argparser.parse_args()
+
+    text = SECTION * options.sections
+    template = curly.Template(text)
+    pickled = pickle.dumps(template, pickle.HIGHEST_PROTOCOL)
+    dumped = template.dumps()
+
+    sizes = {
+        "reparse": len(text.encode("utf-8")),
+        "pickle": len(pickled),
+        "dump": len(dumped)}
+    results = bench.measure_cases((
+        ("reparse", functools.partial(curly.Template, text)),
+        ("pickle", functools.partial(pickle.loads, pickled)),
+        ("dump", functools.partial(curly.Template.loads, dumped))),
+        repeat=options.repeat, warmup=1)
+    for name, stats in results.items():
+        stats["size"] = sizes[name]
+    print(bench.format_cases(results, extra=(
+        ("size", lambda stats: "{0:9d}".format(stats["size"])),)))
+
+    results = bench.measure_cases((
+        ("pickle:dump", functools.partial(
+            pickle.dumps, template, pickle.HIGHEST_PROTOCOL)),
+        ("dump:dump", template.dumps)),
+        repeat=options.repeat, warmup=1)
+    print(bench.format_cases(results, speedup=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of streaming lexer against lexing of the whole text.
+
+Writes a generated template into temporary file and lexes it after
+reading the whole file and with :py:func:`curly.lexer.tokenize_stream`.
+Reports time and peak memory allocated during lexing (tokens are
+dropped as soon as they are counted).
+
+Usage: python -m benchmarks.streaming [--megabytes N] [--chunk-size N]
+"""
+
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+
+from curly import lexer
+
+
+LINE = "<tr><td>{{ item.name }}</td><td>{% if item.ok %}ok{% /if %}</td>\n"
+
+
+def whole(path, _):
+    with open(path, "rb") as template_fp:
+        return sum(1 for _ in lexer.tokenize(template_fp.read()))
+
+
+def stream(path, chunk_size):
+    with open(path, "rb") as template_fp:
+        return sum(1 for _ in lexer.tokenize_stream(template_fp, chunk_size))
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--megabytes", type=int, default=50)
+    argparser.add_argument("--chunk-size", type=int,
+                           default=lexer.STREAM_CHUNK_SIZE)
+    options = argparser.parse_args()
+
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8") as template_fp:
+        lines = options.megabytes * 1024 * 1024 // len(LINE)
+        for _ in range(lines):
+            template_fp.write(LINE)
+        template_fp.flush()
+
+        for name, function in (("whole", whole), ("stream", stream)):
+            tracemalloc.start()
+            started_at = time.perf_counter()
+            count = function(template_fp.name, options.chunk_size)
+            elapsed = time.perf_counter() - started_at
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print("{0:<8} tokens={1} time={2:8.2f}s peak={3:8.1f}MB".format(
+                name, count, elapsed, peak / 1024 / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark suite of lexing, parsing and rendering.
+
+Runs a set of scenarios made by :py:mod:`benchmarks.generator` and
+measures :py:func:`curly.lexer.tokenize`, :py:func:`curly.parser.parse`,
+rendering of compiled template and end-to-end :py:func:`curly.render`.
+Results are written as JSON, use :py:mod:`benchmarks.compare` to
+compare two runs.
+
+Usage: python -m benchmarks.suite [-o results.json] [-k SUBSTRING]
+"""
+
+
+import argparse
+import collections
+import json
+import platform
+import sys
+import time
+
+import curly
+from curly import bench
+from curly import lexer
+from curly import parser
+
+from benchmarks import generator
+
+
+SCENARIOS = collections.OrderedDict((
+    ("small", generator.Parameters(size=1000)),
+    ("large", generator.Parameters(size=50000)),
+    ("literal-heavy", generator.Parameters(size=20000, tag_density=0.05)),
+    ("tag-dense", generator.Parameters(size=20000, tag_density=0.9)),
+    ("deep-nesting", generator.Parameters(size=20000, nesting=6,
+                                          fanout=2)),
+    ("wide-loops", generator.Parameters(size=2000, nesting=1,
+                                        fanout=200)),
+    ("deep-paths", generator.Parameters(size=20000, path_depth=6)),
+    ("objects", generator.Parameters(size=20000, objects=True))
+))
+"""Scenarios of the suite: name to generator parameters."""
+
+
+def run_scenario(parameters, repeat, warmup):
+    text, context = generator.generate(parameters)
+    tokens = list(lexer.tokenize(text))
+    template = curly.Template(text)
+    phases = collections.OrderedDict()
+
+    phases["tokenize"] = bench.measure(
+        lambda: list(lexer.tokenize(text)), repeat=repeat, warmup=warmup)
+    phases["parse"] = bench.measure(
+        lambda: parser.parse(iter(tokens)), repeat=repeat, warmup=warmup)
+    phases["render"] = bench.measure(
+        lambda: template.render(context), repeat=repeat, warmup=warmup)
+    phases["end-to-end"] = bench.measure(
+        lambda: curly.render(text, context), repeat=repeat, warmup=warmup)
+
+    return {
+        "parameters": parameters._asdict(),
+        "template_size": len(text),
+        "tokens": len(tokens),
+        "phases": phases}
+
+
+def run(scenarios, repeat, warmup, log=sys.stderr):
+    results = collections.OrderedDict()
+
+    for name, parameters in scenarios.items():
+        started_at = time.perf_counter()
+        results[name] = run_scenario(parameters, repeat, warmup)
+        print("{0:<16} done in {1:.1f}s".format(
+            name, time.perf_counter() - started_at), file=log)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "created_at": time.time(),
+            "repeat": repeat,
+            "warmup": warmup},
+        "results": results}
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    argparser.add_argument(
+        "-o", "--output", default="-",
+        help="File to write JSON results into, '-' for stdout.")
+    argparser.add_argument(
+        "-k", "--filter", default="",
+        help="Run only scenarios with this substring in the name.")
+    argparser.add_argument("-n", "--repeat", type=int, default=20)
+    argparser.add_argument("-w", "--warmup", type=int, default=3)
+    options = argparser.parse_args()
+
+    scenarios = collections.OrderedDict(
+        (name, parameters) for name, parameters in SCENARIOS.items()
+        if options.filter in name)
+    results = json.dumps(
+        run(scenarios, options.repeat, options.warmup), indent=2)
+
+    if options.output == "-":
+        print(results)
+    else:
+        with open(options.output, "w") as output_fp:
+            output_fp.write(results)
+
+
+if __name__ == "__main__":
+    main()
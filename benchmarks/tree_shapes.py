@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of compilation and rendering of wide and deep trees.
+
+Wide template has a lot of top-level siblings, deep template nests
+``if`` blocks (or loops) into each other. Both are compiled with
+:py:class:`curly.Template` and rendered.
+
+Usage: python -m benchmarks.tree_shapes [--repeat N] [--siblings N]
+           [--depth N]
+"""
+
+
+import argparse
+import functools
+
+import curly
+from curly import bench
+
+
+SIBLING = "{{ a }}{% if a %}-{% /if %}"
+"""Two top-level siblings."""
+
+
+def make_cases(siblings, depth):
+    return (
+        ("wide", SIBLING * (siblings // 2), {"a": 1}),
+        ("deep-if", "{% if a %}" * depth + "{{ a }}" + "{% /if %}" * depth,
+         {"a": 1}),
+        ("deep-loop",
+         "{% loop items %}" * depth + "{{ item }}" + "{% /loop %}" * depth,
+         {"items": [1]}))
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--repeat", type=int, default=3)
+    argparser.add_argument("--siblings", type=int, default=100000)
+    argparser.add_argument("--depth", type=int, default=10000)
+    options = argparser.parse_args()
+
+    cases = []
+    for name, text, context in make_cases(options.siblings, options.depth):
+        cases.append((name + ":compile",
+                      functools.partial(curly.Template, text)))
+        cases.append((name + ":render", functools.partial(
+            curly.Template(text).render, context)))
+
+    results = bench.measure_cases(cases, repeat=options.repeat, warmup=0)
+    print(bench.format_cases(results, speedup=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of undefined policies with sparse contexts.
+
+Renders the template with optional fields where only a part of
+variables is present in the context. ``strict`` policy could not
+render such contexts, so it is measured with the full context as a
+baseline.
+
+Usage: python -m benchmarks.undefined_policies [--repeat N] [--rows N]
+    [--density D]
+"""
+
+
+import argparse
+import functools
+import logging
+import random
+
+import curly
+from curly import bench
+from curly import undefined
+
+
+FIELDS = ("name", "email", "phone", "company", "title", "city")
+
+TEMPLATE = "{% loop rows %}<tr>" + "".join(
+    "{{% if item.{0} %}}<td>{{{{ item.{0} }}}}</td>{{% /if %}}".format(field)
+    for field in FIELDS) + "</tr>\n{% /loop %}"
+
+
+def make_context(rows, density, seed=0):
+    rand = random.Random(seed)
+
+    return {
+        "rows": [
+            {field: "{0}{1}".format(field, index)
+             for field in FIELDS if rand.random() < density}
+            for index in range(rows)]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--density", type=float, default=0.3)
+    options = parser.parse_args()
+
+    # Logging itself is not what is measured here.
+    logging.getLogger(undefined.__name__).disabled = True
+
+    full_context = make_context(options.rows, 1.0)
+    sparse_context = make_context(options.rows, options.density)
+    cases = (
+        ("strict (full)", "strict", full_context),
+        ("empty (full)", "empty", full_context),
+        ("empty", "empty", sparse_context),
+        ("default", undefined.default(""), sparse_context),
+        ("log", "log", sparse_context))
+
+    results = bench.measure_cases(
+        ((name, functools.partial(
+            curly.Template(TEMPLATE, undefined=policy).render, context))
+         for name, policy, context in cases),
+        repeat=options.repeat)
+    print(bench.format_cases(results, unit="us", speedup=False))
+
+
+if __name__ == "__main__":
+    main()
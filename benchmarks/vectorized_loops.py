@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of vectorized loop bodies against generic rendering.
+
+Renders a table loop over row dicts with the generic path (vectorized
+bodies disabled), over row dicts with vectorized body and over
+column-oriented :py:class:`curly.columns.Columns`.
+
+Usage: python -m benchmarks.vectorized_loops [--repeat N] [--rows N]
+"""
+
+
+import argparse
+import functools
+
+import curly
+from curly import bench
+from curly import parser
+from curly.columns import Columns
+
+
+TEMPLATE = (
+    "{% loop rows %}<tr><td>{{ item.a }}</td><td>{{ item.b }}</td>"
+    "</tr>{% /loop %}")
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument("--repeat", type=int, default=10)
+    argparser.add_argument("--rows", type=int, default=100000)
+    options = argparser.parse_args()
+
+    rows = [{"a": index, "b": "name{0}".format(index)}
+            for index in range(options.rows)]
+    columns = Columns({
+        "a": [row["a"] for row in rows],
+        "b": [row["b"] for row in rows]})
+
+    generic = curly.Template(TEMPLATE)
+    for node in parser.walk_tree(generic.node):
+        if isinstance(node, parser.LoopNode):
+            node.vectorized = None
+    vectorized = curly.Template(TEMPLATE)
+
+    cases = (
+        ("generic", generic, rows),
+        ("vectorized", vectorized, rows),
+        ("columns", vectorized, columns))
+
+    results = bench.measure_cases(
+        ((name, functools.partial(template.render, {"rows": data}))
+         for name, template, data in cases),
+        repeat=options.repeat, warmup=1)
+    print(bench.format_cases(results))
+
+
+if __name__ == "__main__":
+    main()
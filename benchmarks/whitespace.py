@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark of whitespace control on an indented HTML template.
+
+Renders the same page as is, with ``trim_blocks=True`` and with trim
+markers, and reports output size and render time of each variant.
+
+Usage: python -m benchmarks.whitespace [--repeat N] [--rows N]
+"""
+
+
+import argparse
+import functools
+
+import curly
+from curly import bench
+
+
+TEMPLATE = """\
+<html>
+  <body>
+    <table>
+      {% loop rows %}
+      <tr>
+        {% loop item.cells %}
+        <td>
+          {% if item.link %}
+          <a href="{{ item.link }}">{{ item.text }}</a>
+          {% else %}
+          {{ item.text }}
+          {% /if %}
+        </td>
+        {% /loop %}
+      </tr>
+      {% /loop %}
+    </table>
+  </body>
+</html>
+"""
+
+MARKERS_TEMPLATE = TEMPLATE.replace("{% ", "{%- ").replace(" %}", " -%}")
+
+
+def make_context(rows):
+    return {
+        "rows": [
+            {"cells": [
+                {"text": "cell {0}.{1}".format(row, column),
+                 "link": "/{0}/{1}".format(row, column) if column else ""}
+                for column in range(5)]}
+            for row in range(rows)]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=200)
+    options = parser.parse_args()
+
+    context = make_context(options.rows)
+    variants = (
+        ("as is", curly.Template(TEMPLATE)),
+        ("trim_blocks", curly.Template(TEMPLATE, trim_blocks=True)),
+        ("markers", curly.Template(MARKERS_TEMPLATE)))
+
+    results = bench.measure_cases(
+        ((name, functools.partial(template.render, context))
+         for name, template in variants),
+        repeat=options.repeat)
+    for name, template in variants:
+        results[name]["size"] = len(
+            template.render(context).encode("utf-8"))
+    print(bench.format_cases(
+        results, unit="us", speedup=False, extra=(
+            ("size", lambda stats: "{0:8d}B".format(stats["size"])),)))
+
+
+if __name__ == "__main__":
+    main()
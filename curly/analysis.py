@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""Static analysis of the AST tree.
+
+Every variable which template reads is known after parsing, so it is
+possible to find out what data template needs without rendering it:
+
+.. code-block:: pycon
+
+  >>> from curly import Template
+  >>> template = Template(
+  ...     "{{ user.name }}{% loop posts %}{{ item.title }}{% /loop %}")
+  >>> template.variables()
+  ('posts', 'user.name')
+
+Variables of the loop body which refer to ``item`` are attributed to
+the expression of the loop (``posts`` above): the whole collection is
+what template reads from the context.
+
+On top of that, :py:func:`fingerprint` hashes values of the variables
+(and template source) into a digest which changes only if output could
+change. It is much cheaper than rendering, so it fits for ETags and
+``304 Not Modified`` responses:
+
+.. code-block:: python3
+
+  etag = template.fingerprint(context)
+  if etag == request.headers.get("If-None-Match"):
+      return Response(status=304)
+
+Values are hashed by content, they are serialized with
+:py:mod:`pickle`. Values which cannot be pickled (e.g. generators or
+cyclic structures) cannot be fingerprinted. Mappings and sets are
+serialized in iteration order, so equal dicts with different order of
+keys may give different fingerprints (it costs a cache miss only).
+"""
+
+
+import hashlib
+import io
+import pickle
+
+from curly import parser
+from curly import utils
+
+
+FINGERPRINT_HASH = hashlib.sha256
+"""Hash function for fingerprints."""
+
+FINGERPRINT_PROTOCOL = 4
+"""Pickle protocol for values of fingerprints. It is fixed, so digests
+do not depend on the Python version defaults."""
+
+
+class Dependencies:
+    """Variables read by each subtree of the AST tree.
+
+    Use :py:func:`analyze` to create it.
+
+    :param root: Root of the analyzed tree.
+    :type root: :py:class:`curly.parser.Node`
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.paths = {}
+        self.nodes = {}
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}(variables={1})>".format(
+            self, self.overall)
+
+    def __getitem__(self, node):
+        """Variables read by the subtree of the node.
+
+        :param node: Node of the analyzed tree.
+        :type node: :py:class:`curly.parser.Node`
+        :rtype: frozenset[str]
+        :raises KeyError: if node is not from the analyzed tree.
+        """
+        return self.paths[id(node)]
+
+    @property
+    def overall(self):
+        """Sorted variables read by the whole tree."""
+        return tuple(sorted(self[self.root]))
+
+
+def analyze(root, scope=None):
+    """Find variables read by every subtree of the AST tree.
+
+    Variables of :py:class:`curly.parser.ElseNode` are attributed to its
+    :py:class:`curly.parser.IfNode` since ``if`` renders its ``else``
+    branch.
+
+    :param root: Root of the tree.
+    :param scope: Variables which ``item`` depends on, if ``root`` is
+        in the loop body. Empty set excludes ``item`` from results.
+    :type root: :py:class:`curly.parser.Node`
+    :type scope: frozenset[str] or None
+    :return: Variables of each subtree.
+    :rtype: :py:class:`Dependencies`
+    """
+    dependencies = Dependencies(root)
+    order = []
+    stack = [(root, None, scope)]
+
+    while stack:
+        node, parent, scope = stack.pop()
+        order.append((node, parent))
+        dependencies.nodes[id(node)] = node
+        paths = node_variables(node, scope)
+        dependencies.paths[id(node)] = set(paths)
+
+        elsenode = getattr(node, "elsenode", None)
+        if elsenode is not None:
+            stack.append((elsenode, node, scope))
+        if isinstance(node, parser.LoopNode):
+            scope = frozenset(paths)
+        stack.extend((subnode, node, scope) for subnode in node.data)
+
+    # Children are always after their parents in pre-order.
+    for node, parent in reversed(order):
+        paths = dependencies.paths[id(node)] = frozenset(
+            dependencies.paths[id(node)])
+        if parent is not None:
+            dependencies.paths[id(parent)].update(paths)
+
+    return dependencies
+
+
+def node_variables(node, scope):
+    """Variables read by the node itself (not by its subnodes).
+
+    :param node: Node to check.
+    :param scope: Variables which ``item`` depends on in the loop
+        body or ``None`` outside of loops.
+    :type node: :py:class:`curly.parser.Node`
+    :type scope: frozenset[str] or None
+    :rtype: frozenset[str]
+    """
+    varname = parser.node_varname(node)
+    if varname is None:
+        return frozenset()
+    if scope is not None and (
+            varname == "item" or varname.startswith("item.")):
+        return scope
+
+    return frozenset([varname])
+
+
+def variables(root):
+    """Sorted variables read by the tree.
+
+    :param root: Root of the tree.
+    :type root: :py:class:`curly.parser.Node`
+    :rtype: tuple[str]
+    """
+    return analyze(root).overall
+
+
+def required_variables(root):
+    """Sorted variables which every rendering of the tree reads.
+
+    Bodies of blocks could be not rendered at all, so only the top
+    level of the tree counts: printed variables, conditions of ``if``
+    (but not of ``elif``) and expressions of loops. It is used to
+    prefetch lazy values, see :py:mod:`curly.context`.
+
+    :param root: Root of the tree.
+    :type root: :py:class:`curly.parser.Node`
+    :rtype: tuple[str]
+    """
+    paths = set()
+
+    for node in root:
+        if isinstance(node, (parser.PrintNode, parser.IfNode,
+                             parser.LoopNode)):
+            varname = parser.node_varname(node)
+            if varname is not None:
+                paths.add(varname)
+
+    return tuple(sorted(paths))
+
+
+def fingerprint(source_hash, paths, context):
+    """Hash values of variables in the context.
+
+    Values are serialized with :py:mod:`pickle` in *fast* mode: without
+    memo, so equal values give equal bytes regardless of their
+    identity.
+
+    :param bytes source_hash: Digest of the template source.
+    :param paths: Variable paths to hash. Paths are not collapsed to
+        their prefixes: ``c.d`` could be a literal key of the context,
+        not an item of ``c``, so both ``c`` and ``c.d`` are hashed.
+    :param dict context: Variables for template rendering.
+    :type paths: Iterable[str]
+    :return: Hex digest.
+    :rtype: str
+    :raises ValueError: if value cannot be serialized.
+    """
+    return hash_values(
+        source_hash,
+        ((path, utils.find_variable(path, context)) for path in paths))
+
+
+def hash_values(source_hash, values):
+    """Hash named values, see :py:func:`fingerprint`.
+
+    :param bytes source_hash: Initial data for the hash.
+    :param values: Names and values to hash.
+    :type values: Iterable[tuple[str, object]]
+    :return: Hex digest.
+    :rtype: str
+    :raises ValueError: if value cannot be serialized.
+    """
+    serializer = Serializer()
+    hasher = FINGERPRINT_HASH(source_hash)
+
+    for name, value in values:
+        hasher.update(serializer.dumps((name, value)))
+
+    return hasher.hexdigest()
+
+
+class Serializer:
+    """Reusable :py:mod:`pickle` serializer in *fast* mode.
+
+    Fast mode does not use memo, so equal values give equal bytes
+    regardless of their identity.
+    """
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.pickler = pickle.Pickler(
+            self.buffer, protocol=FINGERPRINT_PROTOCOL)
+        self.pickler.fast = True
+
+    def dumps(self, value):
+        """Serialize value.
+
+        :param value: Value to serialize.
+        :rtype: bytes
+        :raises ValueError: if value cannot be serialized.
+        """
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        try:
+            self.pickler.dump(value)
+        except Exception as exc:
+            raise ValueError(
+                "Cannot fingerprint value of type {0}: {1}".format(
+                    type(value).__name__, exc)) from exc
+
+        return self.buffer.getvalue()
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""Batch processing of templates.
+
+This module has helpers for processing a lot of templates at once,
+for example, precompilation of the whole template directory on deploy
+or rendering of one template against millions of contexts. Heavy
+lifting is done in the pool of worker processes so lexing, parsing and
+rendering scale with the number of available cores.
+
+.. code-block:: pycon
+
+  >>> from curly.batch import compile_files, find_templates
+  >>> from curly.cache import FileCache
+  >>> paths = find_templates("templates")
+  >>> for result in compile_files(paths, jobs=4, cache=FileCache("c")):
+  ...     print(result.path, result.elapsed, result.error)
+
+.. code-block:: pycon
+
+  >>> import json
+  >>> from curly import Template
+  >>> from curly.batch import render_contexts
+  >>> template = Template("Hello {{ name }}")
+  >>> with open("contexts.jsonl") as contexts_fp:
+  ...     for text in render_contexts(template, contexts_fp,
+  ...                                 jobs=4, decode=json.loads):
+  ...         print(text)
+"""
+
+
+import collections
+import concurrent.futures
+import fnmatch
+import functools
+import itertools
+import multiprocessing
+import os
+import os.path
+import time
+
+from curly import template
+
+
+RENDER_CHUNKSIZE = 256
+"""The number of contexts sent to the render worker at once."""
+
+CompileResult = collections.namedtuple(
+    "CompileResult", ["path", "elapsed", "error"])
+"""Result of the compilation of a single template file.
+
+``elapsed`` is the time spent on reading and compilation in seconds,
+``error`` is the text of the error (``None`` if compilation went
+fine).
+"""
+
+
+def find_templates(*paths, pattern="*"):
+    """Collect template files from the given paths.
+
+    Files are returned as is, directories are walked recursively and
+    every file which name matches ``pattern`` is taken. Results are
+    sorted so they are stable between runs.
+
+    :param str paths: Files and directories to search in.
+    :param str pattern: Shell pattern (:py:mod:`fnmatch`) for file
+        names.
+    :return: Paths to template files.
+    :rtype: list[str]
+    """
+    found = []
+
+    for path in paths:
+        if not os.path.isdir(path):
+            found.append(path)
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if fnmatch.fnmatch(filename, pattern):
+                    found.append(os.path.join(dirpath, filename))
+
+    return found
+
+
+def compile_file(path, cache=None):
+    """Compile single template file.
+
+    This function never raises on broken templates or unreadable files,
+    the error is reported in the result instead.
+
+    :param str path: Path to the template file.
+    :param cache: Cache to store compiled template into.
+    :type cache: :py:class:`curly.cache.FileCache` or None
+    :return: Result of the compilation.
+    :rtype: :py:data:`CompileResult`
+    """
+    started_at = time.perf_counter()
+
+    try:
+        with open(path, "rb") as template_fp:
+            text = template_fp.read()
+        compiled = template.Template(text)
+        if cache is not None:
+            cache.set(text, compiled)
+    except (OSError, ValueError) as exc:
+        return CompileResult(path, time.perf_counter() - started_at,
+                             str(exc) or exc.__class__.__name__)
+
+    return CompileResult(path, time.perf_counter() - started_at, None)
+
+
+def compile_files(paths, *, jobs=1, cache=None):
+    """Compile a list of template files, in parallel if required.
+
+    Results are yielded in the same order as ``paths`` as soon as they
+    are ready. Failed templates do not stop the processing.
+
+    :param list[str] paths: Paths to template files.
+    :param int jobs: The number of worker processes. ``None`` means the
+        number of available CPUs, ``1`` means compilation in the current
+        process.
+    :param cache: Cache to store compiled templates into.
+    :type cache: :py:class:`curly.cache.FileCache` or None
+    :return: Generator of compilation results.
+    :rtype: Generator[:py:data:`CompileResult`]
+    """
+    paths = list(paths)
+    jobs = jobs or os.cpu_count() or 1
+    worker = functools.partial(compile_file, cache=cache)
+
+    if jobs == 1 or len(paths) < 2:
+        yield from map(worker, paths)
+        return
+
+    # Templates are small so sending them one by one makes workers
+    # wait for IPC most of the time. Several chunks per worker keep
+    # balance between IPC overhead and even load.
+    chunksize = max(1, len(paths) // (jobs * 8))
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        yield from executor.map(worker, paths, chunksize=chunksize)
+
+
+def render_contexts(compiled, contexts, *, jobs=1, decode=None,
+                    chunksize=RENDER_CHUNKSIZE):
+    """Render one template against a stream of contexts.
+
+    Contexts are consumed lazily, only a few chunks are in flight at
+    any moment so it is fine to pass file objects with millions of
+    lines. Template is sent to each worker once, on worker start, as
+    a dump of :py:mod:`curly.serialize` format.
+
+    :param compiled: Template to render.
+    :param contexts: Iterable of contexts.
+    :param int jobs: The number of worker processes. ``None`` means the
+        number of available CPUs, ``1`` means rendering in the current
+        process.
+    :param decode: Callable which converts item of ``contexts`` into
+        the context dict (e.g. :py:func:`json.loads` for lines of JSONL
+        file). Decoding is done in worker processes.
+    :param int chunksize: The number of contexts sent to worker at once.
+    :type compiled: :py:class:`curly.template.Template`
+    :type contexts: Iterable
+    :type decode: Callable or None
+    :return: Generator of rendered texts in the order of ``contexts``.
+    :rtype: Generator[str]
+    :raises ValueError: if it is not possible to render some context.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    chunks = make_chunks(contexts, chunksize)
+
+    if jobs == 1:
+        for chunk in chunks:
+            yield from render_chunk(chunk, compiled, decode)
+        return
+
+    # Compact dump is much cheaper to pickle and to restore in every
+    # worker than the tree. Templates which cannot be dumped (custom
+    # undefined policies) are pickled as is.
+    try:
+        packed = compiled.dumps()
+    except ValueError:
+        packed = compiled
+    pool = multiprocessing.Pool(
+        jobs, initializer=init_render_worker,
+        initargs=(packed, decode, compiled.schema))
+    try:
+        # Keep a bounded window of chunks in flight: enough to keep
+        # workers busy, but we never read the whole stream in memory.
+        window = collections.deque()
+        for chunk in chunks:
+            window.append(pool.apply_async(render_worker_chunk, (chunk,)))
+            if len(window) >= jobs * 2:
+                yield from window.popleft().get()
+        while window:
+            yield from window.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def make_chunks(iterable, chunksize):
+    """Split iterable into chunks of ``(start_index, items)``.
+
+    :param Iterable iterable: Iterable to split.
+    :param int chunksize: Maximal length of the chunk.
+    :return: Generator of chunks.
+    :rtype: Generator[tuple[int, list]]
+    """
+    iterator = iter(iterable)
+
+    for start in itertools.count(0, chunksize):
+        chunk = list(itertools.islice(iterator, chunksize))
+        if not chunk:
+            break
+        yield start, chunk
+
+
+def render_chunk(chunk, compiled, decode):
+    """Render a chunk of contexts from :py:func:`make_chunks`.
+
+    :return: List of rendered texts.
+    :rtype: list[str]
+    :raises ValueError: if it is not possible to render some context.
+        Message contains an index of the context in the stream.
+    """
+    start, contexts = chunk
+    rendered = []
+
+    for index, context in enumerate(contexts, start):
+        try:
+            if decode is not None:
+                context = decode(context)
+            rendered.append(compiled.render(context))
+        except ValueError as exc:
+            # Curly exceptions are not the best citizens to send
+            # between processes, so send only the message.
+            raise ValueError("Cannot render context #{0}: {1}".format(
+                index, exc)) from None
+
+    return rendered
+
+
+_worker_state = {}
+
+
+def init_render_worker(compiled, decode, schema=None):
+    """Initializer of the worker process for :py:func:`render_contexts`.
+
+    :param compiled: Template or its dump, see
+        :py:meth:`curly.template.Template.dumps`.
+    :param decode: Decoder of contexts.
+    :param schema: Schema to restore the dump with.
+    """
+    if isinstance(compiled, bytes):
+        compiled = template.Template.loads(compiled, schema=schema)
+    _worker_state["template"] = compiled
+    _worker_state["decode"] = decode
+
+
+def render_worker_chunk(chunk):
+    """Render chunk in worker process, initialized by
+    :py:func:`init_render_worker`.
+    """
+    return render_chunk(chunk, _worker_state["template"],
+                        _worker_state["decode"])
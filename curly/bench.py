@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""Benchmarking of template processing phases.
+
+Template goes through 3 phases: lexing (:py:func:`curly.lexer.tokenize`),
+parsing (:py:func:`curly.parser.parse`) and rendering
+(:py:meth:`curly.parser.Node.process`). This module measures each phase
+separately so it is possible to see where time goes for the given
+template.
+
+.. code-block:: pycon
+
+  >>> from curly.bench import benchmark
+  >>> report = benchmark("Hello {{ name }}", {"name": "world"},
+  ...                    repeat=1000)
+  >>> sorted(report["phases"])
+  ['parse', 'render:emit', 'render:process', 'tokenize']
+
+Rendering is measured for every backend from :py:data:`RENDER_BACKENDS`
+so they could be compared with each other.
+"""
+
+
+import collections
+import functools
+import math
+import statistics
+import time
+import tracemalloc
+
+from curly import lexer
+from curly import parser
+from curly import template
+
+
+def render_process(compiled, context):
+    """Render backend which uses :py:meth:`curly.template.Template.render`.
+    """
+    return compiled.render(context)
+
+
+def render_emit(compiled, context):
+    """Render backend which consumes :py:meth:`curly.parser.Node.emit`
+    chunk by chunk without joining them, like streaming response does.
+    """
+    for _ in compiled.node.emit(context):
+        pass
+
+
+RENDER_BACKENDS = collections.OrderedDict((
+    ("process", render_process),
+    ("emit", render_emit)
+))
+"""Mapping of the render backend name to the callable which renders
+compiled template with the context.
+"""
+
+
+def measure(func, *, repeat=100, warmup=10):
+    """Measure execution time and memory allocations of the callable.
+
+    :param Callable func: Callable without arguments to measure.
+    :param int repeat: The number of measured runs.
+    :param int warmup: The number of runs before measurement.
+    :return: Statistics on timings (in seconds) and allocated memory
+        (peak of traced memory within a single run, in bytes).
+    :rtype: dict[str, float]
+    """
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(max(repeat, 1)):
+        started_at = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started_at)
+    timings.sort()
+
+    # Tracing slows down execution a lot so it is done separately.
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "repeat": len(timings),
+        "min": timings[0],
+        "median": statistics.median(timings),
+        "p99": percentile(timings, 99),
+        "mean": statistics.mean(timings),
+        "allocated_peak": peak}
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of the sorted list of values.
+
+    :param list[float] sorted_values: Sorted values.
+    :param float percent: Percentile to calculate, between 0 and 100.
+    :return: Value of percentile.
+    :rtype: float
+    """
+    rank = int(math.ceil(percent / 100.0 * len(sorted_values)))
+    rank = min(max(rank, 1), len(sorted_values))
+
+    return sorted_values[rank - 1]
+
+
+def benchmark(text, context, *, repeat=100, warmup=10, backends=None):
+    """Benchmark every phase of the template processing.
+
+    :param text: Template source.
+    :param dict context: Context to render template with.
+    :param int repeat: The number of measured runs for each phase.
+    :param int warmup: The number of runs before measurement.
+    :param backends: Names of render backends to measure. Default is
+        all from :py:data:`RENDER_BACKENDS`.
+    :type text: str or bytes
+    :type backends: list[str] or None
+    :return: Report, ready to be dumped in JSON.
+    :rtype: dict
+    :raises ValueError: if it is not possible to compile or render
+        template.
+    """
+    if isinstance(text, bytes):
+        text = text.decode("utf-8")
+
+    tokens = list(lexer.tokenize(text))
+    compiled = template.Template(text)
+    backends = list(RENDER_BACKENDS) if backends is None else backends
+    phases = collections.OrderedDict()
+
+    phases["tokenize"] = measure(
+        lambda: list(lexer.tokenize(text)), repeat=repeat, warmup=warmup)
+    phases["parse"] = measure(
+        lambda: parser.parse(iter(tokens)), repeat=repeat, warmup=warmup)
+    for name in backends:
+        phases["render:" + name] = measure(
+            functools.partial(RENDER_BACKENDS[name], compiled, context),
+            repeat=repeat, warmup=warmup)
+
+    return {
+        "template_size": len(text),
+        "tokens": len(tokens),
+        "output_size": len(compiled.render(context)),
+        "phases": phases}
+
+
+def format_report(report):
+    """Format report from :py:func:`benchmark` as a human readable table.
+
+    :param dict report: Report to format.
+    :return: Formatted text.
+    :rtype: str
+    """
+    lines = [
+        "template: {0} chars, {1} tokens; output: {2} chars".format(
+            report["template_size"], report["tokens"],
+            report["output_size"]),
+        "{0:<16} {1:>12} {2:>12} {3:>12} {4:>12}".format(
+            "phase", "min, us", "median, us", "p99, us", "peak, KiB")]
+
+    for name, stats in report["phases"].items():
+        lines.append(
+            "{0:<16} {1:>12.2f} {2:>12.2f} {3:>12.2f} {4:>12.1f}".format(
+                name, stats["min"] * 1e6, stats["median"] * 1e6,
+                stats["p99"] * 1e6, stats["allocated_peak"] / 1024.0))
+
+    return "\n".join(lines)
+
+
+TIME_UNITS = {"s": 1.0, "ms": 1e3, "us": 1e6}
+"""Multipliers of seconds for units of :py:func:`format_cases`."""
+
+
+def measure_cases(cases, *, repeat=100, warmup=10):
+    """Measure alternatives of the same work one after another.
+
+    :param cases: Names of the cases and callables without arguments.
+    :param int repeat: The number of measured runs of each case.
+    :param int warmup: The number of runs before measurement.
+    :type cases: Iterable[tuple[str, Callable]]
+    :return: Statistics of each case, see :py:func:`measure`.
+    :rtype: collections.OrderedDict[str, dict]
+    """
+    return collections.OrderedDict(
+        (name, measure(func, repeat=repeat, warmup=warmup))
+        for name, func in cases)
+
+
+def format_cases(results, *, unit="ms", speedup=True, extra=()):
+    """Format statistics of cases as a human readable table.
+
+    :param results: Statistics of the cases, see :py:func:`measure_cases`.
+    :param str unit: Unit of timings, one of :py:data:`TIME_UNITS`.
+    :param bool speedup: Show speedup of each case relative to the first
+        one.
+    :param extra: More columns: titles and functions which format the
+        value of the column from the case statistics.
+    :type results: collections.OrderedDict[str, dict]
+    :type extra: Iterable[tuple[str, Callable]]
+    :return: Formatted text.
+    :rtype: str
+    """
+    multiplier = TIME_UNITS[unit]
+    width = max([12] + [len(name) + 1 for name in results])
+    baseline = None
+    lines = []
+
+    for name, stats in results.items():
+        baseline = baseline or stats["median"]
+        columns = [
+            "{0:<{1}}".format(name, width),
+            "median={0:10.2f}{1}".format(stats["median"] * multiplier, unit),
+            "p99={0:10.2f}{1}".format(stats["p99"] * multiplier, unit)]
+        if speedup:
+            columns.append("speedup={0:5.1f}x".format(
+                baseline / stats["median"]))
+        columns.extend(
+            "{0}={1}".format(title, format_column(stats))
+            for title, format_column in extra)
+        lines.append(" ".join(columns))
+
+    return "\n".join(lines)
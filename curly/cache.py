@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""On-disk cache of compiled templates.
+
+Lexing and parsing of the template is not free: for big template
+repositories it makes sense to do it once (e.g. on deploy) and reuse
+results later. :py:class:`FileCache` stores compiled
+:py:class:`curly.template.Template` instances in the directory, keyed
+by the hash of the template source. Entries are dumps of
+:py:mod:`curly.serialize` format.
+
+.. code-block:: pycon
+
+  >>> from curly.cache import FileCache
+  >>> cache = FileCache("/tmp/curly-cache")
+  >>> template = cache.get_or_compile(text)  # parses and stores
+  >>> template = cache.get_or_compile(text)  # loads from disk
+
+Cache is safe to share between processes: every entry is written into
+temporary file first and atomically renamed after.
+"""
+
+
+import hashlib
+import os
+import os.path
+import tempfile
+
+from curly import template
+
+
+CACHE_VERSION = 2
+"""Version of the cache layout. Entries of other versions are ignored."""
+
+CACHE_SUFFIX = ".ctpl"
+"""Suffix of the cache entry filenames."""
+
+
+class FileCache:
+    """Cache of compiled templates placed in the given directory.
+
+    :param str directory: Directory where cached entries are
+        placed. It is created on the first write if absent.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}(directory={0.directory!r})>".format(
+            self)
+
+    def key(self, text):
+        """Cache key for the given template source.
+
+        :param text: Template source.
+        :type text: str or bytes
+        :return: Hex digest which identifies the entry.
+        :rtype: str
+        """
+        if isinstance(text, str):
+            text = text.encode("utf-8")
+
+        digest = hashlib.sha256()
+        digest.update(str(CACHE_VERSION).encode("ascii"))
+        digest.update(b"\x00")
+        digest.update(text)
+
+        return digest.hexdigest()
+
+    def path(self, key):
+        """Path to the cache entry for the given key.
+
+        :param str key: Key from :py:meth:`FileCache.key`.
+        :return: Path to the file.
+        :rtype: str
+        """
+        return os.path.join(self.directory, key[:2], key + CACHE_SUFFIX)
+
+    def get(self, text):
+        """Return cached template for the given source.
+
+        :param text: Template source.
+        :type text: str or bytes
+        :return: Compiled template or ``None`` if there is no entry
+            (or entry is broken).
+        :rtype: :py:class:`curly.template.Template` or None
+        """
+        try:
+            with open(self.path(self.key(text)), "rb") as cache_fp:
+                return self.load(cache_fp)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, text, compiled):
+        """Store compiled template for the given source.
+
+        :param text: Template source.
+        :param compiled: Compiled template.
+        :type text: str or bytes
+        :type compiled: :py:class:`curly.template.Template`
+        :return: Path to the written entry.
+        :rtype: str
+        """
+        path = self.path(self.key(text))
+        dirname = os.path.dirname(path)
+        os.makedirs(dirname, exist_ok=True)
+
+        descriptor, tmpname = tempfile.mkstemp(
+            dir=dirname, suffix=CACHE_SUFFIX + ".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as cache_fp:
+                self.dump(compiled, cache_fp)
+            os.replace(tmpname, path)
+        except Exception:
+            os.unlink(tmpname)
+            raise
+
+        return path
+
+    def get_or_compile(self, text):
+        """Return cached template or compile and cache it.
+
+        :param text: Template source.
+        :type text: str or bytes
+        :return: Compiled template.
+        :rtype: :py:class:`curly.template.Template`
+        :raises ValueError: if it is not possible to compile template.
+        """
+        compiled = self.get(text)
+        if compiled is None:
+            compiled = template.Template(text)
+            self.set(text, compiled)
+
+        return compiled
+
+    def dump(self, compiled, cache_fp):
+        """Serialize compiled template into the file object."""
+        cache_fp.write(compiled.dumps())
+
+    def load(self, cache_fp):
+        """Deserialize compiled template from the file object."""
+        return template.Template.loads(cache_fp.read())
@@ -4,61 +4,369 @@
 
 import argparse
 import json
+import os
+import os.path
 import sys
+import time
 
 import curly
+from curly import batch
+from curly import bench
+from curly import cache
 
 
-def main():
-    options = get_options()
-    template = options.template.read()
+def main(argv=None):
+    options = get_options(argv)
 
     try:
-        template = curly.Template(template)
-        if options.ast:
-            print(repr(template))
-        else:
-            print(template.render(options.context))
+        options.command(options)
     except ValueError as exc:
         sys.exit(exc)
 
 
-def get_options():
+def render_command(options):
+    if options.contexts is not None:
+        # Only one positional means template, context comes from file.
+        if options.context is not None and options.template is None:
+            options.template, options.context = options.context, None
+        if options.context is not None:
+            raise ValueError("Context and --contexts are mutually exclusive")
+        return render_batch_command(options)
+
+    context = json_parameter(options.context or "{}")
+    template = load_template(options)
+
+    if options.ast:
+        print(repr(template))
+    else:
+        print(template.render(context))
+
+
+def render_batch_command(options):
+    check_batch_options(options)
+    template = load_template(options)
+    contexts_fp = open_file(options.contexts)
+    started_at = time.perf_counter()
+    try:
+        contexts = (line for line in contexts_fp if line.strip())
+        rendered = batch.render_contexts(
+            template, contexts, jobs=options.jobs, decode=json.loads)
+        if options.output_format == "dir":
+            count = write_rendered_dir(rendered, options.output)
+        else:
+            count = write_rendered_stream(
+                rendered, options.output, options.output_format)
+    finally:
+        if contexts_fp is not sys.stdin:
+            contexts_fp.close()
+
+    elapsed = time.perf_counter() - started_at
+    print("Rendered {0} contexts in {1:.3f}s ({2:.1f} renders/s)".format(
+        count, elapsed, count / elapsed if elapsed else 0.0),
+        file=sys.stderr)
+
+
+def check_batch_options(options):
+    if options.contexts == "-" and (options.template or "-") == "-":
+        raise ValueError(
+            "Template and --contexts cannot both be read from stdin")
+    if options.output_format == "dir" and not options.output:
+        raise ValueError("--output directory is required for 'dir' format")
+
+
+def write_rendered_dir(rendered, output):
+    os.makedirs(output, exist_ok=True)
+
+    count = 0
+    for count, text in enumerate(rendered, 1):
+        path = os.path.join(output, "{0:08d}".format(count))
+        with open(path, "w", encoding="utf-8") as output_fp:
+            output_fp.write(text)
+
+    return count
+
+
+def write_rendered_stream(rendered, output, output_format):
+    output_fp = sys.stdout
+    if output and output != "-":
+        output_fp = open(output, "w", encoding="utf-8")
+
+    count = 0
+    try:
+        for count, text in enumerate(rendered, 1):
+            if output_format == "jsonl":
+                text = json.dumps(text) + "\n"
+            output_fp.write(text)
+    finally:
+        if output_fp is not sys.stdout:
+            output_fp.close()
+
+    return count
+
+
+def load_template(options):
+    template_fp = open_file(options.template or "-")
+    if not options.cache_dir:
+        return curly.Template.from_stream(template_fp)
+
+    return cache.FileCache(options.cache_dir).get_or_compile(
+        template_fp.read())
+
+
+def compile_command(options):
+    paths = batch.find_templates(*options.paths, pattern=options.pattern)
+    template_cache = None
+    if options.cache_dir:
+        template_cache = cache.FileCache(options.cache_dir)
+
+    errors = 0
+    started_at = time.perf_counter()
+    results = batch.compile_files(paths, jobs=options.jobs,
+                                  cache=template_cache)
+
+    for result in results:
+        if result.error is None:
+            print("ok\t{0:.6f}\t{1}".format(result.elapsed, result.path))
+        else:
+            errors += 1
+            print("error\t{0:.6f}\t{1}\t{2}".format(
+                result.elapsed, result.path, result.error))
+
+    print("Compiled {0} templates ({1} errors) in {2:.3f}s".format(
+        len(paths), errors, time.perf_counter() - started_at),
+        file=sys.stderr)
+
+    if errors:
+        sys.exit(1)
+
+
+def bench_command(options):
+    template = open_file(options.template).read()
+    report = bench.benchmark(
+        template, json_parameter(options.context),
+        repeat=options.repeat, warmup=options.warmup,
+        backends=options.backends)
+
+    if options.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(bench.format_report(report))
+
+
+def profile_command(options):
+    template = curly.Template.from_stream(open_file(options.template))
+    profile = template.profile(json_parameter(options.context))
+
+    if options.collapsed:
+        with open(options.collapsed, "w", encoding="utf-8") as collapsed_fp:
+            collapsed_fp.write(profile.collapsed())
+    print(profile.format(limit=options.limit, key=options.sort))
+
+
+def get_options(argv=None):
     parser = argparse.ArgumentParser(
         description="Render template using curly.",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
     )
+    subparsers = parser.add_subparsers()
 
-    parser.add_argument(
+    render_parser = subparsers.add_parser(
+        "render",
+        description="Render template using curly. This is default command.",
+        help="Render template.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    render_parser.set_defaults(command=render_command)
+    render_parser.add_argument(
         "-a", "--ast",
         action="store_true",
         default=False,
         help="Print AST tree of template only."
     )
-    parser.add_argument(
+    render_parser.add_argument(
+        "-c", "--cache-dir",
+        default=None,
+        help=(
+            "Directory of on-disk cache to load compiled template from "
+            "(template is compiled and stored if it is not cached yet).")
+    )
+    render_parser.add_argument(
+        "--contexts",
+        default=None,
+        metavar="FILE",
+        help=(
+            "JSONL file with one context per line to render template "
+            "against. Use '-' for reading from stdin.")
+    )
+    render_parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help="The number of worker processes for --contexts rendering."
+    )
+    render_parser.add_argument(
+        "-f", "--output-format",
+        choices=("jsonl", "concat", "dir"),
+        default="jsonl",
+        help=(
+            "How to write results of --contexts rendering: JSON string "
+            "per line, concatenated or a file per context in --output "
+            "directory.")
+    )
+    render_parser.add_argument(
+        "-o", "--output",
+        default=None,
+        help="Output file (or directory for 'dir' format) for --contexts."
+    )
+    render_parser.add_argument(
+        "context",
+        default=None,
+        help="JSON with template context. Default is '{}'.",
+        nargs=argparse.OPTIONAL
+    )
+    render_parser.add_argument(
+        "template",
+        default=None,
+        help=(
+            "File where template is placed. Use '-' for reading from "
+            "stdin. Default is stdin."),
+        nargs=argparse.OPTIONAL
+    )
+
+    compile_parser = subparsers.add_parser(
+        "compile",
+        description="Precompile templates, reporting time and errors.",
+        help="Precompile templates.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    compile_parser.set_defaults(command=compile_command)
+    compile_parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=None,
+        help="The number of worker processes. Default is the number of CPUs."
+    )
+    compile_parser.add_argument(
+        "-c", "--cache-dir",
+        default=None,
+        help="Directory of on-disk cache to store compiled templates into."
+    )
+    compile_parser.add_argument(
+        "-p", "--pattern",
+        default="*",
+        help="Shell pattern for template file names in directories."
+    )
+    compile_parser.add_argument(
+        "paths",
+        nargs=argparse.ONE_OR_MORE,
+        help="Template files and directories with templates."
+    )
+
+    bench_parser = subparsers.add_parser(
+        "bench",
+        description=(
+            "Measure time of lexing, parsing and rendering of the "
+            "template separately."),
+        help="Benchmark template.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    bench_parser.set_defaults(command=bench_command)
+    bench_parser.add_argument(
+        "-n", "--repeat",
+        type=int,
+        default=100,
+        help="The number of measured runs of each phase."
+    )
+    bench_parser.add_argument(
+        "-w", "--warmup",
+        type=int,
+        default=10,
+        help="The number of runs of each phase before measurement."
+    )
+    bench_parser.add_argument(
+        "-b", "--backend",
+        dest="backends",
+        action="append",
+        choices=list(bench.RENDER_BACKENDS),
+        default=None,
+        help="Render backend to measure, could be repeated. Default is all."
+    )
+    bench_parser.add_argument(
+        "--json",
+        action="store_true",
+        default=False,
+        help="Print report as JSON."
+    )
+    bench_parser.add_argument(
+        "template",
+        help="File where template is placed. Use '-' for reading from stdin."
+    )
+    bench_parser.add_argument(
         "context",
         default="{}",  # NOQA
-        type=json_parameter,
         help="JSON with template context.",
         nargs=argparse.OPTIONAL
     )
-    parser.add_argument(
+
+    profile_parser = subparsers.add_parser(
+        "profile",
+        description=(
+            "Render template once and show time spent in each tag of "
+            "the template."),
+        help="Profile rendering of template.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    profile_parser.set_defaults(command=profile_command)
+    profile_parser.add_argument(
+        "-l", "--limit",
+        type=int,
+        default=20,
+        help="The number of nodes to show."
+    )
+    profile_parser.add_argument(
+        "-s", "--sort",
+        choices=("exclusive", "inclusive", "calls", "emitted"),
+        default="exclusive",
+        help="Sort nodes by this statistics."
+    )
+    profile_parser.add_argument(
+        "-c", "--collapsed",
+        default=None,
+        metavar="FILE",
+        help="Write collapsed stacks for flamegraph tools into the file."
+    )
+    profile_parser.add_argument(
         "template",
-        type=argparse.FileType("r", encoding="utf-8"),
-        default="-",
-        help="File where template is placed. Use '-' for reading from stdin ",
+        help="File where template is placed. Use '-' for reading from stdin."
+    )
+    profile_parser.add_argument(
+        "context",
+        default="{}",  # NOQA
+        help="JSON with template context.",
         nargs=argparse.OPTIONAL
     )
 
-    return parser.parse_args()
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # curly was a single-command tool before, so keep old invocations
+    # like "curly '{}' template.txt" working.
+    if not argv or argv[0] not in set(subparsers.choices) | {"-h", "--help"}:
+        argv.insert(0, "render")
+
+    return parser.parse_args(argv)
 
 
 def json_parameter(value):
     try:
         return json.loads(value)
     except ValueError as exc:
-        raise argparse.ArgumentTypeError(
-            "Should be JSON: {0}".format(exc)) from exc
+        raise ValueError("Context should be JSON: {0}".format(exc)) from exc
+
+
+def open_file(path):
+    try:
+        return argparse.FileType("r", encoding="utf-8")(path)
+    except argparse.ArgumentTypeError as exc:
+        raise ValueError(str(exc)) from exc
 
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Column-oriented data for loops.
+
+Usually rows for ``{% loop %}`` are the list of dicts. If data comes
+column by column (from dataframes, databases or NumPy arrays), it is
+wasteful to build a dict for every row. :py:class:`Columns` wraps
+mapping of the column name to the sequence of values:
+
+.. code-block:: pycon
+
+  >>> from curly import render
+  >>> from curly.columns import Columns
+  >>> rows = Columns({"a": [1, 2], "b": ["x", "y"]})
+  >>> render("{% loop rows %}{{ item.a }}={{ item.b }};{% /loop %}",
+  ...        {"rows": rows})
+  '1=x;2=y;'
+
+Loops which bodies are compiled into format strings (see
+:py:class:`curly.parser.VectorizedBody`) zip the columns directly,
+other loops get a dict for every row. NumPy structured arrays are
+supported in the same way, there is no need to wrap them.
+"""
+
+
+import collections.abc
+
+
+class Columns(collections.abc.Sequence):
+    """Sequence of rows, stored column by column.
+
+    :param columns: Mapping of the column name to the sequence of
+        values. All sequences should have the same length.
+    :type columns: dict[str, Sequence]
+    :raises ValueError: if columns have different lengths.
+    """
+
+    def __init__(self, columns):
+        self.columns = dict(columns)
+
+        lengths = {len(values) for values in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(
+                "Columns have different lengths: {0}".format(
+                    sorted(lengths)))
+        self.length = lengths.pop() if lengths else 0
+
+    def __repr__(self):
+        return ("<{0.__class__.__name__}(columns={1}, "
+                "length={0.length})>").format(self, sorted(self.columns))
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Columns({
+                name: values[index] for name, values in self.columns.items()})
+        if not -self.length <= index < self.length:
+            raise IndexError("Row index out of range")
+
+        return {name: values[index] for name, values in self.columns.items()}
+
+
+def get_columns(value):
+    """Get columns of column-oriented value.
+
+    :param value: Value to check.
+    :return: Mapping of the column name to values or ``None`` if value
+        is not column-oriented.
+    :rtype: Mapping or None
+    """
+    if isinstance(value, Columns):
+        return value.columns
+
+    dtype = getattr(value, "dtype", None)
+    if getattr(dtype, "names", None) and getattr(value, "ndim", None) == 1:
+        return {name: value[name] for name in dtype.names}
+
+    return None
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""Lazy context values.
+
+Building the context dictionary up front computes every value, even
+those which template never reads (e.g. in ``if`` branches which are
+not taken). :py:class:`LazyContext` takes callables (*providers*)
+instead of values: provider is called when lookup of the variable
+reaches it for the first time, and its result is memoized for the rest
+of the rendering.
+
+.. code-block:: pycon
+
+  >>> from curly import Template
+  >>> from curly.context import LazyContext
+  >>> template = Template(
+  ...     "{% if user %}{{ user.name }}{% else %}{{ login_url }}{% /if %}")
+  >>> context = LazyContext(
+  ...     user=lambda: None, login_url=lambda: "/login",
+  ...     stats=compute_expensive_stats)
+  >>> template.render(context)
+  '/login'
+
+Here ``compute_expensive_stats`` is never called. Every callable value
+is a provider, so callable which should be a value as is has to be
+returned by a provider: ``LazyContext(func=lambda: func)``.
+
+Memoized values are shared by all copies of the context: loops render
+their bodies with copies which have ``item`` set, and values computed
+inside a loop are not computed again after it. Context memoizes values
+for its whole life, so it is made for a single rendering, as a
+dictionary of values is.
+
+Providers of variables which template reads on every rendering could
+be started in the thread pool before rendering, see
+:py:meth:`curly.template.Template.prefetch`:
+
+.. code-block:: python3
+
+  context = template.prefetch(LazyContext(user=load_user, posts=load_posts))
+  template.render(context)
+"""
+
+
+import collections.abc
+import concurrent.futures
+import functools
+
+from curly import utils
+
+
+PREFETCH_WORKERS = 8
+"""The number of threads in the default pool for
+:py:meth:`LazyContext.prefetch`."""
+
+
+class Pending:
+    """Type of :py:data:`PENDING` sentinel."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "PENDING"
+
+
+PENDING = Pending()
+"""Placeholder of the value which provider has not computed yet, see
+:py:meth:`LazyContext.preview_items`."""
+
+
+class LazyContext(collections.abc.Mapping):
+    """Context which computes values of providers on first lookup.
+
+    :param values: Values and providers (callables) of the context, as
+        for :py:class:`dict`.
+    :param kwargs: More values and providers.
+    """
+
+    def __init__(self, values=(), **kwargs):
+        self.data = {}
+        self.providers = {}
+        self.memo = {}
+        self.futures = {}
+
+        for key, value in dict(values, **kwargs).items():
+            if callable(value):
+                self.providers[key] = value
+            else:
+                self.data[key] = value
+
+    def __repr__(self):
+        return ("<{0.__class__.__name__}(values={1}, providers={2}, "
+                "computed={3})>").format(
+                    self, sorted(self.data), sorted(self.providers),
+                    sorted(self.memo))
+
+    def __getitem__(self, key):
+        value = self.get(key, utils.MISSING)
+        if value is utils.MISSING:
+            raise KeyError(key)
+
+        return value
+
+    def __setitem__(self, key, value):
+        """Set value in this context only, not in its copies.
+
+        Value is set as is, even if it is callable.
+        """
+        self.data[key] = value
+
+    def __contains__(self, key):
+        return key in self.data or key in self.providers
+
+    def __iter__(self):
+        yield from self.data
+        for key in self.providers:
+            if key not in self.data:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def get(self, key, default=None):
+        """Value of the variable, provider is called on first lookup.
+
+        :param key: Name of the variable.
+        :param default: Value to return if variable is missing.
+        :return: Value of the variable.
+        :raises Exception: whatever provider raises. Failed value is
+            not memoized, provider is called again on the next lookup.
+        """
+        value = self.data.get(key, utils.MISSING)
+        if value is not utils.MISSING:
+            return value
+
+        value = self.memo.get(key, utils.MISSING)
+        if value is not utils.MISSING:
+            return value
+        if key not in self.providers:
+            return default
+
+        future = self.futures.pop(key, None)
+        if future is not None:
+            value = future.result()
+        else:
+            value = self.providers[key]()
+        self.memo[key] = value
+
+        return value
+
+    def preview_items(self):
+        """Items for previews in exception messages.
+
+        Providers are not called: values which are not computed yet
+        are shown as :py:data:`PENDING`, see
+        :py:class:`curly.exceptions.PreviewRepr`.
+
+        :return: Iterator over names and values.
+        :rtype: Iterator[tuple[str, object]]
+        """
+        yield from self.data.items()
+        for key in self.providers:
+            if key not in self.data:
+                yield key, self.memo.get(key, PENDING)
+
+    def copy(self):
+        """Copy of the context which shares providers and memoized values.
+
+        Values set in the copy (like ``item`` of loops) are not visible
+        in the original context.
+
+        :rtype: :py:class:`LazyContext`
+        """
+        context = self.__class__.__new__(self.__class__)
+        context.__dict__.update(self.__dict__)
+        context.data = self.data.copy()
+
+        return context
+
+    def prefetch(self, paths, executor=None):
+        """Start providers of the variables in the thread pool.
+
+        Results are taken from the pool on the first lookup. Providers
+        which are computed or started already are not started again.
+
+        :param paths: Variable paths, like ``("posts", "user.name")``.
+            Provider of the path itself or of its top-level name is
+            started, as :py:func:`curly.utils.find_variable` looks them
+            up.
+        :param executor: Executor to run providers. Shared pool of
+            :py:data:`PREFETCH_WORKERS` threads is used by default.
+        :type paths: Iterable[str]
+        :type executor: :py:class:`concurrent.futures.Executor` or None
+        :return: The number of started providers.
+        :rtype: int
+        """
+        executor = executor or get_prefetch_executor()
+        started = 0
+
+        for path in paths:
+            key = path
+            if key not in self.providers:
+                key = path.partition(".")[0]
+            if key not in self.providers or key in self.data or \
+                    key in self.memo or key in self.futures:
+                continue
+            self.futures[key] = executor.submit(self.providers[key])
+            started += 1
+
+        return started
+
+
+@functools.lru_cache(1)
+def get_prefetch_executor():
+    """Shared thread pool for :py:meth:`LazyContext.prefetch`.
+
+    :rtype: :py:class:`concurrent.futures.ThreadPoolExecutor`
+    """
+    return concurrent.futures.ThreadPoolExecutor(PREFETCH_WORKERS)
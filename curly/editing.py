@@ -0,0 +1,492 @@
+# -*- coding: utf-8 -*-
+"""Incremental recompilation of edited templates.
+
+Template editors recompile the template on every keystroke while only a
+few characters change. :py:meth:`curly.template.Template.edit` replaces
+a part of the template source and recompiles only what is affected:
+
+.. code-block:: pycon
+
+  >>> from curly import Template
+  >>> template = Template("Hello, {{ name }}!", editable=True)
+  >>> template.edit(10, 14, "user")
+  >>> template.source
+  'Hello, {{ user }}!'
+  >>> template.render({"user": "world"})
+  'Hello, world!'
+
+It is made in 2 steps.
+
+#. Relexing (:py:func:`relex`). Tokenizer is restarted from the end of
+   a tag before the edit and stopped as soon as it finishes a tag at
+   the place where some tag finished before the edit. Text after that
+   place is the same, so tokens after it are the same too: they are
+   reused with shifted positions.
+#. Reparsing (:py:func:`reparse`). Changed tokens (with adjacent
+   literals) are parsed into nodes which replace old nodes in the list
+   of the innermost enclosing block (or root). If changed tokens are
+   not balanced (e.g. ``{% /if %}`` is removed or added), the enclosing
+   block is parsed as a whole, then its enclosing block and so on. The
+   rest of the tree is reused as is.
+
+If even the whole template cannot be parsed after the edit, error is
+raised and template is not changed.
+
+Source and tokens are kept in memory for that, so only templates
+compiled with ``editable=True`` could be edited.
+"""
+
+
+import collections
+import copy
+
+from curly import lexer
+from curly import parser
+
+
+Relexed = collections.namedtuple(
+    "Relexed", ["source", "start", "tokens", "reused", "old", "new"])
+"""Result of :py:func:`relex`.
+
+``tokens`` replace ``old_tokens[start:reused]``, ``old`` and ``new``
+are positions of ``old_tokens[reused]`` before and after the edit
+(``None`` if nothing is reused)."""
+
+
+Region = collections.namedtuple(
+    "Region", ["start", "end", "tokens", "nodes", "opener"])
+"""Result of :py:func:`find_region`.
+
+``tokens[start:end]`` of the edited text are parsed into ``nodes``,
+``tokens`` are these tokens with positions after the edit. ``opener``
+is the index of the block tag which encloses the region (``None`` for
+root)."""
+
+
+def relex(source, tokens, start, end, new_text):
+    """Tokenize the edited part of the text.
+
+    :param str source: Text before the edit.
+    :param tokens: Tokens of the text before the edit.
+    :param int start: Start offset of the replaced text.
+    :param int end: End offset of the replaced text.
+    :param str new_text: Text to insert instead.
+    :type tokens: list[:py:class:`curly.lexer.Token`]
+    :rtype: :py:data:`Relexed`
+    """
+    new_source = source[:start] + new_text + source[end:]
+    delta = len(new_text) - (end - start)
+    restart = find_restart(tokens, start)
+    position = lexer.Position(0, 1, 1)
+    if restart < len(tokens):
+        position = tokens[restart].position
+
+    relexed = []
+    for token in lexer.tokenize(new_source, position):
+        relexed.append(token)
+        if isinstance(token, lexer.LiteralToken):
+            continue
+
+        token_end = token.position.offset + len(token.data)
+        if token_end < start + len(new_text):
+            continue
+        reused = find_offset(tokens, token_end - delta)
+        if 0 < reused < len(tokens) and \
+                tokens[reused].position.offset == token_end - delta and \
+                not isinstance(tokens[reused - 1], lexer.LiteralToken):
+            new = lexer.make_position(new_source, token_end, token.position)
+            return Relexed(new_source, restart, relexed, reused,
+                           tokens[reused].position, new)
+
+    return Relexed(new_source, restart, relexed, len(tokens), None, None)
+
+
+def reparse(root, old_tokens, relexed, *, undefined, autoescape,
+            trim_blocks, schema):
+    """Reparse changed tokens and patch the tree in place.
+
+    :param root: Tree of the template before the edit.
+    :param old_tokens: Tokens of the text before the edit.
+    :param relexed: Result of :py:func:`relex`.
+    :param undefined: Policy for missing variables.
+    :param bool autoescape: Escape printed values for HTML.
+    :param bool trim_blocks: Remove whitespaces around block tags.
+    :param schema: Schema of the context.
+    :type root: :py:class:`curly.parser.RootNode`
+    :type old_tokens: list[:py:class:`curly.lexer.Token`]
+    :type relexed: :py:data:`Relexed`
+    :return: Tokens of the text after the edit or ``None`` if tree
+        cannot be patched and template has to be parsed as a whole.
+        Tree is not changed in that case.
+    :rtype: list[:py:class:`curly.lexer.Token`] or None
+    :raises:
+        :py:exc:`curly.exceptions.CurlySchemaError`: if variables do
+        not match the schema.
+    """
+    tokens = old_tokens[:relexed.start] + relexed.tokens + \
+        old_tokens[relexed.reused:]
+    region = find_region(tokens, old_tokens, relexed, trim_blocks)
+    if region is None:
+        return None
+
+    old_start, old_end = find_old_offsets(tokens, old_tokens, relexed,
+                                          region)
+    container, loops = find_container(
+        root, None if region.opener is None else tokens[region.opener],
+        old_start)
+    region_root = parser.RootNode(region.nodes)
+    parser.prepare_tree(
+        region_root, undefined=undefined, autoescape=autoescape)
+    if schema is not None:
+        parser.bind_schema(region_root, schema, loops=loops)
+
+    # Nodes are found by positions before the edit, so tokens are
+    # moved after that.
+    first, last = find_slice(container, old_start, old_end)
+    if relexed.old is not None:
+        move_tokens(root, old_tokens[relexed.reused:],
+                    relexed.old, relexed.new)
+    container.data[first:last] = region_root.data
+    if isinstance(container, parser.LoopNode):
+        container.vectorized = parser.VectorizedBody.compile(container)
+
+    return tokens[:region.start] + region.tokens + tokens[region.end:]
+
+
+def find_region(tokens, old_tokens, relexed, trim_blocks):
+    """Find the smallest part of the token list which could be parsed.
+
+    It starts from the relexed tokens with adjacent literals and grows
+    to the enclosing block until it is balanced and parsed.
+
+    :param tokens: Tokens of the text after the edit (with positions
+        before the edit after the relexed ones).
+    :param old_tokens: Tokens of the text before the edit.
+    :param relexed: Result of :py:func:`relex`.
+    :param bool trim_blocks: Remove whitespaces around block tags.
+    :type tokens: list[:py:class:`curly.lexer.Token`]
+    :type old_tokens: list[:py:class:`curly.lexer.Token`]
+    :type relexed: :py:data:`Relexed`
+    :return: Parsed region or ``None`` if even the whole list cannot
+        be parsed as a region.
+    :rtype: :py:data:`Region` or None
+    """
+    lo = relexed.start
+    hi = lo + len(relexed.tokens)
+    region_start = lo
+    region_end = hi
+    while region_end < len(tokens) and \
+            isinstance(tokens[region_end], lexer.LiteralToken):
+        region_end += 1
+
+    while True:
+        region_tokens = tokens[region_start:lo] + relexed.tokens + [
+            move_token(token, relexed.old, relexed.new)
+            for token in tokens[hi:region_end]]
+        opener = find_opener(tokens, region_start)
+        old_end = region_end - (hi - relexed.reused)
+        if is_balanced(old_tokens[region_start:old_end]):
+            nodes = parse_region(
+                tokens, region_tokens, region_start, region_end,
+                trim_blocks=trim_blocks)
+            if nodes is not None:
+                return Region(region_start, region_end, region_tokens,
+                              nodes, opener)
+
+        closer = None if opener is None else find_closer(tokens, opener)
+        if closer is None:
+            return None
+        region_start = opener
+        region_end = max(region_end, closer + 1)
+
+
+def find_old_offsets(tokens, old_tokens, relexed, region):
+    """Offsets of the region in the text before the edit.
+
+    :param tokens: Tokens of the text after the edit.
+    :param old_tokens: Tokens of the text before the edit.
+    :param relexed: Result of :py:func:`relex`.
+    :param region: Region from :py:func:`find_region`.
+    :type tokens: list[:py:class:`curly.lexer.Token`]
+    :type old_tokens: list[:py:class:`curly.lexer.Token`]
+    :type relexed: :py:data:`Relexed`
+    :type region: :py:data:`Region`
+    :return: Start offset and end offset (``None`` if region lasts
+        till the end of the text).
+    :rtype: tuple[int, int or None]
+    """
+    old_start = len(relexed.source) + 1
+    if region.start < len(old_tokens):
+        old_start = old_tokens[region.start].position.offset
+
+    old_end = None
+    if region.end < len(tokens):
+        index_delta = relexed.start + len(relexed.tokens) - relexed.reused
+        old_end = old_tokens[region.end - index_delta].position.offset
+
+    return old_start, old_end
+
+
+def find_slice(container, old_start, old_end):
+    """Slice of the container nodes which are made of the region.
+
+    :param container: Innermost node which contains the region.
+    :param int old_start: Start offset of the region before the edit.
+    :param old_end: End offset of the region before the edit or
+        ``None`` if region lasts till the end of the container.
+    :type container: :py:class:`curly.parser.Node`
+    :type old_end: int or None
+    :return: Indexes of the first node of the region and of the node
+        after the region.
+    :rtype: tuple[int, int]
+    """
+    first = find_offset(container.data, old_start)
+    last = len(container.data)
+    if old_end is not None:
+        last = find_offset(container.data, old_end)
+
+    return first, last
+
+
+def parse_region(tokens, region_tokens, start, end, *, trim_blocks):
+    """Parse tokens of the region into nodes.
+
+    Literals on the edges of the region are trimmed according to the
+    tags around the region.
+
+    :return: Nodes or ``None`` if tokens are not balanced.
+    :rtype: list[:py:class:`curly.parser.Node`] or None
+    """
+    stream = list(region_tokens)
+    before = after = None
+    if start > 0 and stream and \
+            isinstance(stream[0], lexer.LiteralToken):
+        before = tokens[start - 1]
+        stream.insert(0, before)
+    if end < len(tokens) and stream and \
+            isinstance(stream[-1], lexer.LiteralToken):
+        after = tokens[end]
+        stream.append(after)
+
+    trimmed = list(parser.trim_tokens(stream, trim_blocks=trim_blocks))
+    if before is not None:
+        trimmed.pop(0)
+    if after is not None:
+        trimmed.pop()
+
+    try:
+        nodes = parser.parse_tokens(trimmed)
+        parser.validate_for_all_nodes_done(parser.RootNode(nodes))
+    except ValueError:
+        return None
+
+    return nodes
+
+
+def find_restart(tokens, start):
+    """Index of the token to restart tokenizer from.
+
+    It is the token after a tag (or the first one), one token before
+    the edited token at least: matches of tags depend on a character
+    after them.
+
+    :param tokens: Tokens of the text before the edit.
+    :param int start: Start offset of the edit.
+    :type tokens: list[:py:class:`curly.lexer.Token`]
+    :rtype: int
+    """
+    index = max(find_offset(tokens, start) - 2, 0)
+    while index > 0 and isinstance(tokens[index - 1], lexer.LiteralToken):
+        index -= 1
+
+    return index
+
+
+def find_offset(items, offset):
+    """Index of the first token or node at the offset or after it.
+
+    :param items: Tokens or nodes sorted by position.
+    :param int offset: Offset in the text.
+    :type items: list
+    :rtype: int
+    """
+    low = 0
+    high = len(items)
+
+    while low < high:
+        middle = (low + high) // 2
+        if items[middle].position.offset < offset:
+            low = middle + 1
+        else:
+            high = middle
+
+    return low
+
+
+def block_role(token):
+    """Role of the token in the structure of blocks.
+
+    :return: ``open``, ``close``, ``branch`` (``elif`` or ``else``) or
+        ``None`` for literals, prints and tags without end tag. Kind of
+        the tag is taken from :py:data:`curly.parser.BLOCK_TAGS`.
+    :rtype: str or None
+    """
+    if isinstance(token, lexer.EndBlockToken):
+        return "close"
+    if isinstance(token, lexer.StartBlockToken):
+        tag = parser.BLOCK_TAGS.get(token.contents["function"])
+        if tag is not None and tag.kind == "branch":
+            return "branch"
+        if tag is None or tag.kind == "block":
+            return "open"
+
+    return None
+
+
+def is_balanced(tokens):
+    """Check if tokens are complete nodes of the same block."""
+    depth = 0
+
+    for token in tokens:
+        role = block_role(token)
+        if role == "open":
+            depth += 1
+        elif role == "close":
+            depth -= 1
+            if depth < 0:
+                return False
+        elif role == "branch" and not depth:
+            return False
+
+    return not depth
+
+
+def find_opener(tokens, index):
+    """Index of the unclosed block tag before the given index.
+
+    :return: Index of the start tag of the enclosing block or ``None``
+        if there is no one.
+    :rtype: int or None
+    """
+    depth = 0
+
+    for current in range(index - 1, -1, -1):
+        role = block_role(tokens[current])
+        if role == "close":
+            depth += 1
+        elif role == "open":
+            if not depth:
+                return current
+            depth -= 1
+
+    return None
+
+
+def find_closer(tokens, index):
+    """Index of the end tag of the block started at the given index.
+
+    :rtype: int or None
+    """
+    depth = 0
+
+    for current in range(index, len(tokens)):
+        role = block_role(tokens[current])
+        if role == "open":
+            depth += 1
+        elif role == "close":
+            depth -= 1
+            if not depth:
+                return current
+
+    return None
+
+
+def find_container(root, opener, offset):
+    """Find node which list of subnodes contains the edited region.
+
+    :param root: Root of the tree.
+    :param opener: Start tag of the enclosing block or ``None`` if the
+        region is on the top level.
+    :param int offset: Offset of the region.
+    :type root: :py:class:`curly.parser.RootNode`
+    :type opener: :py:class:`curly.lexer.StartBlockToken` or None
+    :return: Container node (the branch of ``if``, not the first
+        :py:class:`curly.parser.IfNode`, for ``elif`` and ``else``) and
+        loops around it, outermost first.
+    :rtype: tuple[:py:class:`curly.parser.Node`, list]
+    """
+    node = root
+    loops = []
+
+    while opener is not None and node.token is not opener:
+        if isinstance(node, parser.LoopNode):
+            loops.append(node)
+        child = node.data[find_offset(
+            node.data, opener.position.offset + 1) - 1]
+        node = find_branch(child, opener.position.offset)
+
+    if isinstance(node, parser.LoopNode):
+        loops.append(node)
+
+    return find_branch(node, offset), loops
+
+
+def find_branch(node, offset):
+    """Branch of ``if`` chain (or the node itself) before the offset."""
+    while getattr(node, "elsenode", None) is not None and \
+            node.elsenode.position.offset <= offset:
+        node = node.elsenode
+
+    return node
+
+
+def move_token(token, old, new):
+    """Copy of the token which is moved by the edit."""
+    token = copy.copy(token)
+    token.position = move_position(token.position, old, new)
+
+    return token
+
+
+def move_tokens(root, tokens, old, new):
+    """Move tokens after the edit in place.
+
+    :param root: Tree of the template.
+    :param tokens: Reused tokens.
+    :param old: Position of the first reused token before the edit.
+    :param new: Position of the first reused token after the edit.
+    :type root: :py:class:`curly.parser.RootNode`
+    :type tokens: list[:py:class:`curly.lexer.Token`]
+    :type old: :py:data:`curly.lexer.Position`
+    :type new: :py:data:`curly.lexer.Position`
+    """
+    moved = {id(token): token for token in tokens}
+
+    # Trimmed and merged literals of the tree are not in the token list.
+    for node in parser.walk_tree(root):
+        if isinstance(node, parser.LiteralNode) and \
+                node.token.position.offset >= old.offset:
+            moved[id(node.token)] = node.token
+
+    for token in moved.values():
+        token.position = move_position(token.position, old, new)
+
+
+def move_position(position, old, new):
+    """Position after the edit.
+
+    :param position: Position before the edit, not before ``old``.
+    :param old: Known position before the edit.
+    :param new: The same position after the edit.
+    :type position: :py:data:`curly.lexer.Position`
+    :type old: :py:data:`curly.lexer.Position`
+    :type new: :py:data:`curly.lexer.Position`
+    :rtype: :py:data:`curly.lexer.Position`
+    """
+    column = position.column
+    if position.line == old.line:
+        column += new.column - old.column
+
+    return lexer.Position(
+        position.offset + new.offset - old.offset,
+        position.line + new.line - old.line, column)
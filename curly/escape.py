@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""HTML escaping for templates with autoescaping.
+
+If template is created with ``autoescape=True``, every value printed by
+``{{ ... }}`` is escaped, literal text of the template is trusted and
+printed as is.
+
+.. code-block:: pycon
+
+  >>> from curly import Template
+  >>> from curly.escape import SafeString
+  >>> template = Template("<p>{{ text }}{{ html }}</p>", autoescape=True)
+  >>> template.render({"text": "<b>", "html": SafeString("<br>")})
+  '<p>&lt;b&gt;<br></p>'
+
+Values which should not be escaped are marked as safe: they are
+instances of :py:class:`SafeString` or any objects with ``__html__``
+method (e.g. ``markupsafe.Markup``). ``safe`` filter marks value as
+safe in the template.
+
+Escaping is done with :py:meth:`str.translate` and results for short
+strings (like names, tags or statuses) are cached, so values repeated
+within the render (or between renders) are escaped once. Long strings
+are rarely repeated, they are escaped every time and are not kept in
+memory after rendering.
+"""
+
+
+import functools
+
+
+ESCAPE_TABLE = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&#34;",
+    "'": "&#39;"})
+"""Translation table for :py:meth:`str.translate`."""
+
+ESCAPE_CACHE_SIZE = 4096
+"""The number of escaped strings to keep in cache."""
+
+ESCAPE_CACHE_MAX_LENGTH = 64
+"""Strings longer than that are not cached."""
+
+NOT_ESCAPED_TYPES = frozenset((int, float, bool))
+"""Types which string representation has nothing to escape."""
+
+
+class SafeString(str):
+    """String which is not escaped."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "{0}({1})".format(self.__class__.__name__, super().__repr__())
+
+    def __html__(self):
+        return self
+
+
+def mark_safe(value):
+    """Mark value as safe, so it is not escaped.
+
+    :param value: Value to mark.
+    :return: String representation of the value which is not escaped.
+    :rtype: :py:class:`SafeString`
+    """
+    if isinstance(value, SafeString):
+        return value
+    if hasattr(value, "__html__"):
+        return SafeString(value.__html__())
+
+    return SafeString(value)
+
+
+def escape(value):
+    """Escape value for HTML.
+
+    :param value: Value to escape.
+    :return: Escaped string representation of the value.
+    :rtype: :py:class:`SafeString`
+    """
+    value_type = type(value)
+    if value_type is str:
+        return escape_text(value)
+    if value_type in NOT_ESCAPED_TYPES:
+        return SafeString(value)
+    if hasattr(value, "__html__"):
+        return SafeString(value.__html__())
+
+    return escape_text(str(value))
+
+
+def escape_text(text):
+    """Escape string for HTML, results for short strings are cached.
+
+    :param str text: Text to escape.
+    :return: Escaped text.
+    :rtype: :py:class:`SafeString`
+    """
+    if len(text) > ESCAPE_CACHE_MAX_LENGTH:
+        return SafeString(text.translate(ESCAPE_TABLE))
+
+    return escape_short_text(text)
+
+
+@functools.lru_cache(ESCAPE_CACHE_SIZE)
+def escape_short_text(text):
+    """Escape short string for HTML with cache, see
+    :py:func:`escape_text`.
+
+    :param str text: Text to escape.
+    :return: Escaped text.
+    :rtype: :py:class:`SafeString`
+    """
+    return SafeString(text.translate(ESCAPE_TABLE))
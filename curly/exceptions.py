@@ -3,14 +3,67 @@
 
 Please remember that all exceptions are derived from
 :py:exc:`CurlyError` which is a subclass of :py:exc:`ValueError`.
+
+Exceptions are cheap to create: they store structured fields (like
+``context`` and ``key`` of :py:exc:`CurlyEvaluateNoKeyError`) and
+format the message only when it is converted to string. This matters
+because some exceptions are created and thrown away on the hot path
+of evaluation. Values which could be big (contexts) are presented in
+messages by a bounded preview, see :py:func:`make_preview`.
 """
 
 
+import collections.abc
+import itertools
+import reprlib
+
+
+PREVIEW_LENGTH = 200
+"""Maximal length of the value preview in exception messages."""
+
+
+def make_preview(value, length=PREVIEW_LENGTH):
+    """Make short representation of the value for exception messages.
+
+    It works as :py:func:`repr` but bounded: containers are shown
+    partially and result is truncated up to ``length`` characters.
+    Representation of the huge context costs the same as of the small
+    one.
+
+    :param value: Value to represent.
+    :param int length: Maximal length of the result.
+    :return: Representation of the value.
+    :rtype: str
+    """
+    preview = PREVIEW_REPR.repr(value)
+    if len(preview) > length:
+        preview = preview[:length - 3] + "..."
+
+    return preview
+
+
 class CurlyError(ValueError):
-    """Main exception raised from Curly."""
+    """Main exception raised from Curly.
+
+    :param str message: Message template for :py:meth:`str.format`.
+    :param args: Positional arguments for message template.
+    :param kwargs: Keyword arguments for message template.
+    """
 
     def __init__(self, message, *args, **kwargs):
-        super().__init__(message.format(*args, **kwargs))
+        # ValueError.__init__ is not called intentionally: args are
+        # already set to the arguments of constructor, so exceptions
+        # could be pickled and restored. Message is formatted in
+        # __str__.
+        self.message = message
+        self.format_args = args
+        self.format_kwargs = kwargs
+
+    def __str__(self):
+        return self.message.format(*self.format_args, **self.format_kwargs)
+
+    def __repr__(self):
+        return "{0}({1!r})".format(self.__class__.__name__, str(self))
 
 
 class CurlyEvaluateError(CurlyError):
@@ -31,20 +84,51 @@ class CurlyLexerStringDoesNotMatchError(CurlyLexerError):
     def __init__(self, text, pattern):
         super().__init__("String {0!r} is not valid pattern {1!r}",
                          text, pattern.pattern)
+        self.text = text
+        self.pattern = pattern
 
 
 class CurlyEvaluateNoKeyError(CurlyEvaluateError):
-    """Exception raised if context has no required key."""
+    """Exception raised if context has no required key.
+
+    :param context: Context where key was searched.
+    :param key: Key which was not found.
+    """
 
     def __init__(self, context, key):
-        super().__init__("Context {0!r} has no key {1!r}", context, key)
+        super().__init__("Context {0} has no key {1!r}", context, key)
+        self.context = context
+        self.key = key
+
+    def __str__(self):
+        return self.message.format(make_preview(self.context), self.key)
+
+
+class CurlyEvaluateFilterError(CurlyEvaluateError):
+    """Exception raised if filter failed.
+
+    :param str name: Name of the filter.
+    :param value: Value which was filtered.
+    :param Exception exc: Exception raised by the filter.
+    """
+
+    def __init__(self, name, value, exc):
+        super().__init__("Filter {0} failed on {1}: {2}", name, value, exc)
+        self.name = name
+        self.value = value
+        self.exc = exc
+
+    def __str__(self):
+        return self.message.format(
+            self.name, make_preview(self.value), self.exc)
 
 
 class CurlyParserUnknownTokenError(CurlyParserError):
     """Exception raised on unknown token type."""
 
     def __init__(self, token):
-        super().__init__("Unknown token {0!s}".format(token))
+        super().__init__("Unknown token {0!s}", token)
+        self.token = token
 
 
 class CurlyParserUnknownStartBlockError(CurlyParserError):
@@ -53,6 +137,7 @@ class CurlyParserUnknownStartBlockError(CurlyParserError):
     def __init__(self, token):
         super().__init__("Unknown block tag {0} for token {1!s}",
                          token.contents["function"], token)
+        self.token = token
 
 
 class CurlyParserUnknownEndBlockError(CurlyParserError):
@@ -61,6 +146,43 @@ class CurlyParserUnknownEndBlockError(CurlyParserError):
     def __init__(self, token):
         super().__init__("Unknown block tag {0} for token {1!s}",
                          token.contents["function"], token)
+        self.token = token
+
+
+class CurlyParserUnknownFilterError(CurlyParserError):
+    """Exception raised if filter is not registered."""
+
+    def __init__(self, name, expression):
+        super().__init__("Unknown filter {0} in expression {1!r}",
+                         name, expression)
+        self.name = name
+        self.expression = expression
+
+
+class CurlyParserEmptyFilterError(CurlyParserError):
+    """Exception raised if expression has filter without a name."""
+
+    def __init__(self, expression):
+        super().__init__("Empty filter in expression {0!r}", expression)
+        self.expression = expression
+
+
+class CurlySchemaError(CurlyParserError):
+    """Exception raised if template variables do not match the schema.
+
+    :param unknown: Unknown variables and their positions.
+    :type unknown: list[tuple[str, :py:data:`curly.lexer.Position`]]
+    """
+
+    def __init__(self, unknown):
+        super().__init__("Unknown variables: {0}", unknown)
+        self.unknown = unknown
+
+    def __str__(self):
+        return self.message.format(", ".join(
+            "{0} at {1.line}:{1.column}".format(varname, position)
+            if position is not None else varname
+            for varname, position in self.unknown))
 
 
 class CurlyParserFoundNotDoneError(CurlyParserError):
@@ -69,6 +191,7 @@ class CurlyParserFoundNotDoneError(CurlyParserError):
     def __init__(self, node):
         super().__init__("Cannot find enclosement statement for {0!s}",
                          node.token)
+        self.node = node
 
 
 class CurlyParserNoUnfinishedNodeError(CurlyParserError):
@@ -82,5 +205,67 @@ class CurlyParserUnexpectedUnfinishedNodeError(CurlyParserError):
     """Exception raised if we found unfinished node which is not expected."""
 
     def __init__(self, search_for, node):
-        super().__init__("Excepted to find {0} node but found {1!s} instead",
+        super().__init__("Excepted to find {0} node but found {1} instead",
                          search_for, node)
+        self.search_for = search_for
+        self.node = node
+
+    def __str__(self):
+        return self.message.format(self.search_for, make_preview(self.node))
+
+
+class CurlySerializationError(CurlyError):
+    """Exception raised if template cannot be dumped or loaded.
+
+    :param str reason: What is wrong with the template or the dump.
+    """
+
+    def __init__(self, reason):
+        super().__init__("Template serialization failed: {0}", reason)
+        self.reason = reason
+
+
+class PreviewRepr(reprlib.Repr):
+    """:py:class:`reprlib.Repr` which is bounded for custom containers.
+
+    Default implementation calls :py:func:`repr` for everything but
+    builtin types and truncates result after, and sorts all keys of
+    dictionaries. It is not what we want for contexts with megabytes
+    of data, so only a head of such containers is shown.
+
+    Mappings which compute values on access (like
+    :py:class:`curly.context.LazyContext`) may define
+    ``preview_items()`` method: items for preview which are cheap to
+    get. It is used instead of ``items()`` then.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.maxstring = 60
+        self.maxother = 60
+        self.maxlong = 40
+        self.maxlevel = 3
+
+    def repr_dict(self, value, level):
+        # Default implementation sorts all keys, only a head is needed.
+        if len(value) > self.maxdict:
+            value = dict(itertools.islice(value.items(), self.maxdict + 1))
+        return super().repr_dict(value, level)
+
+    def repr_instance(self, value, level):
+        if isinstance(value, collections.abc.Mapping):
+            items = getattr(value, "preview_items", value.items)()
+            head = dict(itertools.islice(items, self.maxdict + 1))
+            return "{0}({1})".format(
+                value.__class__.__name__, self.repr_dict(head, level))
+        if isinstance(value, (collections.abc.Sequence,
+                              collections.abc.Set)) and \
+                not isinstance(value, (str, bytes)):
+            head = list(itertools.islice(value, self.maxlist + 1))
+            return "{0}({1})".format(
+                value.__class__.__name__, self.repr_list(head, level))
+
+        return super().repr_instance(value, level)
+
+
+PREVIEW_REPR = PreviewRepr()
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""Filters for expressions.
+
+Expression may be followed by a chain of *filters*, separated by
+``|``. Each filter is a name and (optional) arguments:
+
+.. code-block:: pycon
+
+  >>> from curly import render
+  >>> render('{{ name | truncate 5 | upper }}', {"name": "Sergey"})
+  'SE...'
+  >>> render('{{ roles | join ", " }}', {"roles": ["view", "edit"]})
+  'view, edit'
+
+Filter gets the value of the previous step as the first argument and
+arguments from the template as others. Arguments are constants:
+numbers are converted to :py:class:`int` or :py:class:`float`, quoted
+strings are used as is.
+
+Expression is compiled into :py:class:`Pipeline` once, when node of
+the AST tree is built, so rendering does nothing but function calls.
+If input of the pipeline is a quoted string or a number (``{{ "name" |
+upper }}``), filters which are marked as *pure* are applied at compile
+time. Expressions without ``|`` are looked up in the context as
+before.
+
+To add your own filter, use :py:func:`register`:
+
+.. code-block:: python3
+
+  from curly import filters
+
+  @filters.register(pure=True)
+  def reverse(value):
+      return value[::-1]
+
+Filters are looked up when template is compiled, so they have to be
+registered before.
+"""
+
+
+import collections
+import re
+import shlex
+
+from curly import escape as escaping
+from curly import exceptions
+from curly import utils
+
+
+Filter = collections.namedtuple("Filter", ["name", "function", "pure"])
+"""Registered filter.
+
+``pure`` filters have no side effects and their result depends only on
+arguments, so they could be calculated at compile time.
+"""
+
+FILTERS = {}
+"""Registry of filters, mapping of the name to :py:data:`Filter`."""
+
+REGEXP_WORD = utils.make_regexp(
+    r"""
+    \s*
+    (
+        \|                    # pipe
+        |
+        (?:
+            "(?:\\.|[^"\\])*"  # double quoted
+            |
+            '[^']*'           # single quoted
+            |
+            [^\s|"']          # anything else
+        )+
+    )
+    """)
+"""Regular expression for words of the raw expression."""
+
+REGEXP_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?\Z")
+"""Regular expression for number constants."""
+
+
+def register(name=None, *, pure=False):
+    """Decorator which registers a filter.
+
+    :param str name: Name of the filter in templates. Default is the
+        name of the function.
+    :param bool pure: Filter has no side effects and its result
+        depends only on arguments.
+    :return: Decorator which returns function unchanged.
+    """
+
+    def decorator(function):
+        filter_name = name or function.__name__
+        FILTERS[filter_name] = Filter(filter_name, function, pure)
+
+        return function
+
+    return decorator
+
+
+class Pipeline:
+    """Compiled expression: where to get value and how to filter it.
+
+    :param str varname: Name of the variable to resolve. ``None`` means
+        that input is a constant.
+    :param value: Value of the constant input.
+    :param calls: Filters to apply with their arguments.
+    :type calls: list[tuple[:py:data:`Filter`, tuple]]
+    """
+
+    __slots__ = "varname", "value", "calls"
+
+    def __init__(self, varname, value=None, calls=()):
+        self.varname = varname
+        self.value = value
+        self.calls = tuple(calls)
+
+    def __repr__(self):
+        return ("<{0.__class__.__name__}(varname={0.varname!r}, "
+                "value={0.value!r}, calls={1!r})>").format(
+                    self, [(item.name, args) for item, args in self.calls])
+
+    def __reduce__(self):
+        # Filters are pickled by names and looked up in the registry
+        # on loading, so locally defined functions could be filters.
+        calls = tuple((item.name, args) for item, args in self.calls)
+
+        return restore_pipeline, (self.varname, self.value, calls)
+
+    @property
+    def is_constant(self):
+        """Pipeline does not depend on the context."""
+        return self.varname is None and not self.calls
+
+    def apply(self, value):
+        """Apply filters to the value.
+
+        :param value: Resolved input of the pipeline.
+        :return: Filtered value.
+        :raises:
+            :py:exc:`curly.exceptions.CurlyEvaluateFilterError`: if
+            filter failed.
+        """
+        for item, args in self.calls:
+            try:
+                value = item.function(value, *args)
+            except Exception as exc:
+                raise exceptions.CurlyEvaluateFilterError(
+                    item.name, value, exc) from exc
+
+        return value
+
+
+def restore_pipeline(varname, value, calls):
+    """Restore pickled :py:class:`Pipeline`."""
+    return Pipeline(
+        varname, value, ((FILTERS[name], args) for name, args in calls))
+
+
+def compile_pipeline(expression, raw_expression):
+    """Compile expression into :py:class:`Pipeline`.
+
+    :param expression: Expression from the token, split with shell
+        lexing.
+    :param str raw_expression: Expression as it is written in the
+        template.
+    :type expression: list[str]
+    :return: Compiled expression.
+    :rtype: :py:class:`Pipeline`
+    :raises:
+        :py:exc:`curly.exceptions.CurlyParserUnknownFilterError`: if
+        filter is not registered.
+    """
+    if "|" not in expression and "|" not in raw_expression:
+        return Pipeline(utils.join_expression(expression))
+
+    segments = split_segments(raw_expression)
+    if len(segments) == 1:
+        return Pipeline(utils.join_expression(expression))
+
+    source, *segments = segments
+    calls = [compile_call(segment, raw_expression) for segment in segments]
+
+    if len(source) != 1 or not is_constant(source[0]):
+        return Pipeline(
+            utils.join_expression(unquote(word) for word in source),
+            calls=calls)
+
+    return fold_constants(Pipeline(None, parse_constant(source[0]), calls))
+
+
+def split_segments(raw_expression):
+    """Split words of the expression by ``|``.
+
+    :param str raw_expression: Expression as it is written in the
+        template.
+    :return: Words of the source and of every filter call.
+    :rtype: list[list[str]]
+    """
+    segments = [[]]
+
+    for word in REGEXP_WORD.findall(raw_expression):
+        if word == "|":
+            segments.append([])
+        else:
+            segments[-1].append(word)
+
+    return segments
+
+
+def compile_call(segment, raw_expression):
+    """Compile words of the filter call into filter and its arguments.
+
+    :param segment: Name of the filter and its arguments.
+    :param str raw_expression: Expression for error messages.
+    :type segment: list[str]
+    :rtype: tuple[:py:class:`Filter`, tuple]
+    :raises:
+        :py:exc:`curly.exceptions.CurlyParserEmptyFilterError`: if
+        there is no filter after ``|``.
+
+        :py:exc:`curly.exceptions.CurlyParserUnknownFilterError`: if
+        filter is not registered.
+    """
+    if not segment:
+        raise exceptions.CurlyParserEmptyFilterError(raw_expression)
+
+    name, *args = segment
+    if name not in FILTERS:
+        raise exceptions.CurlyParserUnknownFilterError(name, raw_expression)
+
+    return FILTERS[name], tuple(parse_constant(arg) for arg in args)
+
+
+def fold_constants(pipeline):
+    """Apply leading pure filters of pipeline with constant input.
+
+    :param pipeline: Pipeline to fold.
+    :type pipeline: :py:class:`Pipeline`
+    :return: Pipeline with folded constants.
+    :rtype: :py:class:`Pipeline`
+    """
+    value = pipeline.value
+    calls = list(pipeline.calls)
+
+    while calls and calls[0][0].pure:
+        value = Pipeline(None, calls=calls[:1]).apply(value)
+        calls.pop(0)
+
+    return Pipeline(None, value, calls)
+
+
+def is_constant(word):
+    """Check if word of the raw expression is a constant."""
+    return word[0] in "\"'" or REGEXP_NUMBER.match(word) is not None
+
+
+def parse_constant(word):
+    """Convert word of the raw expression into constant.
+
+    :param str word: Word to convert.
+    :return: Number for unquoted numbers, string otherwise.
+    :rtype: int or float or str
+    """
+    if word[0] not in "\"'" and REGEXP_NUMBER.match(word):
+        try:
+            return int(word)
+        except ValueError:
+            return float(word)
+
+    return unquote(word)
+
+
+def unquote(word):
+    """Remove shell quotes from the word."""
+    return "".join(shlex.split(word))
+
+
+@register(pure=True)
+def upper(value):
+    """Convert value to upper case."""
+    return str(value).upper()
+
+
+@register(pure=True)
+def lower(value):
+    """Convert value to lower case."""
+    return str(value).lower()
+
+
+@register(pure=True)
+def title(value):
+    """Convert value to title case."""
+    return str(value).title()
+
+
+@register(pure=True)
+def capitalize(value):
+    """Capitalize the first character of the value."""
+    return str(value).capitalize()
+
+
+@register(pure=True)
+def strip(value):
+    """Remove leading and trailing whitespaces."""
+    return str(value).strip()
+
+
+@register(pure=True)
+def length(value):
+    """Length of the value."""
+    return len(value)
+
+
+@register(pure=True)
+def truncate(value, limit, end="..."):
+    """Truncate value up to ``limit`` characters, including ``end``."""
+    value = str(value)
+    if len(value) <= limit:
+        return value
+
+    return value[:max(limit - len(end), 0)] + end
+
+
+@register(pure=True)
+def join(value, separator=""):
+    """Join items of the value with separator."""
+    return separator.join(str(item) for item in value)
+
+
+@register(pure=True)
+def date(value, date_format):
+    """Format date, time or datetime with :py:meth:`datetime.strftime`.
+    """
+    return value.strftime(date_format)
+
+
+@register(pure=True)
+def safe(value):
+    """Mark value as safe, so it is not autoescaped."""
+    return escaping.mark_safe(value)
+
+
+@register("escape", pure=True)
+def escape_filter(value):
+    """Escape value for HTML, see :py:func:`curly.escape.escape`."""
+    return escaping.escape(value)
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""Incremental rendering of the template for changing contexts.
+
+If the same template is rendered again and again with contexts which
+differ in a few values (e.g. live dashboards), most of the output stays
+the same. :py:class:`IncrementalRenderer` remembers output of every
+top-level subtree of the template and renders again only subtrees
+which variables (see :py:mod:`curly.analysis`) have changed:
+
+.. code-block:: pycon
+
+  >>> from curly import Template
+  >>> from curly.incremental import IncrementalRenderer
+  >>> renderer = IncrementalRenderer(
+  ...     Template("Load: {{ load }}. Hosts: {{ hosts | length }}"))
+  >>> renderer.render({"load": 1, "hosts": ["a", "b"]})
+  'Load: 1. Hosts: 2'
+  >>> renderer.update({"load": 3, "hosts": ["a", "b"]})
+  [Span(start=6, end=7, text='3')]
+  >>> renderer.output
+  'Load: 3. Hosts: 2'
+
+:py:meth:`IncrementalRenderer.update` returns changed spans of the
+output which could be sent to the client instead of the whole page,
+:py:attr:`IncrementalRenderer.output` is the full output.
+
+Top-level loops are cached per iteration: output of the loop body is
+keyed by the content of ``item``, so only new or changed items are
+rendered if other variables of the body are the same.
+
+Values are compared by content (see
+:py:func:`curly.analysis.fingerprint`), so it is safe to mutate the
+context in place between updates. Subtrees with values which cannot be
+fingerprinted are rendered on every update.
+"""
+
+
+import collections
+
+from curly import analysis
+from curly import parser
+
+
+Span = collections.namedtuple("Span", ["start", "end", "text"])
+"""Change of the output: ``text`` replaces ``output[start:end]`` of the
+previous output."""
+
+
+class Fragment:
+    """Cached output of the top-level subtree.
+
+    :param node: Top-level node.
+    :param dependencies: Variables of the tree.
+    :type node: :py:class:`curly.parser.Node`
+    :type dependencies: :py:class:`curly.analysis.Dependencies`
+    """
+
+    def __init__(self, node, dependencies):
+        self.node = node
+        self.paths = tuple(sorted(dependencies[node]))
+        self.digest = None
+        self.pieces = ()
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}(paths={0.paths})>".format(self)
+
+    def update(self, context):
+        """Render subtree if its variables have changed.
+
+        :param dict context: Variables for template rendering.
+        :return: Pieces of the output. The same object is returned if
+            nothing is changed.
+        :rtype: tuple[str]
+        """
+        digest = make_digest(self.paths, context)
+        if digest is None or digest != self.digest:
+            self.pieces = self.render(context)
+        self.digest = digest
+
+        return self.pieces
+
+    def render(self, context):
+        """Render subtree into pieces of the output.
+
+        :param dict context: Variables for template rendering.
+        :rtype: tuple[str]
+        """
+        return "".join(self.node.emit(context)),
+
+
+class LoopFragment(Fragment):
+    """Cached output of the top-level loop, piece per iteration.
+
+    Iterations are keyed by the content of ``item``. Cache is dropped
+    if variables of the body other than ``item`` have changed.
+    """
+
+    def __init__(self, node, dependencies):
+        super().__init__(node, dependencies)
+        self.body_paths = tuple(sorted(set(
+            path
+            for subnode in node
+            for path in analysis.analyze(subnode, frozenset())[subnode])))
+        self.body_digest = None
+        self.body = parser.RootNode(node.data)
+        self.iterations = {}
+
+    def render(self, context):
+        resolved = self.node.evaluate_expression(context)
+
+        body_digest = make_digest(self.body_paths, context)
+        if body_digest is None or body_digest != self.body_digest:
+            self.iterations = {}
+        self.body_digest = body_digest
+
+        iterations = {}
+        pieces = []
+        serializer = analysis.Serializer()
+        context_copy = context.copy()
+        for item in self.node.iterate(resolved):
+            key = make_item_key(serializer, item)
+            piece = iterations.get(key)
+            if piece is None:
+                piece = self.iterations.get(key)
+            if piece is None:
+                context_copy["item"] = item
+                piece = "".join(self.body.emit(context_copy))
+            if key is not None:
+                iterations[key] = piece
+            pieces.append(piece)
+        self.iterations = iterations
+
+        return tuple(pieces)
+
+
+class IncrementalRenderer:
+    """Stateful renderer which renders only changed parts of template.
+
+    Renderer keeps the state of the previous update, so it should not
+    be shared between threads.
+
+    :param template: Template to render.
+    :type template: :py:class:`curly.template.Template`
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self.dependencies = analysis.analyze(template.node)
+        self.output = None
+        self.reset()
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}(fragments={1})>".format(
+            self, len(self.fragments))
+
+    def reset(self):
+        """Drop cached output, next update renders everything."""
+        self.output = None
+        self.fragments = [
+            make_fragment(node, self.dependencies)
+            for node in self.template.node]
+
+    def update(self, context):
+        """Render template for the new context.
+
+        :param dict context: A dictionary with variables for the
+            template.
+        :return: Spans of the previous output which have changed.
+            Spans are sorted and do not overlap, see
+            :py:func:`apply_spans`. On the first update, the whole
+            output is inserted.
+        :rtype: list[:py:data:`Span`]
+        :raises ValueError: if it is not possible to render template
+            with the given context. Cache is dropped in that case.
+        """
+        previous = [fragment.pieces for fragment in self.fragments]
+        try:
+            current = [fragment.update(context)
+                       for fragment in self.fragments]
+        except Exception:
+            self.reset()
+            raise
+
+        spans = diff_pieces(previous, current)
+        self.output = "".join(
+            piece for pieces in current for piece in pieces)
+
+        return spans
+
+    def render(self, context):
+        """Render template for the new context.
+
+        :param dict context: A dictionary with variables for the
+            template.
+        :return: Rendered template.
+        :rtype: str
+        """
+        self.update(context)
+
+        return self.output
+
+
+def make_fragment(node, dependencies):
+    """Make cache of the top-level node.
+
+    :param node: Top-level node.
+    :param dependencies: Variables of the tree.
+    :type node: :py:class:`curly.parser.Node`
+    :type dependencies: :py:class:`curly.analysis.Dependencies`
+    :rtype: :py:class:`Fragment`
+    """
+    if isinstance(node, parser.LoopNode):
+        return LoopFragment(node, dependencies)
+
+    return Fragment(node, dependencies)
+
+
+def make_digest(paths, context):
+    """Fingerprint of variables or ``None`` if it cannot be computed."""
+    try:
+        return analysis.fingerprint(b"", paths, context)
+    except ValueError:
+        return None
+
+
+def make_item_key(serializer, item):
+    """Key of the loop iteration or ``None`` if it cannot be computed.
+
+    Serialized item is the key itself: hashing bytes of the dict key is
+    cheaper than a cryptographic digest.
+    """
+    try:
+        return serializer.dumps(item)
+    except ValueError:
+        return None
+
+
+def diff_pieces(previous, current):
+    """Find changed spans between outputs of fragments.
+
+    :param previous: Pieces of the previous output, per fragment.
+    :param current: Pieces of the current output, per fragment.
+    :type previous: list[tuple[str]]
+    :type current: list[tuple[str]]
+    :rtype: list[:py:data:`Span`]
+    """
+    spans = []
+    offset = 0
+
+    for old_pieces, new_pieces in zip(previous, current):
+        old_length = sum(len(piece) for piece in old_pieces)
+        if old_pieces is new_pieces:
+            offset += old_length
+        elif len(old_pieces) == len(new_pieces):
+            for old, new in zip(old_pieces, new_pieces):
+                if old != new:
+                    spans.append(Span(offset, offset + len(old), new))
+                offset += len(old)
+        else:
+            text = "".join(new_pieces)
+            if old_length or text:
+                spans.append(Span(offset, offset + old_length, text))
+            offset += old_length
+
+    return spans
+
+
+def apply_spans(text, spans):
+    """Apply changed spans to the previous output.
+
+    :param str text: Previous output.
+    :param spans: Changes from :py:meth:`IncrementalRenderer.update`.
+    :type spans: list[:py:data:`Span`]
+    :return: Current output.
+    :rtype: str
+    """
+    chunks = []
+    offset = 0
+
+    for start, end, new_text in spans:
+        chunks.append(text[offset:start])
+        chunks.append(new_text)
+        offset = end
+    chunks.append(text[offset:])
+
+    return "".join(chunks)
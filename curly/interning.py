@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Sharing of identical subtrees between templates.
+
+Applications with a lot of similar templates (copies of a few base
+layouts, for example) keep the same literals, tags and whole blocks in
+memory again and again. :py:func:`intern_tree` replaces nodes of the
+compiled tree with identical nodes which are already in memory:
+
+.. code-block:: pycon
+
+  >>> from curly import Template
+  >>> first = Template(layout + "Hello, {{ name }}", intern=True)
+  >>> second = Template(layout + "Bye, {{ name }}", intern=True)
+  >>> first.node[0] is second.node[0]
+  True
+
+Nodes and tokens are looked up in the process-wide
+:py:data:`TABLE`, strings are interned with :py:func:`sys.intern`.
+Table keeps weak references only: nodes live as long as some template
+uses them.
+
+Node is identical to another one if it has the same class, text of the
+token and template options (undefined policy, autoescaping and
+accessors of the schema) and its subnodes are the same objects. So
+subtrees are interned bottom-up. Node is shared between templates,
+but not within one: N-th copy of the repeated subtree is shared with
+N-th copies in other templates. Nodes of custom block tags (see
+:py:func:`curly.parser.register_block_tag`) are never shared, but
+their parents could be.
+
+Shared nodes belong to different templates, they cannot have the
+positions in the template text. Tokens of interned nodes have no
+positions (``None``) and :py:meth:`curly.template.Template.edit` of
+interned template recompiles it as a whole.
+"""
+
+
+import collections
+import sys
+import weakref
+
+from curly import lexer
+from curly import parser
+
+
+INTERNED_CLASSES = frozenset((
+    parser.LiteralNode, parser.PrintNode, parser.IfNode, parser.ElseNode,
+    parser.LoopNode))
+"""Classes of nodes which could be shared."""
+
+INTERNED_ATTRIBUTES = frozenset((
+    "data", "token", "done", "pipeline", "elsenode", "undefined",
+    "autoescape", "accessor", "vectorized", "encodings"))
+"""Attributes of nodes which could be shared. Nodes with other
+attributes (set by applications) are kept as is."""
+
+
+class InternTable:
+    """Weak tables of shared tokens and nodes."""
+
+    def __init__(self):
+        self.tokens = weakref.WeakValueDictionary()
+        self.nodes = weakref.WeakValueDictionary()
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}(tokens={1}, nodes={2})>".format(
+            self, len(self.tokens), len(self.nodes))
+
+    def intern_tree(self, root):
+        """Replace nodes of the tree with shared ones.
+
+        The root itself is not shared, but its list of subnodes is
+        changed in place.
+
+        :param root: Root of the tree, prepared by
+            :py:func:`curly.parser.prepare_tree`.
+        :type root: :py:class:`curly.parser.RootNode`
+        :return: The same root.
+        :rtype: :py:class:`curly.parser.RootNode`
+        """
+        shared = {}
+        occurrences = collections.Counter()
+
+        # Reversed pre-order has every subnode before its parent.
+        for node in reversed(list(parser.walk_tree(root))):
+            node.data = [shared.get(id(subnode), subnode)
+                         for subnode in node.data]
+            elsenode = getattr(node, "elsenode", None)
+            if elsenode is not None:
+                node.elsenode = shared.get(id(elsenode), elsenode)
+            if node is root:
+                continue
+
+            shared[id(node)] = self.intern_node(node, occurrences)
+
+        return root
+
+    def intern_node(self, node, occurrences=None):
+        """Shared node identical to the given one.
+
+        Subnodes of the node should be interned already.
+
+        :param node: Node to intern.
+        :param occurrences: Counter of identical nodes in the tree.
+            N-th occurrence of the node in the tree is shared with
+            N-th occurrences in other trees only.
+        :type node: :py:class:`curly.parser.Node`
+        :type occurrences: :py:class:`collections.Counter` or None
+        :return: Shared node, the given one if it is the first of its
+            kind (or cannot be shared).
+        :rtype: :py:class:`curly.parser.Node`
+        """
+        if node.__class__ not in INTERNED_CLASSES or not node.done or \
+                not INTERNED_ATTRIBUTES.issuperset(node.__dict__):
+            return node
+
+        token = self.intern_token(node.token)
+        attrs = node.__dict__
+        key = (node.__class__, id(token), policy_key(attrs.get("undefined")),
+               attrs.get("autoescape", False), id(attrs.get("accessor")),
+               id(attrs.get("elsenode")))
+        key += tuple(map(id, node.data))
+        if occurrences is not None:
+            # Tree stays a tree: analysis and instrumentation tell
+            # nodes apart by their ids.
+            occurrences[key] += 1
+            key += (occurrences[key],)
+
+        shared = self.nodes.get(key)
+        if shared is not None:
+            return shared
+
+        # Key refers to the token and subnodes by ids, node keeps them
+        # alive as long as it is in the table.
+        node.token = token
+        pipeline = attrs.get("pipeline")
+        if pipeline is not None and pipeline.varname is not None:
+            pipeline.varname = sys.intern(pipeline.varname)
+        if attrs.get("vectorized") is not None:
+            node.vectorized = parser.VectorizedBody.compile(node)
+        self.nodes[key] = node
+
+        return node
+
+    def intern_token(self, token):
+        """Shared token with the same text, without position.
+
+        :param token: Token to intern.
+        :type token: :py:class:`curly.lexer.Token`
+        :rtype: :py:class:`curly.lexer.Token`
+        """
+        token_class = token.__class__
+        if isinstance(token, lexer.LiteralToken):
+            token_class = lexer.LiteralToken
+            key = (token_class, token.data, token.contents["text"])
+        else:
+            key = (token_class, token.data)
+
+        shared = self.tokens.get(key)
+        if shared is not None:
+            return shared
+
+        contents = {}
+        for name, value in token.contents.items():
+            if isinstance(value, str):
+                value = sys.intern(value)
+            elif isinstance(value, list):
+                value = [sys.intern(word) for word in value]
+            contents[name] = value
+
+        shared = token_class.__new__(token_class)
+        shared.__dict__.update(
+            data=sys.intern(token.data), contents=contents, position=None)
+        if token.trim_left:
+            shared.trim_left = True
+        if token.trim_right:
+            shared.trim_right = True
+        self.tokens[key] = shared
+
+        return shared
+
+
+def policy_key(undefined):
+    """Key of the undefined policy in keys of nodes.
+
+    Policies without state (like
+    :py:class:`curly.undefined.EmptyUndefined`) are interchangeable,
+    other ones (like counters of
+    :py:class:`curly.undefined.LogUndefined`) belong to their template.
+
+    :param undefined: Policy of the node.
+    :type undefined: :py:class:`curly.undefined.Undefined` or None
+    :rtype: type or int
+    """
+    if undefined is None or vars(undefined):
+        return id(undefined)
+
+    return undefined.__class__
+
+
+TABLE = InternTable()
+"""Process-wide table, used by :py:func:`intern_tree`."""
+
+
+def intern_tree(root, table=None):
+    """Replace nodes of the tree with shared ones.
+
+    Please check :py:meth:`InternTable.intern_tree` for details.
+
+    :param root: Root of the tree.
+    :param table: Table to use, :py:data:`TABLE` by default.
+    :type root: :py:class:`curly.parser.RootNode`
+    :type table: :py:class:`InternTable` or None
+    :return: The same root.
+    :rtype: :py:class:`curly.parser.RootNode`
+    """
+    if table is None:
+        table = TABLE
+
+    return table.intern_tree(root)
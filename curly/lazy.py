@@ -0,0 +1,482 @@
+# -*- coding: utf-8 -*-
+"""Lazy parsing of block bodies.
+
+Templates often have large branches which are rarely rendered (admin
+sections, error pages), but they are lexed and parsed on compilation
+anyway. :py:func:`parse` lexes only the tags which are outside of
+``if`` and ``loop`` blocks. For blocks, it finds the matching
+``elif``, ``else`` and end tags and remembers where their bodies are
+in the text:
+
+.. code-block:: pycon
+
+  >>> from curly import Template
+  >>> template = Template(text, lazy=True)
+
+Such blocks are :py:class:`PendingNode` nodes. Body of the node is
+parsed (lazily as well) the first time somebody needs its subnodes,
+usually when the node is rendered. After that, node becomes the
+regular :py:class:`curly.parser.IfNode`,
+:py:class:`curly.parser.ElseNode` or
+:py:class:`curly.parser.LoopNode`. Parsing of bodies is
+thread-safe.
+
+Tags of the blocks are checked on compilation, so a template with
+broken structure fails as before. But errors in bodies (like unknown
+filters or variables which do not match the schema) are raised when
+the body is parsed. Everything that walks the whole tree (analysis of
+variables, instrumentation, dumps, interning) parses all bodies.
+"""
+
+
+import collections
+import itertools
+import re
+import threading
+import time
+
+from curly import exceptions
+from curly import lexer
+from curly import parser
+from curly import undefined as policies
+
+
+REGEXP_TAG_FUNCTION = re.compile(
+    r"\{%-?\s*/?\s*(" + lexer.REGEXP_FUNCTION + r")")
+"""Regular expression for the function of the block tag."""
+
+LOCK = threading.RLock()
+"""Lock for parsing of pending bodies. It is taken only by nodes
+which are not parsed yet."""
+
+Options = collections.namedtuple(
+    "Options", ["source", "undefined", "autoescape", "trim_blocks", "schema"])
+"""Text of the template and options of the compilation."""
+
+Pending = collections.namedtuple(
+    "Pending",
+    ["options", "start", "end", "position", "opening", "closing", "loops"])
+"""Body of the :py:class:`PendingNode`.
+
+Body is ``source[start:end]`` of the :py:data:`Options`, ``position``
+is the position of ``start``. ``opening`` and ``closing`` are tags
+around the body (they are needed to trim whitespaces), ``loops`` are
+loops which enclose the body (outermost first).
+"""
+
+PendingBlock = collections.namedtuple("PendingBlock", ["node", "closing"])
+"""Block with pending bodies in the stream of tokens.
+
+``node`` is the first node of the block, ``closing`` is the end tag.
+"""
+
+
+class PendingNode:
+    """Mixin for nodes which body is not parsed yet.
+
+    Node has no ``data`` attribute, so the first access to it parses
+    the body and changes the class of the node to
+    :py:attr:`PendingNode.node_class`.
+    """
+
+    node_class = None
+    """Class of the node after parsing."""
+
+    def __getattr__(self, name):
+        if name != "data" or "pending" not in self.__dict__:
+            raise AttributeError(name)
+
+        with LOCK:
+            if "pending" in self.__dict__:
+                parse_body(self)
+
+        return self.__dict__["data"]
+
+
+class PendingIfNode(PendingNode, parser.IfNode):
+    """:py:class:`curly.parser.IfNode` with pending body."""
+
+    node_class = parser.IfNode
+
+
+class PendingElseNode(PendingNode, parser.ElseNode):
+    """:py:class:`curly.parser.ElseNode` with pending body."""
+
+    node_class = parser.ElseNode
+
+
+class PendingLoopNode(PendingNode, parser.LoopNode):
+    """:py:class:`curly.parser.LoopNode` with pending body."""
+
+    node_class = parser.LoopNode
+
+
+PENDING_CLASSES = {
+    "if": PendingIfNode,
+    "elif": PendingIfNode,
+    "else": PendingElseNode,
+    "loop": PendingLoopNode}
+"""Classes of pending nodes for the functions of tags."""
+
+BUILTIN_TAGS = {name: parser.BLOCK_TAGS[name] for name in PENDING_CLASSES}
+"""Builtin tags. Blocks are parsed lazily only if these tags are not
+replaced by applications."""
+
+
+def parse(text, *, observer=None, undefined=policies.STRICT,
+          autoescape=False, trim_blocks=False, schema=None):
+    """Parse the template leaving bodies of blocks pending.
+
+    Parameters are the same as for :py:func:`curly.parser.parse`, but
+    the template text is given instead of tokens.
+
+    :param text: Template text.
+    :type text: str or bytes
+    :return: Parsed AST tree with pending nodes.
+    :rtype: :py:class:`curly.parser.RootNode`
+    :raises:
+        :py:exc:`curly.exceptions.CurlyParserError`: if tokens are
+        unknown, blocks are not closed or variables outside of blocks
+        do not match the schema.
+    """
+    started_at = time.perf_counter()
+    if isinstance(text, bytes):
+        text = text.decode("utf-8")
+
+    options = Options(
+        text, policies.get_policy(undefined), autoescape, trim_blocks,
+        schema)
+    root = parser.RootNode(parse_region(
+        options, 0, len(text), lexer.Position(0, 1, 1), ()))
+
+    if observer is not None:
+        observer.on_compile(time.perf_counter() - started_at)
+
+    return root
+
+
+def is_parsed(node):
+    """Check if subnodes of the node are parsed.
+
+    :param node: Node to check.
+    :type node: :py:class:`curly.parser.Node`
+    :rtype: bool
+    """
+    return "pending" not in node.__dict__
+
+
+def parse_body(node):
+    """Parse pending body of the node.
+
+    Subnodes are set before the class is changed, so other threads
+    never see the node without body.
+
+    :param node: Node to parse.
+    :type node: :py:class:`PendingNode`
+    """
+    pending = node.pending
+    loops = pending.loops
+    if isinstance(node, parser.LoopNode):
+        loops += (node,)
+
+    node.data = parse_region(
+        pending.options, pending.start, pending.end, pending.position,
+        loops, pending.opening, pending.closing)
+    node.__class__ = node.node_class
+    if isinstance(node, parser.LoopNode):
+        node.vectorized = parser.VectorizedBody.compile(node)
+    del node.pending
+
+
+def parse_region(options, start, end, position, loops, opening=None,
+                 closing=None):
+    """Parse ``source[start:end]`` into nodes.
+
+    :param options: Template and options.
+    :param int start: Offset of the region.
+    :param int end: Offset after the region.
+    :param position: Position of ``start``.
+    :param loops: Loops which enclose the region.
+    :param opening: Tag before the region, if it is a body.
+    :param closing: Tag after the region, if it is a body.
+    :type options: :py:data:`Options`
+    :type position: :py:data:`curly.lexer.Position`
+    :type loops: tuple[:py:class:`curly.parser.LoopNode`]
+    :type opening: :py:class:`curly.lexer.Token` or None
+    :type closing: :py:class:`curly.lexer.Token` or None
+    :return: Prepared nodes of the region.
+    :rtype: list[:py:class:`curly.parser.Node`]
+    """
+    blocks = {}
+    tokens = scan(options, start, end, position, loops, blocks)
+    if opening is None:
+        tokens = parser.trim_tokens(tokens, trim_blocks=options.trim_blocks)
+    else:
+        # Tags around the body trim its first and last literals.
+        tokens = list(parser.trim_tokens(
+            itertools.chain((opening,), tokens, (closing,)),
+            trim_blocks=options.trim_blocks))[1:-1]
+
+    nodes = parser.parse_tokens(collapse_blocks(tokens, blocks))
+    for node in nodes:
+        if not node.done:
+            raise exceptions.CurlyParserFoundNotDoneError(node)
+
+    root = parser.RootNode(nodes)
+    parser.prepare_tree(
+        root, undefined=options.undefined, autoescape=options.autoescape,
+        schema=options.schema, loops=loops, descend=is_parsed)
+
+    return root.data
+
+
+def scan(options, start, end, position, loops, blocks):
+    """Lex the region, skipping bodies of blocks.
+
+    Tokens are the same as :py:func:`curly.lexer.tokenize` gives, but
+    for blocks which could be parsed lazily only start and end tags
+    are yielded. Pending nodes of the block are stored in ``blocks``
+    by id of the start tag. If block cannot be parsed lazily (e.g. it
+    is not closed), it is lexed as usual, so parser raises the same
+    errors as for eager parsing.
+
+    :param options: Template and options.
+    :param int start: Offset of the region.
+    :param int end: Offset after the region.
+    :param position: Position of ``start``.
+    :param loops: Loops which enclose the region.
+    :param dict blocks: Storage of found blocks.
+    :type options: :py:data:`Options`
+    :type position: :py:data:`curly.lexer.Position`
+    :type loops: tuple[:py:class:`curly.parser.LoopNode`]
+    :return: Generator with tokens.
+    :rtype: Generator[:py:class:`curly.lexer.Token`]
+    """
+    text = options.source
+    token_classes = lexer.get_token_patterns()
+    matches = lexer.make_tokenizer_regexp().finditer(text, start, end)
+    replayed = collections.deque()
+    previous_end = start
+
+    def take():
+        if replayed:
+            return replayed.popleft()
+        return next(matches, None)
+
+    for matcher in iter(take, None):
+        if matcher.start(0) != previous_end:
+            yield lexer.LiteralToken(
+                text[previous_end:matcher.start(0)], position)
+            position = lexer.make_position(text, matcher.start(0), position)
+        previous_end = matcher.end(0)
+
+        token = token_classes[matcher.lastgroup](
+            matcher.group(matcher.lastgroup), position)
+        position = lexer.make_position(text, previous_end, position)
+        if not is_lazy_start(token):
+            yield token
+            continue
+
+        consumed, tags = find_block(token, take)
+        if tags is None:
+            replayed.extendleft(reversed(consumed))
+            yield token
+            continue
+
+        block, position = make_block(
+            options, token, previous_end, position, tags, loops)
+        blocks[id(token)] = block
+        previous_end = tags[-1].end(0)
+        yield token
+        yield block.closing
+
+    if previous_end != end:
+        yield lexer.LiteralToken(text[previous_end:end], position)
+
+
+def is_lazy_start(token):
+    """Check if token starts the block which could be parsed lazily.
+
+    :param token: Token to check.
+    :type token: :py:class:`curly.lexer.Token`
+    :rtype: bool
+    """
+    if token.__class__ is not lexer.StartBlockToken:
+        return False
+
+    function = token.contents["function"]
+    if function not in ("if", "loop"):
+        return False
+
+    return all(parser.BLOCK_TAGS.get(name) is tag
+               for name, tag in BUILTIN_TAGS.items())
+
+
+def find_block(token, take):
+    """Find tags of the block body.
+
+    :param token: Start tag of the block.
+    :param take: Function which returns the next match of the tokenizer
+        or ``None`` at the end of region.
+    :type token: :py:class:`curly.lexer.StartBlockToken`
+    :type take: Callable
+    :return: Consumed matches and matches of ``elif``/``else`` tags of
+        the block with its end tag at the end. Tags are ``None`` if
+        block is not closed properly or contains unknown tags.
+    :rtype: tuple[list, list or None]
+    """
+    consumed = []
+    token_classes = lexer.get_token_patterns()
+    names = [token.contents["function"]]
+    has_else = [False]
+    tags = []
+
+    for matcher in iter(take, None):
+        consumed.append(matcher)
+        token_class = token_classes[matcher.lastgroup]
+        if not issubclass(
+                token_class, (lexer.StartBlockToken, lexer.EndBlockToken)):
+            continue
+
+        function = REGEXP_TAG_FUNCTION.match(matcher.group(0))
+        outermost = None
+        if function is not None:
+            is_end = issubclass(token_class, lexer.EndBlockToken)
+            outermost = nest_tag(function.group(1), is_end, names, has_else)
+        if outermost is None:
+            return consumed, None
+        if outermost:
+            tags.append(matcher)
+        if not names:
+            return consumed, tags
+
+    return consumed, None
+
+
+def nest_tag(function, is_end, names, has_else):
+    """Track nesting of blocks by the next tag of the block body.
+
+    :param str function: Function of the tag.
+    :param bool is_end: Tag is an end tag.
+    :param list names: Functions of the open blocks, outermost first.
+    :param list has_else: ``else`` is found in the open blocks.
+    :return: ``None`` if tag is unknown or misplaced, ``True`` if tag
+        is the branch or the end tag of the outermost block, ``False``
+        otherwise.
+    :rtype: bool or None
+    """
+    if is_end:
+        if names.pop() != function:
+            return None
+        has_else.pop()
+        return not names
+
+    tag = parser.BLOCK_TAGS.get(function)
+    if tag is None:
+        return None
+    if tag.kind == "block":
+        names.append(function)
+        has_else.append(False)
+        return False
+    if tag.kind != "branch":
+        return False
+
+    # Only builtin branches of if are known to the scanner.
+    if tag is not BUILTIN_TAGS.get(function) or \
+            names[-1] != "if" or has_else[-1]:
+        return None
+    has_else[-1] = function == "else"
+
+    return len(names) == 1
+
+
+def make_block(options, token, body_start, position, tags, loops):
+    """Make pending nodes of the block.
+
+    :param options: Template and options.
+    :param token: Start tag of the block.
+    :param int body_start: Offset after the start tag.
+    :param position: Position of ``body_start``.
+    :param tags: Matches of branch tags and the end tag, see
+        :py:func:`find_block`.
+    :param loops: Loops which enclose the block.
+    :type options: :py:data:`Options`
+    :type token: :py:class:`curly.lexer.StartBlockToken`
+    :type position: :py:data:`curly.lexer.Position`
+    :type tags: list
+    :type loops: tuple[:py:class:`curly.parser.LoopNode`]
+    :return: Block and position after its end tag.
+    :rtype: tuple[:py:data:`PendingBlock`, :py:data:`curly.lexer.Position`]
+    """
+    text = options.source
+    token_classes = lexer.get_token_patterns()
+    first = previous = None
+
+    for matcher in tags:
+        tag_position = lexer.make_position(text, matcher.start(0), position)
+        tag = token_classes[matcher.lastgroup](
+            matcher.group(matcher.lastgroup), tag_position)
+
+        node = PENDING_CLASSES[token.contents["function"]](token)
+        del node.data
+        node.done = True
+        node.pending = Pending(
+            options, body_start, matcher.start(0), position, token, tag,
+            loops)
+        if first is None:
+            first = node
+        else:
+            previous.elsenode = node
+        previous = node
+
+        token = tag
+        body_start = matcher.end(0)
+        position = lexer.make_position(text, body_start, tag_position)
+
+    return PendingBlock(first, token), position
+
+
+def collapse_blocks(tokens, blocks):
+    """Replace tags of pending blocks with :py:data:`PendingBlock`.
+
+    :param tokens: Trimmed tokens of the region.
+    :param dict blocks: Blocks found by :py:func:`scan`.
+    :type tokens: Iterable[:py:class:`curly.lexer.Token`]
+    :return: Generator with tokens and blocks.
+    :rtype: Generator
+    """
+    closing = None
+
+    for token in tokens:
+        if closing is not None:
+            if token is closing:
+                closing = None
+            continue
+
+        block = blocks.get(id(token))
+        if block is None:
+            yield token
+        else:
+            yield block
+            closing = block.closing
+
+
+def parse_pending_block(stack, block):
+    """Parsing of :py:data:`PendingBlock`.
+
+    Nodes of the block are done already, so the first one is just put
+    on the top of the stack.
+
+    :param stack: Stack of the parser.
+    :param block: Block to process.
+    :type stack: list[:py:class:`curly.parser.Node`]
+    :type block: :py:data:`PendingBlock`
+    :return: Updated stack.
+    :rtype: list[:py:class:`curly.parser.Node`]
+    """
+    stack.append(block.node)
+
+    return stack
+
+
+parser.TOKEN_PARSERS[PendingBlock] = parse_pending_block
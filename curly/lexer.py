@@ -50,26 +50,67 @@ Some terminology:
 
   It is out of the scope of the Curly is how to implement evaluation
   of the expression. By default, curly tries to find it in
-  context literally, but if you want, feel free to implement your
-  own Jinja2-style DSL. Or even call :py:func:`ast.parse` with
+  context literally and applies filters after ``|`` (see
+  :py:mod:`curly.filters`), but if you want, feel free to implement
+  your own Jinja2-style DSL. Or even call :py:func:`ast.parse` with
   :py:func:`compile`.
 
 For details on lexing please check :py:func:`tokenize` function.
 """
 
 
+import codecs
 import collections
 import functools
+import itertools
+import mmap
+import os
+import re
 
 from curly import exceptions
 from curly import utils
 
 
-REGEXP_FUNCTION = r"[a-zA-Z0-9_-]+"
-"""Regular expression for function definition."""
+REGEXP_FUNCTION = r"[a-zA-Z0-9_]+(?:-[a-zA-Z0-9_]+)*"
+"""Regular expression for function definition.
 
-REGEXP_EXPRESSION = r"(?:\\.|[^\{\}%])+"
-"""Regular expression for 'expression' definition."""
+Function may contain ``-`` but cannot start or end with it: it would be
+ambiguous with trim markers.
+"""
+
+REGEXP_EXPRESSION = r"(?:\\.|[^\{\}%]|%(?!\}))+?"
+"""Regular expression for 'expression' definition.
+
+It is not greedy, so trailing whitespaces and trim marker ``-`` are not
+the part of expression.
+"""
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+"""Default size of the chunk for :py:func:`tokenize_stream`."""
+
+REGEXP_STREAM_BRACE = re.compile(r"(?<!\\)[{}]")
+"""Regular expression for braces which are not escaped."""
+
+REGEXP_STREAM_OPENING = re.compile(r"\{(?:[{%]|\Z)")
+"""Regular expression for the beginning of the tag."""
+
+REGEXP_BYTES_WHITESPACE = (
+    r"(?:[\t-\r\x1c-\x20]|\xc2[\x85\xa0]|\xe1\x9a\x80"
+    r"|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80)")
+"""Pattern for ``\\s`` of Unicode text in UTF-8 bytes."""
+
+MAPPED_BLOCK_SIZE = 1024 * 1024
+"""Size of the block to scan memory-mapped text by."""
+
+CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+"""Bytes which continue multibyte characters in UTF-8."""
+
+Position = collections.namedtuple("Position", ["offset", "line", "column"])
+"""Position of the token in the template text.
+
+``offset`` is 0-based index of the first character, ``line`` and
+``column`` are 1-based.
+"""
 
 
 class Token(collections.UserString):
@@ -78,7 +119,15 @@ class Token(collections.UserString):
     Token is parsed by :py:func:`tokenize` only if it has defined REGEXP
     attribute.
 
+    Tags may have trim markers: ``{%- ... -%}`` or ``{{- ... -}}``.
+    ``-`` on the left means that whitespaces before the tag should be
+    removed, on the right - after the tag. Markers are available as
+    ``trim_left`` and ``trim_right`` attributes, whitespaces are
+    removed by :py:func:`curly.parser.trim_tokens`.
+
     :param str raw_string: Text which was recognized as a token.
+    :param position: Position of the token in the template text.
+    :type position: :py:data:`Position` or None
     :raises:
         :py:exc:`curly.exceptions.CurlyLexerStringDoesNotMatchError`: if
         string does not match regular expression.
@@ -86,7 +135,15 @@ class Token(collections.UserString):
 
     REGEXP = None
 
-    def __init__(self, raw_string):
+    TRIM_GROUPS = None
+    """Indexes of trim marker groups in :py:attr:`Token.REGEXP`."""
+
+    EXPRESSION_GROUP = None
+    """Index of expression group in :py:attr:`Token.REGEXP`."""
+
+    trim_left = trim_right = False
+
+    def __init__(self, raw_string, position=None):
         matcher = self.REGEXP.match(raw_string)
         if matcher is None:
             raise exceptions.CurlyLexerStringDoesNotMatchError(
@@ -94,6 +151,12 @@ class Token(collections.UserString):
 
         super().__init__(raw_string)
         self.contents = self.extract_contents(matcher)
+        self.position = position
+
+        if self.TRIM_GROUPS is not None:
+            left, right = self.TRIM_GROUPS
+            self.trim_left = matcher.group(left) is not None
+            self.trim_right = matcher.group(right) is not None
 
     def extract_contents(self, matcher):
         """Extract more detail token information from regular expression.
@@ -118,14 +181,17 @@ class PrintToken(Token):
     """
     REGEXP = utils.make_regexp(
         r"""
-        {{\s*  # open {{
-        (%s)   # expression 'var' in {{ var }}
-        \s*}}  # closing }}
+        {{(-)?\s*  # open {{ with optional trim marker
+        (%s)       # expression 'var' in {{ var }}
+        \s*(-)?}}  # closing }} with optional trim marker
         """ % REGEXP_EXPRESSION)
     """Regular expression of the token."""
 
+    TRIM_GROUPS = 1, 3
+    EXPRESSION_GROUP = 2
+
     def extract_contents(self, matcher):
-        return {"expression": utils.make_expression(matcher.group(1))}
+        return {"expression": utils.make_expression(matcher.group(2))}
 
 
 class StartBlockToken(Token):
@@ -139,17 +205,20 @@ class StartBlockToken(Token):
     """
     REGEXP = utils.make_regexp(
         r"""
-        {%%\s*  # open block tag
-        (%s)    # function name
-        (%s)?   # expression for function
-        \s*%%}  # closing block tag
+        {%%(-)?\s*  # open block tag with optional trim marker
+        (%s)        # function name
+        (%s)??      # expression for function
+        \s*(-)?%%}  # closing block tag with optional trim marker
         """ % (REGEXP_FUNCTION, REGEXP_EXPRESSION))
     """Regular expression of the token."""
 
+    TRIM_GROUPS = 1, 4
+    EXPRESSION_GROUP = 3
+
     def extract_contents(self, matcher):
         return {
-            "function": matcher.group(1).strip(),
-            "expression": utils.make_expression(matcher.group(2))}
+            "function": matcher.group(2).strip(),
+            "expression": utils.make_expression(matcher.group(3))}
 
 
 class EndBlockToken(Token):
@@ -162,15 +231,17 @@ class EndBlockToken(Token):
     """
     REGEXP = utils.make_regexp(
         r"""
-        {%%\s*  # open block tag
-        /\s*    # / character
-        (%s)    # function name
-        \s*%%}  # closing block tag
+        {%%(-)?\s*  # open block tag with optional trim marker
+        /\s*       # / character
+        (%s)       # function name
+        \s*(-)?%%}  # closing block tag with optional trim marker
         """ % REGEXP_FUNCTION)
     """Regular expression of the token."""
 
+    TRIM_GROUPS = 1, 3
+
     def extract_contents(self, matcher):
-        return {"function": matcher.group(1).strip()}
+        return {"function": matcher.group(2).strip()}
 
 
 class LiteralToken(Token):
@@ -185,12 +256,111 @@ class LiteralToken(Token):
     """
     TEXT_UNESCAPE = utils.make_regexp(r"\\(.)")
 
-    def __init__(self, text):
+    def __init__(self, text, position=None):
         self.data = text
         self.contents = {"text": self.TEXT_UNESCAPE.sub(r"\1", text)}
+        self.position = position
+
+    def sliced(self, skipped_left, skipped_right, position=None):
+        """Make token without text skipped on the left and right.
 
+        :param str skipped_left: Prefix of the raw text to remove.
+        :param str skipped_right: Suffix of the raw text to remove.
+        :param position: Position of the new token.
+        :type position: :py:data:`Position` or None
+        :rtype: :py:class:`LiteralToken`
+        """
+        return LiteralToken(
+            self.data[len(skipped_left):len(self.data) - len(skipped_right)],
+            position)
+
+    def joined(self, other):
+        """Make token with text of this token followed by the other one.
+
+        :param other: Token to append.
+        :type other: :py:class:`LiteralToken`
+        :rtype: :py:class:`LiteralToken`
+        """
+        token = LiteralToken(self.data + other.data, self.position)
+        token.contents["text"] = self.contents["text"] + \
+            other.contents["text"]
 
-def tokenize(text):
+        return token
+
+    def encoded(self):
+        """Text encoded into UTF-8.
+
+        :rtype: bytes or memoryview
+        """
+        return self.contents["text"].encode("utf-8")
+
+
+class LiteralView(LiteralToken):
+    """Literal token which text is a slice of memory-mapped template.
+
+    Text is not copied from the mapping: it is decoded on every access
+    of :py:attr:`LiteralView.data` or ``contents``, and
+    :py:meth:`LiteralView.encoded` gives the slice of mapping as is
+    (if literal has no escapes). Template keeps only offsets, memory
+    is used by the page cache of the file.
+
+    On pickling, view is converted into :py:class:`LiteralToken`.
+
+    :param source: Text of the template in UTF-8.
+    :param int start: Offset of the first byte of the literal.
+    :param int end: Offset after the last byte of the literal.
+    :param position: Position of the token in the template text.
+    :type source: :py:class:`mmap.mmap` or bytes
+    :type position: :py:data:`Position` or None
+    """
+
+    def __init__(self, source, start, end, position=None):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.position = position
+        self.verbatim = source.find(b"\\", start, end) < 0
+
+    def __reduce__(self):
+        return LiteralToken, (self.data, self.position)
+
+    @property
+    def data(self):
+        """Raw text of the literal."""
+        return self.source[self.start:self.end].decode("utf-8")
+
+    @property
+    def contents(self):
+        """Contents of the token, as for :py:class:`LiteralToken`."""
+        text = self.data
+        if not self.verbatim:
+            text = self.TEXT_UNESCAPE.sub(r"\1", text)
+
+        return {"text": text}
+
+    def sliced(self, skipped_left, skipped_right, position=None):
+        return LiteralView(
+            self.source,
+            self.start + len(skipped_left.encode("utf-8")),
+            self.end - len(skipped_right.encode("utf-8")),
+            position)
+
+    def joined(self, other):
+        if isinstance(other, LiteralView) and other.source is self.source \
+                and other.start == self.end:
+            return LiteralView(
+                self.source, self.start, other.end, self.position)
+
+        return super().joined(other)
+
+    def encoded(self):
+        if not self.verbatim:
+            return super().encoded()
+
+        return memoryview(self.source)[self.start:self.end]
+
+
+def tokenize(text, position=None):
     """Lexical analysis of the given text.
 
     Main lexing function: it takes text and returns iterator to
@@ -238,28 +408,350 @@ def tokenize(text):
        leftovers after. This could be done emiting :py:class:`LiteralToken`
        with ``text[previous_end:]`` text (if it is non empty, obviously).
 
+    Each token gets its :py:data:`Position` in the text so it is
+    possible to map it (and nodes built from it) back to the template
+    source.
+
     :param text: Text to lex into tokens.
+    :param position: Position to start lexing from, text before it is
+        skipped. It should be the end of some tag (or the beginning of
+        the text) to get the same tokens as for the whole text.
     :type text: str or bytes
+    :type position: :py:data:`Position` or None
     :return: Generator with :py:class:`Token` instances.
     :rtype: Generator[:py:class:`Token`]
     """
-    previous_end = 0
+    if position is None:
+        position = Position(0, 1, 1)
+    previous_end = position.offset
     tokens = get_token_patterns()
     if isinstance(text, bytes):
         text = text.decode("utf-8")
 
-    for matcher in make_tokenizer_regexp().finditer(text):
+    for matcher in make_tokenizer_regexp().finditer(text, previous_end):
         if matcher.start(0) != previous_end:
-            yield LiteralToken(text[previous_end:matcher.start(0)])
+            yield LiteralToken(text[previous_end:matcher.start(0)], position)
+            position = make_position(text, matcher.start(0), position)
         previous_end = matcher.end(0)
 
         match_groups = matcher.groupdict()
         token_class = tokens[matcher.lastgroup]
-        yield token_class(match_groups[matcher.lastgroup])
+        yield token_class(match_groups[matcher.lastgroup], position)
+        position = make_position(text, previous_end, position)
 
     leftover = text[previous_end:]
     if leftover:
-        yield LiteralToken(leftover)
+        yield LiteralToken(leftover, position)
+
+
+def tokenize_stream(source, chunk_size=STREAM_CHUNK_SIZE):
+    """Lexical analysis of the text which is read by chunks.
+
+    It yields the same tokens as :py:func:`tokenize` but never reads
+    the whole text into memory: file is read by chunks, bytes are
+    decoded from UTF-8 incrementally and text after the last found tag
+    is kept only until it is known that it cannot start a tag (see
+    :py:func:`find_stream_hold`). Literal text between tags is joined
+    into one token, as :py:func:`tokenize` does.
+
+    :param source: File object (opened in text or binary mode) or
+        iterable of text chunks (:py:class:`str` or :py:class:`bytes`).
+    :param int chunk_size: Size of the chunk to read from file object.
+    :return: Generator with :py:class:`Token` instances.
+    :rtype: Generator[:py:class:`Token`]
+    :raises UnicodeDecodeError: if bytes are not valid UTF-8.
+    """
+    tokenizer = StreamTokenizer()
+
+    # None is the end of the text: everything left is tokenized.
+    for chunk in itertools.chain(iter_text_chunks(source, chunk_size),
+                                 [None]):
+        yield from tokenizer.feed(chunk)
+
+
+class StreamTokenizer:
+    """State of :py:func:`tokenize_stream` between chunks of the text."""
+
+    def __init__(self):
+        self.regexp = make_tokenizer_regexp()
+        self.tokens = get_token_patterns()
+        self.buffer = ""
+        self.base = 0  # offset of the buffer in the whole text
+        self.position = Position(0, 1, 1)  # offset is relative to buffer
+        self.literal = []  # parts of the literal token which is not done
+        self.literal_position = None
+
+    def feed(self, chunk):
+        """Tokenize the next chunk of the text.
+
+        :param chunk: Next chunk or ``None`` at the end of the text.
+        :type chunk: str or None
+        :return: Generator with tokens which are complete.
+        :rtype: Generator[:py:class:`Token`]
+        """
+        final = chunk is None
+        self.buffer += chunk or ""
+
+        hold, previous_end = yield from self.tokenize_buffer(final)
+        if hold is None:
+            hold = find_stream_hold(self.buffer, previous_end)
+        if hold != previous_end:
+            self.add_literal(previous_end, hold)
+            self.position = make_position(self.buffer, hold, self.position)
+
+        self.buffer = self.buffer[hold:]
+        self.base += hold
+        self.position = Position(0, self.position.line, self.position.column)
+        if final and self.literal:
+            yield self.literal_token()
+
+    def tokenize_buffer(self, final):
+        """Yield tokens of the buffer which are complete.
+
+        :param bool final: Buffer is the end of the text.
+        :return: Generator with tokens. Its result is the offset of
+            the text to hold till the next chunk (``None`` if it is
+            not known yet) and the end of the last token.
+        :rtype: Generator[:py:class:`Token`]
+        """
+        buffer = self.buffer
+        previous_end = 0
+        hold = len(buffer) if final else None
+
+        for matcher in self.regexp.finditer(buffer):
+            start = matcher.start(0)
+            if matcher.end(0) == len(buffer) and not final:
+                # Tag at the very end may be a prefix of the longer one:
+                # "{{ \}}" is "{{ \}}}" if the next chunk starts
+                # with "}". It also may be the end of the tag which
+                # starts earlier.
+                hold = min(start, find_stream_hold(buffer, previous_end))
+                break
+
+            if self.literal or start != previous_end:
+                self.add_literal(previous_end, start)
+                yield self.literal_token()
+                self.position = make_position(buffer, start, self.position)
+            previous_end = matcher.end(0)
+
+            position = self.position
+            yield self.tokens[matcher.lastgroup](matcher.group(0), Position(
+                self.base + position.offset, position.line, position.column))
+            self.position = make_position(buffer, previous_end, position)
+
+        return hold, previous_end
+
+    def add_literal(self, start, end):
+        """Add text of the buffer to the literal which is not done."""
+        if not self.literal:
+            self.literal_position = Position(
+                self.base + start, self.position.line, self.position.column)
+        self.literal.append(self.buffer[start:end])
+
+    def literal_token(self):
+        """Make token of the literal and start the new one."""
+        token = LiteralToken("".join(self.literal), self.literal_position)
+        self.literal = []
+
+        return token
+
+
+def tokenize_mapping(source):
+    """Lexical analysis of the memory-mapped text in UTF-8.
+
+    It yields the same tokens as :py:func:`tokenize` for the decoded
+    text, but literals are :py:class:`LiteralView` slices of the
+    ``source``: the text is neither decoded nor copied as a whole.
+
+    :param source: Text of the template in UTF-8, see
+        :py:func:`map_file`.
+    :type source: :py:class:`mmap.mmap` or bytes
+    :return: Generator with :py:class:`Token` instances.
+    :rtype: Generator[:py:class:`Token`]
+    :raises UnicodeDecodeError: if tag is not valid UTF-8.
+    """
+    previous_end = 0
+    position = Position(0, 1, 1)
+    tokens = get_token_patterns()
+
+    for matcher in make_tokenizer_bytes_regexp().finditer(source):
+        start, end = matcher.span(0)
+        if start != previous_end:
+            yield LiteralView(source, previous_end, start, position)
+            position = advance_mapped_position(
+                source, previous_end, start, position)
+        previous_end = end
+
+        raw_string = source[start:end].decode("utf-8")
+        yield tokens[matcher.lastgroup](raw_string, position)
+        position = shift_position(position, raw_string)
+
+    if previous_end < len(source):
+        yield LiteralView(source, previous_end, len(source), position)
+
+
+def map_file(path):
+    """Map file into memory for :py:func:`tokenize_mapping`.
+
+    File should not be changed while mapping is used (replace it with
+    the new one instead).
+
+    :param str path: Path to the file.
+    :return: Read-only mapping of the file, empty bytes for empty file.
+    :rtype: :py:class:`mmap.mmap` or bytes
+    """
+    with open(path, "rb") as source_fp:
+        if not os.fstat(source_fp.fileno()).st_size:
+            return b""
+        return mmap.mmap(source_fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def advance_mapped_position(source, start, end, previous):
+    """Calculate position after ``source[start:end]``.
+
+    Text is scanned by blocks, so it is not copied as a whole.
+
+    :param source: Text in UTF-8.
+    :param int start: Offset of the text in ``source``.
+    :param int end: Offset after the end of text in ``source``.
+    :param previous: Position of the ``start``.
+    :type source: :py:class:`mmap.mmap` or bytes
+    :type previous: :py:data:`Position`
+    :return: Position of the ``end``.
+    :rtype: :py:data:`Position`
+    """
+    newlines = 0
+    chars = 0
+    for offset in range(start, end, MAPPED_BLOCK_SIZE):
+        block = source[offset:min(end, offset + MAPPED_BLOCK_SIZE)]
+        newlines += block.count(b"\n")
+        chars += len(block.translate(None, CONTINUATION_BYTES))
+
+    if not newlines:
+        return Position(
+            previous.offset + chars, previous.line, previous.column + chars)
+
+    line_start = source.rfind(b"\n", start, end) + 1
+
+    return Position(
+        previous.offset + chars, previous.line + newlines,
+        count_mapped_chars(source, line_start, end) + 1)
+
+
+def count_mapped_chars(source, start, end):
+    """Count characters of UTF-8 text in ``source[start:end]``."""
+    return sum(
+        len(source[offset:min(end, offset + MAPPED_BLOCK_SIZE)].translate(
+            None, CONTINUATION_BYTES))
+        for offset in range(start, end, MAPPED_BLOCK_SIZE))
+
+
+def iter_text_chunks(source, chunk_size=STREAM_CHUNK_SIZE):
+    """Iterate over text chunks of the source.
+
+    :param source: File object or iterable of chunks, see
+        :py:func:`tokenize_stream`.
+    :param int chunk_size: Size of the chunk to read from file object.
+    :return: Generator with non-empty decoded chunks.
+    :rtype: Generator[str]
+    :raises UnicodeDecodeError: if bytes are not valid UTF-8.
+    """
+    if hasattr(source, "read"):
+        source = read_chunks(source, chunk_size)
+
+    decoder = None
+    for chunk in source:
+        if not isinstance(chunk, str):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder("utf-8")()
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+
+    if decoder is not None:
+        chunk = decoder.decode(b"", final=True)
+        if chunk:
+            yield chunk
+
+
+def read_chunks(fileobj, chunk_size):
+    """Read file object by chunks until the end of file."""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def find_stream_hold(text, start):
+    """Find the beginning of the tag which may end in the next chunk.
+
+    Tag may contain braces only in its opening and closing parts
+    (others have to be escaped). So braces after the possible beginning
+    of the tag (``{`` followed by ``{`` or ``%``) mean that it is not a
+    tag, unless this is ``}`` at the very end of the text: the closing
+    part may be continued. Escaped braces are not taken into account,
+    it only makes the result more conservative.
+
+    :param str text: Text of the chunk.
+    :param int start: Offset of the text after the last found tag.
+    :return: Offset of the text which should be kept for the next
+        chunk, ``len(text)`` if nothing should be kept.
+    :rtype: int
+    """
+    last_offset = len(text) - 1
+    earliest = start
+
+    for matcher in REGEXP_STREAM_BRACE.finditer(text, start):
+        offset = matcher.start(0)
+        if text[offset] == "{":
+            earliest = max(earliest, offset - 1)
+        elif offset < last_offset:
+            earliest = offset + 1
+
+    matcher = REGEXP_STREAM_OPENING.search(text, earliest)
+    if matcher is None:
+        return len(text)
+
+    return matcher.start(0)
+
+
+def make_position(text, offset, previous):
+    """Calculate position of the given offset in the text.
+
+    To avoid scanning of the text from the very beginning, calculation
+    is made relatively to the previous known position.
+
+    :param str text: Template text.
+    :param int offset: Offset to calculate position for.
+    :param previous: Known position before ``offset``.
+    :type previous: :py:data:`Position`
+    :return: Position of the offset.
+    :rtype: :py:data:`Position`
+    """
+    newlines = text.count("\n", previous.offset, offset)
+    if not newlines:
+        return Position(offset, previous.line,
+                        previous.column + offset - previous.offset)
+
+    line_start = text.rindex("\n", previous.offset, offset) + 1
+
+    return Position(offset, previous.line + newlines, offset - line_start + 1)
+
+
+def shift_position(position, skipped):
+    """Calculate position after the skipped text.
+
+    :param position: Position of the skipped text.
+    :param str skipped: Skipped text.
+    :type position: :py:data:`Position`
+    :return: Position right after ``skipped``.
+    :rtype: :py:data:`Position`
+    """
+    return make_position(
+        skipped, len(skipped),
+        Position(0, position.line, position.column))._replace(
+            offset=position.offset + len(skipped))
 
 
 @functools.lru_cache(1)
@@ -282,6 +774,23 @@ def make_tokenizer_regexp():
     return patterns
 
 
+@functools.lru_cache(1)
+def make_tokenizer_bytes_regexp():
+    """Create regular expression for :py:func:`tokenize_mapping`.
+
+    This is :py:func:`make_tokenizer_regexp` for UTF-8 bytes. Bytes of
+    multibyte characters never look like braces, so only ``\\s`` has
+    to be replaced to match Unicode whitespaces as well.
+
+    :rtype: :py:class:`re.regex`
+    """
+    regexp = make_tokenizer_regexp()
+    pattern = regexp.pattern.replace(
+        r"\s", REGEXP_BYTES_WHITESPACE).encode("utf-8")
+
+    return re.compile(pattern, regexp.flags & ~re.UNICODE)
+
+
 @functools.lru_cache(1)
 def get_token_patterns():
     """Mapping of pattern name to its class.
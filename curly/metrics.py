@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""Instrumentation hooks for production metrics.
+
+Template can be created with an *observer*, an object which is
+notified about compilation and every rendering of the template.
+Observer gets compile time, render latency, size of the output and
+counters collected during rendering: variable lookups, lookup misses
+and loop iterations.
+
+.. code-block:: pycon
+
+  >>> from curly import Template
+  >>> from curly.metrics import MetricsSink
+  >>> sink = MetricsSink()
+  >>> template = Template("{% loop items %}{{ item }}{% /loop %}",
+  ...                     observer=sink)
+  >>> template.render({"items": [1, 2, 3]})
+  '123'
+  >>> snapshot = sink.snapshot()
+  >>> snapshot["lookups"], snapshot["loop_iterations"]
+  (4, 3)
+
+To implement your own observer (e.g. to send data to Prometheus or
+StatsD), subclass :py:class:`Observer`. :py:class:`MetricsSink` is a
+simple in-memory implementation which aggregates everything it gets.
+
+Counters are collected by the instrumented copy of the AST tree which
+is made only if observer is set, so templates without observers pay
+nothing.
+"""
+
+
+import bisect
+import threading
+
+from curly import parser
+from curly import utils
+
+
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""Default upper bounds of render latency histogram buckets, in seconds."""
+
+
+class RenderCounters:
+    """Counters collected during single rendering."""
+
+    __slots__ = "lookups", "lookup_misses", "loop_iterations"
+
+    def __init__(self):
+        self.lookups = 0
+        self.lookup_misses = 0
+        self.loop_iterations = 0
+
+    def __repr__(self):
+        return ("<{0.__class__.__name__}(lookups={0.lookups}, "
+                "lookup_misses={0.lookup_misses}, "
+                "loop_iterations={0.loop_iterations})>").format(self)
+
+
+class Observer:
+    """Base class for template observers.
+
+    All methods do nothing, override those you are interested in.
+    """
+
+    def on_compile(self, elapsed):
+        """Called when template is compiled.
+
+        :param float elapsed: Time spent on compilation, in seconds.
+        """
+
+    def on_render(self, elapsed, output_size, counters):
+        """Called when template is rendered.
+
+        It is not called if rendering failed, please check
+        :py:meth:`Observer.on_render_error`.
+
+        :param float elapsed: Time spent on rendering, in seconds.
+        :param int output_size: Size of UTF-8 encoded output, in bytes.
+        :param counters: Counters collected during rendering.
+        :type counters: :py:class:`RenderCounters`
+        """
+
+    def on_render_error(self, elapsed, counters, exc):
+        """Called when rendering of the template failed.
+
+        :param float elapsed: Time spent before failure, in seconds.
+        :param counters: Counters collected before failure.
+        :param Exception exc: Exception raised on rendering.
+        :type counters: :py:class:`RenderCounters`
+        """
+
+
+class MetricsSink(Observer):
+    """Observer which aggregates metrics in memory.
+
+    It is thread safe, so one sink could be shared between threads.
+    Use separate sinks for templates you want to distinguish.
+
+    :param buckets: Sorted upper bounds of render latency histogram
+        buckets, in seconds. The last bucket is implicit and holds
+        everything slower.
+    :type buckets: list[float]
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Reset all collected metrics."""
+        with self.lock:
+            self.compiles = 0
+            self.compile_time = 0.0
+            self.renders = 0
+            self.render_errors = 0
+            self.render_time = 0.0
+            self.histogram = [0] * (len(self.buckets) + 1)
+            self.output_bytes = 0
+            self.lookups = 0
+            self.lookup_misses = 0
+            self.loop_iterations = 0
+
+    def on_compile(self, elapsed):
+        with self.lock:
+            self.compiles += 1
+            self.compile_time += elapsed
+
+    def on_render(self, elapsed, output_size, counters):
+        bucket = bisect.bisect_left(self.buckets, elapsed)
+
+        with self.lock:
+            self.renders += 1
+            self.render_time += elapsed
+            self.histogram[bucket] += 1
+            self.output_bytes += output_size
+            self.add_counters(counters)
+
+    def on_render_error(self, elapsed, counters, exc):
+        with self.lock:
+            self.render_errors += 1
+            self.add_counters(counters)
+
+    def add_counters(self, counters):
+        self.lookups += counters.lookups
+        self.lookup_misses += counters.lookup_misses
+        self.loop_iterations += counters.loop_iterations
+
+    def snapshot(self):
+        """Consistent copy of collected metrics.
+
+        Histogram is presented as a list of ``(upper_bound, count)``
+        pairs, upper bound of the last bucket is ``None``.
+
+        :return: Collected metrics.
+        :rtype: dict
+        """
+        with self.lock:
+            return {
+                "compiles": self.compiles,
+                "compile_time": self.compile_time,
+                "renders": self.renders,
+                "render_errors": self.render_errors,
+                "render_time": self.render_time,
+                "render_histogram": list(zip(
+                    self.buckets + (None,), self.histogram)),
+                "output_bytes": self.output_bytes,
+                "lookups": self.lookups,
+                "lookup_misses": self.lookup_misses,
+                "loop_iterations": self.loop_iterations}
+
+
+def instrument(root):
+    """Make a copy of the AST tree which collects render counters.
+
+    :param root: Root of the tree.
+    :type root: :py:class:`curly.parser.Node`
+    :return: Instrumented copy of the tree and thread local storage.
+        Before rendering with this copy, set ``counters`` attribute of
+        the storage to :py:class:`RenderCounters` instance.
+    :rtype: tuple[:py:class:`curly.parser.Node`, :py:class:`threading.local`]
+    """
+    local = threading.local()
+
+    def patch(_, node, __):
+        if isinstance(node, parser.ExpressionMixin):
+            node.lookup_expression = make_lookup_expression(
+                node.lookup_expression, local)
+        if isinstance(node, parser.LoopNode):
+            # Vectorized loops do not look up variables of the body.
+            node.vectorized = None
+            node.iterate = make_iterate(node.iterate, local)
+
+    return parser.copy_tree(root, patch), local
+
+
+def make_lookup_expression(lookup_expression, local):
+    """Wrap expression lookup to count lookups and misses."""
+
+    def instrumented_lookup_expression(context):
+        counters = local.counters
+        counters.lookups += 1
+        value = lookup_expression(context)
+        if value is utils.MISSING:
+            counters.lookup_misses += 1
+
+        return value
+
+    return instrumented_lookup_expression
+
+
+def make_iterate(iterate, local):
+    """Wrap loop iteration to count iterations."""
+
+    def instrumented_iterate(resolved):
+        counters = local.counters
+        for item in iterate(resolved):
+            counters.loop_iterations += 1
+            yield item
+
+    return instrumented_iterate
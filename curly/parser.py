@@ -72,38 +72,134 @@ Example:
 {'expression': "
                  "['likes'], 'function': 'if'})>",
    'type': 'IfNode'}]
+
+Block tags are dispatched by the registry of :py:data:`BlockTag`
+entries, so applications could add their own tags with
+:py:func:`register_block_tag`:
+
+.. code-block:: python3
+
+  from curly import parser
+
+  class UpperNode(parser.BlockTagNode):
+
+      def emit(self, context):
+          yield "".join(super().emit(context)).upper()
+
+  parser.register_block_tag("upper", UpperNode)
+
+Now ``{% upper %}text{% /upper %}`` renders ``TEXT``. Tags are looked
+up when template is compiled, so they have to be registered before.
 """
 
 
 import collections
+import copy
+import functools
+import itertools
 import pprint
-import subprocess
+import time
 
+from curly import columns as columns_module
+from curly import escape
 from curly import exceptions
+from curly import filters
 from curly import lexer
+from curly import schema as schemas
+from curly import undefined as policies
 from curly import utils
 
 
+BlockTag = collections.namedtuple(
+    "BlockTag", ["name", "node_class", "kind", "start", "end"])
+"""Registered block tag.
+
+``kind`` is ``block`` for tags which are closed by ``{% /name %}``,
+``single`` for tags without end tag and ``branch`` for tags which
+continue the enclosing block (like ``elif`` and ``else``). ``start``
+and ``end`` are parsing functions for start and end tokens, with the
+same signature as :py:func:`parse_start_block_token` (``end`` is
+``None`` if tag has no end token).
+"""
+
+BLOCK_TAGS = {}
+"""Registry of block tags, mapping of the name to :py:data:`BlockTag`."""
+
+TOKEN_PARSERS = {}
+"""Parsing functions for classes of tokens, see :py:func:`parse_tokens`.
+Subclasses of registered classes are looked up by their bases."""
+
+
 class ExpressionMixin:
     """A small helper mixin for :py:class:`Node` which adds
     expression related methods.
+
+    Expression is compiled into :py:class:`curly.filters.Pipeline` when
+    node is created.
     """
 
+    undefined = policies.STRICT
+    """Policy for missing variables, see :py:mod:`curly.undefined`."""
+
+    accessor = None
+    """Accessor generated from the schema, see :py:mod:`curly.schema`."""
+
+    def __init__(self, token):
+        super().__init__(token)
+        self.pipeline = filters.compile_pipeline(
+            self.expression, self.raw_expression)
+
     @property
     def expression(self):
         """*expression* from underlying token."""
         return self.token.contents["expression"]
 
+    @property
+    def raw_expression(self):
+        """*expression* as it is written in the template."""
+        matcher = self.token.REGEXP.match(self.token.data)
+
+        return matcher.group(self.token.EXPRESSION_GROUP) or ""
+
     def evaluate_expression(self, context):
         """Evaluate *expression* in given context.
 
+        If variable is missing, value is taken from
+        :py:attr:`ExpressionMixin.undefined` policy. Filters are applied
+        after that.
+
         :param dict context: Variables for template rendering.
         :return: Evaluated expression.
+        :raises:
+            :py:exc:`curly.exceptions.CurlyEvaluateError`: if variable
+            is missing and policy is strict or filter failed.
         """
-        value = subprocess.list2cmdline(self.expression)
-        value = utils.resolve_variable(value, context)
+        value = self.lookup_expression(context)
+        if value is utils.MISSING:
+            value = self.undefined.missing(self.pipeline.varname, context)
+
+        return self.pipeline.apply(value)
 
-        return value
+    def lookup_expression(self, context):
+        """Find variable of *expression* in given context.
+
+        If template is compiled with schema, variable is taken by
+        :py:attr:`ExpressionMixin.accessor`. If context does not match
+        the schema, generic lookup is used.
+
+        :param dict context: Variables for template rendering.
+        :return: Found value (not filtered) or
+            :py:data:`curly.utils.MISSING`.
+        """
+        if self.pipeline.varname is None:
+            return self.pipeline.value
+        if self.accessor is not None:
+            try:
+                return self.accessor.get(context)
+            except schemas.LOOKUP_ERRORS:
+                pass
+
+        return utils.find_variable(self.pipeline.varname, context)
 
 
 class Node(collections.UserList):
@@ -116,6 +212,12 @@ class Node(collections.UserList):
     own node type, you want to define :py:meth:`Noed.emit` only,
     :py:meth:`Node.process` stays the same.
 
+    Builtin nodes define :py:meth:`Node.expand` instead: it does not
+    render subnodes itself, but asks :py:func:`emit_steps` to render
+    them. So rendering does not recurse and nesting of the template is
+    not limited by the Python recursion limit. Nodes which define
+    :py:meth:`Node.emit` are rendered with it (and recursively).
+
     If you want to render template to the string, use
     :py:meth:`Node.process`. This is a thing you are looking for.
 
@@ -123,11 +225,31 @@ class Node(collections.UserList):
     :type token: :py:class:`curly.lexer.Token`
     """
 
+    custom_emit = False
+    """Class defines its own :py:meth:`Node.emit`, it is set
+    automatically."""
+
+    leaf = False
+    """Node is rendered into a single chunk of text by
+    :py:meth:`Node.render_leaf`, :py:func:`emit_steps` calls it
+    directly instead of :py:meth:`Node.expand`."""
+
     def __init__(self, token):
         super().__init__()
         self.token = token
         self.done = False
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "emit" in cls.__dict__:
+            cls.custom_emit = True
+        if "render_leaf" not in cls.__dict__ and (
+                "emit" in cls.__dict__ or "expand" in cls.__dict__):
+            cls.leaf = False
+        if "render_leaf" in cls.__dict__ and \
+                "render_leaf_bytes" not in cls.__dict__:
+            cls.render_leaf_bytes = Node.render_leaf_bytes
+
     def __str__(self):
         return ("<{0.__class__.__name__}(done={0.done}, token={0.token!r}, "
                 "data={0.data!r})>").format(self)
@@ -135,6 +257,13 @@ class Node(collections.UserList):
     def __repr__(self):
         return pprint.pformat(self._repr_rec())
 
+    def __copy__(self):
+        node = self.__class__.__new__(self.__class__)
+        node.__dict__.update(self.__dict__)
+        node.data = list(self.data)
+
+        return node
+
     def _repr_rec(self):
         return {
             "raw_string": repr(self.token) if self.token else "",
@@ -151,6 +280,14 @@ class Node(collections.UserList):
         """
         return self.token.raw_string
 
+    @property
+    def position(self):
+        """Position of the related token in the template text.
+
+        :rtype: :py:data:`curly.lexer.Position` or None
+        """
+        return getattr(self.token, "position", None)
+
     def process(self, context):
         """Return rendered content of the node as a string.
 
@@ -169,8 +306,54 @@ class Node(collections.UserList):
         :return: Generator with rendered texts.
         :rtype: Generator[str]
         """
-        for node in self:
-            yield from node.emit(context)
+        return emit_steps(self.expand(context), context)
+
+    def expand(self, context):
+        """Return iterator over rendering steps of the node.
+
+        Step is a rendered chunk of text, a subnode to render with the
+        same context or a tuple of subnode and context to render it
+        with, see :py:func:`emit_steps`. By default, all subnodes are
+        rendered with the same context.
+
+        :param dict context: Dictionary with a context variables.
+        :return: Iterator over steps.
+        :rtype: Iterator[str or :py:class:`Node` or tuple]
+        """
+        return iter(self.data)
+
+    def render_leaf(self, context):
+        """Render the leaf node, see :py:attr:`Node.leaf`.
+
+        :param dict context: Dictionary with a context variables.
+        :return: Rendered text.
+        :rtype: str
+        """
+        return self.process(context)
+
+    def render_leaf_bytes(self, context, encoding):
+        """Render the leaf node into bytes, see :py:attr:`Node.leaf`.
+
+        :param dict context: Dictionary with a context variables.
+        :param str encoding: Normalized name of the encoding (as
+            :py:func:`codecs.lookup` returns).
+        :return: Rendered and encoded text.
+        :rtype: bytes or memoryview
+        """
+        return self.render_leaf(context).encode(encoding)
+
+    def emit_bytes(self, context, encoding="utf-8"):
+        """Return generator which emits encoded rendered chunks.
+
+        :param dict context: Dictionary with a context variables.
+        :param str encoding: Normalized name of the encoding (as
+            :py:func:`codecs.lookup` returns).
+        :return: Generator with rendered chunks.
+        :rtype: Generator[bytes or memoryview]
+        """
+        return emit_steps(
+            (self,), context, make_bytes_renderer(encoding),
+            functools.partial(str.encode, encoding=encoding))
 
 
 class RootNode(Node):
@@ -198,6 +381,13 @@ class LiteralNode(Node):
     :type token: :py:class:`curly.lexer.LiteralToken`
     """
 
+    leaf = True
+
+    encodings = None
+    """Cache of the text encoded into different encodings. It is
+    filled on the first rendering into bytes, so only dynamic values
+    are encoded on every rendering."""
+
     def __init__(self, token):
         super().__init__(token)
         self.done = True
@@ -213,8 +403,35 @@ class LiteralNode(Node):
         """Rendered text."""
         return self.token.contents["text"]
 
-    def emit(self, _):
-        yield self.text
+    def expand(self, context):
+        yield self.render_leaf(context)
+
+    def render_leaf(self, _):
+        return self.text
+
+    def render_leaf_bytes(self, _, encoding):
+        encodings = self.encodings
+        if encodings is None:
+            encodings = self.encodings = {}
+
+        encoded = encodings.get(encoding)
+        if encoded is None:
+            if encoding != "utf-8":
+                encoded = self.text.encode(encoding)
+            else:
+                encoded = self.token.encoded()
+                if encoded.__class__ is memoryview:
+                    # Slice of memory-mapped template, nothing to cache.
+                    return encoded
+            encodings[encoding] = encoded
+
+        return encoded
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("encodings", None)
+
+        return state
 
 
 class PrintNode(ExpressionMixin, Node):
@@ -224,10 +441,18 @@ class PrintNode(ExpressionMixin, Node):
     :py:class:`curly.lexer.PrintToken` in AST tree. Example of such node
     is the node for ``{{ var }}`` token.
 
+    If :py:attr:`PrintNode.autoescape` is set, printed value is escaped
+    with :py:func:`curly.escape.escape`.
+
     :param token: Token which produced that node.
     :type token: :py:class:`curly.lexer.PrintToken`
     """
 
+    autoescape = False
+    """Escape printed values for HTML."""
+
+    leaf = True
+
     def __init__(self, token):
         super().__init__(token)
         self.done = True
@@ -238,8 +463,15 @@ class PrintNode(ExpressionMixin, Node):
 
         return struct
 
-    def emit(self, context):
-        yield str(self.evaluate_expression(context))
+    def expand(self, context):
+        yield self.render_leaf(context)
+
+    def render_leaf(self, context):
+        value = self.evaluate_expression(context)
+        if self.autoescape:
+            return escape.escape(value)
+
+        return str(value)
 
 
 class BlockTagNode(ExpressionMixin, Node):
@@ -284,8 +516,8 @@ class ConditionalNode(BlockTagNode):
 
         return struct
 
-    def emit(self, context):
-        return self.ifnode.emit(context)
+    def expand(self, _):
+        return iter((self.ifnode,))
 
 
 class IfNode(BlockTagNode):
@@ -331,11 +563,13 @@ class IfNode(BlockTagNode):
 
         return struct
 
-    def emit(self, context):
+    def expand(self, context):
         if self.evaluate_expression(context):
-            yield from super().emit(context)
-        elif self.elsenode:
-            yield from self.elsenode.emit(context)
+            return iter(self.data)
+        if self.elsenode:
+            return iter((self.elsenode,))
+
+        return iter(())
 
 
 class ElseNode(BlockTagNode):
@@ -364,21 +598,192 @@ class LoopNode(BlockTagNode):
 
         return struct
 
-    def emit(self, context):
+    vectorized = None
+    """Compiled body of the loop, see :py:class:`VectorizedBody`."""
+
+    def expand(self, context):
         resolved = self.evaluate_expression(context)
+
+        if self.vectorized is not None:
+            rendered = self.vectorized.render(self, resolved, context)
+            if rendered is not None:
+                if rendered:
+                    yield rendered
+                return
+
+        # Subnodes are rendered before the next item is set.
         context_copy = context.copy()
+        for item in self.iterate(resolved):
+            context_copy["item"] = item
+            for node in self:
+                yield node, context_copy
 
+    def iterate(self, resolved):
+        """Iterate over items of evaluated expression.
+
+        :param resolved: Evaluated expression of the loop.
+        :return: Iterator over ``item`` values.
+        :rtype: Iterator
+        """
         if isinstance(resolved, dict):
-            for key, value in sorted(resolved.items()):
-                context_copy["item"] = {"key": key, "value": value}
-                yield from super().emit(context_copy)
-        else:
-            for item in resolved:
-                context_copy["item"] = item
-                yield from super().emit(context_copy)
+            return (
+                {"key": key, "value": value}
+                for key, value in sorted(resolved.items()))
+
+        return iter(resolved)
+
 
+class VectorizedBody:
+    """Body of the loop compiled into a format string.
 
-def parse(tokens):
+    Generic rendering of the loop copies the context, runs generators
+    and resolves the full variable names for each row. If body of the
+    loop contains only literals and prints of ``item`` (``{% loop rows
+    %}<td>{{ item.a }}</td>{% /loop %}``), it is compiled into the
+    format string (``<td>{!s}</td>``) and getters of the values from
+    the row, so loop is rendered with ``"".join(map(template.format,
+    *values))``.
+
+    If rows are column-oriented (see :py:mod:`curly.columns`) and all
+    printed variables are columns, the columns are zipped as they are,
+    without building rows at all.
+
+    If the context has keys which shadow variables of the body (e.g.
+    ``"item.a"``), generic rendering is used since literal lookup has
+    priority. ``item`` itself is never shadowed: loop sets it.
+
+    :param str template: Format string of the body.
+    :param fields: Print nodes of the body and the paths of variables
+        within ``item`` (``None`` for ``item`` itself).
+    :type fields: list[tuple[:py:class:`PrintNode`, str or None]]
+    """
+
+    def __init__(self, template, fields):
+        self.template = template
+        self.fields = tuple(fields)
+        self.shadowed = tuple(
+            node.pipeline.varname for node, path in self.fields
+            if path is not None)
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}(template={0.template!r})>".format(
+            self)
+
+    @classmethod
+    def compile(cls, loop):
+        """Compile body of the loop.
+
+        :param loop: Loop to compile.
+        :type loop: :py:class:`LoopNode`
+        :return: Compiled body or ``None`` if loop cannot be compiled.
+        :rtype: :py:class:`VectorizedBody` or None
+        """
+        chunks = []
+        fields = []
+
+        for node in loop:
+            if type(node) is LiteralNode:
+                chunks.append(node.text.replace("{", "{{").replace("}", "}}"))
+                continue
+            if type(node) is not PrintNode:
+                return None
+
+            varname = node.pipeline.varname
+            if varname == "item":
+                path = None
+            elif varname is not None and varname.startswith("item."):
+                path = varname[5:]
+            else:
+                return None
+            chunks.append("{!s}")
+            fields.append((node, path))
+
+        return cls("".join(chunks), fields)
+
+    def render(self, loop, resolved, context):
+        """Render the loop.
+
+        :param loop: Loop to render.
+        :param resolved: Evaluated expression of the loop.
+        :param dict context: Context of the loop.
+        :type loop: :py:class:`LoopNode`
+        :return: Rendered loop or ``None`` if generic rendering should
+            be used.
+        :rtype: str or None
+        """
+        for varname in self.shadowed:
+            if varname in context:
+                return None
+
+        if not self.fields:
+            count = sum(1 for _ in loop.iterate(resolved))
+            return self.template.format() * count
+
+        columns = columns_module.get_columns(resolved)
+        if columns is not None and all(
+                path in columns for _, path in self.fields):
+            values = [
+                self.finalize_column(node, columns[path])
+                for node, path in self.fields]
+        else:
+            # Getters are mapped in lockstep, so tee keeps a single row.
+            rows = itertools.tee(loop.iterate(resolved), len(self.fields))
+            values = [
+                map(self.make_getter(node, path, context), field_rows)
+                for (node, path), field_rows in zip(self.fields, rows)]
+
+        return "".join(map(self.template.format, *values))
+
+    @staticmethod
+    def finalize_column(node, values):
+        """Apply filters and escaping to the column values."""
+        if node.pipeline.calls:
+            values = map(node.pipeline.apply, values)
+        if node.autoescape:
+            values = map(escape.escape, values)
+
+        return values
+
+    @staticmethod
+    def make_getter(node, path, context):
+        """Make function which gets the value of the field from the row.
+
+        It does the same as :py:meth:`PrintNode.emit` does with the
+        context where ``item`` is the row.
+        """
+        pipeline = node.pipeline
+        apply = pipeline.apply if pipeline.calls else None
+        finalize = escape.escape if node.autoescape else None
+        find = utils.find_item_or_attr
+        if path is not None and "." in path:
+            find = utils.find_variable
+
+        def getter(row):
+            if path is None:
+                value = row
+            elif type(row) is dict:
+                value = row.get(path, utils.MISSING)
+                if value is utils.MISSING:
+                    value = find(path, row)
+            else:
+                value = find(path, row)
+
+            if value is utils.MISSING:
+                row_context = context.copy()
+                row_context["item"] = row
+                value = node.undefined.missing(pipeline.varname, row_context)
+            if apply is not None:
+                value = apply(value)
+            if finalize is not None:
+                value = finalize(value)
+
+            return value
+
+        return getter
+
+
+def parse(tokens, *, observer=None, undefined=policies.STRICT,
+          autoescape=False, trim_blocks=False, schema=None):
     """One of the main functions (see also :py:func:`curly.lexer.tokenize`).
 
     The idea of parsing is simple: we have a flow of well defined tokens
@@ -631,31 +1036,269 @@ ll-and-lr-in-context-why-parsing-tools.html
 
     We've just made AST tree.
 
+    If ``observer`` is given, its
+    :py:meth:`curly.metrics.Observer.on_compile` is called with the time
+    spent on parsing (and lexing, if ``tokens`` is lazy generator from
+    :py:func:`curly.lexer.tokenize`).
+
+    Before parsing, whitespaces are removed around tags with trim
+    markers (and block tags if ``trim_blocks`` is set) by
+    :py:func:`trim_tokens`. Finally, tree is prepared for rendering
+    with :py:func:`prepare_tree`.
+
     :param token: A stream with tokens.
+    :param observer: Observer to notify.
+    :param undefined: Policy for missing variables.
+    :param bool autoescape: Escape printed values for HTML.
+    :param bool trim_blocks: Remove whitespaces around block tags.
+    :param schema: Schema of the context, see :py:mod:`curly.schema`.
     :type token: Iterator[:py:class:`curly.lexer.Token`]
+    :type observer: :py:class:`curly.metrics.Observer` or None
+    :type undefined: str or :py:class:`curly.undefined.Undefined`
     :return: Parsed AST tree.
     :rtype: :py:class:`RootNode`
     :raises:
-        :py:exc:`curly.exceptions.CurlyParserError`: if token is unknown.
+        :py:exc:`curly.exceptions.CurlyParserError`: if token is unknown
+        or variables do not match the schema.
+    """
+    started_at = time.perf_counter()
+
+    root = RootNode(
+        parse_tokens(trim_tokens(tokens, trim_blocks=trim_blocks)))
+    validate_for_all_nodes_done(root)
+
+    prepare_tree(
+        root, undefined=undefined, autoescape=autoescape, schema=schema)
+
+    if observer is not None:
+        observer.on_compile(time.perf_counter() - started_at)
+
+    return root
+
+
+def parse_tokens(tokens):
+    """Run the stack machine of :py:func:`parse` over trimmed tokens.
+
+    Each token is dispatched by its class with
+    :py:data:`TOKEN_PARSERS`.
+
+    :param tokens: A stream with tokens, see :py:func:`trim_tokens`.
+    :type tokens: Iterator[:py:class:`curly.lexer.Token`]
+    :return: Final stack of the parser, nodes for :py:class:`RootNode`.
+        Nodes are not validated to be done.
+    :rtype: list[:py:class:`Node`]
+    :raises:
+        :py:exc:`curly.exceptions.CurlyParserError`: if token is
+        unknown.
     """
     stack = []
+    parsers = TOKEN_PARSERS
+
+    for token in tokens:
+        parse_token = parsers.get(token.__class__)
+        if parse_token is None:
+            parse_token = find_token_parser(token)
+        stack = parse_token(stack, token)
+
+    return stack
+
+
+def find_token_parser(token):
+    """Find parsing function for the token of unregistered class.
+
+    :param token: Token to process.
+    :type token: :py:class:`curly.lexer.Token`
+    :return: Parsing function of the nearest registered base class.
+    :rtype: Callable
+    :raises:
+        :py:exc:`curly.exceptions.CurlyParserUnknownTokenError`: if
+        token class is unknown.
+    """
+    for token_class in token.__class__.__mro__:
+        if token_class in TOKEN_PARSERS:
+            return TOKEN_PARSERS[token_class]
+
+    raise exceptions.CurlyParserUnknownTokenError(token)
+
+
+def trim_tokens(tokens, *, trim_blocks=False):
+    """Remove whitespaces around tags from literal tokens.
+
+    Whitespaces are removed at parse time, so rendering does nothing
+    extra. Tags with trim markers (``{%- ... -%}``, ``{{- ... -}}``)
+    remove all whitespaces (including newlines) on the marked side.
+    If ``trim_blocks`` is set, block tags (``{% ... %}``) remove the
+    first newline after the tag and indentation before the tag if it
+    is the first thing on the line. So the lines with block tags only
+    do not get into the output at all:
+
+    .. code-block:: text
+
+      <ul>
+        {% loop items %}
+        <li>{{ item }}</li>
+        {% /loop %}
+      </ul>
+
+    is rendered as
+
+    .. code-block:: text
+
+      <ul>
+        <li>1</li>
+        <li>2</li>
+      </ul>
+
+    Literals which become empty are dropped.
+
+    :param tokens: A stream with tokens.
+    :param bool trim_blocks: Remove whitespaces around block tags.
+    :type tokens: Iterator[:py:class:`curly.lexer.Token`]
+    :return: A stream with trimmed tokens.
+    :rtype: Iterator[:py:class:`curly.lexer.Token`]
+    """
+    pending = None
+    strip_next = None
+    first = True
 
     for token in tokens:
         if isinstance(token, lexer.LiteralToken):
-            stack = parse_literal_token(stack, token)
-        elif isinstance(token, lexer.PrintToken):
-            stack = parse_print_token(stack, token)
-        elif isinstance(token, lexer.StartBlockToken):
-            stack = parse_start_block_token(stack, token)
-        elif isinstance(token, lexer.EndBlockToken):
-            stack = parse_end_block_token(stack, token)
+            if pending is not None:
+                yield pending
+            pending = lstrip_literal(token, strip_next)
+            pending_at_start = first or starts_line(pending)
         else:
-            raise exceptions.CurlyParserUnknownTokenError(token)
+            if pending is not None:
+                pending = rstrip_before_tag(
+                    pending, token, trim_blocks, pending_at_start)
+                if pending is not None:
+                    yield pending
+                pending = None
+            yield token
+            strip_next = strip_after_tag(token, trim_blocks)
+        first = False
+
+    if pending is not None:
+        yield pending
+
+
+def starts_line(token):
+    """Check if literal token starts at the beginning of the line.
+
+    :param token: Literal token or ``None``.
+    :type token: :py:class:`curly.lexer.LiteralToken` or None
+    :rtype: bool
+    """
+    return token is not None and token.position is not None and \
+        token.position.column == 1
 
-    root = RootNode(stack)
-    validate_for_all_nodes_done(root)
 
-    return root
+def rstrip_before_tag(token, tag, trim_blocks, at_start):
+    """Strip the end of literal token as the next tag requires.
+
+    :param token: Literal token before the tag.
+    :param tag: Token of the tag.
+    :param bool trim_blocks: Remove whitespaces around block tags.
+    :param bool at_start: Literal starts at the beginning of the line.
+    :type token: :py:class:`curly.lexer.LiteralToken`
+    :type tag: :py:class:`curly.lexer.Token`
+    :return: Stripped token or ``None`` if it became empty.
+    :rtype: :py:class:`curly.lexer.LiteralToken` or None
+    """
+    if tag.trim_left:
+        return rstrip_literal(token, "all")
+    if trim_blocks and is_block_token(tag):
+        return rstrip_literal(token, "indent", at_start=at_start)
+
+    return token
+
+
+def strip_after_tag(tag, trim_blocks):
+    """Mode of :py:func:`lstrip_literal` for the literal after the tag.
+
+    :param tag: Token of the tag.
+    :param bool trim_blocks: Remove whitespaces around block tags.
+    :type tag: :py:class:`curly.lexer.Token`
+    :rtype: str or None
+    """
+    if tag.trim_right:
+        return "all"
+    if trim_blocks and is_block_token(tag):
+        return "newline"
+
+    return None
+
+
+def is_block_token(token):
+    """Check if token is a block tag (``{% ... %}``).
+
+    :param token: Token to check.
+    :type token: :py:class:`curly.lexer.Token`
+    :rtype: bool
+    """
+    return isinstance(token, (lexer.StartBlockToken, lexer.EndBlockToken))
+
+
+def lstrip_literal(token, mode):
+    """Remove whitespaces from the beginning of the literal token.
+
+    :param token: Token to strip.
+    :param mode: ``all`` to remove all whitespaces, ``newline`` to
+        remove only the first newline, ``None`` to keep everything.
+    :type token: :py:class:`curly.lexer.LiteralToken`
+    :type mode: str or None
+    :return: Stripped token or ``None`` if nothing is left.
+    :rtype: :py:class:`curly.lexer.LiteralToken` or None
+    """
+    text = token.data
+    if mode == "all":
+        text = text.lstrip()
+    elif mode == "newline":
+        if text.startswith("\r\n"):
+            text = text[2:]
+        elif text.startswith("\n"):
+            text = text[1:]
+
+    if len(text) == len(token.data):
+        return token
+    if not text:
+        return None
+
+    skipped = token.data[:len(token.data) - len(text)]
+    position = token.position
+    if position is not None:
+        position = lexer.shift_position(position, skipped)
+
+    return token.sliced(skipped, "", position)
+
+
+def rstrip_literal(token, mode, at_start=False):
+    """Remove whitespaces from the end of the literal token.
+
+    :param token: Token to strip.
+    :param str mode: ``all`` to remove all whitespaces, ``indent`` to
+        remove spaces and tabs after the last newline. If there is no
+        newline, indent is removed only if token is ``at_start`` of the
+        line.
+    :param bool at_start: Token starts the line.
+    :type token: :py:class:`curly.lexer.LiteralToken`
+    :return: Stripped token or ``None`` if nothing is left.
+    :rtype: :py:class:`curly.lexer.LiteralToken` or None
+    """
+    text = token.data
+    if mode == "all":
+        text = text.rstrip()
+    else:
+        stripped = text.rstrip(" \t")
+        if stripped.endswith("\n") or (at_start and not stripped):
+            text = stripped
+
+    if len(text) == len(token.data):
+        return token
+    if not text:
+        return None
+
+    return token.sliced("", token.data[len(text):], token.position)
 
 
 def parse_literal_token(stack, token):
@@ -698,7 +1341,8 @@ def parse_start_block_token(stack, token):
     """This function does parsing of :py:class:`curly.lexer.StartBlockToken`.
 
     Actually, since this token may have different behaviour, dependend
-    on *function* from that token.
+    on *function* from that token, parsing function is taken from
+    :py:data:`BLOCK_TAGS`. Builtin tags are:
 
     .. list-table::
       :header-rows: 1
@@ -724,25 +1368,19 @@ def parse_start_block_token(stack, token):
         :py:exc:`curly.exceptions.CurlyParserUnknownStartBlockError`: if
         token function is unknown.
     """
-    function = token.contents["function"]
-
-    if function == "if":
-        return parse_start_if_token(stack, token)
-    elif function == "elif":
-        return parse_start_elif_token(stack, token)
-    elif function == "else":
-        return parse_start_else_token(stack, token)
-    elif function == "loop":
-        return parse_start_loop_token(stack, token)
-    else:
+    tag = BLOCK_TAGS.get(token.contents["function"])
+    if tag is None:
         raise exceptions.CurlyParserUnknownStartBlockError(token)
 
+    return tag.start(stack, token)
+
 
 def parse_end_block_token(stack, token):
     """This function does parsing of :py:class:`curly.lexer.EndBlockToken`.
 
     Actually, since this token may have different behaviour, dependend
-    on *function* from that token.
+    on *function* from that token, parsing function is taken from
+    :py:data:`BLOCK_TAGS`. Builtin tags are:
 
     .. list-table::
       :header-rows: 1
@@ -764,15 +1402,99 @@ def parse_end_block_token(stack, token):
         :py:exc:`curly.exceptions.CurlyParserUnknownEndBlockError`: if
         function of end block is unknown.
     """
-    function = token.contents["function"]
-
-    if function == "if":
-        return parse_end_if_token(stack, token)
-    elif function == "loop":
-        return parse_end_loop_token(stack, token)
-    else:
+    tag = BLOCK_TAGS.get(token.contents["function"])
+    if tag is None or tag.end is None:
         raise exceptions.CurlyParserUnknownEndBlockError(token)
 
+    return tag.end(stack, token)
+
+
+def register_block_tag(name, node_class, *, kind="block", start=None,
+                       end=None):
+    """Register a block tag.
+
+    By default, start token puts a new node on the stack and end token
+    collects nodes after it as its subnodes (see
+    :py:func:`parse_start_node_token` and
+    :py:func:`parse_end_node_token`), so it is enough to define how
+    node is rendered. Tags of ``single`` kind have no end token, their
+    nodes are done (and have no subnodes) at once. Parsing functions
+    could be overridden for tags with more complex structure.
+
+    Registering the tag with existing name replaces it.
+
+    :param str name: *function* of the tag in templates.
+    :param node_class: Class of nodes for the tag, subclass of
+        :py:class:`BlockTagNode`.
+    :param str kind: Kind of the tag, see :py:data:`BlockTag`.
+    :param start: Parsing function for start token.
+    :param end: Parsing function for end token.
+    :type node_class: type
+    :type start: Callable or None
+    :type end: Callable or None
+    :return: Registered tag.
+    :rtype: :py:data:`BlockTag`
+    :raises ValueError: if kind is unknown or ``branch`` tag has no
+        parsing function for start token.
+    """
+    if kind not in ("block", "single", "branch"):
+        raise ValueError("Unknown kind of block tag {0!r}".format(kind))
+    if kind == "branch" and start is None:
+        raise ValueError(
+            "Branch tag {0} should have parsing function for start "
+            "token".format(name))
+
+    if start is None:
+        start = functools.partial(
+            parse_start_node_token, node_class=node_class,
+            done=kind == "single")
+    if end is None and kind == "block":
+        end = functools.partial(
+            parse_end_node_token, node_class=node_class)
+
+    tag = BLOCK_TAGS[name] = BlockTag(name, node_class, kind, start, end)
+
+    return tag
+
+
+def parse_start_node_token(stack, token, *, node_class, done=False):
+    """Default parsing of start token of the registered block tag.
+
+    It puts the new node on the stack.
+
+    :param stack: Stack of the parser.
+    :param token: Token to process.
+    :param node_class: Class of the node.
+    :param bool done: Node is done at once, it has no end token.
+    :type stack: list[:py:class:`Node`]
+    :type token: :py:class:`curly.lexer.StartBlockToken`
+    :type node_class: type
+    :return: Updated stack.
+    :rtype: list[:py:class:`Node`]
+    """
+    node = node_class(token)
+    node.done = done
+    stack.append(node)
+
+    return stack
+
+
+def parse_end_node_token(stack, token, *, node_class):
+    """Default parsing of end token of the registered block tag.
+
+    Stack rewinding is performed with :py:func:`rewind_stack_for`.
+
+    :param stack: Stack of the parser.
+    :param token: Token to process.
+    :param node_class: Class of the node.
+    :type stack: list[:py:class:`Node`]
+    :type token: :py:class:`curly.lexer.EndBlockToken`
+    :type node_class: type
+    :return: Updated stack.
+    :rtype: list[:py:class:`Node`]
+    """
+    return rewind_stack_for(stack, search_for=node_class)
+
 
 def parse_start_if_token(stack, token):
     """Parsing of token for ``{% if function expression %}``.
@@ -950,7 +1672,8 @@ def rewind_stack_for(stack, *, search_for):
 def validate_for_all_nodes_done(root):
     """Validates that all nodes in given AST trees are marked as done.
 
-    It simply does in-order traversing of the tree, verifying attribute.
+    It simply does pre-order traversing of the tree (see
+    :py:func:`walk_tree`), verifying attribute.
 
     :param root: Root of the tree.
     :type root: :py:class:`RootNode`
@@ -958,8 +1681,369 @@ def validate_for_all_nodes_done(root):
         :py:exc:`curly.exceptions.CurlyParserFoundNotDoneError`: if
         node which is not closed is found.
     """
-    for node in root:
+    for node in walk_tree(root):
         if not node.done:
             raise exceptions.CurlyParserFoundNotDoneError(node)
-        for subnode in root:
-            validate_for_all_nodes_done(subnode)
+
+
+def prepare_tree(root, *, undefined=policies.STRICT, autoescape=False,
+                 schema=None, loops=(), descend=None):
+    """Prepare parsed AST tree for rendering.
+
+    It merges adjacent :py:class:`LiteralNode` nodes into one (literal
+    text is trusted and never escaped, so it is safe to join it at
+    compile time), sets ``undefined`` policy for all nodes with
+    expressions (see :py:mod:`curly.undefined`), enables
+    autoescaping for :py:class:`PrintNode` nodes, binds variables to
+    the ``schema`` (see :py:func:`bind_schema`) and compiles simple
+    loop bodies into :py:class:`VectorizedBody`.
+
+    :param root: Root of the tree.
+    :param undefined: Policy for missing variables.
+    :param bool autoescape: Escape printed values for HTML.
+    :param schema: Schema of the context.
+    :param loops: Loops which enclose ``root``, see
+        :py:func:`bind_schema`.
+    :param descend: Subnodes of which nodes are prepared, see
+        :py:func:`walk_tree`.
+    :type root: :py:class:`Node`
+    :type undefined: str or :py:class:`curly.undefined.Undefined`
+    :type loops: list[:py:class:`LoopNode`]
+    :type descend: Callable or None
+    :raises ValueError: if policy or schema is unknown.
+    :raises:
+        :py:exc:`curly.exceptions.CurlySchemaError`: if variables do
+        not match the schema.
+    """
+    undefined = policies.get_policy(undefined)
+
+    for node in walk_tree(root, descend):
+        if descend is None or descend(node):
+            node.data = merge_literals(node.data)
+        set_node_options(node, undefined, autoescape)
+
+    if schema is not None:
+        bind_schema(root, schema, loops=loops, descend=descend)
+
+    # Bodies are compiled after all nodes are set up.
+    for node in walk_tree(root, descend):
+        if descend is None or descend(node):
+            compile_loop(node)
+
+
+def set_node_options(node, undefined, autoescape):
+    """Set undefined policy and autoescaping for the node.
+
+    :param node: Node to set up.
+    :param undefined: Policy for missing variables.
+    :param bool autoescape: Escape printed values for HTML.
+    :type node: :py:class:`Node`
+    :type undefined: :py:class:`curly.undefined.Undefined`
+    """
+    if undefined is not policies.STRICT and \
+            isinstance(node, ExpressionMixin):
+        node.undefined = undefined
+    if autoescape and isinstance(node, PrintNode):
+        node.autoescape = True
+
+
+def compile_loop(node):
+    """Compile body of the loop into :py:class:`VectorizedBody`.
+
+    :param node: Node to compile, nodes which are not loops are
+        skipped.
+    :type node: :py:class:`Node`
+    """
+    if isinstance(node, LoopNode):
+        node.vectorized = VectorizedBody.compile(node)
+
+
+def bind_schema(root, schema, *, loops=(), descend=None):
+    """Validate variables of the tree and set their accessors.
+
+    Every variable path is resolved with
+    :py:func:`curly.schema.resolve` in the schema of its scope: the
+    schema of the context or, within loops, the schema of the context
+    with ``item`` of the loop elements.
+
+    :param root: Root of the tree.
+    :param schema: Schema of the context, see :py:mod:`curly.schema`.
+    :param loops: Loops which enclose ``root`` (outermost first), if
+        it is a subtree of the template.
+    :param descend: Subnodes of which nodes are bound, see
+        :py:func:`walk_tree`.
+    :type root: :py:class:`Node`
+    :type loops: list[:py:class:`LoopNode`]
+    :type descend: Callable or None
+    :raises ValueError: if schema is not supported.
+    :raises:
+        :py:exc:`curly.exceptions.CurlySchemaError`: if variables do
+        not match the schema.
+    """
+    scope = schemas.make_schema(schema)
+    schemas.check_root(scope)
+    for loop in loops:
+        scope = schemas.loop_scope(scope, loop_item_schema(loop, scope))
+
+    unknown = []
+    stack = [(root, scope)]
+
+    while stack:
+        node, scope = stack.pop()
+        node_schema = bind_node(node, scope, unknown)
+
+        elsenode = getattr(node, "elsenode", None)
+        if elsenode is not None:
+            stack.append((elsenode, scope))
+        if descend is not None and not descend(node):
+            continue
+        if isinstance(node, LoopNode):
+            scope = schemas.loop_scope(scope, node_schema)
+        stack.extend((subnode, scope) for subnode in reversed(node.data))
+
+    if unknown:
+        raise exceptions.CurlySchemaError(unknown)
+
+
+def bind_node(node, scope, unknown):
+    """Validate variable of the node and set its accessor.
+
+    :param node: Node to bind.
+    :param scope: Schema of the node scope.
+    :param list unknown: Variables which are missing in the schema
+        with their positions, variable of the node is appended if it
+        is missing.
+    :type node: :py:class:`Node`
+    :return: Schema of the node value, :py:data:`curly.schema.ANY` if
+        node reads nothing or variable is missing.
+    """
+    varname = node_varname(node)
+    if varname is None:
+        return schemas.ANY
+
+    resolved = schemas.resolve(scope, varname)
+    if resolved is None:
+        unknown.append((varname, node.position))
+        return schemas.ANY
+
+    node.accessor, node_schema = resolved
+
+    return node_schema
+
+
+def loop_item_schema(loop, scope):
+    """Schema of the elements of the enclosing loop.
+
+    Loop is bound already, so it is not changed and missing variable
+    is not reported again.
+
+    :param loop: Loop node.
+    :param scope: Schema of the loop scope.
+    :type loop: :py:class:`LoopNode`
+    :return: Schema of the loop value, :py:data:`curly.schema.ANY` if
+        it is unknown.
+    """
+    varname = node_varname(loop)
+    resolved = None if varname is None else schemas.resolve(scope, varname)
+
+    return schemas.ANY if resolved is None else resolved[1]
+
+
+def node_varname(node):
+    """Variable which the node itself reads from the context.
+
+    :param node: Node to check.
+    :type node: :py:class:`Node`
+    :return: Variable path or ``None`` if node reads nothing: it has
+        no expression (like ``else`` or block tags without arguments)
+        or expression is a constant.
+    :rtype: str or None
+    """
+    if not isinstance(node, ExpressionMixin) or isinstance(node, ElseNode):
+        return None
+    if isinstance(node, BlockTagNode) and not node.raw_expression.strip():
+        return None
+
+    return node.pipeline.varname
+
+
+def merge_literals(nodes):
+    """Merge adjacent :py:class:`LiteralNode` nodes.
+
+    :param nodes: Nodes to merge.
+    :type nodes: list[:py:class:`Node`]
+    :return: Nodes where literals are merged.
+    :rtype: list[:py:class:`Node`]
+    """
+    merged = []
+
+    for node in nodes:
+        if merged and isinstance(node, LiteralNode) and \
+                isinstance(merged[-1], LiteralNode):
+            merged[-1] = LiteralNode(merged[-1].token.joined(node.token))
+        else:
+            merged.append(node)
+
+    return merged
+
+
+def render_leaf_text(node, context):
+    """Render the leaf node, default renderer for :py:func:`emit_steps`.
+
+    :param node: Leaf node.
+    :param dict context: Context of the node.
+    :type node: :py:class:`Node`
+    :return: Rendered text.
+    :rtype: str
+    """
+    return node.render_leaf(context)
+
+
+def emit_steps(steps, context=None, render_leaf=render_leaf_text,
+               render_text=None):
+    """Render steps of the node into chunks.
+
+    It is an iterative renderer of the tree: instead of recursion, it
+    keeps the stack of iterators from :py:meth:`Node.expand`. Nodes
+    which define their own :py:meth:`Node.emit` are rendered with it.
+
+    :param steps: Rendering steps: chunks of text, nodes to render with
+        the ``context`` and tuples of nodes and contexts to render them
+        with.
+    :param dict context: Context for nodes without their own context.
+    :param render_leaf: Function which renders the leaf node with its
+        context, like :py:func:`render_leaf_text` or the one from
+        :py:func:`make_bytes_renderer`.
+    :param render_text: Function which converts chunks of text, they
+        are emitted as is by default.
+    :type steps: Iterable[str or :py:class:`Node` or tuple]
+    :type render_leaf: Callable
+    :type render_text: Callable or None
+    :return: Generator with rendered chunks.
+    :rtype: Generator[str or bytes or memoryview]
+    """
+    stack = []
+    steps = iter(steps)
+
+    while True:
+        for step in steps:
+            step_class = step.__class__
+            if step_class is tuple:
+                node, node_context = step
+            elif isinstance(step, str):
+                yield step if render_text is None else render_text(step)
+                continue
+            else:
+                node, node_context = step, context
+
+            if node.leaf:
+                yield render_leaf(node, node_context)
+                continue
+            stack.append((steps, context))
+            context = node_context
+            if node.custom_emit:
+                steps = iter(node.emit(context))
+            else:
+                steps = node.expand(context)
+            break
+        else:
+            if not stack:
+                return
+            steps, context = stack.pop()
+
+
+def make_bytes_renderer(encoding):
+    """Make renderer of leaf nodes into bytes for :py:func:`emit_steps`.
+
+    :param str encoding: Normalized name of the encoding (as
+        :py:func:`codecs.lookup` returns).
+    :return: Function which renders the leaf node with its context
+        by :py:meth:`Node.render_leaf_bytes`.
+    :rtype: Callable
+    """
+    def render_leaf_bytes(node, context):
+        return node.render_leaf_bytes(context, encoding)
+
+    return render_leaf_bytes
+
+
+def walk_tree(root, descend=None):
+    """Iterate over all nodes of the AST tree in pre-order.
+
+    :param root: Root of the tree.
+    :param descend: Callable which tells if subnodes of the node
+        should be walked (``else`` branches of ``if`` are walked
+        anyway). All nodes are walked by default.
+    :type root: :py:class:`Node`
+    :type descend: Callable or None
+    :return: Iterator over nodes, including ``root``.
+    :rtype: Iterator[:py:class:`Node`]
+    """
+    stack = [root]
+
+    while stack:
+        node = stack.pop()
+        yield node
+
+        elsenode = getattr(node, "elsenode", None)
+        if elsenode is not None:
+            stack.append(elsenode)
+        if descend is None or descend(node):
+            stack.extend(reversed(node.data))
+
+
+def copy_tree(root, callback=None):
+    """Make a structural copy of the AST tree.
+
+    Every node is copied shallowly (tokens are shared), but lists of
+    subnodes and links between ``if``/``elif``/``else`` nodes point
+    to copies. It means that it is safe to patch nodes of the copy
+    (e.g. for instrumentation) without affecting original tree.
+
+    :param root: Root of the tree.
+    :param callback: Callable which is called for every copied node in
+        pre-order as ``callback(original, node_copy, parent_copy)``.
+        ``parent_copy`` is ``None`` for the root.
+    :type root: :py:class:`Node`
+    :type callback: Callable or None
+    :return: Copy of the tree.
+    :rtype: :py:class:`Node`
+    """
+    root_copy = copy.copy(root)
+    stack = [(root, root_copy, None)]
+
+    while stack:
+        original, node_copy, parent_copy = stack.pop()
+        if callback is not None:
+            callback(original, node_copy, parent_copy)
+
+        children = [(node, copy.copy(node)) for node in original.data]
+        node_copy.data = [child for _, child in children]
+
+        elsenode = getattr(original, "elsenode", None)
+        if elsenode is not None:
+            node_copy.elsenode = copy.copy(elsenode)
+            children.append((elsenode, node_copy.elsenode))
+
+        stack.extend(
+            (child, child_copy, node_copy)
+            for child, child_copy in reversed(children))
+
+    return root_copy
+
+
+TOKEN_PARSERS.update({
+    lexer.LiteralToken: parse_literal_token,
+    lexer.LiteralView: parse_literal_token,
+    lexer.PrintToken: parse_print_token,
+    lexer.StartBlockToken: parse_start_block_token,
+    lexer.EndBlockToken: parse_end_block_token})
+
+register_block_tag(
+    "if", IfNode, start=parse_start_if_token, end=parse_end_if_token)
+register_block_tag(
+    "elif", IfNode, kind="branch", start=parse_start_elif_token)
+register_block_tag(
+    "else", ElseNode, kind="branch", start=parse_start_else_token)
+register_block_tag(
+    "loop", LoopNode, start=parse_start_loop_token, end=parse_end_loop_token)
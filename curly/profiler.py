@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""Per-node profiler of template rendering.
+
+Regular profilers like :py:mod:`cProfile` show only generic frames
+(``emit``, ``resolve_variable`` etc.) and it is not possible to say
+which tag in the template is slow. This profiler attributes time to the
+nodes of the AST tree and therefore to the tags in the template source.
+
+.. code-block:: pycon
+
+  >>> from curly import Template
+  >>> template = Template("{% loop items %}{{ item }}{% /loop %}")
+  >>> profile = template.profile({"items": list(range(1000))})
+  >>> print(profile.format(limit=2))  # doctest: +SKIP
+     calls   incl, ms   excl, ms      bytes  location  node
+      1000      1.873      1.873       2890  1:17      PrintNode {{ item }}
+         1      3.702      1.470       2890  1:1       LoopNode {% loop...
+  >>> with open("profile.folded", "w") as folded_fp:
+  ...     folded_fp.write(profile.collapsed())
+
+:py:meth:`Profile.collapsed` produces collapsed stacks, the format which
+is understood by `FlameGraph <https://github.com/brendangregg/FlameGraph>`_
+and compatible tools.
+
+Profiling is performed on the instrumented copy of the AST tree, so
+there is no overhead on regular rendering of the same template.
+"""
+
+
+import time
+
+from curly import parser
+
+
+LABEL_SOURCE_LENGTH = 40
+"""Maximal length of the tag source in node labels."""
+
+
+class NodeStats:
+    """Profiling statistics of a single node of the AST tree.
+
+    Time is measured in seconds, ``emitted`` is the size of UTF-8 encoded
+    output in bytes. Inclusive values contain the values of subnodes,
+    exclusive do not.
+
+    :param node: Profiled node.
+    :param parent: Statistics of the parent node.
+    :type node: :py:class:`curly.parser.Node`
+    :type parent: :py:class:`NodeStats` or None
+    """
+
+    def __init__(self, node, parent=None):
+        self.node = node
+        self.parent = parent
+        self.children = []
+        self.calls = 0
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+        self.emitted = 0
+
+        if parent is not None:
+            parent.children.append(self)
+
+    def __repr__(self):
+        return ("<{0.__class__.__name__}(label={0.label!r}, "
+                "calls={0.calls}, inclusive={0.inclusive}, "
+                "exclusive={0.exclusive}, emitted={0.emitted})>").format(self)
+
+    @property
+    def position(self):
+        """Position of the node tag in the template source."""
+        return self.node.position
+
+    @property
+    def location(self):
+        """Human readable ``line:column`` of the node tag."""
+        if self.position is None:
+            return "-"
+        return "{0.line}:{0.column}".format(self.position)
+
+    @property
+    def source(self):
+        """Shortened source of the node tag. Empty for literals."""
+        if self.node.token is None or \
+                isinstance(self.node, parser.LiteralNode):
+            return ""
+
+        source = " ".join(str(self.node.token).split())
+        if len(source) > LABEL_SOURCE_LENGTH:
+            source = source[:LABEL_SOURCE_LENGTH - 3] + "..."
+
+        return source
+
+    @property
+    def label(self):
+        """Short description of the node: type, location and source."""
+        label = self.node.__class__.__name__
+        if self.position is not None:
+            label += "@" + self.location
+        if self.source:
+            label += " " + self.source
+
+        return label
+
+    @property
+    def exclusive_emitted(self):
+        """Size of output emitted by the node itself, in bytes."""
+        return self.emitted - sum(child.emitted for child in self.children)
+
+    @property
+    def stack(self):
+        """Labels of the node and all its parents, root is the first."""
+        stack = []
+        stats = self
+        while stats is not None:
+            stack.append(stats.label)
+            stats = stats.parent
+
+        return stack[::-1]
+
+
+class Profile:
+    """Results of profiling.
+
+    :param str output: Rendered template.
+    :param stats: Statistics of all nodes in pre-order of the AST tree.
+    :type stats: list[:py:class:`NodeStats`]
+    """
+
+    def __init__(self, output, stats):
+        self.output = output
+        self.stats = stats
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}(nodes={1})>".format(
+            self, len(self.stats))
+
+    @property
+    def root(self):
+        """Statistics of the root node."""
+        return self.stats[0]
+
+    def top(self, limit=None, key="exclusive"):
+        """Statistics of the nodes sorted by given key, descending.
+
+        :param int limit: The number of nodes to return. ``None`` means
+            all nodes.
+        :param str key: Attribute of :py:class:`NodeStats` to sort by.
+        :return: Sorted statistics.
+        :rtype: list[:py:class:`NodeStats`]
+        """
+        stats = sorted(self.stats, key=lambda item: getattr(item, key),
+                       reverse=True)
+
+        return stats[:limit]
+
+    def format(self, limit=None, key="exclusive"):
+        """Human readable table with statistics of the nodes.
+
+        :param int limit: The number of nodes to show.
+        :param str key: Attribute of :py:class:`NodeStats` to sort by.
+        :return: Formatted table.
+        :rtype: str
+        """
+        lines = ["{0:>8} {1:>10} {2:>10} {3:>10}  {4:<8}  {5}".format(
+            "calls", "incl, ms", "excl, ms", "bytes", "location", "node")]
+
+        for stats in self.top(limit, key):
+            lines.append(
+                "{0:>8} {1:>10.3f} {2:>10.3f} {3:>10}  {4:<8}  {5}".format(
+                    stats.calls, stats.inclusive * 1000,
+                    stats.exclusive * 1000, stats.emitted, stats.location,
+                    " ".join(filter(None, (
+                        stats.node.__class__.__name__, stats.source)))))
+
+        return "\n".join(lines)
+
+    def collapsed(self):
+        """Collapsed stacks for flamegraph tools.
+
+        Each line is a semicolon-separated stack of node labels, and
+        exclusive time of the node in microseconds.
+
+        :return: Collapsed stacks, one per line.
+        :rtype: str
+        """
+        lines = []
+
+        for stats in self.stats:
+            weight = int(round(stats.exclusive * 1e6))
+            if weight > 0:
+                stack = ";".join(
+                    label.replace(";", ",") for label in stats.stack)
+                lines.append("{0} {1}".format(stack, weight))
+
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+def profile(compiled, context, *, timer=time.perf_counter):
+    """Render template collecting per-node statistics.
+
+    :param compiled: Template to profile.
+    :param dict context: Context to render template with.
+    :param Callable timer: Function which returns current time in
+        seconds.
+    :type compiled: :py:class:`curly.template.Template`
+    :return: Profiling results.
+    :rtype: :py:class:`Profile`
+    :raises ValueError: if it is not possible to render template.
+    """
+    stats = []
+    accumulators = []
+
+    def instrument(_, node, parent):
+        parent_stats = getattr(parent, "_profiler_stats", None)
+        node_stats = NodeStats(node, parent_stats)
+        node._profiler_stats = node_stats
+        if node.custom_emit:
+            node.emit = make_expand(
+                node.emit, node_stats, accumulators, timer)
+        else:
+            node.expand = make_expand(
+                node.expand, node_stats, accumulators, timer)
+            node.leaf = False
+        if isinstance(node, parser.LoopNode):
+            # Subnodes of vectorized loops are not emitted separately.
+            node.vectorized = None
+        stats.append(node_stats)
+
+    root = parser.copy_tree(compiled.node, instrument)
+    output = "".join(parser.emit_steps([root], context))
+
+    # Children are always after their parents in pre-order.
+    for node_stats in reversed(stats):
+        node_stats.inclusive = node_stats.exclusive + sum(
+            child.inclusive for child in node_stats.children)
+        if not node_stats.node.custom_emit:
+            # Custom emit yields the output of subnodes by itself.
+            node_stats.emitted += sum(
+                child.emitted for child in node_stats.children)
+
+    return Profile(output, stats)
+
+
+def make_expand(expand, stats, accumulators, timer):
+    """Wrap :py:meth:`curly.parser.Node.expand` to collect statistics.
+
+    Expand is a generator, so time is measured for each resumption
+    separately. Subnodes are rendered by :py:func:`curly.parser.emit_steps`
+    after resumption of their parent, so only emitted chunks of the node
+    itself are counted here: inclusive values are summed up after
+    rendering. Nodes with custom :py:meth:`curly.parser.Node.emit`
+    render subnodes within their resumption, ``accumulators`` stack is
+    used to subtract their time from the exclusive time of the parent.
+    """
+
+    def instrumented_expand(context):
+        stats.calls += 1
+        generator = expand(context)
+
+        while True:
+            accumulators.append(0.0)
+            started_at = timer()
+            try:
+                chunk = next(generator)
+            except StopIteration:
+                return
+            finally:
+                elapsed = timer() - started_at
+                stats.exclusive += elapsed - accumulators.pop()
+                if accumulators:
+                    accumulators[-1] += elapsed
+
+            if isinstance(chunk, str):
+                stats.emitted += len(chunk.encode("utf-8"))
+            yield chunk
+
+    return instrumented_expand
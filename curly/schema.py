@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+"""Typed schemas of the template context.
+
+By default, every variable lookup guesses whether each segment of the
+path is a key, an index or an attribute (see
+:py:func:`curly.utils.find_variable`). If the shape of the context is
+known in advance, template can be compiled with a *schema*:
+
+.. code-block:: pycon
+
+  >>> from curly import Template
+  >>> schema = {"user": {"name": str, "roles": [str]}}
+  >>> template = Template("{{ user.name }}: {{ user.roles.0 }}",
+  ...                     schema=schema)
+  >>> template.render({"user": {"name": "Sergey", "roles": ["admin"]}})
+  'Sergey: admin'
+  >>> Template("{{ user.email }}", schema=schema)
+  Traceback (most recent call last):
+  ...
+  curly.exceptions.CurlySchemaError: Unknown variables: user.email at 1:1
+
+All variable paths of the template are validated against the schema at
+compile time and each variable gets an :py:class:`Accessor`, a
+generated function which accesses the value directly (like
+``context["user"]["roles"][0]``). Inside loops, ``item`` gets the schema
+of the loop elements.
+
+Schema may be defined as:
+
+* plain dict: keys are keys of the context, values are schemas;
+* list with one element: sequence of the elements with given schema;
+* :py:class:`typing.TypedDict` subclass;
+* dataclass or :py:func:`collections.namedtuple` (fields are
+  attributes);
+* :py:mod:`typing` generics: ``List[X]``, ``Sequence[X]``,
+  ``Dict[str, X]``, ``Mapping[str, X]``, ``Optional[X]``;
+* :py:data:`typing.Any` or :py:class:`object` for values which are not
+  checked (paths within them are resolved as without schema);
+* any other type is a scalar without nested paths.
+
+If context does not match the schema on rendering (a key is missing or
+a value has unexpected type), lookup falls back to
+:py:func:`curly.utils.find_variable`, so results are the same as
+without schema.
+"""
+
+
+import collections.abc
+import keyword
+import typing
+
+from curly import utils
+
+
+LOOKUP_ERRORS = (LookupError, AttributeError, TypeError)
+"""Exceptions which mean that context does not match the schema."""
+
+
+class Schema:
+    """Base class for schemas."""
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}>".format(self)
+
+    def child(self, segment):
+        """Schema of the nested value.
+
+        :param str segment: Segment of the variable path.
+        :return: Access step (``("item", key)`` or ``("attr", name)``)
+            and schema of the nested value or ``None`` if segment is
+            unknown.
+        :rtype: tuple or None
+        """
+        return None
+
+    def has_field(self, name):
+        """Check if schema declares the field explicitly.
+
+        :param str name: Name of the field.
+        :rtype: bool
+        """
+        return name in getattr(self, "fields", ())
+
+    def item_schema(self):
+        """Schema of the loop elements over the value.
+
+        :rtype: :py:class:`Schema`
+        """
+        return ANY
+
+
+class AnySchema(Schema):
+    """Schema of the value which is not checked."""
+
+
+class ScalarSchema(Schema):
+    """Schema of the value without nested paths.
+
+    :param type value_type: Type of the value.
+    """
+
+    def __init__(self, value_type):
+        self.value_type = value_type
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}({1})>".format(
+            self, getattr(self.value_type, "__name__", self.value_type))
+
+
+class MappingSchema(Schema):
+    """Schema of the mapping.
+
+    :param fields: Schemas of known keys.
+    :param values: Schema of values for any other key. ``None`` means
+        that other keys are unknown.
+    :type fields: dict[str, :py:class:`Schema`]
+    :type values: :py:class:`Schema` or None
+    """
+
+    def __init__(self, fields, values=None):
+        self.fields = dict(fields)
+        self.values = values
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}(fields={1})>".format(
+            self, sorted(self.fields))
+
+    def child(self, segment):
+        if segment in self.fields:
+            return ("item", segment), self.fields[segment]
+        if segment.isdigit() and int(segment) in self.fields:
+            return ("item", int(segment)), self.fields[int(segment)]
+        if self.values is not None:
+            return ("item", segment), self.values
+
+        return None
+
+    def item_schema(self):
+        return MappingSchema({
+            "key": ANY,
+            "value": ANY if self.values is None else self.values})
+
+    def extend(self, name, schema):
+        """Copy of the schema with additional key.
+
+        :param str name: Name of the key.
+        :param schema: Schema of the key.
+        :type schema: :py:class:`Schema`
+        :rtype: :py:class:`MappingSchema`
+        """
+        fields = dict(self.fields)
+        fields[name] = schema
+
+        return MappingSchema(fields, self.values)
+
+
+class ObjectSchema(Schema):
+    """Schema of the object with attributes.
+
+    :param type value_type: Type of the object. Its class attributes
+        (methods and properties) are known attributes too.
+    :param fields: Schemas of known attributes.
+    :type fields: dict[str, :py:class:`Schema`]
+    """
+
+    def __init__(self, value_type, fields):
+        self.value_type = value_type
+        self.fields = dict(fields)
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}({1})>".format(
+            self, self.value_type.__name__)
+
+    def child(self, segment):
+        if segment in self.fields:
+            return ("attr", segment), self.fields[segment]
+        if hasattr(self.value_type, segment):
+            return ("attr", segment), ANY
+
+        return None
+
+
+class SequenceSchema(Schema):
+    """Schema of the sequence.
+
+    :param item: Schema of the elements.
+    :type item: :py:class:`Schema`
+    """
+
+    def __init__(self, item):
+        self.item = item
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}(item={0.item!r})>".format(self)
+
+    def child(self, segment):
+        if segment.isdigit():
+            return ("item", int(segment)), self.item
+
+        return None
+
+    def item_schema(self):
+        return self.item
+
+
+ANY = AnySchema()
+"""Schema of the value which is not checked."""
+
+
+class Accessor:
+    """Generated function which gets the value of the variable.
+
+    :param steps: Access steps, ``("item", key)`` or ``("attr", name)``.
+    :param rest: Rest of the variable path which is resolved with
+        :py:func:`curly.utils.find_variable`, or ``None``.
+    :type steps: list[tuple[str, str or int]]
+    :type rest: str or None
+    """
+
+    __slots__ = "steps", "rest", "get"
+
+    def __init__(self, steps, rest=None):
+        self.steps = tuple(steps)
+        self.rest = rest
+        self.get = self.generate()
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}({0.source})>".format(self)
+
+    def __reduce__(self):
+        return self.__class__, (self.steps, self.rest)
+
+    @property
+    def source(self):
+        """Python expression which gets the value."""
+        expression = "context"
+
+        for kind, key in self.steps:
+            if kind == "item":
+                expression = "{0}[{1!r}]".format(expression, key)
+            elif key.isidentifier() and not keyword.iskeyword(key):
+                expression = "{0}.{1}".format(expression, key)
+            else:
+                expression = "getattr({0}, {1!r})".format(expression, key)
+
+        if self.rest is not None:
+            expression = "find_variable({0!r}, {1})".format(
+                self.rest, expression)
+
+        return expression
+
+    def generate(self):
+        """Compile :py:attr:`Accessor.source` into function.
+
+        :return: Function which takes context and returns the value.
+            It raises one of :py:data:`LOOKUP_ERRORS` if context does
+            not match the schema.
+        :rtype: Callable
+        """
+        code = compile(
+            "lambda context: " + self.source, "<curly accessor>", "eval")
+
+        return eval(code, {"find_variable": utils.find_variable})
+
+
+def make_schema(spec):
+    """Convert schema definition into :py:class:`Schema`.
+
+    :param spec: Schema definition, see module documentation.
+    :return: Schema.
+    :rtype: :py:class:`Schema`
+    :raises ValueError: if schema definition is not supported.
+    """
+    if isinstance(spec, Schema):
+        return spec
+    if spec is typing.Any or spec is object:
+        return ANY
+    if isinstance(spec, dict):
+        return MappingSchema(
+            {key: make_schema(value) for key, value in spec.items()})
+    if isinstance(spec, list):
+        if len(spec) != 1:
+            raise ValueError(
+                "List schema should have one element, got {0!r}".format(
+                    spec))
+        return SequenceSchema(make_schema(spec[0]))
+
+    origin = getattr(spec, "__origin__", None)
+    if origin is not None:
+        return make_generic_schema(spec, origin)
+    if isinstance(spec, type):
+        return make_class_schema(spec)
+
+    raise ValueError("Unsupported schema {0!r}".format(spec))
+
+
+def make_class_schema(spec):
+    """Convert class into :py:class:`Schema`.
+
+    Typed dicts, dataclasses and named tuples give schemas of their
+    fields, other classes are scalars.
+    """
+    if issubclass(spec, dict) and hasattr(spec, "__annotations__"):
+        return MappingSchema({
+            key: make_schema(value)
+            for key, value in typing.get_type_hints(spec).items()})
+
+    fields = getattr(spec, "__dataclass_fields__", None)
+    if fields is None and issubclass(spec, tuple):
+        fields = getattr(spec, "_fields", None)
+    if fields is None:
+        return ScalarSchema(spec)
+
+    hints = typing.get_type_hints(spec)
+
+    return ObjectSchema(spec, {
+        name: make_schema(hints.get(name, typing.Any)) for name in fields})
+
+
+def make_generic_schema(spec, origin):
+    """Convert :py:mod:`typing` generic into :py:class:`Schema`."""
+    args = getattr(spec, "__args__", None) or ()
+
+    if origin is typing.Union:
+        return make_union_schema(args)
+
+    if not isinstance(origin, type):
+        return ANY
+    if issubclass(origin, (str, bytes)):
+        return ScalarSchema(origin)
+    if issubclass(origin, collections.abc.Mapping):
+        return MappingSchema({}, make_schema(args[1]) if args else ANY)
+    if issubclass(origin, tuple):
+        return make_tuple_schema(args)
+    if issubclass(origin, collections.abc.Sequence):
+        return SequenceSchema(make_schema(args[0]) if args else ANY)
+
+    return ANY
+
+
+def make_union_schema(args):
+    """Convert :py:data:`typing.Union` into :py:class:`Schema`.
+
+    Only ``Optional[X]`` is checked (as ``X``), other unions are
+    :py:data:`ANY`.
+    """
+    args = [arg for arg in args if arg is not type(None)]  # NOQA
+    if len(args) == 1:
+        return make_schema(args[0])
+
+    return ANY
+
+
+def make_tuple_schema(args):
+    """Convert :py:class:`typing.Tuple` into :py:class:`Schema`.
+
+    Only homogeneous tuples (``Tuple[X, ...]``) are sequences, other
+    tuples are :py:data:`ANY`.
+    """
+    if len(args) == 2 and args[1] is Ellipsis:
+        return SequenceSchema(make_schema(args[0]))
+
+    return ANY
+
+
+def resolve(schema, varname):
+    """Find schema of the variable and make accessor for it.
+
+    Resolution follows :py:func:`curly.utils.find_variable`: on each
+    level, the whole rest of the path is tried first (only if schema
+    declares such key explicitly), then its first segment.
+
+    :param schema: Schema of the context.
+    :param str varname: Variable path.
+    :type schema: :py:class:`Schema`
+    :return: Accessor and schema of the variable or ``None`` if path
+        is unknown.
+    :rtype: tuple[:py:class:`Accessor`, :py:class:`Schema`] or None
+    """
+    steps = []
+
+    while True:
+        if isinstance(schema, AnySchema):
+            return Accessor(steps, varname), schema
+
+        if "." in varname and not schema.has_field(varname):
+            segment, _, varname = varname.partition(".")
+        else:
+            segment, varname = varname, None
+
+        found = schema.child(segment)
+        if found is None:
+            return None
+        step, schema = found
+        steps.append(step)
+
+        if varname is None:
+            return Accessor(steps), schema
+
+
+def check_root(schema):
+    """Check that schema could be a schema of the whole context.
+
+    :raises ValueError: if it could not.
+    """
+    if not isinstance(schema, (MappingSchema, AnySchema)):
+        raise ValueError(
+            "Context schema should be a mapping, got {0!r}".format(schema))
+
+
+def loop_scope(scope, loop_schema):
+    """Schema of the context within the loop body.
+
+    :param scope: Schema of the context of the loop.
+    :param loop_schema: Schema of the loop expression.
+    :type scope: :py:class:`Schema`
+    :type loop_schema: :py:class:`Schema`
+    :rtype: :py:class:`Schema`
+    """
+    if isinstance(scope, MappingSchema):
+        return scope.extend("item", loop_schema.item_schema())
+
+    return scope
@@ -0,0 +1,729 @@
+# -*- coding: utf-8 -*-
+"""Compact binary format of compiled templates.
+
+Parsed template could be stored (on-disk caches), sent to the worker
+processes or shipped with the application without reparsing. Pickle
+of the tree drags the internals of :py:class:`collections.UserList`,
+tokens and compiled pipelines, so this module defines its own format:
+
+.. code-block:: pycon
+
+  >>> from curly import Template
+  >>> data = Template("Hello, {{ name }}!").dumps()
+  >>> Template.loads(data).render({"name": "world"})
+  'Hello, world!'
+
+Dump consists of:
+
+* header: :py:data:`MAGIC`, :py:data:`FORMAT_VERSION`, typecode of the
+  integers (see :py:mod:`array`), sizes of the sections and the
+  digest of the source;
+* string table: lengths of the strings and UTF-8 blob with all of
+  them. Literals, expressions, names of functions and filters are
+  stored once and referenced by index;
+* node records: flat array of integers, nodes go in pre-order (as
+  :py:func:`curly.parser.walk_tree` yields them). Record has the kind
+  of the node, flags, the token (indexes of strings and position), the
+  compiled pipeline and the number of subnodes. Offsets and lines of
+  positions are stored as differences with the previous node, so
+  integers usually fit 2 bytes.
+
+Both sections are read with a single :py:meth:`array.array.frombytes`
+and decoding call, tree is built without recursion and without
+lexing: tokens and pipelines are restored from the records as is.
+
+Options of the template (undefined policy, autoescaping, trimming) are
+stored too, but the schema is not: it is an arbitrary Python object.
+Pass it to :py:meth:`curly.template.Template.loads` to bind accessors
+again. Nodes of custom block tags are stored by the name of the tag
+(see :py:func:`curly.parser.register_block_tag`), the tag has to be
+registered in the loading process too.
+
+Format is versioned: dumps of other versions are rejected with
+:py:exc:`curly.exceptions.CurlySerializationError`, so cached entries
+are simply compiled again after upgrade.
+"""
+
+
+import array
+import collections
+import gc
+import struct
+import sys
+
+from curly import exceptions
+from curly import filters
+from curly import lexer
+from curly import parser
+from curly import undefined as policies
+
+
+MAGIC = b"CRLY"
+"""First bytes of every dump."""
+
+FORMAT_VERSION = 1
+"""Version of the format. Dumps of other versions are rejected."""
+
+HEADER = struct.Struct("<4sBcBIII")
+"""Header: magic, version, typecode of integers, length of the source
+digest, the number of strings, the size of UTF-8 blob of strings and
+the number of integers in node records."""
+
+TYPECODES = "BHIQ"
+"""Typecodes of unsigned integers, the smallest which fits all
+integers of the dump is used."""
+
+KIND_ROOT, KIND_LITERAL, KIND_PRINT, KIND_IF, KIND_ELSE, KIND_LOOP, \
+    KIND_TAG = range(7)
+
+FLAG_POSITION = 1
+FLAG_TRIM_LEFT = 2
+FLAG_TRIM_RIGHT = 4
+FLAG_ELSE = 8
+FLAG_ESCAPED = 16
+FLAG_PIPELINE = 32
+
+VALUE_NONE, VALUE_FALSE, VALUE_TRUE, VALUE_INT, VALUE_FLOAT, \
+    VALUE_STR = range(6)
+
+NODE_KINDS = {
+    parser.RootNode: KIND_ROOT,
+    parser.LiteralNode: KIND_LITERAL,
+    parser.PrintNode: KIND_PRINT,
+    parser.IfNode: KIND_IF,
+    parser.ElseNode: KIND_ELSE,
+    parser.LoopNode: KIND_LOOP}
+"""Kinds of builtin nodes."""
+
+NODE_CLASSES = {kind: node_class for node_class, kind in NODE_KINDS.items()}
+"""Classes of builtin nodes by kinds."""
+
+Loaded = collections.namedtuple(
+    "Loaded",
+    ["node", "undefined", "autoescape", "trim_blocks", "source_hash",
+     "variables"])
+"""Result of :py:func:`loads`: root of the tree, template options and
+variables of the template (see :py:func:`curly.analysis.variables`)."""
+
+
+def dumps(root, *, undefined=policies.STRICT, autoescape=False,
+          trim_blocks=False, source_hash=b"", variables=()):
+    """Serialize the prepared tree and template options.
+
+    :param root: Root of the tree, prepared by
+        :py:func:`curly.parser.prepare_tree`.
+    :param undefined: Policy for missing variables.
+    :param bool autoescape: Escape printed values for HTML.
+    :param bool trim_blocks: Remove whitespaces around block tags.
+    :param bytes source_hash: Digest of the template source.
+    :param variables: Variables of the template, they are stored to
+        skip analysis of the tree on loading.
+    :type root: :py:class:`curly.parser.RootNode`
+    :type undefined: :py:class:`curly.undefined.Undefined`
+    :type variables: tuple[str]
+    :return: Dump.
+    :rtype: bytes
+    :raises:
+        :py:exc:`curly.exceptions.CurlySerializationError`: if tree
+        has nodes or values which cannot be serialized.
+    """
+    encoder = Encoder()
+    encoder.encode_options(undefined, autoescape, trim_blocks, variables)
+    for node in parser.walk_tree(root):
+        encoder.encode_node(node)
+
+    return encoder.finish(source_hash)
+
+
+def loads(data, *, schema=None):
+    """Deserialize tree and template options.
+
+    :param data: Dump from :py:func:`dumps`.
+    :param schema: Schema of the context to bind variables to, see
+        :py:func:`curly.parser.bind_schema`.
+    :type data: bytes or bytearray or memoryview
+    :return: Restored tree and options.
+    :rtype: :py:data:`Loaded`
+    :raises:
+        :py:exc:`curly.exceptions.CurlySerializationError`: if dump
+        is broken, of other version or refers to unknown tags or
+        filters.
+
+        :py:exc:`curly.exceptions.CurlySchemaError`: if variables do
+        not match the schema.
+    """
+    # Tree has no reference cycles, there is nothing for the garbage
+    # collector to find. But allocation of the tree triggers a lot of
+    # its runs and each one traverses the growing tree.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        decoder = Decoder(data)
+        options = decoder.decode_options()
+        root = decoder.decode_tree()
+    except (IndexError, KeyError, TypeError, struct.error,
+            UnicodeDecodeError) as exc:
+        raise exceptions.CurlySerializationError(
+            "broken dump ({0!r})".format(exc)) from exc
+    finally:
+        if gc_enabled:
+            gc.enable()
+    if decoder.offset != len(decoder.ints):
+        raise exceptions.CurlySerializationError(
+            "broken dump (trailing node records)")
+
+    if schema is not None:
+        parser.bind_schema(root, schema)
+
+    return Loaded(root, *options[:3], source_hash=decoder.source_hash,
+                  variables=options[3])
+
+
+def is_dump(data):
+    """Check if data looks like a dump (starts with :py:data:`MAGIC`).
+
+    :param bytes data: Data to check, first bytes are enough.
+    :rtype: bool
+    """
+    return bytes(data[:len(MAGIC)]) == MAGIC
+
+
+class Encoder:
+    """Builder of the dump: string table and node records."""
+
+    def __init__(self):
+        self.strings = {}
+        self.ints = []
+        self.offset = self.line = 0
+
+    def string(self, text):
+        """Index of the text in the string table."""
+        index = self.strings.get(text)
+        if index is None:
+            index = self.strings[text] = len(self.strings)
+
+        return index
+
+    def encode_options(self, undefined, autoescape, trim_blocks,
+                       variables):
+        """Encode template options and variables of the template."""
+        name = undefined.name
+        expected = policies.POLICIES.get(name)
+        if name == policies.DefaultUndefined.name:
+            expected = policies.DefaultUndefined
+        if expected is None or undefined.__class__ is not expected:
+            raise exceptions.CurlySerializationError(
+                "custom undefined policy {0!r}".format(undefined))
+
+        self.ints.extend((self.string(name), int(autoescape),
+                          int(trim_blocks)))
+        if name == policies.DefaultUndefined.name:
+            self.encode_value(undefined.value)
+        self.ints.append(len(variables))
+        self.ints.extend(self.string(varname) for varname in variables)
+
+    def encode_node(self, node):
+        """Encode record of the single node (without subnodes)."""
+        kind = node_kind(node)
+        calls = None
+        if kind not in (KIND_ROOT, KIND_LITERAL, KIND_TAG):
+            calls = self.pipeline_calls(node.pipeline)
+        flags = node_flags(node, kind, calls)
+
+        self.ints.extend((kind, flags))
+        if node.token is not None:
+            self.encode_token(node.token, kind, flags)
+        if calls is not None:
+            self.encode_pipeline(node.pipeline, calls)
+        self.ints.append(len(node.data))
+
+    def encode_token(self, token, kind, flags):
+        """Encode raw text, position and contents of the token."""
+        ints = self.ints
+        ints.append(self.string(token.data))
+        if flags & FLAG_POSITION:
+            self.encode_position(token.position)
+
+        if kind == KIND_LITERAL:
+            if flags & FLAG_ESCAPED:
+                ints.append(self.string(token.contents["text"]))
+            return
+
+        if kind != KIND_PRINT:
+            ints.append(self.string(token.contents["function"]))
+        expression = token.contents["expression"]
+        ints.append(len(expression))
+        ints.extend(self.string(word) for word in expression)
+
+    def encode_position(self, position):
+        """Encode position as a delta from the previous one."""
+        offset, line, column = position
+        self.ints.extend((zigzag(offset - self.offset),
+                          zigzag(line - self.line), column))
+        self.offset, self.line = offset, line
+
+    def encode_pipeline(self, pipeline, calls):
+        """Encode compiled pipeline with its filters by names."""
+        ints = self.ints
+        ints.append(0 if pipeline.varname is None
+                    else self.string(pipeline.varname) + 1)
+        self.encode_value(pipeline.value)
+        ints.append(len(calls))
+        for name, args in calls:
+            ints.extend((self.string(name), len(args)))
+            for value in args:
+                self.encode_value(value)
+
+    def pipeline_calls(self, pipeline):
+        """Filters of the pipeline by names.
+
+        :return: Calls or ``None`` if pipeline cannot be stored (e.g.
+            folded constant is a list). Such pipelines are compiled
+            again on loading.
+        :rtype: list[tuple[str, tuple]] or None
+        """
+        values = [pipeline.value]
+        calls = []
+        for item, args in pipeline.calls:
+            if filters.FILTERS.get(item.name) is not item:
+                return None
+            calls.append((item.name, args))
+            values.extend(args)
+
+        if not all(value is None or value.__class__ in (bool, int, float, str)
+                   for value in values):
+            return None
+
+        return calls
+
+    def encode_value(self, value):
+        """Encode constant value."""
+        if value is None:
+            self.ints.append(VALUE_NONE)
+        elif value is True or value is False:
+            self.ints.append(VALUE_TRUE if value else VALUE_FALSE)
+        elif value.__class__ is int:
+            self.ints.extend((VALUE_INT, self.string(str(value))))
+        elif value.__class__ is float:
+            self.ints.extend((VALUE_FLOAT, self.string(repr(value))))
+        elif value.__class__ is str:
+            self.ints.extend((VALUE_STR, self.string(value)))
+        else:
+            raise exceptions.CurlySerializationError(
+                "value {0!r} of type {1} cannot be serialized".format(
+                    value, value.__class__.__name__))
+
+    def finish(self, source_hash):
+        """Build the dump.
+
+        :param bytes source_hash: Digest of the template source.
+        :rtype: bytes
+        """
+        strings = list(self.strings)
+        lengths = [len(text) for text in strings]
+        blob = "".join(strings).encode("utf-8", "surrogatepass")
+
+        largest = max(max(self.ints, default=0), max(lengths, default=0))
+        for typecode in TYPECODES:
+            if largest < 1 << (8 * array.array(typecode).itemsize):
+                break
+        lengths = array.array(typecode, lengths)
+        ints = array.array(typecode, self.ints)
+        if sys.byteorder != "little":
+            lengths.byteswap()
+            ints.byteswap()
+
+        header = HEADER.pack(
+            MAGIC, FORMAT_VERSION, typecode.encode("ascii"),
+            len(source_hash), len(strings), len(blob), len(ints))
+
+        return b"".join((header, source_hash, lengths.tobytes(), blob,
+                         ints.tobytes()))
+
+
+class Decoder:
+    """Reader of the dump made by :py:class:`Encoder`.
+
+    :param data: Dump.
+    :type data: bytes or bytearray or memoryview
+    :raises:
+        :py:exc:`curly.exceptions.CurlySerializationError`: if header
+        is broken or version is not supported.
+    """
+
+    def __init__(self, data):
+        data = memoryview(data).cast("B")
+        if len(data) < HEADER.size or not is_dump(data):
+            raise exceptions.CurlySerializationError("not a template dump")
+
+        magic, version, typecode, hash_size, strings_count, blob_size, \
+            ints_count = HEADER.unpack_from(data)
+        if version != FORMAT_VERSION:
+            raise exceptions.CurlySerializationError(
+                "unsupported format version {0}, expected {1}".format(
+                    version, FORMAT_VERSION))
+        typecode = typecode.decode("ascii", "replace")
+        if typecode not in TYPECODES:
+            raise exceptions.CurlySerializationError(
+                "unknown typecode {0!r}".format(typecode))
+
+        itemsize = array.array(typecode).itemsize
+        offset = HEADER.size
+        sections = []
+        for size in (hash_size, strings_count * itemsize, blob_size,
+                     ints_count * itemsize):
+            sections.append(data[offset:offset + size])
+            offset += size
+        if offset != len(data):
+            raise exceptions.CurlySerializationError(
+                "dump has {0} bytes, expected {1}".format(len(data), offset))
+        source_hash, lengths_data, blob, ints_data = sections
+
+        lengths = array.array(typecode)
+        lengths.frombytes(lengths_data)
+        ints = array.array(typecode)
+        ints.frombytes(ints_data)
+        if sys.byteorder != "little":
+            lengths.byteswap()
+            ints.byteswap()
+
+        text = str(blob, "utf-8", "surrogatepass")
+        strings = []
+        start = 0
+        for length in lengths:
+            strings.append(text[start:start + length])
+            start += length
+        if start != len(text):
+            raise exceptions.CurlySerializationError(
+                "string table does not match its lengths")
+
+        self.source_hash = bytes(source_hash)
+        self.strings = strings
+        self.ints = ints.tolist()
+        self.offset = 0
+        self.position_offset = self.position_line = 0
+
+    def take(self, count):
+        """Take the next ``count`` integers."""
+        start = self.offset
+        self.offset += count
+        if self.offset > len(self.ints):
+            raise IndexError("node records are truncated")
+
+        return self.ints[start:self.offset]
+
+    def decode_options(self):
+        """Decode template options and variables of the template.
+
+        :return: Undefined policy, autoescape, trim_blocks and
+            variables.
+        :rtype: tuple
+        """
+        name, autoescape, trim_blocks = self.take(3)
+        name = self.strings[name]
+        if name == policies.DefaultUndefined.name:
+            undefined = policies.default(self.decode_value())
+        else:
+            try:
+                undefined = policies.get_policy(name)
+            except ValueError as exc:
+                raise exceptions.CurlySerializationError(str(exc)) from exc
+
+        strings = self.strings
+        variables = tuple(
+            strings[index] for index in self.take(self.take(1)[0]))
+
+        self.undefined = undefined
+        self.autoescape = bool(autoescape)
+
+        return undefined, self.autoescape, bool(trim_blocks), variables
+
+    def decode_value(self):
+        """Decode constant value."""
+        value_kind = self.ints[self.offset]
+        self.offset += 1
+        if value_kind == VALUE_NONE:
+            return None
+        if value_kind == VALUE_FALSE:
+            return False
+        if value_kind == VALUE_TRUE:
+            return True
+
+        text = self.strings[self.ints[self.offset]]
+        self.offset += 1
+        if value_kind == VALUE_STR:
+            return text
+        if value_kind not in (VALUE_INT, VALUE_FLOAT):
+            raise exceptions.CurlySerializationError(
+                "unknown kind of value {0}".format(value_kind))
+
+        try:
+            return int(text) if value_kind == VALUE_INT else float(text)
+        except ValueError as exc:
+            raise exceptions.CurlySerializationError(
+                "broken number {0!r}".format(text)) from exc
+
+    def decode_tree(self):
+        """Decode node records into the tree.
+
+        Nodes are set up as :py:func:`curly.parser.prepare_tree` does
+        (literals are merged already), except of schema binding.
+
+        :return: Root of the tree.
+        :rtype: :py:class:`curly.parser.RootNode`
+        """
+        root, children, has_else = self.decode_node()
+        if root.__class__ is not parser.RootNode:
+            raise exceptions.CurlySerializationError(
+                "first node is not a root")
+
+        # Frames are [node, subnodes left, else is pending].
+        stack = [[root, children, has_else]]
+        while stack:
+            frame = stack[-1]
+            if frame[1]:
+                frame[1] -= 1
+                node, children, has_else = self.decode_node()
+                frame[0].data.append(node)
+            elif frame[2]:
+                frame[2] = False
+                node, children, has_else = self.decode_node()
+                frame[0].elsenode = node
+            else:
+                node = stack.pop()[0]
+                if node.__class__ is parser.LoopNode:
+                    node.vectorized = parser.VectorizedBody.compile(node)
+                continue
+            stack.append([node, children, has_else])
+
+        return root
+
+    def decode_node(self):
+        """Decode record of the single node.
+
+        :return: Node without subnodes, the number of subnodes and
+            if it has ``else`` node.
+        :rtype: tuple[:py:class:`curly.parser.Node`, int, bool]
+        """
+        ints = self.ints
+        offset = self.offset
+        kind = ints[offset]
+        flags = ints[offset + 1]
+        self.offset = offset + 2
+
+        if kind == KIND_ROOT:
+            node = parser.RootNode([])
+        elif kind == KIND_LITERAL:
+            node = self.decode_literal(flags)
+        else:
+            node = self.decode_expression_node(kind, flags)
+
+        count = ints[self.offset]
+        self.offset += 1
+
+        return node, count, bool(flags & FLAG_ELSE)
+
+    def decode_position(self):
+        """Decode position stored as a delta from the previous one."""
+        ints = self.ints
+        offset = self.offset
+        self.offset = offset + 3
+
+        delta = ints[offset]
+        self.position_offset += delta >> 1 ^ -(delta & 1)
+        delta = ints[offset + 1]
+        self.position_line += delta >> 1 ^ -(delta & 1)
+
+        return tuple.__new__(lexer.Position, (
+            self.position_offset, self.position_line, ints[offset + 2]))
+
+    def decode_raw(self, flags):
+        """Decode raw text and position of the token."""
+        raw = self.strings[self.ints[self.offset]]
+        self.offset += 1
+        position = None
+        if flags & FLAG_POSITION:
+            position = self.decode_position()
+
+        return raw, position
+
+    def decode_literal(self, flags):
+        """Decode literal node."""
+        raw, position = self.decode_raw(flags)
+        text = raw
+        if flags & FLAG_ESCAPED:
+            text = self.strings[self.ints[self.offset]]
+            self.offset += 1
+
+        token = lexer.LiteralToken.__new__(lexer.LiteralToken)
+        token.__dict__ = {
+            "data": raw, "contents": {"text": text}, "position": position}
+        node = parser.LiteralNode.__new__(parser.LiteralNode)
+        node.__dict__ = {"data": [], "token": token, "done": True}
+
+        return node
+
+    def decode_token(self, kind, flags):
+        """Decode token of the print or block tag node."""
+        raw, position = self.decode_raw(flags)
+        ints = self.ints
+        strings = self.strings
+        offset = self.offset
+
+        if kind == KIND_PRINT:
+            token_class = lexer.PrintToken
+            contents = {}
+        else:
+            token_class = lexer.StartBlockToken
+            contents = {"function": strings[ints[offset]]}
+            offset += 1
+        count = ints[offset]
+        offset += 1
+        contents["expression"] = [
+            strings[index] for index in ints[offset:offset + count]]
+        self.offset = offset + count
+
+        token = token_class.__new__(token_class)
+        token.__dict__ = {
+            "data": raw, "contents": contents, "position": position}
+        if flags & FLAG_TRIM_LEFT:
+            token.trim_left = True
+        if flags & FLAG_TRIM_RIGHT:
+            token.trim_right = True
+
+        return token
+
+    def decode_expression_node(self, kind, flags):
+        """Decode node which has an expression (print or block tag)."""
+        token = self.decode_token(kind, flags)
+        pipeline = None
+        if flags & FLAG_PIPELINE:
+            pipeline = self.decode_pipeline()
+
+        if kind == KIND_TAG:
+            return self.make_tag_node(token)
+
+        return self.make_node(NODE_CLASSES[kind], token, pipeline)
+
+    def make_node(self, node_class, token, pipeline):
+        """Make builtin node as :py:func:`curly.parser.prepare_tree` does.
+
+        Pipeline is compiled again if it was not stored.
+        """
+        if pipeline is None:
+            pipeline = self.compile_pipeline(token)
+
+        node = node_class.__new__(node_class)
+        node.__dict__ = {
+            "data": [], "token": token, "done": True, "pipeline": pipeline}
+        if node_class is parser.IfNode:
+            node.elsenode = None
+        elif node_class is parser.PrintNode and self.autoescape:
+            node.autoescape = True
+        if self.undefined is not policies.STRICT:
+            node.undefined = self.undefined
+
+        return node
+
+    @staticmethod
+    def compile_pipeline(token):
+        """Compile pipeline of the token which was not stored."""
+        matcher = token.REGEXP.match(token.data)
+        if matcher is None:
+            raise exceptions.CurlySerializationError(
+                "broken token {0!r}".format(token.data))
+
+        try:
+            return filters.compile_pipeline(
+                token.contents["expression"],
+                matcher.group(token.EXPRESSION_GROUP) or "")
+        except exceptions.CurlyError as exc:
+            raise exceptions.CurlySerializationError(
+                "broken expression {0!r} ({1})".format(
+                    token.data, exc)) from exc
+
+    def make_tag_node(self, token):
+        """Make node of the custom block tag with its constructor."""
+        function = token.contents["function"]
+        tag = parser.BLOCK_TAGS.get(function)
+        if tag is None or tag.node_class is None:
+            raise exceptions.CurlySerializationError(
+                "block tag {0!r} is not registered".format(function))
+
+        node = tag.node_class(token)
+        node.done = True
+        if self.undefined is not policies.STRICT:
+            node.undefined = self.undefined
+
+        return node
+
+    def decode_pipeline(self):
+        """Decode compiled pipeline of the node."""
+        varname = self.ints[self.offset]
+        self.offset += 1
+        varname = None if varname == 0 else self.strings[varname - 1]
+        value = self.decode_value()
+
+        calls = []
+        for _ in range(self.take(1)[0]):
+            name, args_count = self.take(2)
+            name = self.strings[name]
+            if name not in filters.FILTERS:
+                raise exceptions.CurlySerializationError(
+                    "filter {0!r} is not registered".format(name))
+            args = tuple(self.decode_value() for _ in range(args_count))
+            calls.append((filters.FILTERS[name], args))
+
+        return filters.Pipeline(varname, value, calls)
+
+
+def node_kind(node):
+    """Kind of the node record.
+
+    :raises:
+        :py:exc:`curly.exceptions.CurlySerializationError`: if node is
+        neither builtin nor a registered block tag.
+    """
+    kind = NODE_KINDS.get(node.__class__)
+    if kind is not None:
+        return kind
+
+    tag = parser.BLOCK_TAGS.get(getattr(node, "function", None))
+    if tag is None or tag.node_class is not node.__class__:
+        raise exceptions.CurlySerializationError(
+            "node {0!s} is not a registered block tag".format(node))
+
+    return KIND_TAG
+
+
+def node_flags(node, kind, calls):
+    """Flags of the node record.
+
+    :param node: Node to encode.
+    :param int kind: Kind of the node record.
+    :param calls: Filters of the stored pipeline or ``None`` if it is
+        not stored.
+    :rtype: int
+    """
+    flags = 0
+    token = node.token
+    if token is not None:
+        if token.position is not None:
+            flags |= FLAG_POSITION
+        if token.trim_left:
+            flags |= FLAG_TRIM_LEFT
+        if token.trim_right:
+            flags |= FLAG_TRIM_RIGHT
+        if kind == KIND_LITERAL and token.contents["text"] != token.data:
+            flags |= FLAG_ESCAPED
+    if getattr(node, "elsenode", None) is not None:
+        flags |= FLAG_ELSE
+    if calls is not None:
+        flags |= FLAG_PIPELINE
+
+    return flags
+
+
+def zigzag(number):
+    """Map signed integer to unsigned one: 0, -1, 1, -2 to 0, 1, 2, 3."""
+    return number * 2 if number >= 0 else -number * 2 - 1
@@ -7,8 +7,20 @@ environment. This is required for running of rendering routine.
 """
 
 
+import codecs
+import hashlib
+import time
+
+from curly import analysis
+from curly import editing
+from curly import interning
+from curly import lazy as lazy_parsing
 from curly import lexer
+from curly import metrics
 from curly import parser
+from curly import profiler
+from curly import serialize
+from curly import undefined as policies
 
 
 class Template:
@@ -18,17 +30,360 @@ class Template:
     without reparsing it each time.
 
     :param text: A template to compile.
-    :type text: str or bytes
+    :param observer: Observer which is notified on compilation and
+        rendering, see :py:mod:`curly.metrics`.
+    :param undefined: Policy for missing variables: ``strict``,
+        ``empty``, ``log`` or policy instance, see
+        :py:mod:`curly.undefined`.
+    :param bool autoescape: Escape printed values for HTML, see
+        :py:mod:`curly.escape`.
+    :param bool trim_blocks: Remove the first newline after block tags
+        and indentation before them, see
+        :py:func:`curly.parser.trim_tokens`.
+    :param schema: Schema of the context. Variables are validated
+        against it on compilation and looked up with generated
+        accessors, see :py:mod:`curly.schema`.
+    :param bool intern: Share identical subtrees with other templates,
+        see :py:mod:`curly.interning`. Tokens are not kept then.
+    :param bool lazy: Parse bodies of ``if`` and ``loop`` blocks when
+        they are rendered for the first time, see
+        :py:mod:`curly.lazy`. Only text (not stream or file) could be
+        compiled lazily, tokens are not kept.
+    :param bool editable: Keep the source and tokens of the template
+        text for :py:meth:`Template.edit`. Streams and files cannot be
+        edited.
+    :type text: str or bytes or :py:class:`TextStream` or
+        :py:class:`MappedFile`
+    :type observer: :py:class:`curly.metrics.Observer` or None
+    :type undefined: str or :py:class:`curly.undefined.Undefined`
     :raises ValueError: if it is not possible to convert text into
-        AST tree.
+        AST tree, policy is unknown or variables do not match the
+        schema.
     """
 
-    def __init__(self, text):
-        self.node = parser.parse(lexer.tokenize(text))
+    def __init__(self, text, *, observer=None, undefined=policies.STRICT,
+                 autoescape=False, trim_blocks=False, schema=None,
+                 intern=False, lazy=False, editable=False):
+        self.observer = observer
+        self.undefined = policies.get_policy(undefined)
+        self.autoescape = autoescape
+        self.trim_blocks = trim_blocks
+        self.schema = schema
+        self.intern = intern
+        self.lazy = lazy
+        self.editable = editable
+
+        # Streams and mapped files are not kept in memory by design.
+        self.source = self.tokens = None
+        tokens, source_hasher = tokenize_source(text)
+        if not isinstance(text, (str, bytes)):
+            if lazy:
+                raise ValueError(
+                    "Only template text could be compiled lazily")
+            if editable:
+                raise ValueError("Only template text could be edited")
+        elif editable:
+            self.source = text
+
+        if lazy:
+            self.node = lazy_parsing.parse(
+                text, observer=observer, undefined=self.undefined,
+                autoescape=autoescape, trim_blocks=trim_blocks,
+                schema=schema)
+        else:
+            if editable and not intern:
+                self.tokens = tokens = list(tokens)
+            self.node = parser.parse(
+                tokens, observer=observer, undefined=self.undefined,
+                autoescape=autoescape, trim_blocks=trim_blocks,
+                schema=schema)
+        if intern:
+            self.node = interning.intern_tree(self.node)
+        self.setup(source_hasher)
+
+    def setup(self, source_hasher):
+        """Set up everything which is derived from the parsed tree.
+
+        :param source_hasher: :py:mod:`hashlib` hasher of the source.
+        """
+        self.source_hash = make_source_hash(
+            source_hasher, undefined=self.undefined,
+            autoescape=self.autoescape, trim_blocks=self.trim_blocks)
+        if not self.lazy:
+            self.setup_tree(analysis.variables(self.node))
+            return
+
+        # Analysis parses all pending bodies, so it is postponed until
+        # something needs it, see Template.setup_postponed.
+        self.dependencies = None
+        self.required_paths = None
+        self.instrumented_node = self.counters_storage = None
+
+    def setup_postponed(self):
+        """Set up everything which is derived from the lazy tree.
+
+        It is called by methods which need analysis of the tree, all
+        pending bodies are parsed after that.
+        """
+        if self.dependencies is None:
+            self.setup_tree(analysis.variables(self.node))
+
+    def setup_tree(self, dependencies):
+        """Set up everything which is derived from the parsed tree.
+
+        :param dependencies: Variables of the tree, see
+            :py:func:`curly.analysis.variables`.
+        :type dependencies: tuple[str]
+        """
+        self.dependencies = dependencies
+        self.required_paths = None
+
+        self.instrumented_node = self.counters_storage = None
+        if self.observer is not None:
+            self.instrumented_node, self.counters_storage = \
+                metrics.instrument(self.node)
+
+    @classmethod
+    def from_stream(cls, source, *, chunk_size=lexer.STREAM_CHUNK_SIZE,
+                    **kwargs):
+        """Compile template which is read by chunks.
+
+        The whole source is never kept in memory: it is lexed by
+        :py:func:`curly.lexer.tokenize_stream` and parsed while it is
+        read. Compiled template is the same as for the whole text.
+
+        :param source: File object (opened in text or binary mode) or
+            iterable of text chunks (:py:class:`str` or
+            :py:class:`bytes`).
+        :param int chunk_size: Size of the chunk to read from file
+            object.
+        :param kwargs: Keyword arguments of :py:class:`Template`.
+        :return: Compiled template.
+        :rtype: :py:class:`Template`
+        :raises ValueError: if it is not possible to convert text into
+            AST tree.
+        """
+        return cls(TextStream(source, chunk_size), **kwargs)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Compile template from memory-mapped file in UTF-8.
+
+        File is not read into memory: it is lexed by
+        :py:func:`curly.lexer.tokenize_mapping` and literals of the
+        template stay slices of the mapping. They are decoded only when
+        rendered and :py:meth:`Template.render_to` writes them as is,
+        so mostly static templates take about the size of the file
+        (shared page cache) in memory.
+
+        File should not be modified in place while template is used,
+        write the new file and rename it instead.
+
+        :param str path: Path to the template file.
+        :param kwargs: Keyword arguments of :py:class:`Template`.
+        :return: Compiled template.
+        :rtype: :py:class:`Template`
+        :raises ValueError: if it is not possible to convert text into
+            AST tree.
+        """
+        return cls(MappedFile(path), **kwargs)
+
+    @classmethod
+    def loads(cls, data, *, observer=None, schema=None, intern=False):
+        """Restore template from the dump of :py:meth:`Template.dumps`.
+
+        It is much faster than compilation of the source: nothing is
+        lexed or parsed, see :py:mod:`curly.serialize`. Restored
+        template has no source, so it cannot be edited.
+
+        :param data: Dump of the template.
+        :param observer: Observer which is notified on rendering.
+        :param schema: Schema of the context. It is not stored in the
+            dump, pass it again to validate variables and look them up
+            with accessors.
+        :param bool intern: Share identical subtrees with other
+            templates, see :py:mod:`curly.interning`.
+        :type data: bytes or bytearray or memoryview
+        :type observer: :py:class:`curly.metrics.Observer` or None
+        :return: Restored template.
+        :rtype: :py:class:`Template`
+        :raises ValueError: if dump is broken, made by other version
+            of the format or variables do not match the schema.
+        """
+        loaded = serialize.loads(data, schema=schema)
+
+        template = cls.__new__(cls)
+        template.observer = observer
+        template.undefined = loaded.undefined
+        template.autoescape = loaded.autoescape
+        template.trim_blocks = loaded.trim_blocks
+        template.schema = schema
+        template.intern = intern
+        template.lazy = template.editable = False
+        template.source = template.tokens = None
+        template.node = loaded.node
+        if intern:
+            template.node = interning.intern_tree(template.node)
+        template.source_hash = loaded.source_hash
+        template.setup_tree(loaded.variables)
+
+        return template
+
+    def dumps(self):
+        """Serialize compiled template into compact binary format.
+
+        Please check :py:mod:`curly.serialize` for details. Schema and
+        observer are not stored.
+
+        :return: Dump for :py:meth:`Template.loads`.
+        :rtype: bytes
+        :raises ValueError: if template has custom undefined policy,
+            nodes of unregistered block tags or constants which cannot
+            be serialized.
+        """
+        self.setup_postponed()
+
+        return serialize.dumps(
+            self.node, undefined=self.undefined, autoescape=self.autoescape,
+            trim_blocks=self.trim_blocks, source_hash=self.source_hash,
+            variables=self.dependencies)
 
     def __repr__(self):
         return repr(self.node)
 
+    def __getstate__(self):
+        # Observers are bound to the process (locks, connections to
+        # metric servers etc.) so they are not pickled.
+        state = self.__dict__.copy()
+        state["observer"] = None
+        state["instrumented_node"] = state["counters_storage"] = None
+
+        return state
+
+    def edit(self, start, end, new_text):
+        """Replace ``source[start:end]`` with the new text and recompile.
+
+        Only tokens around the edit are lexed again and only the
+        smallest part of the tree which contains changed tokens is
+        parsed again, the rest of the tree is reused. Please check
+        :py:mod:`curly.editing` for details.
+
+        Template is changed in place, so objects which are derived
+        from its tree (like
+        :py:class:`curly.incremental.IncrementalRenderer`) should be
+        created again.
+
+        :param int start: Start offset of the replaced text (in
+            characters).
+        :param int end: End offset of the replaced text.
+        :param str new_text: Text to insert instead.
+        :raises ValueError: if template is not compiled with
+            ``editable=True``, offsets are out of range or it is not
+            possible to compile the new text. Template is not changed
+            in that case.
+        """
+        if not self.editable:
+            raise ValueError(
+                "Template is not editable, compile it with editable=True")
+        if isinstance(self.source, bytes):
+            self.source = self.source.decode("utf-8")
+        if not 0 <= start <= end <= len(self.source):
+            raise ValueError(
+                "Edit {0}:{1} is out of range of the source".format(
+                    start, end))
+
+        started_at = time.perf_counter()
+        tokens = None
+        if self.intern or self.lazy:
+            # Shared nodes have no positions and belong to other
+            # templates too, pending nodes have no tokens at all, so
+            # the tree is compiled again.
+            source = self.source[:start] + new_text + self.source[end:]
+        else:
+            relexed = editing.relex(
+                self.source, self.tokens, start, end, new_text)
+            source = relexed.source
+            tokens = editing.reparse(
+                self.node, self.tokens, relexed, undefined=self.undefined,
+                autoescape=self.autoescape, trim_blocks=self.trim_blocks,
+                schema=self.schema)
+
+        if self.lazy:
+            self.node = lazy_parsing.parse(
+                source, undefined=self.undefined,
+                autoescape=self.autoescape, trim_blocks=self.trim_blocks,
+                schema=self.schema)
+        elif tokens is None:
+            tokens = list(lexer.tokenize(source))
+            self.node = parser.parse(
+                tokens, undefined=self.undefined,
+                autoescape=self.autoescape, trim_blocks=self.trim_blocks,
+                schema=self.schema)
+        if self.intern:
+            self.node = interning.intern_tree(self.node)
+            tokens = None
+
+        self.source = source
+        self.tokens = tokens
+        self.setup(hashlib.sha256(
+            self.source.encode("utf-8", "surrogatepass")))
+        if self.observer is not None:
+            self.observer.on_compile(time.perf_counter() - started_at)
+
+    def variables(self):
+        """Variables which template reads from the context.
+
+        Variables of loop bodies which refer to ``item`` are presented
+        by the expression of the loop. Please check
+        :py:mod:`curly.analysis` for details.
+
+        :return: Sorted variable paths, like ``("posts", "user.name")``.
+        :rtype: tuple[str]
+        """
+        self.setup_postponed()
+
+        return self.dependencies
+
+    def fingerprint(self, context):
+        """Digest which changes only if rendered output could change.
+
+        It hashes the template source and values of
+        :py:meth:`Template.variables` in the context, without
+        rendering. Useful for ETags.
+
+        :param dict context: A dictionary with variables for the
+            template.
+        :return: Hex digest.
+        :rtype: str
+        :raises ValueError: if some value cannot be hashed.
+        """
+        self.setup_postponed()
+
+        return analysis.fingerprint(
+            self.source_hash, self.dependencies, context)
+
+    def prefetch(self, context, executor=None):
+        """Start providers of lazy values which template reads for sure.
+
+        Providers of the variables which every rendering reads (see
+        :py:func:`curly.analysis.required_variables`) are started in
+        the thread pool, so they are computed while the template is
+        rendered. Other providers are still called on first lookup.
+
+        :param context: Lazy context for the rendering.
+        :param executor: Executor to run providers, see
+            :py:meth:`curly.context.LazyContext.prefetch`.
+        :type context: :py:class:`curly.context.LazyContext`
+        :type executor: :py:class:`concurrent.futures.Executor` or None
+        :return: The same context.
+        :rtype: :py:class:`curly.context.LazyContext`
+        """
+        if self.required_paths is None:
+            self.required_paths = analysis.required_variables(self.node)
+        context.prefetch(self.required_paths, executor)
+
+        return context
+
     def render(self, context):
         """Render template into according to the given context.
 
@@ -39,4 +394,180 @@ class Template:
         :raises ValueError: if it is not possible to render template
             with the given context.
         """
-        return self.node.process(context)
+        if self.observer is None:
+            return self.node.process(context)
+
+        return self.render_observed(context)
+
+    def render_bytes(self, context, encoding="utf-8"):
+        """Render template into bytes in the given encoding.
+
+        Literals are encoded once and cached in the tree, only printed
+        values are encoded on rendering. Encoded chunks are joined
+        directly, the whole rendered text is never built as a string.
+
+        :param dict context: A dictionary with variables for the
+            template.
+        :param str encoding: Encoding of the result.
+        :return: Rendered template.
+        :rtype: bytes
+        :raises ValueError: if it is not possible to render template
+            with the given context or to encode rendered values.
+        :raises LookupError: if encoding is unknown.
+        """
+        chunked = chunked_encoding(encoding)
+        if chunked is None or self.observer is not None:
+            return self.render(context).encode(encoding)
+
+        return b"".join(self.node.emit_bytes(context, chunked))
+
+    def render_to(self, sink, context, encoding="utf-8"):
+        """Render template into binary file object.
+
+        Chunks are written as they are rendered, literals of
+        :py:meth:`Template.from_file` templates are written directly
+        from the mapping.
+
+        :param sink: Binary file object, anything with ``write``.
+        :param dict context: A dictionary with variables for the
+            template.
+        :param str encoding: Encoding of the written chunks.
+        :return: Number of written bytes.
+        :rtype: int
+        :raises ValueError: if it is not possible to render template
+            with the given context or to encode rendered values.
+        :raises LookupError: if encoding is unknown.
+        """
+        chunked = chunked_encoding(encoding)
+        if chunked is None or self.observer is not None:
+            rendered = self.render(context).encode(encoding)
+            sink.write(rendered)
+            return len(rendered)
+
+        written = 0
+        for chunk in self.node.emit_bytes(context, chunked):
+            sink.write(chunk)
+            written += len(chunk)
+
+        return written
+
+    def render_observed(self, context):
+        self.setup_postponed()
+        counters = self.counters_storage.counters = metrics.RenderCounters()
+        started_at = time.perf_counter()
+        try:
+            rendered = self.instrumented_node.process(context)
+        except Exception as exc:
+            self.observer.on_render_error(
+                time.perf_counter() - started_at, counters, exc)
+            raise
+        elapsed = time.perf_counter() - started_at
+
+        self.observer.on_render(
+            elapsed, len(rendered.encode("utf-8")), counters)
+
+        return rendered
+
+    def profile(self, context):
+        """Render template collecting per-node profiling statistics.
+
+        Please check :py:mod:`curly.profiler` for details. Regular
+        :py:meth:`Template.render` is not affected by profiling at all.
+
+        :param dict context: A dictionary with variables for the
+            template.
+        :return: Profiling results, rendered template is available as
+            ``output`` attribute.
+        :rtype: :py:class:`curly.profiler.Profile`
+        :raises ValueError: if it is not possible to render template
+            with the given context.
+        """
+        return profiler.profile(self, context)
+
+
+class TextStream:
+    """Source of the template which is read by chunks.
+
+    :param source: File object or iterable of chunks, see
+        :py:func:`curly.lexer.tokenize_stream`.
+    :param int chunk_size: Size of the chunk to read from file object.
+    """
+
+    def __init__(self, source, chunk_size=lexer.STREAM_CHUNK_SIZE):
+        self.source = source
+        self.chunk_size = chunk_size
+
+
+class MappedFile:
+    """Source of the template which is memory-mapped file.
+
+    :param str path: Path to the file, see
+        :py:func:`curly.lexer.map_file`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+
+def tokenize_source(text):
+    """Tokenize template source and hash it on the way.
+
+    :param text: Template text or stream.
+    :type text: str or bytes or :py:class:`TextStream` or
+        :py:class:`MappedFile`
+    :return: Lazy iterator of tokens and hasher of the source. Hasher
+        is complete when tokens are exhausted.
+    :rtype: tuple[Iterator[:py:class:`curly.lexer.Token`], object]
+    """
+    if isinstance(text, MappedFile):
+        mapping = lexer.map_file(text.path)
+        return lexer.tokenize_mapping(mapping), hashlib.sha256(mapping)
+    if not isinstance(text, TextStream):
+        data = text
+        if isinstance(data, str):
+            data = data.encode("utf-8", "surrogatepass")
+        return lexer.tokenize(text), hashlib.sha256(data)
+
+    hasher = hashlib.sha256()
+
+    def chunks():
+        for chunk in lexer.iter_text_chunks(text.source, text.chunk_size):
+            hasher.update(chunk.encode("utf-8", "surrogatepass"))
+            yield chunk
+
+    return lexer.tokenize_stream(chunks()), hasher
+
+
+def make_source_hash(hasher, *, undefined, autoescape, trim_blocks):
+    """Digest of the template source and options which affect output.
+
+    :param hasher: :py:mod:`hashlib` hasher of the template text.
+    :param undefined: Policy for missing variables.
+    :param bool autoescape: Escape printed values for HTML.
+    :param bool trim_blocks: Remove whitespaces around block tags.
+    :type undefined: :py:class:`curly.undefined.Undefined`
+    :rtype: bytes
+    """
+    hasher.update("undefined={0!r};autoescape={1};trim_blocks={2}".format(
+        undefined, autoescape, trim_blocks).encode("utf-8"))
+
+    return hasher.digest()
+
+
+def chunked_encoding(encoding):
+    """Normalized name of the encoding which encodes chunks separately.
+
+    Encodings which start the text with a byte order mark (``utf-16``,
+    ``utf-8-sig`` etc.) cannot encode rendered chunks one by one.
+
+    :param str encoding: Name of the encoding.
+    :return: Name of the encoding, as :py:func:`codecs.lookup` returns
+        it, or None if the text has to be encoded as a whole.
+    :rtype: str or None
+    :raises LookupError: if encoding is unknown.
+    """
+    encoding = codecs.lookup(encoding).name
+    if "".encode(encoding):
+        return None
+
+    return encoding
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Policies for variables which are not found in the context.
+
+By default, Curly raises
+:py:exc:`curly.exceptions.CurlyEvaluateNoKeyError` if variable is
+missing. This is good for catching typos but forces to put every
+optional variable into the context. Template can be created with
+another policy:
+
+.. code-block:: pycon
+
+  >>> from curly import Template
+  >>> from curly import undefined
+  >>> text = "Hello, {{ name }}{% if admin %} (admin){% /if %}!"
+  >>> Template(text, undefined="empty").render({})
+  'Hello, !'
+  >>> Template(text, undefined=undefined.default("guest")).render({})
+  'Hello, guest (admin)!'
+
+Policies are:
+
+``strict`` (:py:class:`StrictUndefined`)
+  Raise an exception. This is the default.
+
+``empty`` (:py:class:`EmptyUndefined`)
+  Missing variable is an empty string: it is rendered as nothing, it
+  is false in ``if`` and loops have no iterations over it.
+
+:py:func:`default` (:py:class:`DefaultUndefined`)
+  Missing variable is the given value.
+
+``log`` (:py:class:`LogUndefined`)
+  As ``empty``, but each missing variable is counted and logged.
+
+Lookups are done with :py:func:`curly.utils.find_variable`, so
+non-strict policies do not raise or catch exceptions at all.
+"""
+
+
+import collections
+import logging
+import threading
+
+from curly import exceptions
+
+
+LOG = logging.getLogger(__name__)
+
+
+class Undefined:
+    """Base class for undefined policies.
+
+    To implement your own policy, override :py:meth:`Undefined.missing`.
+    """
+
+    name = None
+    """Name of the policy."""
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}>".format(self)
+
+    def missing(self, varname, context):
+        """Called when variable is not found in the context.
+
+        :param str varname: Expression which was not resolved.
+        :param dict context: Context where it was searched.
+        :return: Value to use instead of the variable.
+        :raises:
+            :py:exc:`curly.exceptions.CurlyEvaluateError`: if missing
+            variable is an error.
+        """
+        raise NotImplementedError()
+
+
+class StrictUndefined(Undefined):
+    """Policy which raises on missing variables."""
+
+    name = "strict"
+
+    def missing(self, varname, context):
+        raise exceptions.CurlyEvaluateNoKeyError(context, varname)
+
+
+class EmptyUndefined(Undefined):
+    """Policy which treats missing variables as empty strings."""
+
+    name = "empty"
+
+    def missing(self, varname, context):
+        return ""
+
+
+class DefaultUndefined(Undefined):
+    """Policy which treats missing variables as the given value.
+
+    :param value: Value of missing variables.
+    """
+
+    name = "default"
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return "<{0.__class__.__name__}(value={0.value!r})>".format(self)
+
+    def missing(self, varname, context):
+        return self.value
+
+
+class LogUndefined(EmptyUndefined):
+    """Policy which counts and logs missing variables.
+
+    Missing variables are rendered as empty strings. Counters are
+    available as :py:attr:`LogUndefined.misses`, a
+    :py:class:`collections.Counter` where keys are the expressions.
+
+    :param logger: Logger to use.
+    :type logger: :py:class:`logging.Logger`
+    """
+
+    name = "log"
+
+    def __init__(self, logger=LOG):
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.misses = collections.Counter()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def missing(self, varname, context):
+        with self.lock:
+            self.misses[varname] += 1
+        self.logger.warning("Variable %r is undefined", varname)
+
+        return super().missing(varname, context)
+
+
+STRICT = StrictUndefined()
+"""Default policy."""
+
+POLICIES = {
+    policy.name: policy
+    for policy in (StrictUndefined, EmptyUndefined, LogUndefined)}
+"""Mapping of policy names to the classes of policies without
+parameters."""
+
+
+def default(value):
+    """Policy which treats missing variables as the given value.
+
+    :param value: Value of missing variables.
+    :return: Policy.
+    :rtype: :py:class:`DefaultUndefined`
+    """
+    return DefaultUndefined(value)
+
+
+def get_policy(undefined):
+    """Get policy by its name.
+
+    :param undefined: Name of the policy from :py:data:`POLICIES` or
+        the policy itself.
+    :type undefined: str or :py:class:`Undefined`
+    :return: Policy.
+    :rtype: :py:class:`Undefined`
+    :raises ValueError: if policy is unknown.
+    """
+    if isinstance(undefined, Undefined):
+        return undefined
+    if undefined == StrictUndefined.name:
+        return STRICT
+    if undefined in POLICIES:
+        return POLICIES[undefined]()
+
+    raise ValueError(
+        "Unknown undefined policy {0!r}, expected one of {1}".format(
+            undefined, ", ".join(sorted(POLICIES))))
@@ -2,8 +2,10 @@
 """A various utilities which are used by Curly."""
 
 
+import collections.abc
 import re
 import shlex
+import subprocess
 import textwrap
 
 from curly import exceptions
@@ -53,6 +55,20 @@ def make_expression(text):
     return text
 
 
+def join_expression(expression):
+    """Join words of the expression back into the variable name.
+
+    Words which contain whitespaces or quotes are quoted, so ``{{ first
+    name }}`` and ``{{ "first name" }}`` are different variables.
+
+    :param expression: Words of the expression.
+    :type expression: Iterable[str]
+    :return: Variable name.
+    :rtype: str
+    """
+    return subprocess.list2cmdline(expression)
+
+
 def resolve_variable(varname, context):
     """Resolve value named as varname from the context.
 
@@ -114,20 +130,39 @@ def resolve_variable(varname, context):
         :py:exc:`curly.exceptions.CurlyEvaluateNoKeyError`: if it is
         not possible to resolve ``varname`` within a ``context``.
     """
-    try:
-        return get_item_or_attr(varname, context)
-    except exceptions.CurlyEvaluateError:
-        pass
-
-    chunks = varname.split(".", 1)
-    if len(chunks) == 1:
+    value = find_variable(varname, context)
+    if value is MISSING:
         raise exceptions.CurlyEvaluateNoKeyError(context, varname)
 
-    current_name, rest_name = chunks
-    new_context = resolve_variable(current_name, context)
-    resolved = resolve_variable(rest_name, new_context)
+    return value
+
+
+def find_variable(varname, context):
+    """Resolve varname from the context as :py:func:`resolve_variable`
+    does, but without exceptions.
 
-    return resolved
+    Failed lookups are the regular case for the templates with optional
+    variables, so this function never raises or catches exceptions for
+    dicts, lists and plain objects: it uses :py:meth:`dict.get`, bound
+    checks and :py:func:`getattr` with default value instead.
+
+    :param str varname: Expression to resolve
+    :param dict context: A dictionary with variables to resolve.
+    :return: Resolved value or :py:data:`MISSING` if it is not
+        possible to resolve ``varname`` within a ``context``.
+    """
+    while True:
+        value = find_item_or_attr(varname, context)
+        if value is not MISSING:
+            return value
+
+        current_name, dot, varname = varname.partition(".")
+        if not dot:
+            return MISSING
+
+        context = find_item_or_attr(current_name, context)
+        if context is MISSING:
+            return MISSING
 
 
 def get_item_or_attr(varname, context):
@@ -143,15 +178,89 @@ def get_item_or_attr(varname, context):
         :py:exc:`curly.exceptions.CurlyEvaluateNoKeyError`: if it is
         not possible to resolve ``varname`` within a ``context``.
     """
+    value = find_item_or_attr(varname, context)
+    if value is MISSING:
+        raise exceptions.CurlyEvaluateNoKeyError(context, varname)
+
+    return value
+
+
+def find_item_or_attr(varname, context):
+    """Resolve literal varname in context for :py:func:`find_variable`.
+
+    Works as :py:func:`get_item_or_attr` but returns :py:data:`MISSING`
+    instead of raising.
+
+    :param varname: Expression to resolve
+    :param context: A dictionary with variables to resolve.
+    :type varname: str or int
+    :return: Resolved value or :py:data:`MISSING`.
+    """
+    value = find_item(varname, context)
+    if value is MISSING and isinstance(varname, str):
+        try:
+            value = getattr(context, varname, MISSING)
+        except Exception:
+            # Properties could raise anything, not only AttributeError.
+            value = MISSING
+        if value is MISSING and varname.isdigit():
+            value = find_item_or_attr(int(varname), context)
+
+    return value
+
+
+def find_item(key, context):
+    """Get item from the container or :py:data:`MISSING`.
+
+    Dicts and sequences are checked without exceptions. Other mappings
+    are indexed, so :py:meth:`dict.__missing__` of
+    :py:class:`collections.defaultdict` or :py:class:`collections.Counter`
+    works, and :py:exc:`KeyError` means that item is missing. For other
+    containers (which define :py:meth:`object.__getitem__` only) any
+    exception means that item is missing.
+
+    :param key: Key or index of the item.
+    :param context: Container to get item from.
+    :type key: str or int
+    :return: Item or :py:data:`MISSING`.
+    """
+    if type(context) is dict:
+        return context.get(key, MISSING)
+
+    if isinstance(context, collections.abc.Mapping):
+        try:
+            return context[key]
+        except KeyError:
+            return MISSING
+
+    if isinstance(context, collections.abc.Sequence):
+        if isinstance(key, int) and -len(context) <= key < len(context):
+            return context[key]
+        return MISSING
+
+    if not hasattr(context, "__getitem__"):
+        return MISSING
+
     try:
-        return context[varname]
+        return context[key]
     except Exception:
-        try:
-            return getattr(context, varname)
-        except Exception as exc:
-            pass
+        return MISSING
+
+
+class Missing:
+    """Type of :py:data:`MISSING` sentinel."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __bool__(self):
+        return False
+
+    def __reduce__(self):
+        return "MISSING"
 
-    if isinstance(varname, str) and varname.isdigit():
-        return get_item_or_attr(int(varname), context)
 
-    raise exceptions.CurlyEvaluateNoKeyError(context, varname)
+MISSING = Missing()
+"""Sentinel which means that variable is not found in the context."""
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+
+import pickle
+
+import pytest
+
+from curly import analysis
+from curly import parser
+from curly import template
+from curly.escape import SafeString
+
+
+TEXT = (
+    "{{ title | upper }}{% if user.admin %}{{ user.name }}"
+    "{% elif guest %}{{ 'guest' | upper }}{% else %}{{ anonymous }}{% /if %}"
+    "{% loop posts %}{{ item.title }}{% loop item.tags %}{{ item }}"
+    "{{ separator }}{% /loop %}{% /loop %}{{ item }}")
+
+
+def find_node(root, node_type):
+    return next(
+        node for node in parser.walk_tree(root) if type(node) is node_type)
+
+
+def test_variables():
+    tpl = template.Template(TEXT)
+
+    assert tpl.variables() == (
+        "anonymous", "guest", "item", "posts", "separator", "title",
+        "user.admin", "user.name")
+
+
+def test_variables_per_subtree():
+    tpl = template.Template(TEXT)
+    dependencies = analysis.analyze(tpl.node)
+
+    assert dependencies[find_node(tpl.node, parser.IfNode)] == {
+        "user.admin", "user.name", "guest", "anonymous"}
+    assert dependencies[find_node(tpl.node, parser.LoopNode)] == {
+        "posts", "separator"}
+    assert dependencies[find_node(tpl.node, parser.ElseNode)] == {
+        "anonymous"}
+    assert dependencies.overall == tpl.variables()
+
+
+def test_loop_over_constant():
+    tpl = template.Template("{% loop 'abc' | upper %}{{ item }}{% /loop %}")
+
+    assert tpl.variables() == ()
+
+
+def test_fingerprint_depends_only_on_variables():
+    tpl = template.Template(TEXT)
+    context = {
+        "title": "t", "user": {"admin": True, "name": "n", "age": 1},
+        "posts": [{"title": "p", "tags": ["a", "b"]}], "separator": ",",
+        "item": 1, "unused": object()}
+    fingerprint = tpl.fingerprint(context)
+
+    assert fingerprint == tpl.fingerprint(dict(context, unused=None))
+    assert fingerprint == tpl.fingerprint(
+        dict(context, user={"admin": True, "name": "n", "age": 2}))
+    assert fingerprint != tpl.fingerprint(dict(context, title="x"))
+    assert fingerprint != tpl.fingerprint(
+        dict(context, posts=[{"title": "p", "tags": ["a"]}]))
+    assert fingerprint != tpl.fingerprint(dict(context, separator=None))
+
+
+def test_fingerprint_of_literal_dotted_key():
+    tpl = template.Template("{{ c }}{{ c.d }}")
+    first = {"c": {"d": 1}, "c.d": "x"}
+    second = dict(first, **{"c.d": "y"})
+
+    assert tpl.render(first) != tpl.render(second)
+    assert tpl.fingerprint(first) != tpl.fingerprint(second)
+
+
+def test_fingerprint_depends_on_template():
+    context = {"a": "<"}
+
+    assert template.Template("{{ a }}").fingerprint(context) != \
+        template.Template("{{ a }}!").fingerprint(context)
+    assert template.Template("{{ a }}").fingerprint(context) != \
+        template.Template("{{ a }}", autoescape=True).fingerprint(context)
+
+
+@pytest.mark.parametrize("first, second", (
+    (1, "1"),
+    ("1", SafeString("1")),
+    (1, True),
+    (["a", "b"], ["ab"]),
+    ({"a": 1}, [("a", 1)]),
+    (None, "None")))
+def test_fingerprint_distinguishes_values(first, second):
+    tpl = template.Template("{{ a }}")
+
+    assert tpl.fingerprint({"a": first}) != tpl.fingerprint({"a": second})
+
+
+def test_fingerprint_of_sets_and_objects():
+    tpl = template.Template("{{ a }}")
+
+    assert tpl.fingerprint({"a": {"x", "y", "z"}}) == \
+        tpl.fingerprint({"a": {"x", "y", "z"}})
+    assert tpl.fingerprint({"a": frozenset("xy")}) != \
+        tpl.fingerprint({"a": {"x", "y"}})
+    assert tpl.fingerprint({"a": complex(1, 2)}) == \
+        tpl.fingerprint({"a": complex(1, 2)})
+    with pytest.raises(ValueError):
+        tpl.fingerprint({"a": (item for item in "abc")})
+    cyclic = []
+    cyclic.append(cyclic)
+    with pytest.raises(ValueError):
+        tpl.fingerprint({"a": cyclic})
+
+
+def test_fingerprint_does_not_depend_on_identity():
+    tpl = template.Template("{{ a }}")
+    value = "x" * 10
+
+    assert tpl.fingerprint({"a": [value, value]}) == \
+        tpl.fingerprint({"a": ["x" * 10, "".join(["x"] * 10)]})
+
+
+def test_fingerprint_of_missing_variable():
+    tpl = template.Template("{{ a }}")
+
+    assert tpl.fingerprint({}) != tpl.fingerprint({"a": None})
+
+
+def test_fingerprint_after_pickle():
+    tpl = template.Template(TEXT)
+    context = {"title": "t", "posts": []}
+
+    assert pickle.loads(pickle.dumps(tpl)).fingerprint(context) == \
+        tpl.fingerprint(context)
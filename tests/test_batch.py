@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+
+import io
+import json
+import os.path
+import sys
+
+import pytest
+
+import curly
+from curly import batch
+from curly import cache
+from curly import cli
+from curly import filters
+from curly import serialize
+
+
+@pytest.fixture
+def template_dir(tmpdir):
+    tmpdir.join("a.html").write("Hello {{ name }}")
+    tmpdir.join("sub", "b.html").write("{% loop items %}{{ item }}{% /loop %}",
+                                       ensure=True)
+    tmpdir.join("sub", "broken.html").write("{% if var %}")
+    tmpdir.join("sub", "skip.txt").write("{% if var %}")
+
+    return str(tmpdir)
+
+
+def test_find_templates(template_dir):
+    found = batch.find_templates(template_dir, pattern="*.html")
+    found = [os.path.relpath(path, template_dir) for path in found]
+
+    assert found == ["a.html", os.path.join("sub", "b.html"),
+                     os.path.join("sub", "broken.html")]
+
+
+@pytest.mark.parametrize("jobs", (1, 2))
+def test_compile_files(template_dir, tmpdir, jobs):
+    template_cache = cache.FileCache(str(tmpdir.join("cache")))
+    paths = batch.find_templates(template_dir, pattern="*.html")
+    results = list(batch.compile_files(paths, jobs=jobs,
+                                       cache=template_cache))
+
+    assert [result.path for result in results] == paths
+    assert [bool(result.error) for result in results] == \
+        [False, False, True]
+    assert all(result.elapsed >= 0 for result in results)
+
+    with open(paths[0], "rb") as template_fp:
+        compiled = template_cache.get(template_fp.read())
+    assert compiled.render({"name": "world"}) == "Hello world"
+
+
+def test_cache_get_or_compile(tmpdir):
+    template_cache = cache.FileCache(str(tmpdir))
+    assert template_cache.get("{{ a }}") is None
+
+    template_cache.get_or_compile("{{ a }}")
+    assert template_cache.get("{{ a }}").render({"a": 1}) == "1"
+    assert template_cache.get(b"{{ a }}").render({"a": 1}) == "1"
+
+
+def test_cache_broken_entry(tmpdir):
+    template_cache = cache.FileCache(str(tmpdir))
+    path = template_cache.set("{{ a }}", template_cache.get_or_compile("1"))
+    with open(path, "wb") as cache_fp:
+        cache_fp.write(b"garbage")
+
+    assert template_cache.get("{{ a }}") is None
+
+
+def test_cache_broken_token(tmpdir, monkeypatch):
+    monkeypatch.setattr(filters, "FILTERS", dict(filters.FILTERS))
+    filters.register("split", pure=True)(str.split)
+    text = "{% loop 'a b' | split %}{{ item }}{% /loop %}"
+    template_cache = cache.FileCache(str(tmpdir))
+    path = template_cache.set(text, curly.Template(text))
+    with open(path, "rb") as cache_fp:
+        data = cache_fp.read()
+    with open(path, "wb") as cache_fp:
+        cache_fp.write(data.replace(b"{% loop 'a b'", b"{! loop 'a b'"))
+
+    assert template_cache.get(text) is None
+    assert template_cache.get_or_compile(text).render({}) == "ab"
+
+
+def test_cache_entry_is_dump(tmpdir):
+    template_cache = cache.FileCache(str(tmpdir))
+    path = template_cache.set("{{ a }}", curly.Template("{{ a }}"))
+
+    with open(path, "rb") as cache_fp:
+        assert serialize.is_dump(cache_fp.read())
+
+
+def test_cli_compile(template_dir, tmpdir, capsys):
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["compile", "-p", "*.html", "-j", "1",
+                  "-c", str(tmpdir.join("cache")), template_dir])
+    assert exc.value.code == 1
+
+    out, err = capsys.readouterr()
+    statuses = [line.split("\t")[0] for line in out.splitlines()]
+    assert statuses == ["ok", "ok", "error"]
+    assert "3 templates (1 errors)" in err
+
+
+def test_cli_legacy_render(tmpdir, capsys):
+    tmpdir.join("a.html").write("Hello {{ name }}")
+    cli.main(['{"name": "world"}', str(tmpdir.join("a.html"))])
+
+    out, _ = capsys.readouterr()
+    assert out == "Hello world\n"
+
+
+@pytest.mark.parametrize("jobs", (1, 2))
+def test_render_contexts(jobs):
+    template = curly.Template("{{ a }}-")
+    contexts = ('{{"a": {0}}}'.format(index) for index in range(1000))
+    rendered = batch.render_contexts(template, contexts, jobs=jobs,
+                                     decode=json.loads, chunksize=7)
+
+    assert list(rendered) == ["{0}-".format(index) for index in range(1000)]
+
+
+def test_cli_render_cache(tmpdir, capsys):
+    tmpdir.join("a.html").write("Hello {{ name }}")
+    for _ in range(2):
+        cli.main(["render", "-c", str(tmpdir.join("cache")),
+                  '{"name": "world"}', str(tmpdir.join("a.html"))])
+
+    out, _ = capsys.readouterr()
+    assert out == "Hello world\n" * 2
+    assert cache.FileCache(str(tmpdir.join("cache"))).get(
+        "Hello {{ name }}") is not None
+
+
+@pytest.mark.parametrize("jobs", (1, 2))
+def test_render_contexts_schema(jobs):
+    template = curly.Template("{{ a.b }}", schema={"a": {"b": int}})
+    contexts = [{"a": {"b": index}} for index in range(10)]
+    rendered = batch.render_contexts(template, contexts, jobs=jobs)
+
+    assert list(rendered) == [str(index) for index in range(10)]
+
+
+@pytest.mark.parametrize("jobs", (1, 2))
+def test_render_contexts_error(jobs):
+    template = curly.Template("{{ a }}")
+    contexts = [{"a": 1}, {"a": 2}, {"b": 3}]
+
+    with pytest.raises(ValueError) as exc:
+        list(batch.render_contexts(template, contexts, jobs=jobs,
+                                   chunksize=2))
+    assert "#2" in str(exc.value)
+
+
+@pytest.mark.parametrize("output_format, expected", (
+    ("jsonl", '"a=1"\n"a=2"\n'),
+    ("concat", "a=1a=2")
+))
+def test_cli_render_contexts(tmpdir, capsys, output_format, expected):
+    tmpdir.join("tpl").write("a={{ a }}")
+    tmpdir.join("contexts.jsonl").write('{"a": 1}\n\n{"a": 2}\n')
+    cli.main(["render", "--contexts", str(tmpdir.join("contexts.jsonl")),
+              "-f", output_format, str(tmpdir.join("tpl"))])
+
+    out, err = capsys.readouterr()
+    assert out == expected
+    assert "Rendered 2 contexts" in err
+
+
+def test_cli_render_contexts_dir(tmpdir):
+    tmpdir.join("tpl").write("a={{ a }}")
+    tmpdir.join("contexts.jsonl").write('{"a": 1}\n{"a": 2}\n')
+    cli.main(["render", "--contexts", str(tmpdir.join("contexts.jsonl")),
+              "-f", "dir", "-o", str(tmpdir.join("out")),
+              str(tmpdir.join("tpl"))])
+
+    assert sorted(path.read() for path in tmpdir.join("out").listdir()) == \
+        ["a=1", "a=2"]
+
+
+@pytest.mark.parametrize("template", ([], ["-"]))
+def test_cli_render_contexts_both_stdin(template, monkeypatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO("a={{ a }}"))
+
+    with pytest.raises(SystemExit) as exc:
+        cli.main(["render", "--contexts", "-"] + template)
+
+    assert "cannot both be read from stdin" in str(exc.value)
+    assert sys.stdin.read() == "a={{ a }}"
+
+
+def test_cli_render_contexts_closed(tmpdir, monkeypatch):
+    tmpdir.join("tpl").write("a={{ a }}")
+    tmpdir.join("contexts.jsonl").write('{"a": 1}\n{"b": 2}\n')
+    opened = []
+    open_file = cli.open_file
+    monkeypatch.setattr(
+        cli, "open_file", lambda path: opened.append(open_file(path)) or
+        opened[-1])
+
+    with pytest.raises(SystemExit):
+        cli.main(["render", "--contexts", str(tmpdir.join("contexts.jsonl")),
+                  str(tmpdir.join("tpl"))])
+
+    assert len(opened) == 2 and opened[1].closed
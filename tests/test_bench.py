@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+
+import collections
+import json
+
+import pytest
+
+from curly import bench
+from curly import cli
+
+
+@pytest.mark.parametrize("percent, value", (
+    (0, 1),
+    (50, 50),
+    (99, 99),
+    (100, 100)
+))
+def test_percentile(percent, value):
+    assert bench.percentile(list(range(1, 101)), percent) == value
+
+
+def test_benchmark():
+    report = bench.benchmark(
+        "{% loop items %}{{ item }}{% /loop %}", {"items": [1, 2, 3]},
+        repeat=3, warmup=1)
+
+    assert report["tokens"] == 3
+    assert report["output_size"] == 3
+    assert list(report["phases"]) == [
+        "tokenize", "parse", "render:process", "render:emit"]
+    for stats in report["phases"].values():
+        assert stats["repeat"] == 3
+        assert 0 < stats["min"] <= stats["median"] <= stats["p99"]
+        assert stats["allocated_peak"] > 0
+
+
+def test_measure_cases():
+    calls = []
+    results = bench.measure_cases(
+        (("b", lambda: calls.append("b")), ("a", lambda: calls.append("a"))),
+        repeat=3, warmup=1)
+
+    assert list(results) == ["b", "a"]
+    assert calls == sorted(calls, reverse=True)
+    assert calls.count("a") == calls.count("b") >= 4
+    assert all(stats["repeat"] == 3 for stats in results.values())
+
+
+def test_format_cases():
+    results = collections.OrderedDict((
+        ("generic", {"median": 0.004, "p99": 0.005, "size": 10}),
+        ("vectorized case", {"median": 0.001, "p99": 0.002, "size": 5})))
+
+    assert bench.format_cases(results, extra=(
+        ("size", lambda stats: str(stats["size"])),)).splitlines() == [
+        "generic          median=      4.00ms p99=      5.00ms "
+        "speedup=  1.0x size=10",
+        "vectorized case  median=      1.00ms p99=      2.00ms "
+        "speedup=  4.0x size=5"]
+    assert bench.format_cases(
+        results, unit="us", speedup=False).splitlines()[0] == (
+        "generic          median=   4000.00us p99=   5000.00us")
+
+
+def test_cli_bench_json(tmpdir, capsys):
+    tmpdir.join("tpl").write("Hello {{ name }}")
+    cli.main(["bench", "-n", "2", "-w", "0", "-b", "emit", "--json",
+              str(tmpdir.join("tpl")), '{"name": "world"}'])
+
+    out, _ = capsys.readouterr()
+    report = json.loads(out)
+    assert list(report["phases"]) == ["tokenize", "parse", "render:emit"]
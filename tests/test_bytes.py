@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+
+import io
+import pickle
+
+import pytest
+
+from curly import metrics
+from curly import parser
+from curly import template
+
+
+TEXT = (
+    "<h1>{{ title | upper }}</h1> ü€𝄞\n"
+    "{% if user %}<p>Hello, {{ user.name }}!</p>"
+    "{% else %}<p>Login</p>{% /if %}\n"
+    "<ul>{% loop posts %}<li>{{ item.title }}</li>{% /loop %}</ul>\n"
+    "{% loop tags %}{% if item %}{{ item }}{% /if %}{% /loop %}"
+    "\\{ escaped \\}")
+
+CONTEXT = {
+    "title": "Blog",
+    "user": {"name": "<Сергей>"},
+    "posts": [{"title": "first"}, {"title": "второй"}],
+    "tags": ["a", "", "ё"]}
+
+
+@pytest.mark.parametrize("kwargs", (
+    {},
+    {"autoescape": True},
+    {"trim_blocks": True},
+    {"undefined": "empty"},
+    {"lazy": True},
+    {"intern": True},
+))
+@pytest.mark.parametrize("encoding", ("utf-8", "UTF8", "utf-16", "utf-32"))
+def test_same_as_render(kwargs, encoding):
+    tpl = template.Template(TEXT, **kwargs)
+    expected = template.Template(TEXT, **kwargs).render(CONTEXT)
+
+    for _ in range(2):
+        assert tpl.render_bytes(CONTEXT, encoding) == \
+            expected.encode(encoding)
+    assert tpl.render(CONTEXT) == expected
+
+
+def test_literals_encoded_once():
+    tpl = template.Template(
+        "ё{% loop a %}ж{% if item %}{{ item }}{% /if %}{% /loop %}")
+    tpl.render_bytes({"a": [1, 2]}, "cp1251")
+    literal, loop = tpl.node
+    cached = literal.encodings["cp1251"]
+
+    assert tpl.render_bytes({"a": [3]}, "cp1251") == "ёж3".encode("cp1251")
+    assert literal.encodings["cp1251"] is cached
+    assert loop[0].encodings == {"cp1251": "ж".encode("cp1251")}
+    assert "encodings" not in pickle.loads(pickle.dumps(tpl)).node[0].__dict__
+
+
+def test_encoding_errors():
+    tpl = template.Template("a{{ a }}")
+
+    assert tpl.render_bytes({"a": "b"}, "ascii") == b"ab"
+    with pytest.raises(UnicodeEncodeError):
+        tpl.render_bytes({"a": "é"}, "ascii")
+    with pytest.raises(LookupError):
+        tpl.render_bytes({"a": "b"}, "unknown")
+
+
+def test_custom_nodes(monkeypatch):
+    class UpperNode(parser.BlockTagNode):
+
+        def emit(self, context):
+            yield "".join(super().emit(context)).upper()
+
+    class ReversedNode(parser.LiteralNode):
+
+        def render_leaf(self, _):
+            return self.text[::-1]
+
+    monkeypatch.setattr(parser, "BLOCK_TAGS", dict(parser.BLOCK_TAGS))
+    parser.register_block_tag("upper", UpperNode)
+    tpl = template.Template("{% upper %}ab{{ a }}{% /upper %}ёж")
+    tpl.node[1].__class__ = ReversedNode
+
+    assert tpl.render_bytes({"a": "c"}) == "ABCжё".encode("utf-8")
+
+
+def test_from_file(tmpdir):
+    path = tmpdir.join("template.curly")
+    path.write_binary(TEXT.encode("utf-8"))
+    tpl = template.Template.from_file(str(path))
+    expected = template.Template(TEXT).render(CONTEXT)
+    sink = io.BytesIO()
+
+    assert tpl.render_bytes(CONTEXT) == expected.encode("utf-8")
+    assert tpl.render_to(sink, CONTEXT, "utf-16") == len(sink.getvalue())
+    assert sink.getvalue() == expected.encode("utf-16")
+
+
+def test_observer():
+    sink = metrics.MetricsSink()
+    tpl = template.Template("{{ a }}", observer=sink)
+
+    assert tpl.render_bytes({"a": "ё"}, "cp1251") == "ё".encode("cp1251")
+    assert sink.snapshot()["renders"] == 1
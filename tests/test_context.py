@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+
+import collections
+import concurrent.futures
+import threading
+
+import pytest
+
+from curly import analysis
+from curly import context as lazy_context
+from curly import exceptions
+from curly import lazy
+from curly import parser
+from curly import template
+
+
+TEXT = (
+    "<h1>{{ title }}</h1>\n"
+    "{% if user %}<p>Hello, {{ user.name }}!</p>"
+    "{% elif guest %}<p>Hi, guest</p>{% else %}{{ login }}{% /if %}\n"
+    "<ul>{% loop posts %}<li>{{ item.title }} {{ site }}"
+    "{% if item.hot %}!{% /if %}</li>{% /loop %}</ul>\n"
+    "{{ site }}")
+
+VALUES = {
+    "title": "Blog",
+    "user": None,
+    "guest": True,
+    "login": "/login",
+    "posts": [{"title": "first", "hot": True},
+              {"title": "second", "hot": False}],
+    "site": "example.com"}
+
+
+@pytest.fixture
+def calls():
+    return collections.Counter()
+
+
+def make_context(calls, **values):
+    def provider(key, value):
+        def provide():
+            calls[key] += 1
+            return value
+        return provide
+
+    values = dict(VALUES, **values)
+
+    return lazy_context.LazyContext(
+        (key, provider(key, value)) for key, value in values.items())
+
+
+@pytest.mark.parametrize("kwargs", (
+    {},
+    {"autoescape": True},
+    {"undefined": "empty"},
+    {"lazy": True},
+    {"schema": {"title": str, "user": {"name": str}, "guest": bool,
+                "login": str, "posts": [{"title": str, "hot": bool}],
+                "site": str}},
+))
+def test_same_as_dict(calls, kwargs):
+    tpl = template.Template(TEXT, **kwargs)
+
+    assert tpl.render(make_context(calls)) == tpl.render(VALUES)
+    assert calls == dict.fromkeys(
+        ("title", "user", "guest", "posts", "site"), 1)
+
+
+def test_memoized(calls):
+    tpl = template.Template(
+        "{% loop posts %}{{ site }}{% loop posts %}{{ site }}{% /loop %}"
+        "{% /loop %}{{ site }}")
+    context = make_context(calls)
+
+    assert tpl.render(context) == "example.com" * 7
+    assert tpl.render(context) == "example.com" * 7
+    assert calls == {"posts": 1, "site": 1}
+
+
+def test_mapping(calls):
+    context = make_context(calls, answer=42)
+    context["plain"] = len
+    copied = context.copy()
+    copied["item"] = 1
+
+    assert "answer" in context and "item" not in context
+    assert len(context) == len(VALUES) + 2
+    assert list(copied)[:2] == ["plain", "item"]
+    assert not calls
+
+    assert context["answer"] == 42
+    assert copied["answer"] == 42
+    assert context["plain"] is len
+    assert copied.get("unknown", 1) == 1
+    with pytest.raises(KeyError):
+        context["item"]
+    assert calls == {"answer": 1}
+    assert repr(context).startswith(
+        "<LazyContext(values=['plain'], providers=['answer', 'guest',")
+    assert repr(context).endswith("computed=['answer'])>")
+
+
+def test_provider_errors():
+    results = iter((ValueError("boom"), "value"))
+
+    def provider():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    tpl = template.Template("{{ a }}")
+    context = lazy_context.LazyContext(a=provider)
+
+    with pytest.raises(ValueError):
+        tpl.render(context)
+    assert tpl.render(context) == "value"
+    with pytest.raises(exceptions.CurlyEvaluateNoKeyError):
+        tpl.render(lazy_context.LazyContext(b=provider))
+
+
+def test_lookup_error_does_not_call_providers(calls):
+    tpl = template.Template("{{ title }}{{ missing }}")
+    context = make_context(calls)
+
+    with pytest.raises(exceptions.CurlyEvaluateNoKeyError) as excinfo:
+        tpl.render(context)
+
+    message = str(excinfo.value)
+    assert "'title': 'Blog'" in message
+    assert "'posts': PENDING" in message
+    assert calls == {"title": 1}
+
+
+def test_required_variables():
+    tpl = template.Template(TEXT)
+
+    assert analysis.required_variables(tpl.node) == (
+        "posts", "site", "title", "user")
+
+
+def test_prefetch(calls):
+    tpl = template.Template(TEXT)
+    context = make_context(calls)
+    context.memo["site"] = "memoized"
+
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        assert tpl.prefetch(context, executor) is context
+        assert sorted(context.futures) == ["posts", "title", "user"]
+        assert context.prefetch(["posts", "user.name", "unknown"]) == 0
+        assert "memoized" in tpl.render(context)
+
+    assert not context.futures
+    assert calls == dict.fromkeys(("title", "user", "guest", "posts"), 1)
+
+
+def test_prefetch_concurrent():
+    barrier = threading.Barrier(3, timeout=10)
+
+    def provider(value):
+        def provide():
+            barrier.wait()
+            return value
+        return provide
+
+    tpl = template.Template("{{ a }}{{ b.c }}{% if d %}{{ e }}{% /if %}")
+    context = lazy_context.LazyContext(
+        a=provider(1), b=provider({"c": 2}), e=lambda: 3, d=True)
+
+    assert tpl.prefetch(context) is context
+    barrier.wait()
+    assert tpl.render(context) == "123"
+
+
+def test_prefetch_lazy_template():
+    tpl = template.Template(TEXT, lazy=True)
+    tpl.prefetch(lazy_context.LazyContext(VALUES))
+
+    assert tpl.required_paths == ("posts", "site", "title", "user")
+    assert [node for node in parser.walk_tree(tpl.node, lazy.is_parsed)
+            if not lazy.is_parsed(node)]
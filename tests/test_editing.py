@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+
+import io
+
+import pytest
+
+from curly import exceptions
+from curly import metrics
+from curly import parser
+from curly import template
+
+
+TEXT = (
+    "<h1>{{ title }}</h1>\n"
+    "{% if user %}<p>Hello, {{ user.name }}!</p>"
+    "{% elif guest %}<p>Hi, guest</p>{% else %}<p>Login</p>{% /if %}\n"
+    "<ul>{% loop posts %}<li>{{ item.title }}</li>{% /loop %}</ul>\n"
+    "<p>{{ footer }}</p>")
+
+CONTEXT = {
+    "title": "Blog",
+    "user": {"name": "Sergey"},
+    "guest": True,
+    "header": "Header",
+    "posts": [{"title": "first"}, {"title": "second"}],
+    "footer": "bye"}
+
+
+def signature(tokens):
+    return [(token.__class__, token.data, token.position)
+            for token in tokens]
+
+
+def positions(node):
+    return [(subnode.__class__, subnode.position)
+            for subnode in parser.walk_tree(node)]
+
+
+def check_edit(text, start, end, new_text, **kwargs):
+    edited = template.Template(text, editable=True, **kwargs)
+    edited.edit(start, end, new_text)
+    expected = template.Template(
+        text[:start] + new_text + text[end:], editable=True, **kwargs)
+
+    assert edited.source == expected.source
+    assert signature(edited.tokens) == signature(expected.tokens)
+    assert repr(edited.node) == repr(expected.node)
+    assert positions(edited.node) == positions(expected.node)
+    assert edited.source_hash == expected.source_hash
+    assert edited.variables() == expected.variables()
+    assert edited.render(CONTEXT) == expected.render(CONTEXT)
+
+    return edited
+
+
+@pytest.mark.parametrize("marker, new_text", (
+    ("Blog", "Site "),
+    ("<h1>", "{{ header }} "),
+    ("Hello", "Good day"),
+    ("guest</p>", "my dear "),
+    ("Login", "Sign in or "),
+    ("<li>", "<b>"),
+    ("item.title", " | upper"),
+    ("{{ footer", " | upper"),
+    ("Hello", "{{ title }}, "),
+    ("Hello", "{% if guest %}dear{% /if %} "),
+    ("<ul>", "{% loop posts %}*{% /loop %}"),
+    ("</ul>\n", "{% if user %}{% /if %}"),
+    ("Login</p>", "{% /if %}{% if guest %}"),
+    ("guest</p>", "{% elif user %}"),
+    ("{% /loop %}", ""),
+    ("", "{% if title %}x{% /if %}"),
+))
+@pytest.mark.parametrize("trim_blocks", (True, False))
+def test_edit(marker, new_text, trim_blocks):
+    start = TEXT.find(marker) + len(marker) if marker else 0
+    check_edit(TEXT, start, start, new_text, trim_blocks=trim_blocks)
+
+
+@pytest.mark.parametrize("old_text, new_text", (
+    ("{{ title }}", "{{ header }}"),
+    ("{% elif guest %}", ""),
+    ("{% elif guest %}<p>Hi, guest</p>{% else %}", "{%- else -%}"),
+    ("<li>{{ item.title }}</li>", ""),
+    ("{% /loop %}</ul>\n<p>", "</ul>\n{% /loop %}<p>"),
+    ("{{ footer }}", "{{ footer"),
+))
+def test_replace(old_text, new_text):
+    start = TEXT.index(old_text)
+    check_edit(TEXT, start, start + len(old_text), new_text)
+
+
+def test_edit_sequence():
+    tpl = template.Template(TEXT, editable=True)
+    text = TEXT
+
+    for marker, new_text in (("Hello", "\n  "),
+                             ("<li>", "{{ title }}"),
+                             ("Blog", "{% if user %}!{% /if %}"),
+                             ("</p>", "x")):
+        start = text.find(marker) + len(marker)
+        text = text[:start] + new_text + text[start:]
+        tpl.edit(start, start, new_text)
+        assert tpl.render(CONTEXT) == template.Template(text).render(
+            CONTEXT)
+
+    assert tpl.source == text
+
+
+def test_edit_schema():
+    schema = {"title": str, "posts": [{"title": str}], "header": str}
+    text = "{{ title }}{% loop posts %}{{ item.title }}{% /loop %}"
+    start = text.index("item.") + len("item.")
+
+    tpl = template.Template(text, schema=schema, editable=True)
+    tpl.edit(start, start + len("title"), "title")
+    assert tpl.render(CONTEXT) == "Blogfirstsecond"
+
+    with pytest.raises(exceptions.CurlySchemaError):
+        tpl.edit(start, start + len("title"), "body")
+    assert tpl.source == text
+    assert tpl.render(CONTEXT) == "Blogfirstsecond"
+
+
+@pytest.mark.parametrize("old_text, new_text", (
+    ("{% /if %}", ""),
+    ("{% /loop %}", "{% /if %}"),
+    ("{% if user %}", "{% if user %}{% else %}{% else %}"),
+))
+def test_edit_invalid(old_text, new_text):
+    tpl = template.Template(TEXT, editable=True)
+    start = TEXT.index(old_text)
+
+    with pytest.raises(exceptions.CurlyParserError):
+        tpl.edit(start, start + len(old_text), new_text)
+
+    assert tpl.source == TEXT
+    assert tpl.render(CONTEXT) == template.Template(TEXT).render(CONTEXT)
+
+    tpl.edit(0, 0, "x")
+    assert tpl.render(CONTEXT) == "x" + template.Template(TEXT).render(
+        CONTEXT)
+
+
+@pytest.mark.parametrize("start, end", ((-1, 0), (2, 1), (0, 1000)))
+def test_edit_out_of_range(start, end):
+    tpl = template.Template(TEXT, editable=True)
+
+    with pytest.raises(ValueError):
+        tpl.edit(start, end, "x")
+    assert tpl.source == TEXT
+
+
+def test_edit_bytes():
+    tpl = template.Template(TEXT.encode("utf-8"), editable=True)
+    tpl.edit(0, 0, "x")
+
+    assert tpl.source == "x" + TEXT
+
+
+def test_not_editable():
+    tpl = template.Template(TEXT)
+
+    assert tpl.source is None and tpl.tokens is None
+    with pytest.raises(ValueError):
+        tpl.edit(0, 0, "x")
+
+
+def test_edit_stream():
+    with pytest.raises(ValueError):
+        template.Template.from_stream(io.StringIO(TEXT), editable=True)
+
+
+def test_edit_observer():
+    sink = metrics.MetricsSink()
+    tpl = template.Template(TEXT, observer=sink, editable=True)
+    tpl.edit(0, 0, "x")
+
+    assert sink.compiles == 2
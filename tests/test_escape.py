@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+
+import pickle
+
+import pytest
+
+from curly import escape
+from curly import lexer
+from curly import parser
+from curly import template
+
+
+class Html:
+
+    def __html__(self):
+        return "<i>html</i>"
+
+
+@pytest.mark.parametrize("value, result", (
+    ("<a href=\"x\">'&'</a>",
+     "&lt;a href=&#34;x&#34;&gt;&#39;&amp;&#39;&lt;/a&gt;"),
+    ("plain", "plain"),
+    (1, "1"),
+    (None, "None"),
+    (["<"], "[&#39;&lt;&#39;]"),
+    (escape.SafeString("<b>"), "<b>"),
+    (Html(), "<i>html</i>")
+))
+def test_escape(value, result):
+    escaped = escape.escape(value)
+
+    assert escaped == result
+    assert isinstance(escaped, escape.SafeString)
+
+
+def test_mark_safe():
+    assert escape.mark_safe("<b>") == "<b>"
+    assert isinstance(escape.mark_safe("<b>"), escape.SafeString)
+    assert escape.mark_safe(Html()) == "<i>html</i>"
+
+
+def test_autoescape():
+    tpl = template.Template(
+        "<p title='{{ title }}'>{{ body }}{{ html | safe }}</p>"
+        "{{ body | escape }}", autoescape=True)
+    context = {"title": "'", "body": "<b>", "html": "<br>"}
+
+    assert tpl.render(context) == \
+        "<p title='&#39;'>&lt;b&gt;<br></p>&lt;b&gt;"
+
+
+def test_no_autoescape_by_default():
+    tpl = template.Template("{{ body }}{{ body | escape }}")
+
+    assert tpl.render({"body": "<b>"}) == "<b>&lt;b&gt;"
+
+
+def test_autoescape_pickle():
+    tpl = template.Template("{{ body }}", autoescape=True)
+    restored = pickle.loads(pickle.dumps(tpl))
+
+    assert restored.render({"body": "<"}) == "&lt;"
+
+
+def test_repeated_values_are_cached():
+    escape.escape_short_text.cache_clear()
+    tpl = template.Template(
+        "{% loop rows %}{{ item }}{% /loop %}", autoescape=True)
+    long_text = "<p>" * escape.ESCAPE_CACHE_MAX_LENGTH
+    rendered = tpl.render({"rows": ["<a>", "<b>", long_text] * 50})
+
+    info = escape.escape_short_text.cache_info()
+    assert info.misses == 2
+    assert info.hits == 98
+    assert info.currsize == 2
+    assert rendered == ("&lt;a&gt;&lt;b&gt;" +
+                        "&lt;p&gt;" * escape.ESCAPE_CACHE_MAX_LENGTH) * 50
+
+
+def test_merge_literals():
+    nodes = [
+        parser.LiteralNode(
+            lexer.LiteralToken("a\\{", lexer.Position(0, 1, 1))),
+        parser.LiteralNode(lexer.LiteralToken("b")),
+        parser.PrintNode(lexer.PrintToken("{{ c }}")),
+        parser.LiteralNode(lexer.LiteralToken("d"))]
+    merged = parser.merge_literals(nodes)
+
+    assert len(merged) == 3
+    assert merged[0].text == "a{b"
+    assert str(merged[0].token) == "a\\{b"
+    assert merged[0].position == lexer.Position(0, 1, 1)
+    assert merged[1] is nodes[2]
+    assert merged[2] is nodes[3]
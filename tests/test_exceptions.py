@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+
+import collections
+import pickle
+
+import pytest
+
+from curly import exceptions
+from curly import utils
+
+
+class CountingRepr(dict):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+
+    def __repr__(self):
+        self.calls += 1
+        return super().__repr__()
+
+
+def test_no_key_error_is_lazy():
+    context = CountingRepr(a=1)
+    exc = exceptions.CurlyEvaluateNoKeyError(context, "b")
+
+    assert context.calls == 0
+    assert exc.context is context
+    assert exc.key == "b"
+    assert str(exc) == \
+        "Context CountingRepr({'a': 1}) has no key 'b'"
+
+
+def test_failed_lookup_does_not_repr_context():
+    context = CountingRepr(a={"b": 1})
+
+    assert utils.resolve_variable("a.b", context) == 1
+    with pytest.raises(exceptions.CurlyEvaluateNoKeyError):
+        utils.resolve_variable("a.c", context)
+    assert context.calls == 0
+
+
+@pytest.mark.parametrize("context", (
+    {index: "x" * 1000 for index in range(1000)},
+    collections.UserDict({index: index for index in range(100000)}),
+    list(range(100000)),
+    "x" * 100000
+))
+def test_preview_is_bounded(context):
+    exc = exceptions.CurlyEvaluateNoKeyError(context, "key")
+
+    assert len(exceptions.make_preview(context)) <= \
+        exceptions.PREVIEW_LENGTH
+    assert len(str(exc)) < exceptions.PREVIEW_LENGTH + 50
+
+
+def test_preview_small_value_is_repr():
+    value = {"a": [1, 2], "b": "c"}
+
+    assert exceptions.make_preview(value) == repr(value)
+
+
+@pytest.mark.parametrize("exc", (
+    exceptions.CurlyEvaluateNoKeyError({"a": 1}, "b"),
+    exceptions.CurlyParserNoUnfinishedNodeError(),
+    exceptions.CurlyError("Message {0} {name}", 1, name="name")
+))
+def test_pickle(exc):
+    restored = pickle.loads(pickle.dumps(exc))
+
+    assert type(restored) is type(exc)
+    assert str(restored) == str(exc)
+
+
+def test_exceptions_are_value_errors():
+    with pytest.raises(ValueError):
+        raise exceptions.CurlyEvaluateNoKeyError({}, "key")
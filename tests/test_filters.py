@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+
+import datetime
+import pickle
+
+import pytest
+
+from curly import exceptions
+from curly import filters
+from curly import render
+from curly import template
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(filters, "FILTERS", dict(filters.FILTERS))
+
+    return filters.FILTERS
+
+
+@pytest.mark.parametrize("tpl, context, result", (
+    ("{{ name | upper }}", {"name": "Name"}, "NAME"),
+    ("{{ name|lower }}", {"name": "Name"}, "name"),
+    ("{{ name | truncate 5 }}", {"name": "Sergey"}, "Se..."),
+    ("{{ name | truncate 5 \"\" }}", {"name": "Sergey"}, "Serge"),
+    ("{{ name | truncate 10 }}", {"name": "Sergey"}, "Sergey"),
+    ("{{ roles | join \", \" }}", {"roles": ["a", "b"]}, "a, b"),
+    ("{{ roles | join }}", {"roles": ["a", 1]}, "a1"),
+    ("{{ when | date \"%Y-%m\" }}", {"when": datetime.date(2017, 3, 1)},
+     "2017-03"),
+    ("{{ user.name | strip | title }}", {"user": {"name": " a b "}},
+     "A B"),
+    ("{{ roles | length }}", {"roles": [1, 2, 3]}, "3"),
+    ("{% if roles | length %}yes{% /if %}", {"roles": []}, ""),
+    ("{% loop roles | join %}{{ item }};{% /loop %}", {"roles": "ab"},
+     "a;b;"),
+    ("{{ \"a|b\" }}", {"a|b": "literal"}, "literal"),
+    ("{{ \"abc\" | upper }}", {}, "ABC"),
+    ("{{ 12345 | truncate 4 }}", {}, "1...")
+))
+def test_filters(tpl, context, result):
+    assert render(tpl, context) == result
+
+
+@pytest.mark.parametrize("tpl", (
+    "{{ name | unknown }}",
+    "{{ name | }}",
+    "{% if name | upper | unknown 1 %}{% /if %}"
+))
+def test_compile_errors(tpl):
+    with pytest.raises(exceptions.CurlyParserError):
+        template.Template(tpl)
+
+
+def test_filter_error():
+    tpl = template.Template("{{ value | date \"%Y\" }}")
+
+    with pytest.raises(exceptions.CurlyEvaluateFilterError) as excinfo:
+        tpl.render({"value": "string"})
+    assert "Filter date failed on 'string'" in str(excinfo.value)
+
+
+def test_arguments_are_constants():
+    tpl = template.Template("{{ a | truncate 1 -2.5 \"3\" 'x y' z }}")
+    pipeline = tpl.node[0].pipeline
+
+    assert pipeline.varname == "a"
+    assert pipeline.calls[0][1] == (1, -2.5, "3", "x y", "z")
+
+
+def test_register(registry):
+    @filters.register("reverse", pure=True)
+    def reverse_string(value):
+        return value[::-1]
+
+    assert render("{{ name | reverse | upper }}", {"name": "ab"}) == "BA"
+
+
+def test_pure_filters_are_folded(registry):
+    calls = []
+
+    @filters.register(pure=True)
+    def pure(value):
+        calls.append(value)
+        return value + "!"
+
+    @filters.register()
+    def impure(value):
+        calls.append(value)
+        return value + "?"
+
+    tpl = template.Template("{{ 'a' | pure | impure | pure }}")
+    assert calls == ["a"]
+
+    assert tpl.render({}) == "a!?!"
+    assert tpl.render({}) == "a!?!"
+    assert calls == ["a", "a!", "a!?", "a!", "a!?"]
+
+
+def test_expression_is_compiled_once(monkeypatch):
+    tpl = template.Template("{{ name | upper }}")
+    monkeypatch.setattr(filters, "compile_pipeline", None)
+
+    assert tpl.render({"name": "a"}) == "A"
+
+
+def test_pickle(registry):
+    @filters.register()
+    def local(value):
+        return value * 2
+
+    tpl = template.Template("{{ name | local | upper }}")
+    restored = pickle.loads(pickle.dumps(tpl))
+
+    assert restored.render({"name": "a"}) == "AA"
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+
+import pytest
+
+from curly import exceptions
+from curly import incremental
+from curly import template
+
+
+TEXT = (
+    "<h1>{{ title }}</h1>{% if alert %}<b>{{ alert }}</b>{% /if %}"
+    "{% loop hosts %}<li>{{ item.name }}: {{ item.load }}{{ unit }}</li>"
+    "{% /loop %}<p>{{ footer }}</p>")
+
+
+def make_context(**kwargs):
+    context = {
+        "title": "Dashboard",
+        "alert": "",
+        "hosts": [{"name": "a", "load": 1}, {"name": "b", "load": 2}],
+        "unit": "%",
+        "footer": "ok"}
+    context.update(kwargs)
+
+    return context
+
+
+@pytest.fixture
+def tpl():
+    return template.Template(TEXT)
+
+
+@pytest.fixture
+def renderer(tpl):
+    return incremental.IncrementalRenderer(tpl)
+
+
+def check_update(renderer, tpl, context):
+    previous = renderer.output or ""
+    spans = renderer.update(context)
+
+    assert renderer.output == tpl.render(context)
+    assert incremental.apply_spans(previous, spans) == renderer.output
+
+    return spans
+
+
+def test_first_update_renders_everything(renderer, tpl):
+    spans = check_update(renderer, tpl, make_context())
+
+    assert "".join(span.text for span in spans) == renderer.output
+
+
+def test_nothing_changed(renderer, tpl):
+    check_update(renderer, tpl, make_context())
+
+    assert check_update(renderer, tpl, make_context()) == []
+
+
+def test_changed_variable(renderer, tpl):
+    check_update(renderer, tpl, make_context())
+    spans = check_update(renderer, tpl, make_context(title="Hosts"))
+
+    assert spans == [incremental.Span(4, 13, "Hosts")]
+
+
+def test_changed_loop_item(renderer, tpl, monkeypatch):
+    context = make_context()
+    check_update(renderer, tpl, context)
+    context["hosts"][1]["load"] = 5
+
+    rendered = []
+    emit = template.parser.Node.emit
+
+    def counting_emit(node, context):
+        rendered.append(context.get("item"))
+        return emit(node, context)
+
+    monkeypatch.setattr(template.parser.Node, "emit", counting_emit)
+    spans = renderer.update(context)
+    monkeypatch.undo()
+
+    assert rendered == [{"name": "b", "load": 5}]
+    assert renderer.output == tpl.render(context)
+    assert [span.text for span in spans] == ["<li>b: 5%</li>"]
+
+
+def test_loop_body_variable_changed(renderer, tpl):
+    check_update(renderer, tpl, make_context())
+    spans = check_update(renderer, tpl, make_context(unit=" pct"))
+
+    assert [span.text for span in spans] == [
+        "<li>a: 1 pct</li>", "<li>b: 2 pct</li>"]
+
+
+@pytest.mark.parametrize("hosts", (
+    [],
+    [{"name": "a", "load": 1}],
+    [{"name": "c", "load": 0}, {"name": "a", "load": 1},
+     {"name": "b", "load": 2}]))
+def test_loop_length_changed(renderer, tpl, hosts):
+    check_update(renderer, tpl, make_context())
+    check_update(renderer, tpl, make_context(hosts=hosts))
+    check_update(renderer, tpl, make_context())
+
+
+def test_condition_changed(renderer, tpl):
+    check_update(renderer, tpl, make_context())
+    check_update(renderer, tpl, make_context(alert="down"))
+    check_update(renderer, tpl, make_context(alert="up"))
+    check_update(renderer, tpl, make_context())
+
+
+@pytest.mark.parametrize("text", (
+    "{% if c %}{{ c.d }}{% /if %}",
+    "{% loop rows %}{{ c }}{{ c.d }}{% /loop %}"))
+def test_literal_dotted_key(text):
+    tpl = template.Template(text)
+    renderer = incremental.IncrementalRenderer(tpl)
+    context = {"c": {"d": 1}, "c.d": "x", "rows": [1]}
+
+    check_update(renderer, tpl, context)
+    assert check_update(renderer, tpl, dict(context, **{"c.d": "y"}))
+
+
+class Unpicklable:
+
+    def __init__(self):
+        self.rendered = 0
+
+    def __reduce__(self):
+        raise TypeError("Cannot pickle")
+
+    def __str__(self):
+        self.rendered += 1
+        return "x"
+
+
+def test_values_which_cannot_be_fingerprinted():
+    tpl = template.Template("{% loop rows %}{{ item }}{% /loop %}{{ a }}")
+    renderer = incremental.IncrementalRenderer(tpl)
+    value = Unpicklable()
+
+    check_update(renderer, tpl, {"rows": [1], "a": value})
+    assert check_update(renderer, tpl, {"rows": [1], "a": value}) == []
+    assert value.rendered == 4
+
+
+def test_failed_update_drops_cache(renderer, tpl):
+    check_update(renderer, tpl, make_context())
+    context = make_context()
+    del context["unit"]
+
+    with pytest.raises(exceptions.CurlyEvaluateNoKeyError):
+        renderer.update(context)
+    assert renderer.output is None
+    check_update(renderer, tpl, make_context())
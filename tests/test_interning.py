@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+
+import gc
+
+import pytest
+
+from curly import analysis
+from curly import interning
+from curly import parser
+from curly import template
+
+
+LAYOUT = (
+    "<h1>{{ title | upper }}</h1>\n"
+    "{% if user %}<p>Hello, {{ user.name }}!</p>"
+    "{% elif guest %}<p>Hi, guest</p>{% else %}<p>Login</p>{% /if %}\n"
+    "<ul>{% loop posts %}<li>{{ item.title }}</li>{% /loop %}</ul>\n")
+
+CONTEXT = {
+    "title": "Blog",
+    "user": {"name": "Sergey"},
+    "guest": True,
+    "posts": [{"title": "first"}, {"title": "second"}],
+    "footer": "bye"}
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = interning.InternTable()
+    monkeypatch.setattr(interning, "TABLE", table)
+
+    return table
+
+
+def nodes(tpl):
+    return list(parser.walk_tree(tpl.node))[1:]
+
+
+def test_shared(table):
+    first = template.Template(LAYOUT + "{{ footer }}", intern=True)
+    second = template.Template(LAYOUT + "{{ title }}", intern=True)
+
+    assert first.node is not second.node
+    assert all(a is b for a, b in zip(first.node.data[:-1],
+                                      second.node.data[:-1]))
+    assert first.node.data[-1] is not second.node.data[-1]
+    assert first.tokens is None
+    assert all(node.position is None for node in nodes(first))
+    assert table.nodes and table.tokens
+
+
+@pytest.mark.parametrize("kwargs", (
+    {},
+    {"autoescape": True},
+    {"trim_blocks": True},
+    {"undefined": "empty"},
+    {"schema": {"title": str, "user": {"name": str}, "guest": bool,
+                "posts": [{"title": str}]}},
+))
+def test_render(table, kwargs):
+    plain = template.Template(LAYOUT * 2, **kwargs)
+    interned = template.Template(LAYOUT * 2, intern=True, **kwargs)
+
+    assert interned.render(CONTEXT) == plain.render(CONTEXT)
+    assert interned.variables() == plain.variables()
+    assert interned.fingerprint(CONTEXT) == plain.fingerprint(CONTEXT)
+
+
+def test_repeated_subtrees(table):
+    text = "{% loop a %}{{ item }}{% /loop %}{% loop b %}{{ item }}{% /loop %}"
+    first = template.Template(text, intern=True)
+    second = template.Template(text, intern=True)
+    subtrees = nodes(first)
+
+    assert len(set(map(id, subtrees))) == len(subtrees)
+    assert all(a is b for a, b in zip(subtrees, nodes(second)))
+
+    dependencies = analysis.analyze(first.node)
+    assert dependencies[first.node.data[0].data[0]] == frozenset(["a"])
+    assert dependencies[first.node.data[1].data[0]] == frozenset(["b"])
+
+
+def test_options_not_shared(table):
+    text = "<p>{{ a }}</p>"
+    first = template.Template(text, intern=True)
+
+    for kwargs in ({"autoescape": True}, {"undefined": "log"}):
+        other = template.Template(text, intern=True, **kwargs)
+        assert first.node[0] is other.node[0]
+        assert first.node[1] is not other.node[1]
+
+    assert template.Template(text, intern=True, undefined="empty").node[1] \
+        is template.Template(text, intern=True, undefined="empty").node[1]
+
+
+def test_custom_tag(table, monkeypatch):
+    class UpperNode(parser.BlockTagNode):
+
+        def emit(self, context):
+            yield "".join(super().emit(context)).upper()
+
+    monkeypatch.setattr(parser, "BLOCK_TAGS", dict(parser.BLOCK_TAGS))
+    parser.register_block_tag("upper", UpperNode)
+    text = "{% if a %}{% upper %}{{ a }}{% /upper %}{% /if %}"
+    first = template.Template(text, intern=True)
+    second = template.Template(text, intern=True)
+
+    assert first.node[0] is not second.node[0]
+    assert first.node[0][0] is not second.node[0][0]
+    assert first.node[0][0][0] is second.node[0][0][0]
+    assert first.render({"a": "x"}) == "X"
+
+
+def test_weak(table):
+    tpl = template.Template(LAYOUT, intern=True)
+    assert table.nodes
+
+    del tpl
+    gc.collect()
+
+    assert not table.nodes and not table.tokens
+
+
+def test_edit(table):
+    first = template.Template(
+        LAYOUT + "{{ footer }}", intern=True, editable=True)
+    second = template.Template(LAYOUT + "{{ footer }}", intern=True)
+    first.edit(0, 4, "<h2>")
+
+    assert first.source.startswith("<h2>")
+    assert first.node.data[-1] is second.node.data[-1]
+    assert first.render(CONTEXT).startswith("<h2>BLOG</h1>")
+    assert second.render(CONTEXT).startswith("<h1>BLOG</h1>")
+    assert first.render(CONTEXT).endswith("bye")
+
+
+def test_loads(table):
+    tpl = template.Template(LAYOUT)
+    first = template.Template.loads(tpl.dumps(), intern=True)
+    second = template.Template.loads(tpl.dumps(), intern=True)
+
+    assert first.node[0] is second.node[0]
+    assert first.render(CONTEXT) == tpl.render(CONTEXT)
+
+
+def test_repr(table):
+    tpl = template.Template("{{ a }}", intern=True)
+
+    assert tpl.render({"a": 1}) == "1"
+    assert repr(table) == "<InternTable(tokens=1, nodes=1)>"
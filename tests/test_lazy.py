@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+
+import pickle
+import threading
+
+import pytest
+
+from curly import exceptions
+from curly import lazy
+from curly import parser
+from curly import template
+
+
+TEXT = (
+    "<h1>{{ title | upper }}</h1>\n"
+    "{% if user %}\n  <p>Hello, {{ user.name }}!</p>\n"
+    "{%- elif guest -%}\n  <p>Hi, guest</p>\n"
+    "{% else %}\n  <p>Login</p>\n{% /if %}\n"
+    "<ul>\n  {% loop posts %}\n  <li>{{ item.title }}"
+    "{% if item.draft %} (draft){% /if %}</li>\n  {% /loop %}\n</ul>\n"
+    "\\{ escaped \\} {{ footer }}")
+
+CONTEXT = {
+    "title": "Blog",
+    "user": {"name": "<Sergey>"},
+    "guest": True,
+    "posts": [{"title": "first", "draft": True},
+              {"title": "second", "draft": False}],
+    "footer": "bye"}
+
+SCHEMA = {
+    "title": str,
+    "user": {"name": str},
+    "guest": bool,
+    "posts": [{"title": str, "draft": bool}],
+    "footer": str}
+
+
+def signature(tpl):
+    return [(node.__class__, node.position, node.token and node.token.data,
+             node.token and node.token.contents)
+            for node in parser.walk_tree(tpl.node)]
+
+
+def pending(tpl):
+    return [node for node in parser.walk_tree(tpl.node, lazy.is_parsed)
+            if not lazy.is_parsed(node)]
+
+
+@pytest.mark.parametrize("kwargs", (
+    {},
+    {"autoescape": True},
+    {"trim_blocks": True},
+    {"undefined": "empty"},
+    {"schema": SCHEMA},
+))
+@pytest.mark.parametrize("context", (CONTEXT, {
+    "title": "Blog", "user": None, "guest": False, "posts": [],
+    "footer": "bye"}))
+def test_same_as_eager(kwargs, context):
+    eager = template.Template(TEXT, **kwargs)
+    tpl = template.Template(TEXT, lazy=True, **kwargs)
+
+    assert tpl.render(context) == eager.render(context)
+    assert tpl.fingerprint(context) == eager.fingerprint(context)
+    assert tpl.variables() == eager.variables()
+    assert signature(tpl) == signature(eager)
+    assert repr(tpl) == repr(eager)
+    assert not pending(tpl)
+
+
+def test_pending():
+    tpl = template.Template(TEXT, lazy=True)
+    ifnode, loop = tpl.node[3], tpl.node[5]
+
+    assert isinstance(ifnode, lazy.PendingIfNode)
+    assert isinstance(ifnode.elsenode, lazy.PendingIfNode)
+    assert isinstance(ifnode.elsenode.elsenode, lazy.PendingElseNode)
+    assert isinstance(loop, lazy.PendingLoopNode)
+    assert ifnode.position == (29, 2, 1)
+    assert ifnode.elsenode.position == (76, 4, 1)
+
+    tpl.render(dict(CONTEXT, user=None, posts=[]))
+
+    assert isinstance(ifnode, lazy.PendingIfNode)
+    assert ifnode.elsenode.__class__ is parser.IfNode
+    assert isinstance(ifnode.elsenode.elsenode, lazy.PendingElseNode)
+    assert isinstance(loop, lazy.PendingLoopNode)
+
+    tpl.render(CONTEXT)
+
+    assert ifnode.__class__ is parser.IfNode
+    assert loop.__class__ is parser.LoopNode
+    assert loop.vectorized is None
+    assert isinstance(loop[2], parser.IfNode)
+    assert pending(tpl) == [ifnode.elsenode.elsenode]
+
+
+@pytest.mark.parametrize("text", (
+    "{% if a %}",
+    "{% if a %}{% /loop %}",
+    "{% if a %}{% loop b %}{% /if %}{% /loop %}",
+    "{% if a %}{% else %}{% else %}{% /if %}",
+    "{% if a %}{% else %}{% elif b %}{% /if %}",
+    "{% loop a %}{% else %}{% /loop %}",
+    "{% if a %}{% unknown %}{% /if %}",
+    "{% if a %}{% /unknown %}{% /if %}",
+    "{% if a %}{% /if %}{% /if %}",
+    "{% if a | unknown %}{% /if %}",
+    "{% if a %}{% elif a | unknown %}{% /if %}",
+))
+def test_broken(text):
+    with pytest.raises(exceptions.CurlyParserError) as eager_error:
+        template.Template(text)
+    with pytest.raises(exceptions.CurlyParserError) as lazy_error:
+        template.Template(text, lazy=True)
+
+    assert lazy_error.type is eager_error.type
+    assert str(lazy_error.value) == str(eager_error.value)
+
+
+def test_errors_in_bodies():
+    tpl = template.Template(
+        "{% if a %}{{ a | unknown }}{% /if %}", lazy=True)
+
+    assert tpl.render({"a": False}) == ""
+    for _ in range(2):
+        with pytest.raises(exceptions.CurlyParserUnknownFilterError):
+            tpl.render({"a": True})
+
+    tpl = template.Template(
+        "{% loop a %}{{ item.b }}{% /loop %}", lazy=True,
+        schema={"a": [{"c": int}]})
+    with pytest.raises(exceptions.CurlySchemaError):
+        tpl.render({"a": [{"c": 1}]})
+
+
+def test_custom_tags(monkeypatch):
+    class UpperNode(parser.BlockTagNode):
+
+        def emit(self, context):
+            yield "".join(super().emit(context)).upper()
+
+    monkeypatch.setattr(parser, "BLOCK_TAGS", dict(parser.BLOCK_TAGS))
+    parser.register_block_tag("upper", UpperNode)
+    parser.register_block_tag(
+        "otherwise", parser.ElseNode, kind="branch",
+        start=parser.parse_start_else_token)
+    text = ("{% upper %}{% if a %}a{% /if %}{% /upper %}"
+            "{% if b %}{% upper %}b{% /upper %}{% /if %}"
+            "{% if c %}c{% otherwise %}d{% /if %}")
+    tpl = template.Template(text, lazy=True)
+
+    assert isinstance(tpl.node[0][0], lazy.PendingIfNode)
+    assert isinstance(tpl.node[1], lazy.PendingIfNode)
+    assert tpl.node[2].__class__ is parser.IfNode
+    assert tpl.render({"a": 1, "b": 1, "c": 0}) == "ABd"
+    assert repr(tpl) == repr(template.Template(text))
+
+
+def test_replaced_tag(monkeypatch):
+    monkeypatch.setattr(parser, "BLOCK_TAGS", dict(parser.BLOCK_TAGS))
+    parser.register_block_tag(
+        "else", parser.ElseNode, kind="branch",
+        start=parser.parse_start_else_token)
+    tpl = template.Template("{% if a %}a{% else %}b{% /if %}", lazy=True)
+
+    assert not pending(tpl)
+    assert tpl.render({"a": 0}) == "b"
+
+
+def test_threads(monkeypatch):
+    parsed = []
+    parse_body = lazy.parse_body
+    monkeypatch.setattr(
+        lazy, "parse_body",
+        lambda node: parsed.append(node) or parse_body(node))
+
+    tpl = template.Template(TEXT * 20, lazy=True)
+    expected = template.Template(TEXT * 20).render(CONTEXT)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def render():
+        barrier.wait()
+        results.append(tpl.render(CONTEXT))
+
+    threads = [threading.Thread(target=render) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [expected] * 8
+    assert len(parsed) == len(set(map(id, parsed)))
+
+
+def test_pickle():
+    tpl = template.Template(TEXT, lazy=True)
+    loaded = pickle.loads(pickle.dumps(tpl))
+
+    assert pending(loaded)
+    assert loaded.render(CONTEXT) == tpl.render(CONTEXT)
+
+
+def test_dumps():
+    tpl = template.Template(TEXT, lazy=True)
+    loaded = template.Template.loads(tpl.dumps())
+
+    assert loaded.render(CONTEXT) == template.Template(TEXT).render(CONTEXT)
+
+
+def test_edit():
+    tpl = template.Template(TEXT, lazy=True, editable=True)
+    tpl.edit(0, 4, "<h2>")
+
+    assert pending(tpl)
+    assert tpl.render(CONTEXT).startswith("<h2>BLOG</h1>")
+    assert tpl.tokens is None
+
+
+def test_only_text(tmpdir):
+    tmpdir.join("tpl").write_text(TEXT, "utf-8")
+
+    with pytest.raises(ValueError):
+        template.Template.from_file(str(tmpdir.join("tpl")), lazy=True)
+    with pytest.raises(ValueError):
+        template.Template.from_stream([TEXT], lazy=True)
+
+    tpl = template.Template(TEXT.encode("utf-8"), lazy=True)
+    assert tpl.render(CONTEXT) == template.Template(TEXT).render(CONTEXT)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+
+import pickle
+
+import pytest
+
+from curly import metrics
+from curly import Template
+
+
+TEMPLATE = (
+    "{% loop items %}{% if item.show %}{{ item.name }}{% /if %}{% /loop %}")
+
+
+@pytest.fixture
+def sink():
+    return metrics.MetricsSink(buckets=[1.0, 10.0])
+
+
+def test_sink_collects(sink):
+    template = Template(TEMPLATE, observer=sink)
+    items = [{"name": "a", "show": True}, {"name": "б", "show": False}]
+
+    assert template.render({"items": items}) == "a"
+    assert template.render({"items": items * 2}) == "aa"
+
+    snapshot = sink.snapshot()
+    assert snapshot["compiles"] == 1
+    assert snapshot["compile_time"] > 0
+    assert snapshot["renders"] == 2
+    assert snapshot["render_histogram"] == [(1.0, 2), (10.0, 0), (None, 0)]
+    assert snapshot["output_bytes"] == 3
+    assert snapshot["loop_iterations"] == 6
+    assert snapshot["lookups"] == 2 + 6 + 3
+    assert snapshot["lookup_misses"] == 0
+
+
+def test_sink_lookup_misses(sink):
+    template = Template("{{ a }}{{ b }}", observer=sink)
+
+    with pytest.raises(ValueError):
+        template.render({"a": 1})
+
+    template.render({"a": 1, "b": 2})
+    snapshot = sink.snapshot()
+    assert snapshot["renders"] == 1
+    assert snapshot["render_errors"] == 1
+    assert snapshot["lookups"] == 4
+    assert snapshot["lookup_misses"] == 1
+
+
+def test_sink_reset(sink):
+    Template("{{ a }}", observer=sink).render({"a": 1})
+    sink.reset()
+
+    assert sink.snapshot()["renders"] == 0
+
+
+def test_custom_observer():
+    events = []
+
+    class Observer(metrics.Observer):
+
+        def on_render(self, elapsed, output_size, counters):
+            events.append((output_size, counters.lookups))
+
+    Template("{{ a }}", observer=Observer()).render({"a": "ёж"})
+    assert events == [(4, 1)]
+
+
+def test_no_observer_keeps_tree():
+    template = Template(TEMPLATE)
+
+    assert template.instrumented_node is None
+    assert "evaluate_expression" not in vars(template.node[0])
+
+
+def test_pickle_drops_observer(sink):
+    template = pickle.loads(pickle.dumps(Template("{{ a }}", observer=sink)))
+
+    assert template.observer is None
+    assert template.render({"a": 1}) == "1"
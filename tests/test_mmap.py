@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+
+import io
+import pickle
+
+import pytest
+
+from curly import lexer
+from curly import template
+
+
+TEXTS = (
+    "",
+    "no tags { } {} {{ }} %}",
+    "Hello, {{ name }}!\n{% if a %}x{%- elif b -%}y{% else %}z{% /if %}",
+    "{{ 'date' | date \"%Y\" -}} ü€𝄞 {% loop rows %}{{ item }}{% /loop %}",
+    "{{ a \\} }}{ {  {{{ x }}} \\{{ y }} {{ \\{{ }} {{ a-}} end {",
+    "é\n€ {{　a\xa0}} {% if a %}\n\n  {{ b }}{% /if %}",
+    "{{ a }",
+    "{{ a }}" * 10)
+
+
+def signature(tokens):
+    return [(token.contents, token.data, token.position,
+             token.trim_left, token.trim_right) for token in tokens]
+
+
+@pytest.fixture
+def make_file(tmpdir):
+    def make(text):
+        path = tmpdir.join("template.curly")
+        path.write_binary(text.encode("utf-8"))
+        return str(path)
+
+    return make
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_tokenize_mapping(text):
+    tokens = list(lexer.tokenize_mapping(text.encode("utf-8")))
+
+    assert signature(tokens) == signature(lexer.tokenize(text))
+    assert [token.__class__ for token in tokens] == [
+        lexer.LiteralView if token.__class__ is lexer.LiteralToken
+        else token.__class__ for token in lexer.tokenize(text)]
+
+
+def test_literal_view():
+    data = "a\\{é".encode("utf-8")
+    view = lexer.LiteralView(data, 0, len(data))
+
+    assert view.data == "a\\{é"
+    assert view.contents == {"text": "a{é"}
+    assert not view.verbatim
+    assert view.encoded() == "a{é".encode("utf-8")
+
+    view = lexer.LiteralView(data, 3, len(data))
+    assert view.verbatim
+    assert isinstance(view.encoded(), memoryview)
+    assert bytes(view.encoded()) == "é".encode("utf-8")
+
+    restored = pickle.loads(pickle.dumps(view))
+    assert restored.__class__ is lexer.LiteralToken
+    assert restored.data == view.data
+
+
+def test_literal_view_sliced_joined():
+    data = " 　ab c\n".encode("utf-8")
+    view = lexer.LiteralView(data, 0, len(data))
+
+    left = view.sliced(" 　", "")
+    assert isinstance(left, lexer.LiteralView)
+    assert left.data == "ab c\n"
+
+    right = view.sliced("", "c\n")
+    assert right.data == " 　ab "
+    assert right.joined(view.sliced(" 　ab ", "")).data == view.data
+    assert isinstance(right.joined(left), lexer.LiteralToken)
+    assert right.joined(left).data == " 　ab ab c\n"
+
+
+def test_map_file_empty(make_file):
+    assert lexer.map_file(make_file("")) == b""
+
+
+@pytest.mark.parametrize("text", (
+    "",
+    "no tags { } {} %}",
+    TEXTS[2],
+    TEXTS[5],
+    "  {% if a -%}\n x \\{ é\n{%- /if %}\n{% loop rows %} {{ item }}\n"
+    "{% /loop %}"))
+@pytest.mark.parametrize("trim_blocks", (True, False))
+def test_from_file(make_file, text, trim_blocks):
+    context = {"a": 1, "b": 2, "name": "x", "rows": [1, 2]}
+    expected = template.Template(text, trim_blocks=trim_blocks)
+    rendered = expected.render(context)
+    compiled = template.Template.from_file(
+        make_file(text), trim_blocks=trim_blocks)
+    sink = io.BytesIO()
+
+    assert compiled.render(context) == rendered
+    assert compiled.render_to(sink, context) == len(sink.getvalue())
+    assert sink.getvalue() == rendered.encode("utf-8")
+    assert compiled.source_hash == expected.source_hash
+    assert pickle.loads(pickle.dumps(compiled)).render(context) == rendered
+
+
+def test_from_file_keeps_views(make_file):
+    compiled = template.Template.from_file(
+        make_file("é {{ a }}\n{% if a %} b {% /if %}"))
+
+    assert [node.token.__class__ for node in compiled.node][::2] == [
+        lexer.LiteralView, lexer.LiteralView]
+    assert compiled.node[1].position == lexer.Position(2, 1, 3)
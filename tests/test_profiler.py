@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+
+import itertools
+
+from curly import cli
+from curly import parser
+from curly import profiler
+from curly import Template
+
+
+TEMPLATE = """\
+Hello {{ name }}
+{% loop items %}{% if item %}{{ item }}{% else %}-{% /if %}{% /loop %}"""
+
+
+def make_timer():
+    return itertools.count().__next__
+
+
+def test_profile_output():
+    template = Template(TEMPLATE)
+    profile = template.profile({"name": "World", "items": [1, 0, "ё"]})
+
+    assert profile.output == "Hello World\n1-ё"
+    assert profile.root.emitted == len(profile.output.encode("utf-8"))
+
+
+def test_profile_does_not_touch_template():
+    template = Template(TEMPLATE)
+    template.profile({"name": "World", "items": [1]})
+
+    nodes = [template.node]
+    while nodes:
+        node = nodes.pop()
+        assert "emit" not in vars(node)
+        assert "expand" not in vars(node)
+        nodes.extend(node)
+
+
+def test_profile_stats():
+    template = Template(TEMPLATE)
+    profile = profiler.profile(
+        template, {"name": "World", "items": [1, 0, 2]}, timer=make_timer())
+    stats = {item.label: item for item in profile.stats}
+
+    loop = stats["LoopNode@2:1 {% loop items %}"]
+    assert loop.calls == 1
+    assert stats["IfNode@2:17 {% if item %}"].calls == 3
+    assert stats["PrintNode@2:30 {{ item }}"].calls == 2
+    assert stats["ElseNode@2:40 {% else %}"].calls == 1
+
+    for item in profile.stats:
+        assert item.exclusive >= 0
+        assert item.inclusive == item.exclusive + sum(
+            child.inclusive for child in item.children)
+        assert item.exclusive_emitted >= 0
+    assert loop.emitted == 3
+
+
+def test_profile_custom_emit(monkeypatch):
+    class UpperNode(parser.BlockTagNode):
+
+        def emit(self, context):
+            yield "".join(super().emit(context)).upper()
+
+    monkeypatch.setattr(parser, "BLOCK_TAGS", dict(parser.BLOCK_TAGS))
+    parser.register_block_tag("upper", UpperNode)
+    template = Template(
+        "a{% upper %}b{% if x %}{{ x }}{% /if %}{% /upper %}c")
+    profile = profiler.profile(template, {"x": "d"}, timer=make_timer())
+    stats = {item.label.split("@")[0]: item for item in profile.stats}
+
+    assert profile.output == "aBDc"
+    assert profile.root.emitted == 4
+    assert stats["UpperNode"].calls == 1
+    assert stats["UpperNode"].emitted == 2
+    assert stats["PrintNode"].calls == 1
+    for item in profile.stats:
+        assert item.exclusive >= 0
+        assert item.inclusive == item.exclusive + sum(
+            child.inclusive for child in item.children)
+
+
+def test_profile_collapsed():
+    template = Template(TEMPLATE)
+    profile = profiler.profile(
+        template, {"name": "World", "items": [1]}, timer=make_timer())
+    lines = profile.collapsed().splitlines()
+
+    assert "RootNode;PrintNode@1:7 {{ name }} 2000000" in lines
+    for line in lines:
+        stack, weight = line.rsplit(" ", 1)
+        assert stack.startswith("RootNode")
+        assert int(weight) > 0
+
+
+def test_cli_profile(tmpdir, capsys):
+    tmpdir.join("tpl").write(TEMPLATE)
+    cli.main(["profile", "-c", str(tmpdir.join("folded")),
+              str(tmpdir.join("tpl")), '{"name": "a", "items": [1]}'])
+
+    out, _ = capsys.readouterr()
+    assert out.splitlines()[0].split() == [
+        "calls", "incl,", "ms", "excl,", "ms", "bytes", "location", "node"]
+    assert tmpdir.join("folded").read().startswith("RootNode")
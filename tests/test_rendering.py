@@ -5,7 +5,9 @@ import itertools
 
 import pytest
 
+from curly import exceptions
 from curly import render
+from curly import template
 
 
 @pytest.mark.parametrize("tpl", (
@@ -95,3 +97,30 @@ def test_mixed_statements(one, another):
 def test_literal_replacement():
     tpl = r"\{\{"
     assert render(tpl, {}) == "{{"
+
+
+@pytest.mark.parametrize("opening, middle, closing, context, result", (
+    ("{% if a %}", "{{ a }}", "{% /if %}", {"a": 1}, "1"),
+    ("{% if b %}{% else %}", "{{ a }}", "{% /if %}", {"a": 1, "b": 0}, "1"),
+    ("{% loop items %}", "{{ item }}", "{% /loop %}", {"items": [1]}, "1"),
+    ("<{% if a %}", "x", "{% /if %}>", {"a": 1}, "<" * 10000 + "x" +
+     ">" * 10000),
+))
+def test_deep_nesting(opening, middle, closing, context, result):
+    tpl = template.Template(
+        opening * 10000 + middle + closing * 10000, trim_blocks=True)
+
+    assert tpl.render(context) == result
+    assert b"".join(tpl.node.emit_bytes(context)) == result.encode("utf-8")
+
+
+def test_deep_nesting_not_closed():
+    with pytest.raises(exceptions.CurlyParserFoundNotDoneError):
+        template.Template("{% if a %}" * 10000 + "{% /if %}" * 9999)
+
+
+def test_wide_tree():
+    tpl = template.Template("{{ a }}{% if a %}-{% /if %}" * 20000)
+
+    assert len(tpl.node) == 40000
+    assert tpl.render({"a": 1}) == "1-" * 20000
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+
+import collections
+import dataclasses
+import pickle
+import typing
+
+import pytest
+
+from curly import exceptions
+from curly import parser
+from curly import schema
+from curly import template
+
+
+class Profile(typing.TypedDict):
+    name: str
+    roles: typing.List[str]
+
+
+@dataclasses.dataclass
+class User:
+    name: str
+    profile: Profile
+
+    @property
+    def upper_name(self):
+        return self.name.upper()
+
+
+Point = collections.namedtuple("Point", ["x", "y"])
+
+
+def accessors(tpl):
+    return {
+        node.pipeline.varname: node.accessor
+        for node in parser.walk_tree(tpl.node)
+        if getattr(node, "accessor", None) is not None}
+
+
+@pytest.mark.parametrize("spec, expected", (
+    (str, schema.ScalarSchema),
+    (typing.Any, schema.AnySchema),
+    (object, schema.AnySchema),
+    ({"a": int}, schema.MappingSchema),
+    ([int], schema.SequenceSchema),
+    (typing.List[int], schema.SequenceSchema),
+    (typing.Tuple[int, ...], schema.SequenceSchema),
+    (typing.Dict[str, int], schema.MappingSchema),
+    (typing.Optional[typing.List[int]], schema.SequenceSchema),
+    (typing.Union[int, str], schema.AnySchema),
+    (Profile, schema.MappingSchema),
+    (User, schema.ObjectSchema),
+    (Point, schema.ObjectSchema)))
+def test_make_schema(spec, expected):
+    assert isinstance(schema.make_schema(spec), expected)
+
+
+@pytest.mark.parametrize("spec", ([], [int, str], 1))
+def test_make_schema_unsupported(spec):
+    with pytest.raises(ValueError):
+        schema.make_schema(spec)
+
+
+@pytest.mark.parametrize("varname, source", (
+    ("user", "context['user']"),
+    ("user.name", "context['user'].name"),
+    ("user.upper_name", "context['user'].upper_name"),
+    ("user.profile.roles.0", "context['user'].profile['roles'][0]"),
+    ("point.x", "context['point'].x"),
+    ("data", "context['data']"),
+    ("data.a.b", "find_variable('a.b', context['data'])"),
+    ("counts.a", "context['counts']['a']"),
+    ("a.b", "context['a.b']")))
+def test_resolve(varname, source):
+    context_schema = schema.make_schema({
+        "user": User,
+        "point": Point,
+        "data": typing.Any,
+        "counts": typing.Dict[str, int],
+        "a.b": int})
+    accessor, _ = schema.resolve(context_schema, varname)
+
+    assert accessor.source == source
+
+
+@pytest.mark.parametrize("varname", (
+    "unknown", "user.email", "user.name.first", "point.z", "user.profile.x"))
+def test_resolve_unknown(varname):
+    context_schema = schema.make_schema({"user": User, "point": Point})
+
+    assert schema.resolve(context_schema, varname) is None
+
+
+def test_template_renders_with_schema():
+    spec = {"user": User, "rows": [{"a": int, "b": [str]}]}
+    tpl = template.Template(
+        "{{ user.profile.name | upper }} {{ user.upper_name }}"
+        "{% loop rows %}{% if item.a %}{{ item.b.0 }}{% /if %}{% /loop %}",
+        schema=spec)
+    context = {
+        "user": User("Sergey", {"name": "sergey", "roles": []}),
+        "rows": [{"a": 1, "b": ["x"]}, {"a": 0, "b": ["y"]}]}
+
+    assert tpl.render(context) == "SERGEY SERGEYx"
+    assert set(accessors(tpl)) == {
+        "user.profile.name", "user.upper_name", "rows", "item.a", "item.b.0"}
+
+
+def test_loop_over_dict_with_schema():
+    tpl = template.Template(
+        "{% loop data %}{{ item.key }}={{ item.value.x }};{% /loop %}",
+        schema={"data": typing.Dict[str, Point]})
+
+    assert tpl.render({"data": {"b": Point(2, 0), "a": Point(1, 0)}}) == \
+        "a=1;b=2;"
+
+
+def test_unknown_variables():
+    with pytest.raises(exceptions.CurlySchemaError) as excinfo:
+        template.Template(
+            "{{ user.name }}\n{% if user.email %}"
+            "{% loop user.roles %}{{ item.id }}{% /loop %}{% /if %}",
+            schema={"user": {"name": str, "roles": [str]}})
+
+    assert [varname for varname, _ in excinfo.value.unknown] == \
+        ["user.email", "item.id"]
+    assert str(excinfo.value) == \
+        "Unknown variables: user.email at 2:1, item.id at 2:41"
+
+
+def test_item_is_unknown_outside_of_loop():
+    with pytest.raises(exceptions.CurlySchemaError):
+        template.Template(
+            "{% loop rows %}{% /loop %}{{ item }}", schema={"rows": [int]})
+
+
+@pytest.mark.parametrize("context", (
+    {"user": {"name": "a", "roles": {"0": "z"}}},
+    {"user": {"name": "a", "roles": "xyz"}},
+    {"user": type("User", (), {"name": "a", "roles": ["x"]})()}))
+def test_fallback_if_context_does_not_match(context):
+    text = "{{ user.name }}{% if user.roles %}{{ user.roles.0 }}{% /if %}"
+    tpl = template.Template(text, schema={"user": {"name": str,
+                                                   "roles": [str]}})
+
+    assert tpl.render(context) == template.Template(text).render(context)
+
+
+def test_missing_variable_with_schema():
+    tpl = template.Template(
+        "{{ user.name }}", schema={"user": {"name": str}},
+        undefined="empty")
+
+    assert tpl.render({"user": {}}) == ""
+    with pytest.raises(exceptions.CurlyEvaluateNoKeyError):
+        template.Template(
+            "{{ user.name }}", schema={"user": {"name": str}}).render({})
+
+
+def test_root_schema_should_be_mapping():
+    with pytest.raises(ValueError):
+        template.Template("{{ a }}", schema=[int])
+
+
+def test_pickle_template_with_schema():
+    tpl = template.Template(
+        "{{ user.profile.roles.1 }}", schema={"user": User})
+    restored = pickle.loads(pickle.dumps(tpl))
+    context = {"user": User("a", {"name": "a", "roles": ["x", "y"]})}
+
+    assert restored.render(context) == "y"
+    assert accessors(restored)["user.profile.roles.1"].source == \
+        "context['user'].profile['roles'][1]"
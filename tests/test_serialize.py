@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+
+import pickle
+import struct
+
+import pytest
+
+from curly import exceptions
+from curly import filters
+from curly import metrics
+from curly import parser
+from curly import serialize
+from curly import template
+from curly import undefined
+
+
+TEXT = (
+    "<h1>{{ title | upper }}</h1>\\{ escaped \\}\n"
+    "{% if user %}<p>Hello, {{ user.name }}!</p>"
+    "{% elif guest %}<p>Hi, {{ 'guest' | upper }}</p>"
+    "{% else %}<p>Login</p>{% /if %}\n"
+    "<ul>{% loop posts %}<li>{{ item.title | truncate 3 }}</li>"
+    "{% /loop %}</ul>\n"
+    "{%- loop posts -%}\n{{ item.title | truncate 2 '.' }}\n{%- /loop %}"
+    "<p>{{ footer }} — ✓</p>")
+
+CONTEXT = {
+    "title": "Blog",
+    "user": {"name": "<Sergey>"},
+    "guest": True,
+    "posts": [{"title": "first"}, {"title": "second"}],
+    "footer": "bye"}
+
+
+def signature(tpl):
+    return [(node.__class__, node.position, node.token and node.token.data,
+             node.token and node.token.contents)
+            for node in parser.walk_tree(tpl.node)]
+
+
+def check_roundtrip(tpl, context=CONTEXT, **kwargs):
+    loaded = template.Template.loads(tpl.dumps(), **kwargs)
+
+    assert repr(loaded) == repr(tpl)
+    assert signature(loaded) == signature(tpl)
+    assert loaded.source_hash == tpl.source_hash
+    assert loaded.variables() == tpl.variables()
+    assert loaded.fingerprint(context) == tpl.fingerprint(context)
+    assert loaded.render(context) == tpl.render(context)
+
+    return loaded
+
+
+@pytest.mark.parametrize("kwargs", (
+    {},
+    {"autoescape": True},
+    {"trim_blocks": True},
+    {"undefined": "empty"},
+    {"undefined": "log"},
+    {"undefined": undefined.default(-1.5)},
+))
+def test_roundtrip(kwargs):
+    tpl = template.Template(TEXT, **kwargs)
+    loaded = check_roundtrip(tpl)
+
+    assert loaded.undefined.__class__ is tpl.undefined.__class__
+    assert loaded.autoescape == tpl.autoescape
+    assert loaded.trim_blocks == tpl.trim_blocks
+    if "undefined" in kwargs:
+        assert loaded.render({"posts": []}) == tpl.render({"posts": []})
+
+
+@pytest.mark.parametrize("text", (
+    "",
+    "text",
+    "{{ a }}",
+    "{% if a %}{% /if %}",
+    "{% loop a %}{{ item }}{% /loop %}",
+    "{{ '' | upper }}{{ 'x y' | upper }}{{ 'abc' | length }}",
+    "{{ a | truncate 100000000000000000000000 }}{{ a | join '' }}",
+    "\ud800 surrogate {{ a }}",
+))
+def test_roundtrip_texts(text):
+    check_roundtrip(template.Template(text), {"a": [1, 2]})
+
+
+def test_roundtrip_mapped_file(tmpdir):
+    tmpdir.join("tpl").write_text(TEXT, "utf-8")
+    tpl = template.Template.from_file(str(tmpdir.join("tpl")))
+    loaded = template.Template.loads(tpl.dumps())
+
+    assert repr(loaded) == repr(pickle.loads(pickle.dumps(tpl)))
+    assert loaded.render(CONTEXT) == tpl.render(CONTEXT)
+
+
+def test_roundtrip_deep():
+    depth = 10000
+    tpl = template.Template(
+        "{% if a %}" * depth + "{{ a }}" + "{% /if %}" * depth)
+
+    assert template.Template.loads(tpl.dumps()).render({"a": 1}) == "1"
+
+
+def test_vectorized():
+    loaded = check_roundtrip(template.Template(TEXT))
+    loops = [node for node in parser.walk_tree(loaded.node)
+             if isinstance(node, parser.LoopNode)]
+
+    assert loops and all(loop.vectorized is not None for loop in loops)
+
+
+def test_schema():
+    schema = {"title": str, "posts": [{"title": str}]}
+    text = "{{ title }}{% loop posts %}{{ item.title }}{% /loop %}"
+    loaded = check_roundtrip(
+        template.Template(text, schema=schema), schema=schema)
+
+    assert loaded.schema is schema
+    assert all(node.accessor is not None
+               for node in parser.walk_tree(loaded.node)
+               if isinstance(node, parser.ExpressionMixin))
+
+    with pytest.raises(exceptions.CurlySchemaError):
+        template.Template.loads(loaded.dumps(), schema={"title": str})
+
+
+def test_observer():
+    sink = metrics.MetricsSink()
+    loaded = template.Template.loads(
+        template.Template(TEXT).dumps(), observer=sink)
+    loaded.render(CONTEXT)
+
+    assert sink.snapshot()["renders"] == 1
+
+
+def test_pickle_loaded():
+    loaded = template.Template.loads(template.Template(TEXT).dumps())
+
+    assert pickle.loads(pickle.dumps(loaded)).render(CONTEXT) == \
+        loaded.render(CONTEXT)
+
+
+def test_smaller_than_pickle():
+    tpl = template.Template(TEXT * 10)
+
+    assert len(tpl.dumps()) * 4 < len(pickle.dumps(tpl))
+
+
+def test_edit_loaded():
+    loaded = template.Template.loads(template.Template(TEXT).dumps())
+
+    with pytest.raises(ValueError):
+        loaded.edit(0, 0, "x")
+
+
+def test_unstored_pipeline(monkeypatch):
+    monkeypatch.setattr(filters, "FILTERS", dict(filters.FILTERS))
+    filters.register("split", pure=True)(str.split)
+    tpl = template.Template("{% loop 'a b' | split %}{{ item }}{% /loop %}")
+
+    assert tpl.render({}) == "ab"
+    check_roundtrip(tpl, {})
+
+
+def test_unknown_filter(monkeypatch):
+    monkeypatch.setattr(filters, "FILTERS", dict(filters.FILTERS))
+    filters.register("twice")(lambda value: value * 2)
+    data = template.Template("{{ a | twice }}").dumps()
+    del filters.FILTERS["twice"]
+
+    with pytest.raises(exceptions.CurlySerializationError):
+        template.Template.loads(data)
+
+
+class UpperNode(parser.BlockTagNode):
+
+    def emit(self, context):
+        yield "".join(super().emit(context)).upper()
+
+
+def test_custom_tag(monkeypatch):
+    monkeypatch.setattr(parser, "BLOCK_TAGS", dict(parser.BLOCK_TAGS))
+    parser.register_block_tag("upper", UpperNode)
+    tpl = template.Template(
+        "{% upper %}a{% if b %}{{ b }}{% /if %}{% /upper %}c",
+        undefined="empty")
+    data = tpl.dumps()
+
+    loaded = check_roundtrip(tpl, {"b": "b"})
+    assert loaded.render({}) == "Ac"
+
+    del parser.BLOCK_TAGS["upper"]
+    with pytest.raises(exceptions.CurlySerializationError):
+        template.Template.loads(data)
+    with pytest.raises(exceptions.CurlySerializationError):
+        tpl.dumps()
+
+
+def test_custom_policy():
+    class Policy(undefined.EmptyUndefined):
+        pass
+
+    with pytest.raises(exceptions.CurlySerializationError):
+        template.Template("{{ a }}", undefined=Policy()).dumps()
+
+
+def test_unsupported_constant():
+    with pytest.raises(exceptions.CurlySerializationError):
+        template.Template("{{ a }}", undefined=undefined.default([])).dumps()
+
+
+@pytest.mark.parametrize("corrupt", (
+    lambda data: b"",
+    lambda data: b"garbage",
+    lambda data: b"PICK" + data[4:],
+    lambda data: data[:4] + bytes([serialize.FORMAT_VERSION + 1]) + data[5:],
+    lambda data: data[:5] + b"x" + data[6:],
+    lambda data: data[:-1],
+    lambda data: data + b"\x00",
+    lambda data: data[:serialize.HEADER.size],
+))
+def test_broken(corrupt):
+    data = corrupt(template.Template(TEXT).dumps())
+
+    with pytest.raises(exceptions.CurlySerializationError):
+        template.Template.loads(data)
+
+
+def test_broken_records():
+    data = bytearray(template.Template("{{ a }}").dumps())
+    fields = list(serialize.HEADER.unpack_from(data))
+    fields[-1] += 1
+    data[:serialize.HEADER.size] = serialize.HEADER.pack(*fields)
+    data.append(0)
+
+    with pytest.raises(exceptions.CurlySerializationError):
+        template.Template.loads(bytes(data))
+
+
+@pytest.mark.parametrize("text, old, new", (
+    ("{{ a | truncate 987654 }}", b"truncate987654", b"truncate98765x"),
+    ("{{ a | truncate 2.5e3 }}", b"2500.0", b"2500.x"),
+    ("{% loop 'a b' | split %}{{ item }}{% /loop %}",
+     b"{% loop 'a b'", b"{! loop 'a b'"),
+    ("{% loop 'a b' | split %}{{ item }}{% /loop %}",
+     b"'a b' | split", b"'a b' | ^plit"),
+))
+def test_broken_strings(monkeypatch, text, old, new):
+    monkeypatch.setattr(filters, "FILTERS", dict(filters.FILTERS))
+    filters.register("split", pure=True)(str.split)
+    data = template.Template(text).dumps()
+    assert data.count(old) == 1
+
+    with pytest.raises(exceptions.CurlySerializationError):
+        template.Template.loads(data.replace(old, new))
+
+
+def test_broken_bytes():
+    data = template.Template(TEXT).dumps()
+    state = 1
+
+    for _ in range(1000):
+        broken = bytearray(data)
+        for _ in range(3):
+            # Linear congruential generator, to be independent of random.
+            state = (state * 1103515245 + 12345) % 2 ** 31
+            broken[state % len(broken)] = state % 256
+        try:
+            template.Template.loads(bytes(broken))
+        except exceptions.CurlySerializationError:
+            pass
+
+
+def test_header():
+    data = template.Template("{{ a }}").dumps()
+    magic, version, typecode, hash_size = struct.unpack_from("<4sBcB", data)
+
+    assert serialize.is_dump(data)
+    assert not serialize.is_dump(b"{{ a }}")
+    assert (magic, version, typecode, hash_size) == \
+        (serialize.MAGIC, serialize.FORMAT_VERSION, b"B", 32)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+
+import io
+
+import pytest
+
+from curly import lexer
+from curly import template
+
+
+TEXTS = (
+    "",
+    "no tags { } {} {{ }} %}",
+    "Hello, {{ name }}!\n{% if a %}x{%- elif b -%}y{% else %}z{% /if %}",
+    "{{ 'date' | date \"%Y\" -}} ü€𝄞 {% loop rows %}{{ item }}{% /loop %}",
+    "{{ a \\} }}{ {  {{{ x }}} \\{{ y }} {{ \\{{ }} {{ a-}} end {",
+    "{{\\}}}{{ a\\\\}}{% a \\{% b %}{{%  if\n/\\%}}",
+    "{{ a }",
+    "{{ a }}" * 10)
+
+
+def signature(tokens):
+    return [(token.__class__, token.data, token.position, token.contents,
+             token.trim_left, token.trim_right) for token in tokens]
+
+
+@pytest.mark.parametrize("text", TEXTS)
+@pytest.mark.parametrize("chunk_size", (1, 2, 3, 5, 8, 1024))
+@pytest.mark.parametrize("binary", (True, False))
+def test_tokenize_stream(text, chunk_size, binary):
+    fileobj = io.BytesIO(text.encode("utf-8")) if binary \
+        else io.StringIO(text)
+
+    assert signature(lexer.tokenize_stream(fileobj, chunk_size)) == \
+        signature(lexer.tokenize(text))
+
+
+def test_tokenize_stream_from_chunks():
+    text = "{{ a }}€ {% if b %}{{ c }}{% /if %}"
+    data = text.encode("utf-8")
+    chunks = [data[index:index + 1] for index in range(len(data))]
+
+    assert signature(lexer.tokenize_stream(iter(chunks))) == \
+        signature(lexer.tokenize(text))
+    assert signature(lexer.tokenize_stream(["", text[:3], "", text[3:]])) \
+        == signature(lexer.tokenize(text))
+
+
+def test_tokenize_stream_invalid_utf8():
+    with pytest.raises(UnicodeDecodeError):
+        list(lexer.tokenize_stream(io.BytesIO(b"{{ a }}\xe2\x82")))
+
+
+def test_tokenize_stream_reads_by_chunks():
+    sizes = []
+
+    class File(io.StringIO):
+
+        def read(self, size=-1):
+            sizes.append(size)
+            return super().read(size)
+
+    tokens = lexer.tokenize_stream(File("{{ a }} b" * 100), 16)
+    next(tokens)
+
+    assert sizes == [16]
+
+
+@pytest.mark.parametrize("chunk_size", (1, 7, 1024))
+def test_template_from_stream(chunk_size):
+    text = TEXTS[2]
+    context = {"name": "Sergey", "a": False, "b": True}
+    streamed = template.Template.from_stream(
+        io.BytesIO(text.encode("utf-8")), chunk_size=chunk_size,
+        autoescape=True)
+    expected = template.Template(text, autoescape=True)
+
+    assert streamed.render(context) == expected.render(context)
+    assert streamed.source_hash == expected.source_hash
+    assert streamed.fingerprint(context) == expected.fingerprint(context)
+    assert repr(streamed) == repr(expected)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+
+import pickle
+
+import pytest
+
+from curly import exceptions
+from curly import lexer
+from curly import parser
+from curly import render
+from curly import template
+
+
+class UpperNode(parser.BlockTagNode):
+
+    def emit(self, context):
+        yield "".join(super().emit(context)).upper()
+
+
+class RepeatNode(parser.BlockTagNode):
+
+    def emit(self, context):
+        body = "".join(super().emit(context))
+        yield body * self.evaluate_expression(context)
+
+
+class NowNode(parser.BlockTagNode):
+
+    def emit(self, context):
+        yield "<{0}>".format(self.evaluate_expression(context))
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(parser, "BLOCK_TAGS", dict(parser.BLOCK_TAGS))
+    parser.register_block_tag("upper", UpperNode)
+    parser.register_block_tag("repeat", RepeatNode)
+    parser.register_block_tag("now", NowNode, kind="single")
+
+    return parser.BLOCK_TAGS
+
+
+def test_builtin_tags():
+    assert sorted(parser.BLOCK_TAGS) == ["elif", "else", "if", "loop"]
+    assert parser.BLOCK_TAGS["if"].kind == "block"
+    assert parser.BLOCK_TAGS["elif"].kind == "branch"
+    assert parser.BLOCK_TAGS["elif"].end is None
+
+
+@pytest.mark.parametrize("tpl, result", (
+    ("{% upper %}a{{ name }}{% /upper %}", "AB"),
+    ("{% repeat count %}{{ name }}{% /repeat %}", "bbb"),
+    ("{% now name %}", "<b>"),
+    ("{% loop items %}{% upper %}{{ item }}{% /upper %}{% /loop %}", "XY"),
+    ("{% repeat count %}{% if name %}{% now name %}{% /if %}{% /repeat %}",
+     "<b><b><b>"),
+    ("{% upper %}{% upper %}a{% /upper %}b{% /upper %}", "AB"),
+))
+def test_render(registry, tpl, result):
+    context = {"name": "b", "count": 3, "items": "xy"}
+
+    assert render(tpl, context) == result
+
+
+def test_variables(registry):
+    tpl = template.Template(
+        "{% upper %}{% now name %}{% /upper %}",
+        schema={"name": str})
+
+    assert tpl.variables() == ("name",)
+    assert tpl.render({"name": "b"}) == "<B>"
+
+
+def test_pickle(registry):
+    tpl = template.Template("{% upper %}{{ name }}{% /upper %}")
+
+    assert pickle.loads(pickle.dumps(tpl)).render({"name": "b"}) == "B"
+
+
+def test_edit(registry):
+    tpl = template.Template(
+        "{% upper %}a{% /upper %}{% now name %}", editable=True)
+    tpl.edit(11, 12, "{% now name %}{% repeat count %}c{% /repeat %}")
+
+    assert tpl.render({"name": "b", "count": 2}) == "<B>CC<b>"
+
+
+def test_custom_parsers(registry):
+    calls = []
+
+    def start(stack, token):
+        calls.append(token.contents["function"])
+        return parser.parse_literal_token(
+            stack, lexer.LiteralToken("!", token.position))
+
+    parser.register_block_tag("bang", None, kind="single", start=start)
+
+    assert render("a{% bang %}b", {}) == "a!b"
+    assert calls == ["bang"]
+
+
+@pytest.mark.parametrize("tpl, exc", (
+    ("{% unknown %}", exceptions.CurlyParserUnknownStartBlockError),
+    ("{% /unknown %}", exceptions.CurlyParserUnknownEndBlockError),
+    ("{% now name %}{% /now %}", exceptions.CurlyParserUnknownEndBlockError),
+    ("{% /elif %}", exceptions.CurlyParserUnknownEndBlockError),
+    ("{% upper %}", exceptions.CurlyParserFoundNotDoneError),
+    ("{% upper %}{% /loop %}",
+     exceptions.CurlyParserUnexpectedUnfinishedNodeError),
+))
+def test_errors(registry, tpl, exc):
+    with pytest.raises(exc):
+        template.Template(tpl)
+
+
+@pytest.mark.parametrize("kwargs", (
+    {"kind": "unknown"},
+    {"kind": "branch"},
+))
+def test_register_errors(registry, kwargs):
+    with pytest.raises(ValueError):
+        parser.register_block_tag("tag", UpperNode, **kwargs)
+
+
+def test_unknown_token():
+    with pytest.raises(exceptions.CurlyParserUnknownTokenError):
+        parser.parse_tokens([object()])
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+
+import pytest
+
+from curly import lexer
+from curly import parser
+from curly import template
+
+
+@pytest.mark.parametrize("text, left, right", (
+    ("{{ a }}", False, False),
+    ("{{- a }}", True, False),
+    ("{{ a -}}", False, True),
+    ("{{-a-}}", True, True),
+    ("{%- if a -%}", True, True),
+    ("{%if-%}", False, True),
+    ("{%- /if %}", True, False),
+    ("{%-/if-%}", True, True)
+))
+def test_trim_markers(text, left, right):
+    token, = lexer.tokenize(text)
+
+    assert token.trim_left is left
+    assert token.trim_right is right
+
+
+@pytest.mark.parametrize("text, expression", (
+    ("{{ a-b }}", ["a-b"]),
+    ("{{-a-}}", ["a"]),
+    ("{% if a -%}", ["a"]),
+    ("{%if-%}", [""])
+))
+def test_expression_without_markers(text, expression):
+    token, = lexer.tokenize(text)
+
+    assert token.contents["expression"] == expression
+
+
+@pytest.mark.parametrize("text, result", (
+    ("a  {{- b -}}  c", "a1c"),
+    ("a \n {{- b }} c", "a1 c"),
+    ("{% if b -%}\n  x\n  {%- /if %}", "x"),
+    ("  {%- if b %}x{% /if -%}  ", "x"),
+    ("{{- b -}}", "1")
+))
+def test_trim_render(text, result):
+    assert template.Template(text).render({"b": 1}) == result
+
+
+TRIM_BLOCKS_TEMPLATE = """\
+<ul>
+  {% loop items %}
+  <li>{{ item }}</li>
+  {% /loop %}
+</ul>
+{% if flag %}
+  {% if flag %}
+  yes
+  {% /if %}
+{% /if %}
+{{ flag }} {% if flag %}inline{% /if %}
+"""
+
+
+def test_trim_blocks():
+    tpl = template.Template(TRIM_BLOCKS_TEMPLATE, trim_blocks=True)
+
+    assert tpl.render({"items": [1, 2], "flag": True}) == (
+        "<ul>\n  <li>1</li>\n  <li>2</li>\n</ul>\n  yes\nTrue inline")
+
+
+def test_trim_blocks_disabled():
+    tpl = template.Template(TRIM_BLOCKS_TEMPLATE)
+
+    assert tpl.render({"items": [], "flag": False}) == (
+        "<ul>\n  \n</ul>\n\nFalse \n")
+
+
+def test_trim_is_done_at_parse_time():
+    tokens = list(parser.trim_tokens(
+        lexer.tokenize("a\n  {% if b %}\n  c{{ d -}}\n"), trim_blocks=True))
+
+    assert [str(token) for token in tokens] == [
+        "a\n", "{% if b %}", "  c", "{{ d -}}"]
+    assert tokens[2].position == lexer.Position(15, 3, 1)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+
+import collections
+import pickle
+
+import pytest
+
+from curly import exceptions
+from curly import metrics
+from curly import template
+from curly import undefined
+from curly import utils
+
+
+TEMPLATE = (
+    "[{{ name }}]{% if admin %}admin{% else %}user{% /if %}"
+    "{% loop rows %}<{{ item.title }}>{% /loop %}")
+
+
+@pytest.fixture
+def counted_exceptions(monkeypatch):
+    created = []
+
+    def init(self, *args, **kwargs):
+        created.append(self)
+        original_init(self, *args, **kwargs)
+
+    original_init = exceptions.CurlyError.__init__
+    monkeypatch.setattr(exceptions.CurlyError, "__init__", init)
+
+    return created
+
+
+def test_strict_is_default():
+    with pytest.raises(exceptions.CurlyEvaluateNoKeyError):
+        template.Template(TEMPLATE).render({})
+
+
+def test_strict_by_name():
+    with pytest.raises(exceptions.CurlyEvaluateNoKeyError):
+        template.Template(TEMPLATE, undefined="strict").render({})
+
+
+def test_empty(counted_exceptions):
+    tpl = template.Template(TEMPLATE, undefined="empty")
+
+    assert tpl.render({}) == "[]user"
+    assert tpl.render({"rows": [{}, {"title": "t"}]}) == "[]user<><t>"
+    assert not counted_exceptions
+
+
+def test_default(counted_exceptions):
+    tpl = template.Template(TEMPLATE, undefined=undefined.default("?"))
+
+    assert tpl.render({"admin": False, "rows": []}) == "[?]user"
+    assert not counted_exceptions
+
+
+def test_log(caplog):
+    policy = undefined.LogUndefined()
+    tpl = template.Template(TEMPLATE, undefined=policy)
+
+    assert tpl.render({"rows": [{}, {}]}) == "[]user<><>"
+    assert policy.misses == {
+        "name": 1, "admin": 1, "item.title": 2}
+    assert "'item.title'" in caplog.text
+
+
+def test_present_values_are_not_replaced():
+    tpl = template.Template(TEMPLATE, undefined=undefined.default("?"))
+
+    assert tpl.render({"name": "", "admin": True, "rows": []}) == \
+        "[]admin"
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        template.Template(TEMPLATE, undefined="unknown")
+
+
+def test_policy_is_pickled():
+    tpl = template.Template(TEMPLATE, undefined="log")
+    restored = pickle.loads(pickle.dumps(tpl))
+
+    assert restored.render({}) == "[]user"
+    assert restored.undefined.misses == {"name": 1, "admin": 1, "rows": 1}
+
+
+def test_metrics_count_misses():
+    sink = metrics.MetricsSink()
+    tpl = template.Template(TEMPLATE, observer=sink, undefined="empty")
+    tpl.render({"name": "name"})
+
+    snapshot = sink.snapshot()
+    assert snapshot["lookups"] == 3
+    assert snapshot["lookup_misses"] == 2
+
+
+@pytest.mark.parametrize("varname, context", (
+    ("a", {}),
+    ("a.b", {"a": {}}),
+    ("a.1", {"a": [1]}),
+    ("a.b", {"a": 1}),
+    ("a.b.c", {"a": {"b": None}}),
+    ("upper.x", {"upper": "string"})
+))
+def test_find_variable_missing(varname, context, counted_exceptions):
+    assert utils.find_variable(varname, context) is utils.MISSING
+    assert not counted_exceptions
+
+
+def test_missing_is_pickled():
+    assert pickle.loads(pickle.dumps(utils.MISSING)) is utils.MISSING
+
+
+@pytest.mark.parametrize("context, result", (
+    (collections.Counter(), "0"),
+    (collections.defaultdict(lambda: "default"), "default"),
+    ({"a": collections.Counter(b=1)}, "0"),
+))
+def test_missing_method(context, result):
+    text = "{{ x }}" if "a" not in context else "{{ a.x }}"
+
+    assert template.Template(text).render(context) == result
+
+
+def test_raising_property():
+    class Context:
+
+        @property
+        def x(self):
+            raise KeyError("boom")
+
+    for text in ("{{ x }}", "{{ x.y }}"):
+        with pytest.raises(exceptions.CurlyEvaluateNoKeyError):
+            template.Template(text).render(Context())
+    assert template.Template(
+        "{{ x }}", undefined="empty").render(Context()) == ""
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+
+import pytest
+
+from curly import exceptions
+from curly import metrics
+from curly import parser
+from curly import template
+from curly.columns import Columns
+
+
+BODY = "{% loop rows %}<{{ item.a }}|{{ item.b.c }}|{{ item }}>{% /loop %}"
+
+
+class Row:
+
+    def __init__(self, a):
+        self.a = a
+        self.b = {"c": "{" + a + "}"}
+
+    def __str__(self):
+        return "Row"
+
+
+class StructuredArray:
+    """Duck type of one-dimensional NumPy structured array."""
+
+    class dtype:
+        names = ("a", "b")
+
+    ndim = 1
+
+    def __init__(self, a, b):
+        self.columns = {"a": a, "b": b}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        return {name: values[key] for name, values in self.columns.items()}
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self.columns["a"])))
+
+
+def render_generic(tpl, context):
+    for node in parser.walk_tree(tpl.node):
+        if isinstance(node, parser.LoopNode):
+            node.vectorized = None
+
+    return tpl.render(context)
+
+
+def outcome(func, *args):
+    try:
+        return func(*args)
+    except exceptions.CurlyEvaluateError as exc:
+        return type(exc)
+
+
+@pytest.mark.parametrize("text", (
+    BODY,
+    "{% loop rows %}{{ item.a | upper }}{{ '{x}' }}{% /loop %}",
+    "{% loop rows %}{% /loop %}",
+    "{% loop rows %}{x}{% /loop %}"
+))
+@pytest.mark.parametrize("make_rows", (
+    lambda: [],
+    lambda: [{"a": "1", "b": {"c": 2}}, {"a": "<", "b": {"c": None}}],
+    lambda: [Row("x"), Row("y")],
+    lambda: {"k1": "v1", "k2": "v2"},
+    lambda: ({"a": "a", "b": {"c": index}} for index in range(3))
+))
+@pytest.mark.parametrize("options", (
+    {}, {"autoescape": True}, {"undefined": "empty"}
+))
+def test_same_as_generic(text, make_rows, options):
+    tpl = template.Template(text, **options)
+    generic = template.Template(text, **options)
+
+    assert outcome(tpl.render, {"rows": make_rows()}) == \
+        outcome(render_generic, generic, {"rows": make_rows()})
+
+
+@pytest.mark.parametrize("text", (
+    "{% loop rows %}{% if item %}1{% /if %}{% /loop %}",
+    "{% loop rows %}{{ other }}{% /loop %}",
+    "{% loop rows %}{{ items }}{% /loop %}",
+    "{% loop rows %}{% loop item %}{{ item }}{% /loop %}{% /loop %}"
+))
+def test_not_vectorized(text):
+    tpl = template.Template(text)
+
+    assert tpl.node[0].vectorized is None
+
+
+def test_vectorized():
+    tpl = template.Template(BODY)
+
+    assert tpl.node[0].vectorized.template == "<{!s}|{!s}|{!s}>"
+
+
+def test_shadowing_key_uses_generic():
+    tpl = template.Template("{% loop rows %}{{ item.a }}{% /loop %}")
+
+    assert tpl.render({"rows": [{"a": 1}], "item.a": 2}) == "2"
+
+
+def test_item_in_nested_loop(monkeypatch):
+    tpl = template.Template(
+        "{% loop rows %}{% loop item %}<{{ item }}>{% /loop %}{% /loop %}")
+    rendered = []
+    render = parser.VectorizedBody.render
+
+    def spy(self, *args):
+        rendered.append(render(self, *args))
+        return rendered[-1]
+
+    monkeypatch.setattr(parser.VectorizedBody, "render", spy)
+
+    assert tpl.render({"rows": [[1, 2], [3]]}) == "<1><2><3>"
+    assert rendered == ["<1><2>", "<3>"]
+
+
+def test_missing_strict():
+    tpl = template.Template("{% loop rows %}{{ item.a }}{% /loop %}")
+
+    with pytest.raises(exceptions.CurlyEvaluateNoKeyError) as excinfo:
+        tpl.render({"rows": [{"a": 1}, {}]})
+    assert excinfo.value.key == "item.a"
+    assert excinfo.value.context["item"] == {}
+
+
+def test_missing_default():
+    tpl = template.Template(
+        "{% loop rows %}{{ item.a }};{% /loop %}", undefined="empty")
+
+    assert tpl.render({"rows": [{"a": 1}, {}, {"a": 3}]}) == "1;;3;"
+
+
+@pytest.mark.parametrize("rows", (
+    Columns({"a": ["1", "<"], "b": [10, 20]}),
+    StructuredArray(["1", "<"], [10, 20])
+))
+def test_columns(rows):
+    text = "{% loop rows %}{{ item.a }}-{{ item.b }};{% /loop %}"
+    tpl = template.Template(text, autoescape=True)
+
+    assert tpl.render({"rows": rows}) == "1-10;&lt;-20;"
+    assert render_generic(tpl, {"rows": rows}) == "1-10;&lt;-20;"
+
+
+def test_columns_missing_column():
+    rows = Columns({"a": [1, 2]})
+    tpl = template.Template(
+        "{% loop rows %}{{ item.a }}{{ item.b }};{% /loop %}",
+        undefined="empty")
+
+    assert tpl.render({"rows": rows}) == "1;2;"
+
+
+def test_columns_validation():
+    with pytest.raises(ValueError):
+        Columns({"a": [1], "b": [1, 2]})
+
+    rows = Columns({"a": [1, 2, 3]})
+    assert len(rows) == 3
+    assert rows[-1] == {"a": 3}
+    assert list(rows[1:]) == [{"a": 2}, {"a": 3}]
+
+
+def test_metrics_are_collected():
+    sink = metrics.MetricsSink()
+    tpl = template.Template(
+        "{% loop rows %}{{ item.a }}{% /loop %}", observer=sink)
+    tpl.render({"rows": [{"a": 1}, {"a": 2}]})
+
+    snapshot = sink.snapshot()
+    assert snapshot["lookups"] == 3
+    assert snapshot["loop_iterations"] == 2